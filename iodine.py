@@ -12,7 +12,7 @@ from __future__ import annotations
 import copy
 from dataclasses import dataclass, field
 import json
-from typing import Dict, Set, Tuple, List
+from typing import Any, Callable, Dict, Optional, Set, Tuple, List
 from enum import Enum
 
 
@@ -161,18 +161,25 @@ class TCompartment:
 
 
 class TStack:
-    items: List[TNetworkDict]
+    """The undo or redo history of one network.
+
+    Each item is the number of an undo step, and the network as it was on the other side of that
+    step, or None if it did not exist then. The items are not copied.
+    """
+    items: List[Tuple[int, Optional[TNetwork]]]
     def __init__(self):
         self.items = []
 
     def isEmpty(self):
         return self.items == []
 
-    def push(self, netDict: TNetworkDict):
-        theSet = copy.deepcopy(netDict)
-        self.items.append(theSet)
+    def push(self, step: int, network: Optional[TNetwork]):
+        self.items.append((step, network))
 
-    def pop(self):
+    def top(self) -> Tuple[int, Optional[TNetwork]]:
+        return self.items[-1]
+
+    def pop(self) -> Tuple[int, Optional[TNetwork]]:
         return self.items.pop()
 
 
@@ -271,6 +278,7 @@ errorDict = {
 
 
 ExceptionDict = {
+    -1: Error,
     -2: IDNotFoundError,
     -3: IDRepeatError,
     -4: NodeNotFreeError,
@@ -307,12 +315,25 @@ fontWeightDict = {
 }
 
 
-stackFlag: bool = True
+stackFlag: bool = True  # False within a group, i.e. between startGroup() and endGroup()
 errCode: int = 0
 networkDict: TNetworkDict = TNetworkDict()
-netSetStack: TStack = TStack()
-redoStack: TStack = TStack()
+# The undo and redo histories, by network. A network is copied only when it changes, so editing
+# one network does not copy the others.
+undoStacks: Dict[int, TStack] = {}
+redoStacks: Dict[int, TStack] = {}
+stepCount: int = 0  # The number of the last undo step; a group of changes is one step
+groupNetworks: Set[int] = set()  # The networks already saved in the undo step of the group
 lastNetIndex: int = 0
+modelVersion: int = 0  # Incremented on every change to the model, including undo and redo
+
+# Kinds of items reported to change listeners; see addChangeListener()
+NODE = 'node'
+REACTION = 'reaction'
+COMPARTMENT = 'compartment'
+NETWORK = 'network'
+ChangeListener = Callable[[int, str, int], None]
+_changeListeners: List[ChangeListener] = []
 
 
 def getErrorCode():
@@ -321,44 +342,88 @@ def getErrorCode():
     return errCode
 
 
-def undo():
+def getModelVersion() -> int:
     """
-    Undo ge back to last state
+    Return a number that changes whenever the model may have changed, e.g. to invalidate caches.
+
+    The version is only ever incremented, even by reset().
+    """
+    return modelVersion
+
+
+def undo(neti: Optional[int] = None):
+    """
+    Undo the last undo step, or the last undo step of network neti if given.
+
+    Each network has its own history. Without neti, the last step of any network is undone, and
+    if it changed several networks, e.g. clearNetworks(), it is undone in all of them that have
+    not undone it since. With neti, the last step of network neti is undone, unless a later step
+    created or deleted a network, which is then undone instead; so the creation and deletion of
+    networks are undone from any network.
     errCode: -9: stack is empty
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
-    errCode = 0
-    if netSetStack.isEmpty():
-        errCode = -9
-    else:
-        redoStack.push(networkDict)
-        networkDict = netSetStack.pop()
-    if errCode < 0:
-        raise ExceptionDict[errCode](errorDict[errCode])
+    _moveStep(undoStacks, redoStacks, neti, max)
 
 
-def redo():
+def redo(neti: Optional[int] = None):
     """
-    Redo redo
+    Redo the first undone step, or the last undone step of network neti if given, or of the
+    creation or deletion of a network if undone since. See undo().
     errCode: -9: stack is empty
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
-    if redoStack.isEmpty():
-        errCode = -9
-    else:
-        netSetStack.push(networkDict)
-        networkDict = redoStack.pop()
-    if errCode < 0:
-        raise ExceptionDict[errCode](errorDict[errCode])
+    _moveStep(redoStacks, undoStacks, neti, min)
+
+
+def _moveStep(fromStacks: Dict[int, TStack], toStacks: Dict[int, TStack], neti: Optional[int],
+              choose: Callable[[List[int]], int]):
+    """Restore the networks saved in one step of fromStacks, saving them in toStacks."""
+    global errCode, modelVersion
+    errCode = 0
+    tops = {i: stack.top()[0] for i, stack in fromStacks.items()
+            if not stack.isEmpty() and (neti is None or i == neti or _addsOrRemoves(i, stack))}
+    if len(tops) == 0:
+        _raiseError(-9)
+    step = choose(list(tops.values()))
+    networks = [i for i, top in tops.items() if top == step]
+
+    modelVersion += 1
+    for i in networks:
+        step, network = fromStacks[i].pop()
+        toStacks.setdefault(i, TStack()).push(step, networkDict.get(i))
+        _restoreNetwork(i, network)
+
+
+def _addsOrRemoves(neti: int, stack: TStack) -> bool:
+    """Whether the top step of the stack of network neti creates or deletes it."""
+    return not stack.isEmpty() and (stack.top()[1] is None) == (neti in networkDict)
+
+
+def _restoreNetwork(neti: int, network: Optional[TNetwork]):
+    global networkDict, lastNetIndex
+    if neti in networkDict:
+        _notifyChange(neti, NETWORK)
+        if network is None:
+            del networkDict[neti]
+        else:
+            networkDict[neti] = network
+    elif network is not None:
+        # Keep the networks in the order of their indices, i.e. of their creation
+        networks = dict(networkDict)
+        networks[neti] = network
+        networkDict = TNetworkDict()
+        networkDict.update(sorted(networks.items()))
+        lastNetIndex = max(lastNetIndex, neti + 1)
 
 
 def startGroup():
     """
     StartGroup used at the start of a group operaction or secondary function.
+
+    The changes made until endGroup() are a single undo step, in each network that they change.
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
-    redoStack = TStack()
-    netSetStack.push(networkDict)
+    global stackFlag, stepCount
+    stepCount += 1
+    groupNetworks.clear()
     stackFlag = False
 
 
@@ -370,12 +435,26 @@ def endGroup():
     stackFlag = True
 
 
+def cancelGroup():
+    """
+    End a group, and undo its changes, e.g. if it failed half way. They cannot be redone, and the
+    redo history of the networks they changed stays cleared.
+    """
+    global stackFlag, modelVersion
+    stackFlag = True
+    if len(groupNetworks) != 0:
+        modelVersion += 1
+    for neti in groupNetworks:
+        _restoreNetwork(neti, undoStacks[neti].pop()[1])
+    groupNetworks.clear()
+
+
 def newNetwork(netID: str):
     """
     newNetwork Create a new network
     errCode -3: id repeat, 0 :ok
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack, lastNetIndex
+    global stackFlag, errCode, networkDict, lastNetIndex
     errCode = 0
     for network in networkDict.values():
         if network.id == netID:
@@ -384,19 +463,55 @@ def newNetwork(netID: str):
     if errCode < 0:
         raise ExceptionDict[errCode](errorDict[errCode])
     else:
-        _pushUndoStack()
+        _pushUndoStack(lastNetIndex)
 
         newNetwork = TNetwork(netID)
         networkDict[lastNetIndex] = newNetwork
         lastNetIndex += 1
 
 
+def addNetwork(network: TNetwork) -> int:
+    """
+    Add a network built outside of iodine, e.g. by a file importer, as a single undo step.
+
+    This is the bulk-insert path: the nodes, reactions and compartments of the network are taken
+    as they are, rather than added and validated one call at a time. The network must be
+    consistent, i.e. its item IDs unique, its reactions referring to its nodes, and the
+    compi, node_indices and baseNodes fields in agreement.
+    errCode -3: id repeat
+    return: the index of the new network
+    """
+    global lastNetIndex
+    if any(net.id == network.id for net in networkDict.values()):
+        _raiseError(-3)
+    _pushUndoStack(lastNetIndex)
+    neti = lastNetIndex
+    networkDict[neti] = network
+    lastNetIndex += 1
+    return neti
+
+
+def setNetwork(neti: int, network: TNetwork):
+    """
+    Replace network neti with a network built outside of iodine, as a single undo step.
+
+    See addNetwork().
+    errCode -3: id repeat, -5: net index out of range
+    """
+    _getNetwork(neti)
+    if any(net.id == network.id for i, net in networkDict.items() if i != neti):
+        _raiseError(-3)
+    _pushUndoStack(neti, replaced=True)
+    _notifyChange(neti, NETWORK)
+    networkDict[neti] = network
+
+
 def getNetworkIndex(netID: str) -> int:
     """
     getNetworkIndex
     return: -2: net id can't find
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = -2
 
     for i, net in networkDict.items():
@@ -413,7 +528,7 @@ def saveNetworkAsJSON(neti: int, fileName: str):
     errCode: -5: net index out of range
     -10: "Json convert error", -11: "File error"
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -461,24 +576,38 @@ def saveNetworkAsJSON(neti: int, fileName: str):
 def deleteNetwork(neti: int):
     """
     DeleteNetwork DeleteNetwork
+
+    Undoing this restores the network as it was deleted, but not its undo history, which is
+    discarded so that the histories of deleted networks do not pile up.
     errCode: -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
     if errCode < 0:
         raise ExceptionDict[errCode](errorDict[errCode])
     else:
-        _pushUndoStack()
+        _pushUndoStack(neti, replaced=True)
+        _forgetHistory(neti)
+        _notifyChange(neti, NETWORK)
 
         del networkDict[neti]
 
 
 def clearNetworks():
-    global stackFlag, errCode, networkDict, netSetStack, redoStack, lastNetIndex
-    errCode = 0
-    _pushUndoStack()
+    """Delete all the networks, as a single undo step. See deleteNetwork()."""
+    global stackFlag, errCode, networkDict, lastNetIndex
+    errCode = 0
+    inGroup = not stackFlag
+    if not inGroup:
+        startGroup()
+    for neti in networkDict:
+        _pushUndoStack(neti, replaced=True)
+        _forgetHistory(neti)
+    if not inGroup:
+        endGroup()
+    _notifyChange(-1, NETWORK)
     networkDict = TNetworkDict()
     lastNetIndex = 0
 
@@ -492,7 +621,7 @@ def getNetworkID(neti: int):
     GetNetworkID GetID of network
     errCode: -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -536,11 +665,94 @@ def _getCompartment(neti: int, compi: int) -> TCompartment:
     return net.compartments[compi]
 
 
-def _pushUndoStack():
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+def addChangeListener(listener: ChangeListener):
+    """
+    Register a function to be called whenever an existing item of the model is about to change,
+    e.g. to invalidate cached copies of it.
+
+    The listener is called as listener(neti, kind, index), where kind is one of NODE, REACTION and
+    COMPARTMENT, and index is the index of the item. If kind is NETWORK, every item of network
+    neti may change, or every item of every network if neti is -1 (e.g. on undo). The creation
+    of new items is not reported.
+    """
+    _changeListeners.append(listener)
+
+
+def removeChangeListener(listener: ChangeListener):
+    _changeListeners.remove(listener)
+
+
+def _notifyChange(neti: int, kind: str, index: int = -1):
+    for listener in _changeListeners:
+        listener(neti, kind, index)
+
+
+def _pushUndoStack(neti: int, replaced: bool = False):
+    """Called before every change to network neti, so this also increments the model version.
+
+    Network neti is saved to its undo history, and its redo history is cleared, the first time it
+    changes in an undo step. It is copied, unless replaced is True, i.e. it is about to be deleted
+    or replaced rather than changed.
+    """
+    global stepCount, modelVersion
+    modelVersion += 1
     if stackFlag:
-        redoStack = TStack()
-        netSetStack.push(networkDict)
+        stepCount += 1
+    elif neti in groupNetworks:
+        return
+    else:
+        groupNetworks.add(neti)
+    redoStacks.pop(neti, None)
+    # The creation and deletion of networks are redone from any network, so a new step in any
+    # network discards them
+    for i in [i for i, stack in redoStacks.items() if _addsOrRemoves(i, stack)]:
+        del redoStacks[i]
+    network = networkDict.get(neti)
+    if network is not None and not replaced:
+        network = _copyNetwork(network)
+    undoStacks.setdefault(neti, TStack()).push(stepCount, network)
+
+
+def _clone(obj: Any) -> Any:
+    """Return a shallow copy of an object with a __dict__, faster than copy.copy()."""
+    clone = object.__new__(type(obj))
+    clone.__dict__ = obj.__dict__.copy()
+    return clone
+
+
+def _copyNetwork(network: TNetwork) -> TNetwork:
+    """Return a deep copy of a network, for its undo history.
+
+    This is several times faster than copy.deepcopy(), which spends most of its time finding out
+    what to copy, since only the items, their colors, the species of the reactions and the node
+    sets are mutable.
+    """
+    new = _clone(network)
+    new.nodes = dict()
+    for nodei, node in network.nodes.items():
+        node = new.nodes[nodei] = _clone(node)
+        node.fillColor = _clone(node.fillColor)
+        node.outlineColor = _clone(node.outlineColor)
+        node.fontColor = _clone(node.fontColor)
+    new.reactions = dict()
+    for reai, reaction in network.reactions.items():
+        reaction = new.reactions[reai] = _clone(reaction)
+        reaction.fillColor = _clone(reaction.fillColor)
+        reaction.srcDict = {nodei: _clone(s) for nodei, s in reaction.srcDict.items()}
+        reaction.destDict = {nodei: _clone(s) for nodei, s in reaction.destDict.items()}
+    new.compartments = dict()
+    for compi, comp in network.compartments.items():
+        comp = new.compartments[compi] = _clone(comp)
+        comp.fillColor = _clone(comp.fillColor)
+        comp.outlineColor = _clone(comp.outlineColor)
+        comp.node_indices = set(comp.node_indices)
+    new.baseNodes = set(network.baseNodes)
+    return new
+
+
+def _forgetHistory(neti: int):
+    """Discard the undo history of network neti, but for its last step."""
+    del undoStacks[neti].items[:-1]
 
 
 def addNode(neti: int, nodeID: str, x: float, y: float, w: float, h: float):
@@ -550,7 +762,7 @@ def addNode(neti: int, nodeID: str, x: float, y: float, w: float, h: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     try:
         n = _getNetwork(neti)
@@ -563,7 +775,7 @@ def addNode(neti: int, nodeID: str, x: float, y: float, w: float, h: float):
             errCode = -12
             return
 
-        _pushUndoStack()
+        _pushUndoStack(neti)
         newNode = TNode(nodeID, x, y, w, h)
         n.addNode(newNode)
         networkDict[neti] = n
@@ -579,7 +791,7 @@ def getNodeIndex(neti: int, nodeID: str):
     -5: net index out of range
     return: >=0
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = -2
     if neti not in networkDict:
         errCode = -5
@@ -600,7 +812,7 @@ def deleteNode(neti: int, nodei: int):
     return: -7: node index out of range, -4: node is not free
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = -4
     if neti not in networkDict:
         errCode = -5
@@ -612,13 +824,15 @@ def deleteNode(neti: int, nodei: int):
             s = n.getFreenodes()
             if nodei in s:
                 errCode = 0
-                _pushUndoStack()
+                _pushUndoStack(neti)
                 networkDict[neti] = n
                 # remove node from associated compartment
                 compi = getCompartmentOfNode(neti, nodei)
+                _notifyChange(neti, NODE, nodei)
                 if compi == -1:
                     n.baseNodes.remove(nodei)
                 else:
+                    _notifyChange(neti, COMPARTMENT, compi)
                     n.compartments[compi].node_indices.remove(nodei)
                 del n.nodes[nodei]
                 return
@@ -632,14 +846,15 @@ def clearNetwork(neti: int):
     ClearNetwork clear all nodes and reactions in this network
     errCode: -5:  net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
     if errCode < 0:
         raise ExceptionDict[errCode](errorDict[errCode])
     else:
-        _pushUndoStack()
+        _pushUndoStack(neti)
+        _notifyChange(neti, NETWORK)
         networkDict[neti].nodes.clear()
         networkDict[neti].reactions.clear()
 
@@ -649,7 +864,7 @@ def getNumberOfNodes(neti: int):
     GetNumberOfNodes get the number of nodes in the current network
     num: >= -5:  net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -666,7 +881,7 @@ def getNodeCenter(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -688,7 +903,7 @@ def getNodeID(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -709,13 +924,18 @@ def getListOfNodeIDs(neti: int) -> List[str]:
     return [n.id for n in networkDict[neti].nodes.values()]
 
 
+def getListOfNodeIndices(neti: int) -> List[int]:
+    """Return the indices of all the nodes in the network, in the same order as getListOfNodeIDs."""
+    return list(_getNetwork(neti).nodes.keys())
+
+
 def getNodeCoordinateAndSize(neti: int, nodei: int):
     """
     getNodeCoordinateAndSize get the x,y,w,h of the node
     errCode:-7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -740,7 +960,7 @@ def getNodeFillColor(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -762,7 +982,7 @@ def getNodeFillColorRGB(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
 
     if neti not in networkDict:
@@ -786,7 +1006,7 @@ def getNodeFillColorAlpha(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -806,7 +1026,7 @@ def getNodeOutlineColor(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -828,7 +1048,7 @@ def getNodeOutlineColorRGB(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
 
     if neti not in networkDict:
@@ -852,7 +1072,7 @@ def getNodeOutlineColorAlpha(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
 
     if neti not in networkDict:
@@ -873,7 +1093,7 @@ def getNodeOutlineThickness(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -893,7 +1113,7 @@ def getNodeFontPointSize(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -913,7 +1133,7 @@ def getNodeFontFamily(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -933,7 +1153,7 @@ def getNodeFontStyle(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -953,7 +1173,7 @@ def getNodeFontWeight(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -973,7 +1193,7 @@ def getNodeFontName(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -993,7 +1213,7 @@ def getNodeFontColor(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1015,7 +1235,7 @@ def getNodeFontColorRGB(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
 
     if neti not in networkDict:
@@ -1039,7 +1259,7 @@ def getNodeFontColorAlpha(neti: int, nodei: int):
     errCode: -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
 
     if neti not in networkDict:
@@ -1061,7 +1281,7 @@ def setNodeID(neti: int, nodei: int, newID: str):
     -5: net index out of range
     -7: node index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1073,7 +1293,8 @@ def setNodeID(neti: int, nodei: int, newID: str):
             if any((n.id == newID for n in net.nodes.values())):
                 errCode = -3
             else:
-                _pushUndoStack()
+                _pushUndoStack(neti)
+                _notifyChange(neti, NODE, nodei)
                 net.nodes[nodei].id = newID
                 return
     raise ExceptionDict[errCode](errorDict[errCode])
@@ -1086,7 +1307,7 @@ def setNodeCoordinate(neti: int, nodei: int, x: float, y: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1097,7 +1318,8 @@ def setNodeCoordinate(neti: int, nodei: int, x: float, y: float):
         elif x < 0 or y < 0:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].x = x
             n.nodes[nodei].y = y
             return
@@ -1112,7 +1334,7 @@ def setNodeSize(neti: int, nodei: int, w: float, h: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1123,7 +1345,8 @@ def setNodeSize(neti: int, nodei: int, w: float, h: float):
         elif w <= 0 or h <= 0:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].w = w
             n.nodes[nodei].h = h
             return
@@ -1138,7 +1361,7 @@ def setNodeFillColorRGB(neti: int, nodei: int, r: int, g: int, b: int):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1149,7 +1372,8 @@ def setNodeFillColorRGB(neti: int, nodei: int, r: int, g: int, b: int):
         elif r < 0 or r > 255 or g < 0 or g > 255 or b < 0 or b > 255:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].fillColor.r = r
             n.nodes[nodei].fillColor.g = g
             n.nodes[nodei].fillColor.b = b
@@ -1165,7 +1389,7 @@ def setNodeFillColorAlpha(neti: int, nodei: int, a: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1176,7 +1400,8 @@ def setNodeFillColorAlpha(neti: int, nodei: int, a: float):
         elif a < 0 or a > 1:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             networkDict[neti].nodes[nodei].fillColor.a = int(a*255)
             return
 
@@ -1190,7 +1415,7 @@ def setNodeOutlineColorRGB(neti: int, nodei: int, r: int, g: int, b: int):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1201,7 +1426,8 @@ def setNodeOutlineColorRGB(neti: int, nodei: int, r: int, g: int, b: int):
         elif r < 0 or r > 255 or g < 0 or g > 255 or b < 0 or b > 255:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].outlineColor.r = r
             n.nodes[nodei].outlineColor.g = g
             n.nodes[nodei].outlineColor.b = b
@@ -1217,7 +1443,7 @@ def setNodeOutlineColorAlpha(neti: int, nodei: int, a: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1228,7 +1454,8 @@ def setNodeOutlineColorAlpha(neti: int, nodei: int, a: float):
         elif a < 0 or a > 1:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             A1 = int(a * 255)
             n.nodes[nodei].outlineColor.a = A1
             return
@@ -1243,7 +1470,7 @@ def setNodeOutlineThickness(neti: int, nodei: int, thickness: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1254,7 +1481,8 @@ def setNodeOutlineThickness(neti: int, nodei: int, thickness: float):
         elif thickness <= 0:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].outlineThickness = thickness
             return
 
@@ -1268,7 +1496,7 @@ def setNodeFontPointSize(neti: int, nodei: int, fontPointSize: int):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1279,7 +1507,8 @@ def setNodeFontPointSize(neti: int, nodei: int, fontPointSize: int):
         elif fontPointSize <= 0:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].fontPointSize = fontPointSize
             return
 
@@ -1294,7 +1523,7 @@ def setNodeFontFamily(neti: int, nodei: int, fontFamily: str):
     -7: node index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1305,7 +1534,8 @@ def setNodeFontFamily(neti: int, nodei: int, fontFamily: str):
         elif fontFamily not in fontFamilyDict:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].fontFamily = fontFamily
             return
 
@@ -1320,7 +1550,7 @@ def setNodeFontStyle(neti: int, nodei: int, fontStyle: str):
     -7: node index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1331,7 +1561,8 @@ def setNodeFontStyle(neti: int, nodei: int, fontStyle: str):
         elif fontStyle not in fontStyleDict:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].fontStyle = fontStyle
             return
     raise ExceptionDict[errCode](errorDict[errCode])
@@ -1345,7 +1576,7 @@ def setNodeFontWeight(neti: int, nodei: int, fontWeight: str):
     -7: node index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1356,7 +1587,8 @@ def setNodeFontWeight(neti: int, nodei: int, fontWeight: str):
         elif fontWeight not in fontWeightDict:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].fontWeight = fontWeight
             return
 
@@ -1370,7 +1602,7 @@ def setNodeFontName(neti: int, nodei: int, fontName: str):
     -5: net index out of range
     -7: node index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1379,7 +1611,8 @@ def setNodeFontName(neti: int, nodei: int, fontName: str):
         if nodei not in n.nodes:
             errCode = -7
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].fontName = fontName
             return
 
@@ -1393,7 +1626,7 @@ def setNodeFontColorRGB(neti: int, nodei: int, r: int, g: int, b: int):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1404,7 +1637,8 @@ def setNodeFontColorRGB(neti: int, nodei: int, r: int, g: int, b: int):
         elif r < 0 or r > 255 or g < 0 or g > 255 or b < 0 or b > 255:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             n.nodes[nodei].fontColor.r = r
             n.nodes[nodei].fontColor.g = g
             n.nodes[nodei].fontColor.b = b
@@ -1420,7 +1654,7 @@ def setNodeFontColorAlpha(neti: int, nodei: int, a: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1431,7 +1665,8 @@ def setNodeFontColorAlpha(neti: int, nodei: int, a: float):
         elif a < 0 or a > 1:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, NODE, nodei)
             networkDict[neti].nodes[nodei].fontColor.a = int(a*255)
             return
 
@@ -1444,7 +1679,7 @@ def createReaction(neti: int, reaID: str):
     errCode: -3: id repeat
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1452,7 +1687,7 @@ def createReaction(neti: int, reaID: str):
         if any((r.id == reaID for r in networkDict[neti].reactions.values())):
             errCode = -3
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
             newReact = TReaction(reaID)
             networkDict[neti].addReaction(newReact)
             return
@@ -1466,7 +1701,7 @@ def getReactionIndex(neti: int, reaID: str):
     return: -2: id can't find, >=0: ok
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1486,7 +1721,7 @@ def deleteReaction(neti: int, reai: int):
     errCode:  -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1494,7 +1729,8 @@ def deleteReaction(neti: int, reai: int):
         if reai not in networkDict[neti].reactions:
             errCode = -6
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             del networkDict[neti].reactions[reai]
             return
 
@@ -1506,7 +1742,7 @@ def clearReactions(neti: int):
     clearReactions clear all reactions in this network
     errCode: -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1514,7 +1750,8 @@ def clearReactions(neti: int):
     if errCode < 0:
         raise ExceptionDict[errCode](errorDict[errCode])
     else:
-        _pushUndoStack()
+        _pushUndoStack(neti)
+        _notifyChange(neti, NETWORK)
         networkDict[neti].reactions.clear()
 
 
@@ -1523,7 +1760,7 @@ def getNumberOfReactions(neti: int):
     getNumberOfReactions get the number of reactions in the current Reactionset
     return: >=0: ok, -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     if neti not in networkDict:
         errCode = -5
     if errCode < 0:
@@ -1539,7 +1776,7 @@ def getReactionID(neti: int, reai: int):
     errCode: -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1560,13 +1797,19 @@ def getListOfReactionIDs(neti: int) -> List[str]:
     return [r.id for r in networkDict[neti].reactions.values()]
 
 
+def getListOfReactionIndices(neti: int) -> List[int]:
+    """Return the indices of all the reactions in the network, in the same order as
+    getListOfReactionIDs."""
+    return list(_getNetwork(neti).reactions.keys())
+
+
 def getReactionRateLaw(neti: int, reai: int):
     """
     getReactionRateLaw get the ratelaw of Reaction
     errCode: -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1586,7 +1829,7 @@ def getReactionFillColor(neti: int, reai: int):
     errCode:  -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1606,7 +1849,7 @@ def getReactionFillColorRGB(neti: int, reai: int):
     errCode:  -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1629,7 +1872,7 @@ def getReactionFillColorAlpha(neti: int, reai: int):
     errCode:  -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1650,7 +1893,7 @@ def getReactionLineThickness(neti: int, reai: int):
     errCode: -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1670,7 +1913,7 @@ def getReactionCenterHandlePosition(neti: int, reai: int):
     errCode: -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1690,7 +1933,7 @@ def getReactionSrcNodeStoich(neti: int, reai: int, srcNodeIdx: int):
     errCode: -6: reaction index out of range,
     -5: net index out of range, -2: id not found
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1711,7 +1954,7 @@ def getReactionDestNodeStoich(neti: int, reai: int, destNodeIdx: int):
     return: positive float : ok, -6: reaction index out of range, -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1733,7 +1976,7 @@ def getReactionSrcNodeHandlePosition(neti: int, reai: int, srcNodeIdx: int):
     errCode: -6: reaction index out of range,
     -5: net index out of range, -2: id not found
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1756,7 +1999,7 @@ def getReactionDestNodeHandlePosition(neti: int, reai: int, destNodeIdx: int):
     return: positive float : ok, -6: reaction index out of range, -7: node index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1779,7 +2022,7 @@ def getNumberOfSrcNodes(neti: int, reai: int):
     return: non-negative int: ok, -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1799,7 +2042,7 @@ def getNumberOfDestNodes(neti: int, reai: int):
     return: non-negative int: ok, -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1819,7 +2062,7 @@ def getListOfReactionSrcNodes(neti: int, reai: int) -> List[int]:
     return: non-empty slice : ok, -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1843,7 +2086,7 @@ def getListOfReactionDestNodes(neti: int, reai: int) -> List[int]:
     return: non-empty slice : ok, -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1896,7 +2139,7 @@ def addSrcNode(neti: int, reai: int, nodei: int, stoich: float):
     -8: "wrong stoich: stoich has to be positive"
     -3: id repeat
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1914,7 +2157,8 @@ def addSrcNode(neti: int, reai: int, nodei: int, stoich: float):
             if srcNodeIdx in r[reai].srcDict:
                 errCode = -3
             else:
-                _pushUndoStack()
+                _pushUndoStack(neti)
+                _notifyChange(neti, REACTION, reai)
                 rea.srcDict[srcNodeIdx] = TSpeciesNode(stoich)
                 networkDict[neti].reactions[reai] = rea
                 return
@@ -1932,7 +2176,7 @@ def addDestNode(neti: int, reai: int, nodei: int, stoich: float):
     -8: "wrong stoich: stoich has to be positive"
     -3: id repeat
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1949,7 +2193,8 @@ def addDestNode(neti: int, reai: int, nodei: int, stoich: float):
             if nodei in rea.destDict:
                 errCode = -3
             else:
-                _pushUndoStack()
+                _pushUndoStack(neti)
+                _notifyChange(neti, REACTION, reai)
                 rea.destDict[nodei] = TSpeciesNode(stoich)
                 networkDict[neti].reactions[reai] = rea
                 return
@@ -1964,7 +2209,7 @@ def deleteSrcNode(neti: int, reai: int, srcNodeIdx: int):
     -5: net index out of range
     -2: id not found
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -1977,7 +2222,8 @@ def deleteSrcNode(neti: int, reai: int, srcNodeIdx: int):
             if srcNodeIdx not in rea.srcDict:
                 errCode = -2
             else:
-                _pushUndoStack()
+                _pushUndoStack(neti)
+                _notifyChange(neti, REACTION, reai)
                 del rea.srcDict[srcNodeIdx]
                 networkDict[neti].reactions[reai] = rea
                 return
@@ -1992,7 +2238,7 @@ def deleteDestNode(neti: int, reai: int, destNodeIdx: int):
     -5: net index out of range
     -2: id not found
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2005,7 +2251,8 @@ def deleteDestNode(neti: int, reai: int, destNodeIdx: int):
             if destNodeIdx not in rea.destDict:
                 errCode = -2
             else:
-                _pushUndoStack()
+                _pushUndoStack(neti)
+                _notifyChange(neti, REACTION, reai)
                 del rea.destDict[destNodeIdx]
                 return
 
@@ -2019,7 +2266,7 @@ def setReactionID(neti: int, reai: int, newID: str):
     -5: net index out of range
     -3: id repeat
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2031,7 +2278,8 @@ def setReactionID(neti: int, reai: int, newID: str):
             if any((r.id == newID for r in reactions.values())):
                 errCode = -3
             else:
-                _pushUndoStack()
+                _pushUndoStack(neti)
+                _notifyChange(neti, REACTION, reai)
                 networkDict[neti].reactions[reai].id = newID
                 return
 
@@ -2044,7 +2292,7 @@ def setRateLaw(neti: int, reai: int, rateLaw: str):
     errCode: -6: reaction index out of range
     -5: net index out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2052,7 +2300,8 @@ def setRateLaw(neti: int, reai: int, rateLaw: str):
         if reai not in networkDict[neti].reactions:
             errCode = -6
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             networkDict[neti].reactions[reai].rateLaw = rateLaw
             return
 
@@ -2066,7 +2315,7 @@ def setReactionSrcNodeStoich(neti: int, reai: int, srcNodeIdx: int, newStoich: f
     -5: net index out of range, -2: id not found
     -8: wrong stoich
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2079,7 +2328,8 @@ def setReactionSrcNodeStoich(neti: int, reai: int, srcNodeIdx: int, newStoich: f
         elif newStoich <= 0.0:
             errCode = -8
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             networkDict[neti].reactions[reai].srcDict[srcNodeIdx].stoich = newStoich
             return
 
@@ -2093,7 +2343,7 @@ def setReactionDestNodeStoich(neti: int, reai: int, destNodeIdx: int, newStoich:
     -5: net index out of range, -2: id not found
     -8: wrong stoich
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2106,7 +2356,8 @@ def setReactionDestNodeStoich(neti: int, reai: int, destNodeIdx: int, newStoich:
         elif newStoich <= 0.0:
             errCode = -8
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             networkDict[neti].reactions[reai].destDict[destNodeIdx].stoich = newStoich
             return
 
@@ -2120,7 +2371,7 @@ def setReactionSrcNodeHandlePosition(neti: int, reai: int, srcNodeIdx: int, hand
     -5: net index out of range, -2: id not found
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2131,7 +2382,8 @@ def setReactionSrcNodeHandlePosition(neti: int, reai: int, srcNodeIdx: int, hand
         elif srcNodeIdx not in r[reai].srcDict:
             errCode = -2
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             networkDict[neti].reactions[reai].srcDict[srcNodeIdx].handleX = handleX
             networkDict[neti].reactions[reai].srcDict[srcNodeIdx].handleY = handleY
             return
@@ -2146,7 +2398,7 @@ def setReactionDestNodeHandlePosition(neti: int, reai: int, destNodeIdx: int, ha
     -5: net index out of range, -2: id not found
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2157,7 +2409,8 @@ def setReactionDestNodeHandlePosition(neti: int, reai: int, destNodeIdx: int, ha
         elif destNodeIdx not in r[reai].destDict:
             errCode = -2
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             networkDict[neti].reactions[reai].destDict[destNodeIdx].handleX = handleX
             networkDict[neti].reactions[reai].destDict[destNodeIdx].handleY = handleY
             return
@@ -2172,7 +2425,7 @@ def setReactionFillColorRGB(neti: int, reai: int, R: int, G: int, B: int):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2183,7 +2436,8 @@ def setReactionFillColorRGB(neti: int, reai: int, R: int, G: int, B: int):
         elif R < 0 or R > 255 or G < 0 or G > 255 or B < 0 or B > 255:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             r[reai].fillColor.r = R
             r[reai].fillColor.g = G
             r[reai].fillColor.b = B
@@ -2199,7 +2453,7 @@ def setReactionFillColorAlpha(neti: int, reai: int, a: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2210,7 +2464,8 @@ def setReactionFillColorAlpha(neti: int, reai: int, a: float):
         elif a < 0 or a > 1:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             A1 = int(a * 255)
             r[reai].fillColor.a = A1
             return
@@ -2225,7 +2480,7 @@ def setReactionLineThickness(neti: int, reai: int, thickness: float):
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2235,7 +2490,8 @@ def setReactionLineThickness(neti: int, reai: int, thickness: float):
         elif thickness <= 0:
             errCode = -12
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             networkDict[neti].reactions[reai].thickness = thickness
             return
 
@@ -2249,7 +2505,7 @@ def setReactionCenterHandlePosition(neti: int, reai: int, centerHandleX: float,
     -5: net index out of range
     -12: Variable out of range
     """
-    global stackFlag, errCode, networkDict, netSetStack, redoStack
+    global stackFlag, errCode, networkDict
     errCode = 0
     if neti not in networkDict:
         errCode = -5
@@ -2257,7 +2513,8 @@ def setReactionCenterHandlePosition(neti: int, reai: int, centerHandleX: float,
         if reai not in networkDict[neti].reactions:
             errCode = -6
         else:
-            _pushUndoStack()
+            _pushUndoStack(neti)
+            _notifyChange(neti, REACTION, reai)
             networkDict[neti].reactions[reai].centerHandleX = centerHandleX
             networkDict[neti].reactions[reai].centerHandleY = centerHandleY
             return
@@ -2283,7 +2540,7 @@ def addCompartment(neti: int, compID: str, x: float, y: float, w: float, h: floa
     comp = TCompartment(compID, x, y, w, h)
     if any((compID == c.id for c in net.compartments.values())):
         _raiseError(-3)
-    _pushUndoStack()
+    _pushUndoStack(neti)
     return net.addCompartment(comp)
 
 
@@ -2293,11 +2550,14 @@ def deleteCompartment(neti: int, compi: int):
     if compi not in net.compartments:
         _raiseError(-13)
 
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     # Put all nodes in compartment in base compartment (-1)
     for nodei in net.compartments[compi].node_indices:
         assert net.nodes[nodei].compi == compi
+        _notifyChange(neti, NODE, nodei)
         net.nodes[nodei].compi = -1
+        net.baseNodes.add(nodei)
 
     del net.compartments[compi]
 
@@ -2327,14 +2587,17 @@ def setCompartmentOfNode(neti: int, nodei: int, compi: int):
     net = _getNetwork(neti)
 
     node = _getNode(neti, nodei)
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, NODE, nodei)
     if node.compi != -1:
+        _notifyChange(neti, COMPARTMENT, node.compi)
         net.compartments[node.compi].node_indices.remove(nodei)
     else:
         net.baseNodes.remove(nodei)
 
     if compi != -1:
         newComp = _getCompartment(neti, compi)
+        _notifyChange(neti, COMPARTMENT, compi)
         newComp.node_indices.add(nodei)
     else:
         net.baseNodes.add(nodei)
@@ -2345,7 +2608,8 @@ def setCompartmentOfNode(neti: int, nodei: int, compi: int):
 def setCompartmentPosition(neti: int, compi: int, x: float, y: float):
     if x < 0 or y < 0:
         _raiseError(-12)
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     comp = _getCompartment(neti, compi)
     comp.x = x
     comp.y = y
@@ -2359,7 +2623,8 @@ def getCompartmentPosition(neti: int, compi: int) -> Tuple[float, float]:
 def setCompartmentSize(neti: int, compi: int, w: float, h: float):
     if w < 0 or h < 0:
         _raiseError(-12)
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     comp = _getCompartment(neti, compi)
     comp.w = w
     comp.h = h
@@ -2371,7 +2636,8 @@ def getCompartmentSize(neti: int, compi: int) -> Tuple[float, float]:
 
 
 def setCompartmentVolume(neti: int, compi: int, volume: float):
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     _getCompartment(neti, compi).volume = volume
 
 
@@ -2380,7 +2646,8 @@ def getCompartmentVolume(neti: int, compi: int) -> float:
 
 
 def setCompartmentID(neti: int, compi: int, id: str):
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     _getCompartment(neti, compi).id = id
 
 
@@ -2391,7 +2658,8 @@ def getCompartmentID(neti: int, compi: int) -> str:
 # TODO note that this returns a TColor instead of tuples of numbers. Should change the node &
 # reaction color functions to do the same.
 def setCompartmentFillColor(neti: int, compi: int, color: TColor):
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     _getCompartment(neti, compi).fillColor = color
 
 
@@ -2400,7 +2668,8 @@ def getCompartmentFillColor(neti: int, compi: int) -> TColor:
 
 
 def setCompartmentOutlineColor(neti: int, compi: int, color: TColor):
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     _getCompartment(neti, compi).outlineColor = color
 
 
@@ -2409,12 +2678,170 @@ def getCompartmentOutlineColor(neti: int, compi: int) -> TColor:
 
 
 def setCompartmentOutlineThickness(neti: int, compi: int, thickness: float):
-    _pushUndoStack()
+    _pushUndoStack(neti)
+    _notifyChange(neti, COMPARTMENT, compi)
     _getCompartment(neti, compi).outlineThickness = thickness
 
 
 def getCompartmentOutlineThickness(neti: int, compi: int) -> float:
     return _getCompartment(neti, compi).outlineThickness
+
+
+def _validColor(color: TColor) -> bool:
+    return all(0 <= c <= 255 for c in (color.r, color.g, color.b, color.a))
+
+
+def _nonNegative(value: float) -> bool:
+    return value >= 0
+
+
+def _positive(value: float) -> bool:
+    return value > 0
+
+
+def _anyValue(_) -> bool:
+    return True
+
+
+# Attributes that may be set in bulk, mapped to the function that validates their values
+_NODE_ATTRIBUTES = {
+    'id': _anyValue,
+    'x': _nonNegative,
+    'y': _nonNegative,
+    'w': _positive,
+    'h': _positive,
+    'fillColor': _validColor,
+    'outlineColor': _validColor,
+    'outlineThickness': _positive,
+}
+_REACTION_ATTRIBUTES = {
+    'id': _anyValue,
+    'rateLaw': _anyValue,
+    'fillColor': _validColor,
+    'thickness': _positive,
+}
+_COMPARTMENT_ATTRIBUTES = {
+    'id': _anyValue,
+    'x': _nonNegative,
+    'y': _nonNegative,
+    'w': _nonNegative,
+    'h': _nonNegative,
+    'volume': _anyValue,
+    'fillColor': _validColor,
+    'outlineColor': _validColor,
+    'outlineThickness': _anyValue,
+}
+
+
+def _setAttributes(neti: int, kind: str, items: Dict[int, Any], attrs: Dict[int, Dict[str, Any]],
+                   validators: Dict[str, Any], notFoundCode: int):
+    """Validate all the given attributes, then set them with a single undo step."""
+    newIDs = dict()
+    for i, itemAttrs in attrs.items():
+        if i not in items:
+            _raiseError(notFoundCode)
+        for name, value in itemAttrs.items():
+            if name not in validators:
+                _raiseError(-1)
+            if not validators[name](value):
+                _raiseError(-12)
+        if 'id' in itemAttrs:
+            newIDs[i] = itemAttrs['id']
+
+    if len(newIDs) != 0:
+        ids = [newIDs.get(i, item.id) for i, item in items.items()]
+        if len(set(ids)) != len(ids):
+            _raiseError(-3)
+
+    _pushUndoStack(neti)
+    for i, itemAttrs in attrs.items():
+        _notifyChange(neti, kind, i)
+        item = items[i]
+        for name, value in itemAttrs.items():
+            if isinstance(value, TColor):
+                value = copy.copy(value)  # Colors may be shared by the caller
+            setattr(item, name, value)
+
+
+def setNodesAttributes(neti: int, attrs: Dict[int, Dict[str, Any]]):
+    """
+    Set the attributes of many nodes at once, as a single undo step.
+
+    Args:
+        neti: network index.
+        attrs: Maps node indices to dicts of new attribute values, keyed by TNode attribute name.
+               The attributes that may be set are id, x, y, w, h, fillColor, outlineColor, and
+               outlineThickness. Colors are given as TColor.
+
+    Every value is validated before any is set, so if an error is raised, nothing has changed.
+    errCode: -1: unsupported attribute, -3: id repeat, -5: net index out of range
+    -7: node index out of range, -12: Variable out of range
+    """
+    _setAttributes(neti, NODE, _getNetwork(neti).nodes, attrs, _NODE_ATTRIBUTES, -7)
+
+
+def setReactionsAttributes(neti: int, attrs: Dict[int, Dict[str, Any]]):
+    """
+    Set the attributes of many reactions at once, as a single undo step.
+
+    The attributes that may be set are id, rateLaw, fillColor, and thickness. See
+    setNodesAttributes() for details.
+    errCode: -1: unsupported attribute, -3: id repeat, -5: net index out of range
+    -6: reaction index out of range, -12: Variable out of range
+    """
+    _setAttributes(neti, REACTION, _getNetwork(neti).reactions, attrs, _REACTION_ATTRIBUTES, -6)
+
+
+def setCompartmentsAttributes(neti: int, attrs: Dict[int, Dict[str, Any]]):
+    """
+    Set the attributes of many compartments at once, as a single undo step.
+
+    The attributes that may be set are id, x, y, w, h, volume, fillColor, outlineColor, and
+    outlineThickness. See setNodesAttributes() for details.
+    errCode: -1: unsupported attribute, -3: id repeat, -5: net index out of range
+    -12: Variable out of range, -13: compartment index out of range
+    """
+    _setAttributes(neti, COMPARTMENT, _getNetwork(neti).compartments, attrs,
+                   _COMPARTMENT_ATTRIBUTES, -13)
+
+
+def setReactionsHandlePositions(neti: int, handles: Dict[int, Dict[str, Any]]):
+    """
+    Set the handle positions of many reactions at once, as a single undo step.
+
+    Args:
+        neti: network index.
+        handles: Maps reaction indices to dicts with any of the keys 'center', 'src' and 'dest'.
+                 'center' is the (x, y) position of the center handle; 'src' and 'dest' map the
+                 indices of reactant and product nodes respectively to (x, y) handle positions.
+
+    Every reaction and node is checked before any handle is set, so if an error is raised,
+    nothing has changed.
+    errCode: -1: unsupported key, -2: node is not a reactant/product of the reaction
+    -5: net index out of range, -6: reaction index out of range
+    """
+    reactions = _getNetwork(neti).reactions
+    for reai, reaHandles in handles.items():
+        if reai not in reactions:
+            _raiseError(-6)
+        for key, value in reaHandles.items():
+            if key == 'src' or key == 'dest':
+                speciesDict = reactions[reai].srcDict if key == 'src' else reactions[reai].destDict
+                if any(nodei not in speciesDict for nodei in value):
+                    _raiseError(-2)
+            elif key != 'center':
+                _raiseError(-1)
+
+    _pushUndoStack(neti)
+    for reai, reaHandles in handles.items():
+        _notifyChange(neti, REACTION, reai)
+        reaction = reactions[reai]
+        if 'center' in reaHandles:
+            reaction.centerHandleX, reaction.centerHandleY = reaHandles['center']
+        for key, speciesDict in (('src', reaction.srcDict), ('dest', reaction.destDict)):
+            for nodei, (x, y) in reaHandles.get(key, dict()).items():
+                speciesDict[nodei].handleX = x
+                speciesDict[nodei].handleY = y
     
 
 def createUniUni(neti: int, reaID:str, rateLaw:str, srci: int, desti: int, srcStoich:float, destStoich:float):
@@ -2466,15 +2893,24 @@ def CreateBiBi(neti:int, reaID:str, rateLaw:str, src1i:int, src2i:int, dest1i:in
 
 
 def reset():
-    global stackFlag, errCode, networkDict, netSetStack, redoStack, lastNetIndex
+    global stackFlag, errCode, networkDict, undoStacks, redoStacks, lastNetIndex, modelVersion
+    modelVersion += 1
+    _notifyChange(-1, NETWORK)
     stackFlag = True
     errCode = 0
     networkDict = TNetworkDict()
-    netSetStack = TStack()
-    redoStack = TStack()
+    undoStacks = {}
+    redoStacks = {}
+    groupNetworks.clear()
     lastNetIndex = 0
 
 
+def clearUndoHistory():
+    """Discard the undo and redo histories of all the networks, e.g. once the model is loaded."""
+    undoStacks.clear()
+    redoStacks.clear()
+
+
 # newNetwork("net1")
 # newNetwork("net2")
 # newNetwork("net3")
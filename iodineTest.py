@@ -626,6 +626,38 @@ class TestNodeFunc(unittest.TestCase):
         self.assertEqual(IodineAPI.redo(), None)
         self.assertEqual(IodineAPI.getNodeOutlineThickness(0, 1), 1)
 
+    def test_setNodesAttributes(self):
+        color = IodineAPI.TColor(10, 20, 30, 255)
+        self.assertEqual(IodineAPI.setNodesAttributes(0, {
+            0: {'x': 5, 'y': 6, 'fillColor': color},
+            2: {'id': 'node4', 'outlineThickness': 2},
+        }), None)
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0), (5, 6, 5.4, 6.4))
+        self.assertEqual(IodineAPI.getNodeFillColorRGB(0, 0), 0x0a141e)
+        self.assertEqual(IodineAPI.getNodeID(0, 2), 'node4')
+        self.assertEqual(IodineAPI.getNodeOutlineThickness(0, 2), 2)
+        # Nothing is set if any value is invalid
+        with self.assertRaises(IodineAPI.NodeIndexNotFoundError):
+            IodineAPI.setNodesAttributes(0, {0: {'x': 7}, 4: {'x': 7}})
+        with self.assertRaises(IodineAPI.VariableOutOfRangeError):
+            IodineAPI.setNodesAttributes(0, {0: {'x': 7}, 1: {'w': 0}})
+        with self.assertRaises(IodineAPI.IDRepeatError):
+            IodineAPI.setNodesAttributes(0, {0: {'x': 7}, 1: {'id': 'node1'}})
+        # Swapping IDs is fine, since they are unique afterwards
+        IodineAPI.setNodesAttributes(0, {0: {'id': 'node2'}, 1: {'id': 'node1'}})
+        self.assertEqual(IodineAPI.getNodeID(0, 0), 'node2')
+        with self.assertRaises(IodineAPI.Error):
+            IodineAPI.setNodesAttributes(0, {0: {'compi': 1}})
+        with self.assertRaises(IodineAPI.NetIndexNotFoundError):
+            IodineAPI.setNodesAttributes(3, {0: {'x': 7}})
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0), (5, 6, 5.4, 6.4))
+        # A single undo step
+        IodineAPI.undo()
+        self.assertEqual(IodineAPI.getNodeID(0, 0), 'node1')
+        IodineAPI.undo()
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0), (1.1, 2.5, 5.4, 6.4))
+        self.assertEqual(IodineAPI.getNodeID(0, 2), 'node3')
+
     def test_setNodeFontPointSize(self):
         self.assertEqual(IodineAPI.getNodeFontPointSize(0, 1), 20)
         self.assertEqual(IodineAPI.setNodeFontPointSize(0, 1, 10), None)
@@ -1501,6 +1533,28 @@ class TestReactionNodeFunc(unittest.TestCase):
         self.assertEqual(IodineAPI.redo(), None)
         self.assertEqual(IodineAPI.getReactionCenterHandlePosition(0, 1), (2.1, 3.2))
 
+    def test_setReactionsHandlePositions(self):
+        self.assertEqual(IodineAPI.setReactionsHandlePositions(0, {
+            0: {'center': (1, 2), 'src': {0: (3, 4)}, 'dest': {3: (5, 6)}},
+            1: {'dest': {0: (7, 8), 2: (9, 10)}},
+        }), None)
+        self.assertEqual(IodineAPI.getReactionCenterHandlePosition(0, 0), (1, 2))
+        self.assertEqual(IodineAPI.getReactionSrcNodeHandlePosition(0, 0, 0), (3, 4))
+        self.assertEqual(IodineAPI.getReactionDestNodeHandlePosition(0, 0, 3), (5, 6))
+        self.assertEqual(IodineAPI.getReactionDestNodeHandlePosition(0, 1, 2), (9, 10))
+        # Nothing is set if any reaction or node is invalid
+        with self.assertRaises(IodineAPI.IDNotFoundError):
+            IodineAPI.setReactionsHandlePositions(0, {0: {'center': (0, 0), 'src': {2: (1, 1)}}})
+        with self.assertRaises(IodineAPI.ReactionIndexNotFoundError):
+            IodineAPI.setReactionsHandlePositions(0, {0: {'center': (0, 0)}, 4: {}})
+        with self.assertRaises(IodineAPI.Error):
+            IodineAPI.setReactionsHandlePositions(0, {0: {'middle': (0, 0)}})
+        self.assertEqual(IodineAPI.getReactionCenterHandlePosition(0, 0), (1, 2))
+        # A single undo step
+        IodineAPI.undo()
+        self.assertEqual(IodineAPI.getReactionCenterHandlePosition(0, 0), (0, 0))
+        self.assertEqual(IodineAPI.getReactionDestNodeHandlePosition(0, 1, 2), (0, 0))
+
     '''
     def test_saveNetworkAsJSON_readNetworkFromJSON(self):
         self.assertEqual(IodineAPI.saveNetworkAsJSON(0, "../JSON_files/testfile.json"), None)
@@ -1628,8 +1682,181 @@ class TestCompartmentFunc(unittest.TestCase):
         IodineAPI.redo()
         self.assertEqual(IodineAPI.getCompartmentOfNode(0, 2), 1)
 
+    def test_deleteCompartmentMovesNodesToBase(self):
+        IodineAPI.setCompartmentOfNode(0, 2, 1)
+        IodineAPI.deleteCompartment(0, 1)
+        self.assertIn(2, IodineAPI.getNodesInCompartment(0, -1))
+        IodineAPI.setCompartmentOfNode(0, 2, 0)
+        self.assertNotIn(2, IodineAPI.getNodesInCompartment(0, -1))
+
     # TODO more tests can be added for undo/redo, and also for the fill/stroke/etc. functions.
 
 
+class TestUndoHistory(unittest.TestCase):
+    def setUp(self):
+        IodineAPI.newNetwork("network1")
+        IodineAPI.newNetwork("network2")
+        IodineAPI.addNode(0, "node1", 1.1, 2.5, 5.4, 6.4)
+        IodineAPI.addNode(1, "node2", 1.2, 3.2, 2.5, 4.1)
+
+    def tearDown(self):
+        IodineAPI.clearNetworks()
+
+    def test_per_network(self):
+        IodineAPI.setNodeCoordinate(0, 0, 3, 4)
+        # Changing network 1 saves only network 1
+        depth = len(IodineAPI.undoStacks[0].items)
+        IodineAPI.setNodeCoordinate(1, 0, 5, 6)
+        self.assertEqual(len(IodineAPI.undoStacks[0].items), depth)
+
+        IodineAPI.undo(0)
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0)[:2], (1.1, 2.5))
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(1, 0)[:2], (5, 6))
+        IodineAPI.undo(0)
+        self.assertEqual(IodineAPI.getListOfNodeIndices(0), [])
+        IodineAPI.undo(0)
+        self.assertEqual(IodineAPI.getListOfNetworks(), [1])
+        IodineAPI.redo(0)
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1])
+
+        # A change to network 1 clears only its redo history
+        IodineAPI.setNodeCoordinate(1, 0, 7, 8)
+        with self.assertRaises(IodineAPI.StackEmptyError):
+            IodineAPI.redo(1)
+        IodineAPI.redo(0)
+        IodineAPI.redo()
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0)[:2], (3, 4))
+
+        # undo() undoes the last change to any network
+        IodineAPI.undo()
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(1, 0)[:2], (5, 6))
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0)[:2], (3, 4))
+
+    def test_group(self):
+        IodineAPI.startGroup()
+        IodineAPI.setNodeCoordinate(0, 0, 3, 4)
+        IodineAPI.setNodeSize(0, 0, 7, 8)
+        IodineAPI.setNodeCoordinate(1, 0, 5, 6)
+        IodineAPI.endGroup()
+        # One step in each network that the group changed
+        IodineAPI.undo(1)
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(1, 0)[:2], (1.2, 3.2))
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0), (3, 4, 7, 8))
+        IodineAPI.redo(1)
+        IodineAPI.undo()
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0), (1.1, 2.5, 5.4, 6.4))
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(1, 0)[:2], (1.2, 3.2))
+        IodineAPI.redo()
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0), (3, 4, 7, 8))
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(1, 0)[:2], (5, 6))
+
+    def test_networks(self):
+        IodineAPI.deleteNetwork(0)
+        IodineAPI.undo()
+        # Restored in its place
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1])
+        self.assertEqual(IodineAPI.getNodeID(0, 0), "node1")
+        IodineAPI.newNetwork("network3")
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1, 2])
+
+        # Networks are created and deleted in the history of every network
+        IodineAPI.undo(1)
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1])
+        IodineAPI.redo(0)
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1, 2])
+        IodineAPI.deleteNetwork(0)
+        IodineAPI.undo(2)
+        self.assertEqual(IodineAPI.getNodeID(0, 0), "node1")
+        IodineAPI.redo(1)
+        self.assertEqual(IodineAPI.getListOfNetworks(), [1, 2])
+        # But the earlier changes to a deleted network are forgotten
+        self.assertEqual(len(IodineAPI.undoStacks[0].items), 1)
+        IodineAPI.undo(1)
+        IodineAPI.undo(0)
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1])
+        with self.assertRaises(IodineAPI.StackEmptyError):
+            IodineAPI.undo(0)
+        self.assertEqual(IodineAPI.getListOfNodeIndices(0), [0])
+
+    def test_cancelGroup(self):
+        IodineAPI.setNodeCoordinate(0, 0, 3, 4)
+        IodineAPI.startGroup()
+        IodineAPI.setNodeCoordinate(0, 0, 5, 6)
+        IodineAPI.setNodeCoordinate(1, 0, 7, 8)
+        IodineAPI.newNetwork("network3")
+        IodineAPI.cancelGroup()
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1])
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0)[:2], (3, 4))
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(1, 0)[:2], (1.2, 3.2))
+        # The changes before the group are still undone
+        IodineAPI.undo(0)
+        self.assertEqual(IodineAPI.getNodeCoordinateAndSize(0, 0)[:2], (1.1, 2.5))
+
+    def test_copies(self):
+        # The undo history keeps its own colors and species, which iodine changes in place
+        IodineAPI.createReaction(0, "rea1")
+        IodineAPI.addSrcNode(0, 0, 0, 1)
+        color = IodineAPI.getNodeFillColor(0, 0)
+        IodineAPI.startGroup()
+        IodineAPI.setNodeFillColorRGB(0, 0, 1, 2, 3)
+        IodineAPI.setReactionSrcNodeStoich(0, 0, 0, 5)
+        IodineAPI.endGroup()
+        IodineAPI.undo(0)
+        self.assertEqual(IodineAPI.getNodeFillColor(0, 0), color)
+        self.assertEqual(IodineAPI.getReactionSrcNodeStoich(0, 0, 0), 1)
+        IodineAPI.redo(0)
+        self.assertEqual(IodineAPI.getNodeFillColor(0, 0)[:3], (1, 2, 3))
+        self.assertEqual(IodineAPI.getReactionSrcNodeStoich(0, 0, 0), 5)
+
+    def test_clearUndoHistory(self):
+        IodineAPI.clearUndoHistory()
+        with self.assertRaises(IodineAPI.StackEmptyError):
+            IodineAPI.undo()
+        self.assertEqual(IodineAPI.getListOfNetworks(), [0, 1])
+
+
+class TestChangeListener(unittest.TestCase):
+    def setUp(self):
+        IodineAPI.newNetwork("network1")
+        IodineAPI.addNode(0, "node1", 1.1, 2.5, 5.4, 6.4)
+        IodineAPI.addNode(0, "node2", 1.2, 3.2, 2.5, 4.1)
+        IodineAPI.createReaction(0, "rea1")
+        IodineAPI.addCompartment(0, "comp1", 4.2, 5.3, 12.3, 7.1)
+        self.changes = list()
+        IodineAPI.addChangeListener(self.listener)
+
+    def tearDown(self):
+        IodineAPI.removeChangeListener(self.listener)
+        IodineAPI.clearNetworks()
+
+    def listener(self, neti, kind, index):
+        self.changes.append((neti, kind, index))
+
+    def test_changes(self):
+        IodineAPI.setNodeCoordinate(0, 1, 3, 4)
+        IodineAPI.setRateLaw(0, 0, "k1")
+        IodineAPI.setCompartmentOfNode(0, 0, 0)
+        IodineAPI.setNodesAttributes(0, {1: {'x': 5}})
+        self.assertEqual(self.changes, [
+            (0, IodineAPI.NODE, 1),
+            (0, IodineAPI.REACTION, 0),
+            (0, IodineAPI.NODE, 0),
+            (0, IodineAPI.COMPARTMENT, 0),
+            (0, IodineAPI.NODE, 1),
+        ])
+        self.changes.clear()
+        IodineAPI.undo()
+        # Only the network that changed is restored
+        self.assertEqual(self.changes, [(0, IodineAPI.NETWORK, -1)])
+
+    def test_getListOfIndices(self):
+        IodineAPI.deleteNode(0, 0)
+        IodineAPI.addNode(0, "node3", 1.1, 2.5, 5.4, 6.4)
+        self.assertEqual(IodineAPI.getListOfNodeIndices(0), [1, 2])
+        self.assertEqual(IodineAPI.getListOfReactionIndices(0), [0])
+        with self.assertRaises(NetIndexNotFoundError):
+            IodineAPI.getListOfNodeIndices(3)
+
+
 if __name__ == '__main__':
     unittest.main()
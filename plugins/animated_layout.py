@@ -0,0 +1,43 @@
+"""
+Arrange all the nodes of the network with a force-directed layout, shown as it runs.
+
+Version 0.01
+
+"""
+
+# pylint: disable=maybe-no-member
+from rkplugin.plugins import CommandPlugin, PluginMetadata
+from rkplugin import api
+
+
+metadata = PluginMetadata(
+    name='AnimatedLayout',
+    author='PyRKViewer',
+    version='0.0.1',
+    short_desc='Arrange the nodes with a force-directed layout, shown as it runs.',
+    long_desc='Same as AutoLayout, but the layout runs while the canvas is idle, and the nodes '
+              'move to their new positions step by step. The nodes dragged while the layout runs '
+              'stay where they are dropped. The result is a single undo step.'
+)
+
+
+class AnimatedLayout(CommandPlugin):
+    def __init__(self):
+        """
+        Initialize the AnimatedLayout for a Command Plugin.
+
+        Args:
+            self
+
+        """
+        super().__init__(metadata)
+
+    def run(self):
+        """
+        Start laying out the current network.
+
+        Args:
+            self
+
+        """
+        api.animate_layout()
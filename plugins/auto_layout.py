@@ -0,0 +1,53 @@
+"""
+Arrange all the nodes of the network with a force-directed layout.
+
+Version 0.01
+
+"""
+
+# pylint: disable=maybe-no-member
+from rkplugin.plugins import CommandPlugin, PluginMetadata
+from rkplugin import api
+from rkviewer.layout.force import ForceLayout
+from rkviewer.layout.graph import LayoutGraph, default_handles
+
+
+metadata = PluginMetadata(
+    name='AutoLayout',
+    author='PyRKViewer',
+    version='0.0.1',
+    short_desc='Arrange the nodes with a force-directed layout.',
+    long_desc='All nodes are moved so that linked nodes are close to each other, and the others '
+              'spread apart. Nodes stay within their compartments. The reaction handles are reset.'
+)
+
+
+class AutoLayout(CommandPlugin):
+    # The layout can take seconds on large networks
+    isolated = True
+
+    def __init__(self):
+        """
+        Initialize the AutoLayout for a Command Plugin.
+
+        Args:
+            self
+
+        """
+        super().__init__(metadata)
+
+    def run(self):
+        """
+        Lay out the current network, and apply the result as a single undo step.
+
+        Args:
+            self
+
+        """
+        snapshot = api.snapshot()
+        if snapshot.num_nodes == 0:
+            return
+        graph = LayoutGraph.from_snapshot(snapshot, api.canvas_size().as_tuple())
+        positions = graph.node_positions(ForceLayout(graph).run())
+        handles = default_handles(snapshot, positions + snapshot.node_sizes / 2)
+        api.apply_layout(snapshot, positions, handles)
@@ -74,15 +74,16 @@ class ColorSelected(WindowedPlugin):
         """
         color = evt.GetColour()
 
-        # start group action context for undo purposes
-        with api.group_action():
+        net_index = api.cur_net_index()
+        # apply the changes as one batch, which is also a single undo step
+        with api.batch() as b:
             # color selected nodes
             for index in api.selected_node_indices():
-                api.update_node(api.cur_net_index(), index, fill_color=color, border_color=color)
+                b.update_node(net_index, index, fill_color=color, border_color=color)
 
             # color selected reactions
             for index in api.selected_reaction_indices():
-                api.set_reaction_color(api.cur_net_index(), index, color)
+                b.update_reaction(net_index, index, fill_color=color)
 
     def on_selection_did_change(self, node_indices: List[int], reaction_indices: List[int],
                                 compartment_indices: List[int]):
@@ -40,9 +40,9 @@ class Disco(CommandPlugin):
             self
 
         """
-        nodes = api.all_nodes()
+        net_index = api.cur_net_index()
         rgb = random.getrandbits(24)
         color = wx.Colour(rgb)
-        for node in nodes:
-            api.set_node_fill(api.cur_net_index(), node.index, color)
-            api.set_node_border(api.cur_net_index(), node.index, color)
+        with api.batch() as b:
+            for node in api.all_nodes():
+                b.update_node(net_index, node.index, fill_color=color, border_color=color)
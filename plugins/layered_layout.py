@@ -0,0 +1,54 @@
+"""
+Arrange all the nodes of the network in layers, as a pathway flowing from top to bottom.
+
+Version 0.01
+
+"""
+
+# pylint: disable=maybe-no-member
+from rkplugin.plugins import CommandPlugin, PluginMetadata
+from rkplugin import api
+from rkviewer.layout.graph import LayoutGraph
+from rkviewer.layout.layered import layered_handles, layered_layout
+
+
+metadata = PluginMetadata(
+    name='LayeredLayout',
+    author='PyRKViewer',
+    version='0.0.1',
+    short_desc='Arrange the nodes in layers, as a pathway flowing from top to bottom.',
+    long_desc='Each reactant is placed above its reactions and each product below, with as few '
+              'crossings as possible. Nodes stay within their compartments. The reaction handles '
+              'are set so that the curves flow vertically.'
+)
+
+
+class LayeredLayout(CommandPlugin):
+    # The layout can take a second on large networks
+    isolated = True
+
+    def __init__(self):
+        """
+        Initialize the LayeredLayout for a Command Plugin.
+
+        Args:
+            self
+
+        """
+        super().__init__(metadata)
+
+    def run(self):
+        """
+        Lay out the current network, and apply the result as a single undo step.
+
+        Args:
+            self
+
+        """
+        snapshot = api.snapshot()
+        if snapshot.num_nodes == 0:
+            return
+        graph = LayoutGraph.from_snapshot(snapshot, api.canvas_size().as_tuple())
+        positions = layered_layout(graph)
+        handles = layered_handles(snapshot, positions + snapshot.node_sizes / 2)
+        api.apply_layout(snapshot, positions, handles)
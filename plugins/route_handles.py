@@ -0,0 +1,49 @@
+"""
+Place the handles of all the reactions so that their curves overlap less.
+
+Version 0.01
+
+"""
+
+# pylint: disable=maybe-no-member
+from rkplugin.plugins import CommandPlugin, PluginMetadata
+from rkplugin import api
+from rkviewer.layout.routing import route_handles
+
+
+metadata = PluginMetadata(
+    name='RouteHandles',
+    author='PyRKViewer',
+    version='0.0.1',
+    short_desc='Bend the reaction curves around other nodes and away from each other.',
+    long_desc='The Bezier handles of all the reactions are chosen together so that the curves '
+              'cross fewer nodes and fewer other curves, without moving the nodes.'
+)
+
+
+class RouteHandles(CommandPlugin):
+    # Routing can take a second on large networks
+    isolated = True
+
+    def __init__(self):
+        """
+        Initialize the RouteHandles for a Command Plugin.
+
+        Args:
+            self
+
+        """
+        super().__init__(metadata)
+
+    def run(self):
+        """
+        Route the handles of the current network, and apply the result as a single undo step.
+
+        Args:
+            self
+
+        """
+        snapshot = api.snapshot()
+        if snapshot.num_reactions == 0:
+            return
+        api.apply_layout(snapshot, None, route_handles(snapshot))
@@ -9,13 +9,21 @@ from rkviewer.canvas.geometry import Rect, within_rect
 from rkviewer.config import DEFAULT_ARROW_TIP
 import wx
 import copy
+from collections import defaultdict
 from contextlib import contextmanager
 from rkviewer.mvc import IController
-from typing import List, Optional, Set, Tuple
+from typing import Any, Collection, Dict, Iterator, List, Optional, Set, Tuple
 from rkviewer.controller import Controller
 from rkviewer.canvas.canvas import Canvas
 from rkviewer.canvas import data
 from rkviewer.canvas.state import cstate, ArrowTip
+from rkviewer.ratelaw import BoundRateLaw
+from rkviewer.search import KINDS, SUBSTRING, SearchMatch
+from rkviewer.snapshot import NetworkSnapshot
+from rkviewer.stoichiometry import Stoichiometry
+from rkviewer.layout.animated import AnimatedLayout, commit_layout
+from rkviewer.layout.force import ForceLayout
+from rkviewer.layout.graph import LayoutGraph, ReactionHandles
 from rkviewer import config
 
 Node = data.Node
@@ -28,6 +36,7 @@ settings = config.settings
 
 _canvas: Optional[Canvas] = None
 _controller: Optional[IController] = None
+_animated_layout: Optional[AnimatedLayout] = None
 
 
 def init_api(canvas: Canvas, controller: IController):
@@ -47,6 +56,42 @@ def cur_net_index() -> int:
     return _canvas.net_index
 
 
+def network_indices() -> List[int]:
+    """
+    Returns the indices of the networks, each of which has a tab above the canvas.
+
+    Returns:
+        List[int]
+    """
+    return _controller.get_list_of_networks()
+
+
+def new_network(net_id: str) -> int:
+    """
+    Creates an empty network in a new tab and shows it. This is a single undo step.
+
+    Args:
+        net_id (str): The ID of the network, which must be unique.
+
+    Returns:
+        int: The index of the network.
+    """
+    return _controller.new_network(net_id)
+
+
+def activate_network(net_index: int):
+    """
+    Shows a network on the canvas, in place of the current network. This is not an undo step.
+
+    The current network keeps its zoom level, scroll position and selection for when it is shown
+    again, but its items no longer have elements on the canvas.
+
+    Args:
+        net_index (int): The network index.
+    """
+    _controller.activate_network(net_index)
+
+
 @contextmanager
 def group_action():
     """Context manager for doing a group operation in the controller, for undo/redo purposes.
@@ -54,8 +99,10 @@ def group_action():
     TODO more documentation on this
     """
     _controller.start_group()
-    yield
-    _controller.end_group()
+    try:
+        yield
+    finally:
+        _controller.end_group()
 
 
 def all_nodes() -> List[Node]:
@@ -80,6 +127,99 @@ def all_reactions() -> List[Reaction]:
     return _controller.get_list_of_reactions(cur_net_index())
 
 
+def snapshot(net_index: Optional[int] = None) -> NetworkSnapshot:
+    """
+    Returns a read-only, array-backed snapshot of a network.
+
+    This is much faster than all_nodes() and all_reactions() for reading a whole network, and the
+    same snapshot is returned until the network changes, so repeated calls are cheap. The arrays
+    must not be modified; copy them if needed.
+
+    Args:
+        net_index (int): The network index. Defaults to the current network.
+
+    Returns:
+        NetworkSnapshot
+    """
+    if net_index is None:
+        net_index = cur_net_index()
+    return _controller.get_snapshot(net_index)
+
+
+def stoichiometry(net_index: Optional[int] = None) -> Stoichiometry:
+    """
+    Returns the stoichiometry of a network, as sparse matrices.
+
+    The matrices are updated as reactions change, re-reading only those reactions, and the same
+    object is returned until the network changes. It also provides structural analyses, i.e.
+    conservation_laws(), dead_end_species(), connected_components() and reachable(), which are
+    computed once per object. See rkviewer.stoichiometry.
+
+    Args:
+        net_index (int): The network index. Defaults to the current network.
+
+    Returns:
+        Stoichiometry
+    """
+    if net_index is None:
+        net_index = cur_net_index()
+    return _controller.get_stoichiometry(net_index)
+
+
+def search(query: str, mode: str = SUBSTRING, kinds: Optional[Collection[str]] = None,
+           limit: int = 50, net_index: Optional[int] = None) -> List[SearchMatch]:
+    """
+    Searches the IDs of the nodes, reactions and compartments of a network, and the symbols of the
+    rate laws of its reactions, ignoring case.
+
+    The search is indexed and updated as items change, so it is much faster than looping over
+    all_nodes(). See rkviewer.search.
+
+    Args:
+        query (str): The text to search for.
+        mode (str): 'prefix', 'substring' or 'fuzzy', i.e. the characters of the query in order.
+        kinds (Collection[str]): The kinds of items to return, among 'node', 'reaction' and
+                                 'compartment'. Defaults to all of them.
+        limit (int): The maximum number of items to return.
+        net_index (int): The network index. Defaults to the current network.
+
+    Returns:
+        List[SearchMatch]: The matching items, best first.
+    """
+    if net_index is None:
+        net_index = cur_net_index()
+    return _controller.search(net_index, query, mode, kinds, limit)
+
+
+def zoom_to(node_indices: Collection[int] = (), reaction_indices: Collection[int] = (),
+            compartment_indices: Collection[int] = ()):
+    """
+    Selects the given items of the current network, and zooms and scrolls the canvas to them.
+
+    Args:
+        node_indices (Collection[int]): The indices of the nodes.
+        reaction_indices (Collection[int]): The indices of the reactions.
+        compartment_indices (Collection[int]): The indices of the compartments.
+    """
+    _canvas.ZoomToItems(node_indices, reaction_indices, compartment_indices)
+
+
+def find_and_zoom(query: str, mode: str = SUBSTRING) -> Optional[SearchMatch]:
+    """
+    Searches the current network, and zooms to the best match, if any. See search().
+
+    Returns:
+        Optional[SearchMatch]: The best match, or None if there is none.
+    """
+    matches = search(query, mode, limit=1)
+    if len(matches) == 0:
+        return None
+    match = matches[0]
+    # The arguments of zoom_to() are in the order of KINDS
+    zoom_to(*[[match.index] if match.kind == kind else [] for kind in KINDS])
+    return match
+
+
 def selected_nodes() -> List[Node]:
     """ 
     Lists out all selected nodes.
@@ -99,7 +239,7 @@ def selected_node_indices() -> Set[int]:
         Set[int]
     
     """
-    return _canvas.selected_idx.item_copy()
+    return _canvas.sel_nodes_idx.item_copy()
 
 
 def selected_reaction_indices() -> Set[int]:
@@ -143,6 +283,27 @@ def get_reaction_by_index(net_index: int, reaction_index: int) -> Reaction:
     return _controller.get_reaction_by_index(net_index, reaction_index)
 
 
+def get_rate_law(net_index: int, reaction_index: int) -> BoundRateLaw:
+    """
+    Gets the compiled rate law of a reaction.
+
+    The rate law is parsed and compiled to a vectorized NumPy function once, and its symbols are
+    matched to the IDs of the nodes; see rkviewer.ratelaw. The result is cached until the reaction
+    changes, or a node is renamed, added or deleted.
+
+    Args:
+        net_index (int): The network index.
+        reaction_index (int): The index of the reaction.
+
+    Returns:
+        BoundRateLaw
+
+    Raises:
+        RateLawError: If the rate law is empty, or cannot be parsed or compiled.
+    """
+    return _controller.get_rate_law(net_index, reaction_index)
+
+
 def add_node(net_index: int, node: Node):
     """ 
     Adds a node to the api to the last overall index.
@@ -167,6 +328,154 @@ def add_reaction(net_index: int, reaction: Reaction):
     _controller.add_reaction_g(net_index, reaction)
 
 
+class Batch:
+    """Updates buffered by batch(), to be applied together when the batch ends.
+
+    The update_*() methods take the same arguments and do the same validation as the module-level
+    functions of the same name, but nothing is changed until the batch() block exits. Updating the
+    same item more than once merges the changes, the latest value of each property winning.
+    """
+
+    def __init__(self):
+        self._nodes: Dict[int, Dict[int, Dict[str, Any]]] = defaultdict(lambda: defaultdict(dict))
+        self._reactions: Dict[int, Dict[int, Dict[str, Any]]] = defaultdict(
+            lambda: defaultdict(dict))
+        self._compartments: Dict[int, Dict[int, Dict[str, Any]]] = defaultdict(
+            lambda: defaultdict(dict))
+        self._handles: Dict[int, Dict[int, Dict[str, Any]]] = defaultdict(
+            lambda: defaultdict(dict))
+
+    def update_node(self, net_index: int, node_index: int, id_: str = None,
+                    fill_color: wx.Colour = None, border_color: wx.Colour = None,
+                    border_width: float = None, position: Vec2 = None, size: Vec2 = None):
+        """See update_node()."""
+        props = self._nodes[net_index][node_index]
+        _validate_rect_update(position, size, props,
+                              lambda: get_node_by_index(net_index, node_index))
+        if id_ is not None and len(id_) == 0:
+            raise ValueError('id_ cannot be empty')
+        if border_width is not None and border_width < 0:
+            raise ValueError("border_width must be at least 0")
+
+        props.update(_specified(id_=id_, fill_color=fill_color, border_color=border_color,
+                                border_width=border_width, position=position, size=size))
+
+    def update_reaction(self, net_index: int, reaction_index: int, id_: str = None,
+                        fill_color: wx.Colour = None, thickness: float = None,
+                        ratelaw: str = None):
+        """See update_reaction()."""
+        if id_ is not None and len(id_) == 0:
+            raise ValueError('id_ cannot be empty')
+        if thickness is not None and thickness < 0:
+            raise ValueError('thickness must be at least 0')
+        if ratelaw is not None and len(ratelaw) == 0:
+            raise ValueError('ratelaw cannot be empty')
+
+        self._reactions[net_index][reaction_index].update(
+            _specified(id_=id_, fill_color=fill_color, thickness=thickness, ratelaw=ratelaw))
+
+    def update_compartment(self, net_index: int, comp_index: int, id_: str = None,
+                           fill_color: wx.Colour = None, border_color: wx.Colour = None,
+                           border_width: float = None, volume: float = None,
+                           position: Vec2 = None, size: Vec2 = None):
+        """See update_compartment()."""
+        props = self._compartments[net_index][comp_index]
+        _validate_rect_update(position, size, props,
+                              lambda: _controller.get_compartment_by_index(net_index, comp_index))
+        if id_ is not None and len(id_) == 0:
+            raise ValueError('id_ cannot be empty')
+        if border_width is not None and border_width < 0:
+            raise ValueError("border_width must be at least 0")
+        if volume is not None and volume < 0:
+            raise ValueError("volume must be at least 0")
+
+        props.update(_specified(id_=id_, fill_color=fill_color, border_color=border_color,
+                                border_width=border_width, volume=volume, position=position,
+                                size=size))
+
+    def update_reaction_handles(self, net_index: int, reaction_index: int, center: Vec2 = None,
+                                sources: Dict[int, Vec2] = None, targets: Dict[int, Vec2] = None):
+        """See update_reaction_handles()."""
+        props = self._handles[net_index][reaction_index]
+        if center is not None:
+            props['center'] = center
+        for name, handles in (('sources', sources), ('targets', targets)):
+            if handles is not None:
+                props.setdefault(name, dict()).update(handles)
+
+    def apply(self):
+        """Apply all the buffered updates as one group, i.e. one undo step and one view update.
+
+        This is called by batch(), and the buffer is cleared afterwards.
+        """
+        with group_action():
+            for net_index, updates in self._compartments.items():
+                _controller.update_compartments(net_index, updates)
+            for net_index, updates in self._nodes.items():
+                _controller.update_nodes(net_index, updates)
+            for net_index, updates in self._reactions.items():
+                _controller.update_reactions(net_index, updates)
+            for net_index, updates in self._handles.items():
+                _controller.update_reaction_handles(net_index, updates)
+        self._nodes.clear()
+        self._reactions.clear()
+        self._compartments.clear()
+        self._handles.clear()
+
+
+def _specified(**props) -> Dict[str, Any]:
+    return {name: value for name, value in props.items() if value is not None}
+
+
+def _validate_rect_update(position: Optional[Vec2], size: Optional[Vec2], pending: Dict[str, Any],
+                          get_old):
+    """Validate a new position and/or size, given the changes already pending for the item."""
+    # Check position at least 0
+    if position is not None and (position.x < 0 or position.y < 0):
+        raise ValueError("position cannot have negative coordinates, but got '{}'".format(position))
+
+    # Check size at least 0
+    if size is not None and (size.x < 0 or size.y < 0):
+        raise ValueError("size cannot have negative coordinates, but got '{}'".format(size))
+
+    # Check within bounds
+    if position is not None or size is not None:
+        pos = position if position is not None else pending.get('position')
+        sz = size if size is not None else pending.get('size')
+        if pos is None or sz is None:
+            old = get_old()
+            pos = pos if pos is not None else old.position
+            sz = sz if sz is not None else old.size
+        botright = pos + sz
+        if botright.x > _canvas.realsize.x or botright.y > _canvas.realsize.y:
+            raise ValueError('Invalid position and size combination ({} and {}): bottom right '
+                             'corner exceed canvas boundary {}'.format(pos, sz, _canvas.realsize))
+
+
+@contextmanager
+def batch() -> Iterator[Batch]:
+    """Context manager that buffers updates and applies them all at once when it exits.
+
+    Applying the updates of a batch is much faster than calling update_node() etc. for each item,
+    since each kind of item is updated with a single model call, and the view is only refreshed
+    once. The whole batch is also a single undo step. Nothing is applied if the block raises.
+
+    Example:
+        with api.batch() as b:
+            for node in api.all_nodes():
+                b.update_node(net_index, node.index, fill_color=color)
+
+    Note:
+        Errors that can only be detected by the model, such as an index that does not exist or a
+        repeated ID, are raised when the batch exits. Each kind of update (compartments, nodes,
+        reactions and reaction handles, in that order) is applied atomically, but updates of the
+        kinds applied before the error are kept.
+    """
+    b = Batch()
+    yield b
+    b.apply()
+
+
 # TODO add "cosmetic" versions of these functions, where changes made to controller are not added
 # to the history stack. This requires controller to have "programmatic group" feature, i.e. actions
 # performed inside such groups are not recorded. programmatic groups nested within group operations
@@ -177,6 +486,8 @@ def update_node(net_index: int, node_index: int, id_: str = None, fill_color: wx
     """
     Update one or multiple properties of a node.
 
+    To update many nodes, use batch() instead, which is much faster.
+
     Args:
         net_index (int): The network index.
         node_index (int): The node index of the node to modify.
@@ -192,48 +503,11 @@ def update_node(net_index: int, node_index: int, id_: str = None, fill_color: wx
                     range.
     """
     # Make sure this node exists
-    old_node = get_node_by_index(net_index, node_index)
-    # Validate
-    # Check ID not empty
-    if id_ is not None and len(id_) == 0:
-        raise ValueError('id_ cannot be empty')
-
-    # Check border at least 0
-    if border_width is not None and border_width < 0:
-        raise ValueError("border_width must be at least 0")
-
-    # Check position at least 0
-    if position is not None and (position.x < 0 or position.y < 0):
-        raise ValueError("position cannot have negative coordinates, but got '{}'".format(position))
-
-    # Check size at least 0
-    if size is not None and (size.x < 0 or size.y < 0):
-        raise ValueError("size cannot have negative coordinates, but got '{}'".format(size))
-
-    # Check within bounds
-    if position is not None or size is not None:
-        pos = position if position is not None else old_node.position
-        sz = size if size is not None else old_node.size
-        botright = pos + sz
-        if botright.x > _canvas.realsize.x or botright.y > _canvas.realsize.y:
-            raise ValueError('Invalid position and size combination ({} and {}): bottom right '
-                             'corner exceed canvas boundary {}', pos, sz, _canvas.realsize)
-
-    with group_action():
-        if id_ is not None:
-            _controller.rename_node(net_index, node_index, id_)
-        if fill_color is not None:
-            _controller.set_node_fill_rgb(net_index, node_index, fill_color)
-            _controller.set_node_fill_alpha(net_index, node_index, fill_color.Alpha())
-        if border_color is not None:
-            _controller.set_node_border_rgb(net_index, node_index, border_color)
-            _controller.set_node_border_alpha(net_index, node_index, border_color.Alpha())
-        if border_width is not None:
-            _controller.set_node_border_width(net_index, node_index, border_width)
-        if position is not None:
-            _controller.move_node(net_index, node_index, position)
-        if size is not None:
-            _controller.set_node_size(net_index, node_index, size)
+    get_node_by_index(net_index, node_index)
+    with batch() as b:
+        b.update_node(net_index, node_index, id_=id_, fill_color=fill_color,
+                      border_color=border_color, border_width=border_width, position=position,
+                      size=size)
 
 
 def update_reaction(net_index: int, reaction_index: int, id_: str = None,
@@ -242,6 +516,8 @@ def update_reaction(net_index: int, reaction_index: int, id_: str = None,
     """
     Update one or multiple properties of a reaction.
 
+    To update many reactions, use batch() instead, which is much faster.
+
     Args:
         net_index (int): The network index.
         reaction_index (int): The reaction index of the reaction to modify.
@@ -254,28 +530,157 @@ def update_reaction(net_index: int, reaction_index: int, id_: str = None,
         ValueError: If ID is empty, thickness is out of range, or the rate law is set to zero.
 
     """
-    # TODO get old reaction
-    # Validate
-    # Check ID not empty
-    if id_ is not None and len(id_) == 0:
-        raise ValueError('id_ cannot be empty')
-
-    if thickness is not None and thickness < 0:
-        raise ValueError('thickness must be at least 0')
-
-    if ratelaw is not None and len(ratelaw) == 0:
-        raise ValueError('ratelaw cannot be empty')
-
-    with group_action():
-        if id_ is not None:
-            _controller.rename_reaction(net_index, reaction_index, id_)
-        if fill_color is not None:
-            _controller.set_reaction_fill_rgb(net_index, reaction_index, fill_color)
-            _controller.set_reaction_fill_alpha(net_index, reaction_index, fill_color.Alpha())
-        if thickness is not None:
-            _controller.set_reaction_line_thickness(net_index, reaction_index, thickness)
-        if ratelaw is not None:
-            _controller.set_reaction_ratelaw(net_index, reaction_index, ratelaw)
+    with batch() as b:
+        b.update_reaction(net_index, reaction_index, id_=id_, fill_color=fill_color,
+                          thickness=thickness, ratelaw=ratelaw)
+
+
+def update_compartment(net_index: int, comp_index: int, id_: str = None,
+                       fill_color: wx.Colour = None, border_color: wx.Colour = None,
+                       border_width: float = None, volume: float = None,
+                       position: Vec2 = None, size: Vec2 = None):
+    """
+    Update one or multiple properties of a compartment.
+
+    To update many compartments, use batch() instead, which is much faster.
+
+    Args:
+        net_index (int): The network index.
+        comp_index (int): The index of the compartment to modify.
+        id_ (str): If specified, the new ID of the compartment.
+        fill_color (wx.Colour): If specified, the new fill color of the compartment.
+        border_color (wx.Colour): If specified, the new border color of the compartment.
+        border_width (float): If specified, the new border width of the compartment.
+        volume (float): If specified, the new volume of the compartment.
+        position (Vec2): If specified, the new position of the compartment.
+        size (Vec2): If specified, the new size of the compartment.
+
+    Raises:
+        ValueError: If ID is empty or if at least one of border_width, volume, position, and size
+                    is out of range.
+    """
+    with batch() as b:
+        b.update_compartment(net_index, comp_index, id_=id_, fill_color=fill_color,
+                             border_color=border_color, border_width=border_width, volume=volume,
+                             position=position, size=size)
+
+
+def update_reaction_handles(net_index: int, reaction_index: int, center: Vec2 = None,
+                            sources: Dict[int, Vec2] = None, targets: Dict[int, Vec2] = None):
+    """
+    Set the positions of the Bezier handles of a reaction.
+
+    To update many reactions, use batch() instead, which is much faster.
+
+    Args:
+        net_index (int): The network index.
+        reaction_index (int): The reaction index of the reaction to modify.
+        center (Vec2): If specified, the new position of the center handle, i.e. the handle on the
+                       reactant side of the centroid.
+        sources (Dict[int, Vec2]): If specified, maps the indices of reactant nodes to the new
+                                   positions of their handles.
+        targets (Dict[int, Vec2]): If specified, maps the indices of product nodes to the new
+                                   positions of their handles.
+    """
+    with batch() as b:
+        b.update_reaction_handles(net_index, reaction_index, center=center, sources=sources,
+                                  targets=targets)
+
+
+def apply_layout(snapshot: NetworkSnapshot, node_positions, handles: ReactionHandles = None):
+    """
+    Move the nodes of a network to the positions computed by a layout, as a single undo step.
+
+    See rkviewer.layout for the layout algorithms.
+
+    Args:
+        snapshot (NetworkSnapshot): The snapshot that the layout was computed from. The nodes and
+                                    reactions of the network must not have changed since.
+        node_positions (numpy.ndarray): The new positions of the top-left corners of the nodes, in
+                                        the order of the rows of the snapshot, or None to leave
+                                        the nodes where they are.
+        handles (ReactionHandles): If specified, the new positions of the reaction handles, e.g.
+                                   from rkviewer.layout.graph.default_handles() or
+                                   rkviewer.layout.routing.route_handles().
+    """
+    commit_layout(_controller, snapshot, node_positions, handles)
+
+
+def animate_layout(iterations: int = 100):
+    """
+    Lay out the current network with a force-directed layout, showing its progress on the canvas.
+
+    This returns immediately: the layout runs for settings['layout_time_slice'] milliseconds each
+    time the canvas is idle, and the nodes are shown at their intermediate positions without
+    changing the model. The result is applied as a single undo step when the layout is done. The
+    nodes that the user drags in the meantime stay where they are dropped. A layout that is still
+    running when this is called again, or when the network changes, is cancelled.
+
+    Args:
+        iterations (int): The number of iterations of the layout.
+    """
+    global _animated_layout
+    if _animated_layout is not None:
+        _animated_layout.cancel()
+        _animated_layout = None
+    snapshot = _controller.get_snapshot(cur_net_index())
+    if snapshot.num_nodes == 0:
+        return
+    graph = LayoutGraph.from_snapshot(snapshot, canvas_size().as_tuple())
+    _animated_layout = AnimatedLayout(_canvas, _controller, ForceLayout(graph, iterations),
+                                      settings['layout_time_slice'] / 1000)
+    _animated_layout.start()
+
+
+def simulate(end_time: float = None, num_points: int = None,
+             initial_amounts: Dict[str, float] = None, parameters: Dict[str, float] = None,
+             net_index: Optional[int] = None):
+    """
+    Simulate the ODEs of a network on a worker thread, cancelling the running simulation.
+
+    This returns immediately. The time course is delivered in chunks, as it is computed, to the
+    on_simulation_did_progress() handlers of the plugins, followed by a call with done set. Each
+    node is a species, and its rate of change is given by the rate laws of the reactions; see
+    rkviewer.simulation.
+
+    Args:
+        end_time (float): The end time. Defaults to settings['simulation_end_time'].
+        num_points (int): The number of evenly spaced time points, including 0 and end_time.
+                          Defaults to settings['simulation_points'].
+        initial_amounts (Dict[str, float]): The initial amount of each species, by node ID.
+                                            Defaults to 1 for the species not given.
+        parameters (Dict[str, float]): The value of each parameter of the rate laws, by name.
+                                       Defaults to 1 for the parameters not given.
+        net_index (int): The network index. Defaults to the current network.
+
+    Raises:
+        SimulationError: If the network has no reactions, or if a rate law is empty or cannot be
+                         compiled.
+    """
+    if net_index is None:
+        net_index = cur_net_index()
+    if end_time is None:
+        end_time = settings['simulation_end_time']
+    if num_points is None:
+        num_points = settings['simulation_points']
+    _controller.simulate(net_index, end_time, num_points, initial_amounts, parameters)
+
+
+def cancel_simulation():
+    """
+    Cancel the running simulation, if any.
+    """
+    _controller.cancel_simulation()
+
+
+def canvas_size() -> Vec2:
+    """
+    Returns the size of the canvas, i.e. the bounds that items must be placed within.
+
+    Returns:
+        Vec2
+    """
+    return _canvas.realsize
 
 
 def update_reactant_stoich(net_index: int, reaction_index: int, node_index: int, stoich: int):
@@ -7,7 +7,8 @@ The rkplugins.
 from inspect import isabstract
 from rkviewer.canvas.geometry import Vec2
 from rkviewer.canvas.data import Node
-from typing import List
+from typing import List, Optional, Tuple
+import numpy as np
 import wx
 import abc
 from dataclasses import dataclass
@@ -43,9 +44,25 @@ class Plugin:
     """
     Defines Plugin objects.
 
+    Attributes:
+        async_events: Set this to True in a subclass to receive events (except
+            on_did_paint_canvas) on a separate worker thread instead of the UI thread. The
+            arguments are copies, so they may be kept. A handler called this way must not call
+            the API directly; instead it may return a callable, which is then run on the UI thread.
+            If events arrive faster than they are handled, older ones may be dropped. Consecutive
+            pending events of on_did_commit_node_positions or on_selection_did_change are replaced
+            by the latest one, and those of on_did_move_nodes are merged into one, so that events
+            are still delivered in order.
+        isolated: Set this to True in a CommandPlugin to run it in a separate process, so that a
+            long computation does not freeze the editor. The plugin works on a copy of the network
+            and selection taken when it is started, and the changes it makes through the API are
+            applied to the real network as a single undoable action when it finishes. Such a
+            plugin should only change the network through the API.
     """
     metadata: PluginMetadata
     ptype: PluginType
+    async_events: bool = False
+    isolated: bool = False
 
     def __init__(self, metadata: PluginMetadata, ptype: PluginType):
         """
@@ -78,6 +95,14 @@ class Plugin:
                                 compartment_indices: List[int]):
         pass
 
+    def on_simulation_did_progress(self, net_index: int, node_indices: Tuple[int, ...],
+                                   reaction_indices: Tuple[int, ...], times: np.ndarray,
+                                   amounts: np.ndarray, rates: np.ndarray, done: bool,
+                                   error: Optional[str]):
+        """Called with each chunk of the time course of a running simulation; see
+        rkviewer.events.SimulationDidProgressEvent and api.simulate()."""
+        pass
+
     
 class CommandPlugin(Plugin, abc.ABC):
     """
@@ -0,0 +1,489 @@
+"""Reading networks from Antimony-like reaction notation, and editing them as text.
+
+Only reactions and species declarations are read, one statement per line::
+
+    J0: 2 A + B -> C; k1 * A^2 * B   // a named reaction, with its rate law
+    C => D + $E;                     // unnamed, so given an ID such as _J0; '$' is dropped
+    species F, G;                    // species not in any reaction
+
+'->' and '=>' are both read as a reaction; the rate law, after the first ';', is kept as it is.
+Comments start with '//' or '#'. Every other statement, e.g. 'k1 = 0.1', 'model m()' or 'end', is
+ignored, and compartments are not read.
+
+read_antimony() builds a new TNetwork from a whole text, to be added to iodine as a single undo
+step with iodine.addNetwork() or iodine.setNetwork(), like rkviewer.sbml.read_sbml().
+
+AntimonyDocument keeps the text of a network in sync with it while the text is edited, e.g. in a
+side panel. Each update only parses the lines that differ from the previous text, and only applies
+the reactions and species of those lines to the network, as a single undo step, so that the
+positions and styles of the other items are kept and an edit takes about as long on a large model
+as on a small one. The text describes the whole network: a species exists as long as some line
+mentions it, so deleting the only reaction or declaration that mentions a species deletes its node.
+"""
+from collections import Counter
+from dataclasses import dataclass
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import iodine as iod
+from .sbml import DEFAULT_NODE_SIZE, default_reaction_handles, grid_positions
+
+
+ID_PATTERN = r'[A-Za-z_]\w*'
+_REACTION_RE = re.compile(r'\s*(?:(?P<id>{})\s*:)?(?P<lhs>[^:]*?)(?:->|=>)(?P<rhs>.*)$'.format(
+    ID_PATTERN))
+_TERM_RE = re.compile(r'\s*(?:(?P<stoich>\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+)\s*\*?\s*)?\$?'
+                      r'(?P<id>{})\s*$'.format(ID_PATTERN))
+_SPECIES_RE = re.compile(r'\s*(?:(?:const|var)\s+)?species\s+(?P<ids>[^;]*);?\s*$')
+_SPECIES_TERM_RE = re.compile(r'\s*\$?(?P<id>{})(?:\s+in\s+{})?\s*$'.format(ID_PATTERN,
+                                                                           ID_PATTERN))
+_COMMENT_RE = re.compile(r'//|#')
+
+#: IDs given to unnamed reactions, as in Antimony
+UNNAMED_FORMAT = '_J{}'
+
+_UNNAMED_RE = re.compile(r'_J\d+')
+
+Side = Tuple[Tuple[str, float], ...]
+
+
+class AntimonyError(ValueError):
+    """Raised for a reaction or species declaration that cannot be read.
+
+    Attributes:
+        line: The number of the line, starting at 1.
+        message: What is wrong with it.
+    """
+    line: int
+    message: str
+
+    def __init__(self, line: int, message: str):
+        super().__init__('Line {}: {}'.format(line, message))
+        self.line = line
+        self.message = message
+
+
+@dataclass(frozen=True)
+class ReactionStatement:
+    """A reaction, with its reactants and products as (species ID, stoichiometry) pairs.
+
+    id is empty for an unnamed reaction.
+    """
+    id: str
+    reactants: Side
+    products: Side
+    rate_law: str
+
+    def same_reaction(self, other: 'ReactionStatement') -> bool:
+        """Whether the two statements describe the same reaction, whatever their IDs."""
+        return (self.reactants == other.reactants and self.products == other.products
+                and self.rate_law == other.rate_law)
+
+    def species(self) -> Iterable[str]:
+        return (species_id for species_id, _ in self.reactants + self.products)
+
+
+@dataclass(frozen=True)
+class SpeciesStatement:
+    ids: Tuple[str, ...]
+
+    def species(self) -> Iterable[str]:
+        return self.ids
+
+
+Statement = Union[ReactionStatement, SpeciesStatement]
+
+
+def _mentions(lines: Iterable[Tuple[Optional[str], Optional[Statement]]]) -> Counter:
+    """Count the lines that mention each species, given the (reaction ID, statement) of each line.
+
+    Reactions without an ID, i.e. that repeat the ID of another, are left out.
+    """
+    return Counter(species_id for reaction_id, statement in lines
+                   if isinstance(statement, SpeciesStatement)
+                   or (statement is not None and reaction_id is not None)
+                   for species_id in set(statement.species()))
+
+
+def _parse_side(text: str) -> Side:
+    terms: Dict[str, float] = dict()
+    if text.strip() == '':
+        return tuple()
+    for term in text.split('+'):
+        match = _TERM_RE.match(term)
+        if match is None:
+            raise ValueError('Expected a species, optionally after its stoichiometry, but got '
+                             '"{}"'.format(term.strip()))
+        stoich = float(match['stoich']) if match['stoich'] else 1
+        if stoich <= 0:
+            raise ValueError('The stoichiometry of {} is not positive'.format(match['id']))
+        # A species repeated on one side, as in A + A, adds up
+        terms[match['id']] = terms.get(match['id'], 0) + stoich
+    return tuple(terms.items())
+
+
+def parse_line(line: str) -> Optional[Statement]:
+    """Parse one line, returning None if it has no reaction or species declaration.
+
+    Raises:
+        ValueError: If the line has a reaction or a species declaration that cannot be read.
+    """
+    match = _COMMENT_RE.search(line)
+    if match is not None:
+        line = line[:match.start()]
+    head, _, rate_law = line.partition(';')
+    match = _REACTION_RE.match(head)
+    if match is not None:
+        reactants = _parse_side(match['lhs'])
+        products = _parse_side(match['rhs'])
+        if len(reactants) == 0 or len(products) == 0:
+            raise ValueError('A reaction needs at least one reactant and one product')
+        return ReactionStatement(match['id'] or '', reactants, products,
+                                 rate_law.strip().rstrip(';').strip())
+    match = _SPECIES_RE.match(line)
+    if match is not None:
+        ids = list()
+        for term in match['ids'].split(','):
+            term_match = _SPECIES_TERM_RE.match(term)
+            if term_match is None:
+                raise ValueError('Expected a species ID, but got "{}"'.format(term.strip()))
+            ids.append(term_match['id'])
+        return SpeciesStatement(tuple(ids))
+    return None
+
+
+def _format_side(net: iod.TNetwork, species: Dict[int, iod.TSpeciesNode]) -> str:
+    return ' + '.join(net.nodes[nodei].id if s.stoich == 1
+                      else '{:g} {}'.format(s.stoich, net.nodes[nodei].id)
+                      for nodei, s in species.items())
+
+
+def write_antimony(net: iod.TNetwork) -> str:
+    """Return the text of a network: one line per reaction, then one per species not in any."""
+    lines = ['{}: {} -> {}; {}'.format(rea.id, _format_side(net, rea.srcDict),
+                                       _format_side(net, rea.destDict), rea.rateLaw).rstrip()
+             for rea in net.reactions.values()]
+    lines.extend('species {};'.format(net.nodes[nodei].id) for nodei in sorted(net.getFreenodes()))
+    return '\n'.join(lines)
+
+
+class _IDAllocator:
+    """Gives unnamed reactions the first _J<n> IDs that are not taken."""
+
+    def __init__(self, taken: Set[str]):
+        self.taken = taken
+        self.next = 0
+
+    def __call__(self) -> str:
+        while UNNAMED_FORMAT.format(self.next) in self.taken:
+            self.next += 1
+        reaction_id = UNNAMED_FORMAT.format(self.next)
+        self.taken.add(reaction_id)
+        return reaction_id
+
+
+def read_antimony(text: str, net_id: str = 'antimony') -> iod.TNetwork:
+    """Build a network from the reactions and species declarations of a text.
+
+    The species are placed on a grid, in the order in which they are first mentioned, and the
+    reactions get the default handles.
+
+    Raises:
+        AntimonyError: For the first line that cannot be read, or that repeats a reaction ID.
+    """
+    statements = list()
+    for lineno, line in enumerate(text.splitlines(), 1):
+        try:
+            statement = parse_line(line)
+        except ValueError as e:
+            raise AntimonyError(lineno, str(e)) from None
+        if statement is not None:
+            statements.append((lineno, statement))
+
+    named = [s.id for _, s in statements if isinstance(s, ReactionStatement) and s.id]
+    allocate = _IDAllocator(set(named))
+    net = iod.TNetwork(net_id)
+    node_indices: Dict[str, int] = dict()
+    reaction_ids: Set[str] = set()
+    for lineno, statement in statements:
+        for species_id in statement.species():
+            if species_id not in node_indices:
+                node_indices[species_id] = net.lastNodeIdx
+                net.addNode(iod.TNode(species_id, 0, 0, *DEFAULT_NODE_SIZE))
+        if isinstance(statement, SpeciesStatement):
+            continue
+        reaction_id = statement.id or allocate()
+        if reaction_id in reaction_ids:
+            raise AntimonyError(lineno, 'Reaction {} is already defined'.format(reaction_id))
+        reaction_ids.add(reaction_id)
+        reaction = iod.TReaction(reaction_id)
+        for side, species_dict in ((statement.reactants, reaction.srcDict),
+                                   (statement.products, reaction.destDict)):
+            for species_id, stoich in side:
+                species_dict[node_indices[species_id]] = iod.TSpeciesNode(stoich)
+        reaction.rateLaw = statement.rate_law
+        net.addReaction(reaction)
+
+    for node, (x, y) in zip(net.nodes.values(), grid_positions([], len(net.nodes))):
+        node.x = x
+        node.y = y
+    for reaction in net.reactions.values():
+        handles = default_reaction_handles(net, reaction)
+        reaction.centerHandleX, reaction.centerHandleY = handles['center']
+        for key, species_dict in (('src', reaction.srcDict), ('dest', reaction.destDict)):
+            for nodei, (x, y) in handles[key].items():
+                species_dict[nodei].handleX = x
+                species_dict[nodei].handleY = y
+    return net
+
+
+class AntimonyDocument:
+    """The text of an iodine network, to be edited while the network is kept in sync with it.
+
+    update() applies a new version of the text. The lines before and after the edited region,
+    i.e. all but the lines that differ from the previous text, are not parsed again and their
+    items are not touched, so the time an update takes depends on the size of the edit rather than
+    of the model, apart from the undo step that iodine records.
+
+    While a line cannot be read, e.g. as it is being typed, the network keeps what the line last
+    described if the edit did not add or remove lines, rather than deleting its reaction.
+
+    If the network is changed by something else than update(), e.g. on the canvas or by an undo,
+    the document is stale: the next update() first reads the text again from the network, and the
+    text shown to the user should be replaced with the text property.
+
+    Attributes:
+        net_index: The index of the network.
+        version: The iodine model version when the document was last in sync with the network.
+    """
+    net_index: int
+    version: int
+    _lines: List[str]
+    _statements: List[Optional[Statement]]
+    _reaction_ids: List[Optional[str]]  # The ID of the reaction of each line, named or not
+    _errors: List[Optional[str]]
+    _species_refs: Counter  # How many lines mention each species
+    _ids_in_use: Counter  # How many lines define each reaction ID
+
+    def __init__(self, net_index: int):
+        self.net_index = net_index
+        self.reload()
+
+    @property
+    def text(self) -> str:
+        return '\n'.join(self._lines)
+
+    @property
+    def stale(self) -> bool:
+        return self.version != iod.getModelVersion()
+
+    @property
+    def errors(self) -> List[AntimonyError]:
+        """The lines of the text that could not be read."""
+        return [AntimonyError(i + 1, message) for i, message in enumerate(self._errors)
+                if message is not None]
+
+    def _network(self) -> iod.TNetwork:
+        net = iod.networkDict.get(self.net_index)
+        if net is None:
+            raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(self.net_index))
+        return net
+
+    def reload(self):
+        """Read the text again from the network."""
+        net = self._network()
+        self._lines = write_antimony(net).split('\n')
+        self._statements = list()
+        self._errors = list()
+        for line in self._lines:
+            try:
+                self._statements.append(parse_line(line))
+                self._errors.append(None)
+            except ValueError as e:
+                # An ID that is not an Antimony identifier
+                self._statements.append(None)
+                self._errors.append(str(e))
+        self._reaction_ids = [s.id if isinstance(s, ReactionStatement) else None
+                              for s in self._statements]
+        self._species_refs = _mentions(zip(self._reaction_ids, self._statements))
+        self._ids_in_use = Counter(reaction_id for reaction_id in self._reaction_ids
+                                   if reaction_id is not None)
+        self.version = iod.getModelVersion()
+
+    def update(self, text: str) -> List[AntimonyError]:
+        """Apply a new version of the text to the network, as a single undo step.
+
+        Returns:
+            The lines of the new text that could not be read, as errors.
+        """
+        if self.stale:
+            self.reload()
+        lines = text.split('\n')
+        old_lines = self._lines
+        start = 0
+        end = len(old_lines)
+        new_end = len(lines)
+        while start < min(end, new_end) and old_lines[start] == lines[start]:
+            start += 1
+        while end > start and new_end > start and old_lines[end - 1] == lines[new_end - 1]:
+            end -= 1
+            new_end -= 1
+        if start == end and start == new_end:
+            return self.errors
+
+        old_statements = self._statements[start:end]
+        old_ids = self._reaction_ids[start:end]
+        statements, errors = self._parse_lines(lines[start:new_end], old_statements)
+        self._ids_in_use.subtract(i for i in old_ids if i is not None)
+        reaction_ids = self._assign_ids(statements, errors, old_statements, old_ids)
+        self._lines[start:end] = lines[start:new_end]
+        self._statements[start:end] = statements
+        self._reaction_ids[start:end] = reaction_ids
+        self._errors[start:end] = errors
+
+        old = list(zip(old_ids, old_statements))
+        new = list(zip(reaction_ids, statements)) + self._revive(set(old_ids))
+        old_species = _mentions(old)
+        new_species = _mentions(new)
+        self._species_refs.subtract(old_species)
+        self._species_refs.update(new_species)
+        self._apply(dict(old), dict(new), [i for i in new_species if i not in old_species],
+                    [i for i in old_species if i not in new_species])
+        self.version = iod.getModelVersion()
+        return self.errors
+
+    def _parse_lines(self, lines: List[str], old_statements: List[Optional[Statement]]):
+        statements: List[Optional[Statement]] = list()
+        errors: List[Optional[str]] = list()
+        for k, line in enumerate(lines):
+            try:
+                statements.append(parse_line(line))
+                errors.append(None)
+            except ValueError as e:
+                # Lines edited in place keep what they last described until they can be read
+                statements.append(old_statements[k] if len(lines) == len(old_statements)
+                                  else None)
+                errors.append(str(e))
+        return statements, errors
+
+    def _assign_ids(self, statements: List[Optional[Statement]], errors: List[Optional[str]],
+                    old_statements: List[Optional[Statement]],
+                    old_ids: List[Optional[str]]) -> List[Optional[str]]:
+        """Return the reaction IDs of the edited lines, or None for the IDs already in use.
+
+        Unnamed reactions take the IDs that the unnamed reactions of the edited lines had, in
+        order, so that editing one, or removing its name, keeps it in the network.
+        """
+        named = {s.id for s in statements if isinstance(s, ReactionStatement) and s.id}
+        reusable = [reaction_id for s, reaction_id in zip(old_statements, old_ids)
+                    if reaction_id is not None and reaction_id not in named
+                    and (not s.id or _UNNAMED_RE.fullmatch(reaction_id))]
+        reusable.reverse()
+        net = self._network()
+        allocate = _IDAllocator(set(self._ids_in_use) | {r.id for r in net.reactions.values()}
+                                | named | set(reusable))
+        reaction_ids: List[Optional[str]] = list()
+        for k, statement in enumerate(statements):
+            reaction_id = None
+            if isinstance(statement, ReactionStatement):
+                reaction_id = statement.id or (reusable.pop() if reusable else allocate())
+                if self._ids_in_use[reaction_id] > 0:
+                    errors[k] = 'Reaction {} is already defined'.format(reaction_id)
+                    reaction_id = None
+                else:
+                    self._ids_in_use[reaction_id] += 1
+            reaction_ids.append(reaction_id)
+        return reaction_ids
+
+    def _revive(self, freed: Set[Optional[str]]) -> List[Tuple[str, Statement]]:
+        """Read the lines that were left out for defining one of the freed IDs again, and return
+        their reactions."""
+        freed = {i for i in freed if i is not None and self._ids_in_use[i] <= 0}
+        revived = list()
+        if len(freed) == 0:
+            return revived
+        for k, statement in enumerate(self._statements):
+            if (isinstance(statement, ReactionStatement) and self._reaction_ids[k] is None
+                    and statement.id in freed):
+                freed.remove(statement.id)
+                self._reaction_ids[k] = statement.id
+                self._ids_in_use[statement.id] += 1
+                self._errors[k] = None
+                revived.append((statement.id, statement))
+        return revived
+
+    def _apply(self, old: Dict[Optional[str], Optional[Statement]],
+               new: Dict[Optional[str], Optional[Statement]], added_species: List[str],
+               removed_species: List[str]):
+        """Apply the changes from the reactions 'old' to the reactions 'new', keyed by ID."""
+        old = {i: s for i, s in old.items() if isinstance(s, ReactionStatement) and i is not None}
+        new = {i: s for i, s in new.items() if isinstance(s, ReactionStatement) and i is not None}
+        removed = [i for i in old if i not in new]
+        added = [i for i in new if i not in old]
+        changed = [i for i in new if i in old and not new[i].same_reaction(old[i])]
+        net = self._network()
+        node_indices = {node.id: nodei for nodei, node in net.nodes.items()}
+        added_species = [i for i in added_species
+                         if self._species_refs[i] > 0 and i not in node_indices]
+        removed_species = [i for i in removed_species
+                           if self._species_refs[i] <= 0 and i in node_indices]
+        if not (removed or added or changed or added_species or removed_species):
+            return
+
+        neti = self.net_index
+        iod.startGroup()
+        try:
+            items = list(net.nodes.values()) + list(net.compartments.values())
+            w, h = DEFAULT_NODE_SIZE
+            for species_id, (x, y) in zip(added_species,
+                                          grid_positions(items, len(added_species))):
+                node_indices[species_id] = net.lastNodeIdx
+                iod.addNode(neti, species_id, x, y, w, h)
+
+            reaction_indices = {rea.id: reai for reai, rea in net.reactions.items()}
+            for reaction_id in removed:
+                iod.deleteReaction(neti, reaction_indices.pop(reaction_id))
+            rerouted = list()
+            for reaction_id in changed:
+                reai = reaction_indices[reaction_id]
+                if self._set_species(reai, old[reaction_id], new[reaction_id], node_indices):
+                    rerouted.append(reai)
+                if new[reaction_id].rate_law != old[reaction_id].rate_law:
+                    iod.setRateLaw(neti, reai, new[reaction_id].rate_law)
+            for reaction_id in added:
+                reai = net.lastReactionIdx
+                iod.createReaction(neti, reaction_id)
+                self._set_species(reai, None, new[reaction_id], node_indices)
+                iod.setRateLaw(neti, reai, new[reaction_id].rate_law)
+                rerouted.append(reai)
+            if len(rerouted) != 0:
+                iod.setReactionsHandlePositions(neti, {
+                    reai: default_reaction_handles(net, net.reactions[reai]) for reai in rerouted})
+
+            for species_id in removed_species:
+                iod.deleteNode(neti, node_indices[species_id])
+        finally:
+            iod.endGroup()
+
+    def _set_species(self, reai: int, old: Optional[ReactionStatement], new: ReactionStatement,
+                     node_indices: Dict[str, int]) -> bool:
+        """Set the reactants and products of a reaction, returning whether any was added or
+        removed."""
+        neti = self.net_index
+        changed = False
+        sides = ((iod.addSrcNode, iod.deleteSrcNode, iod.setReactionSrcNodeStoich, 0),
+                 (iod.addDestNode, iod.deleteDestNode, iod.setReactionDestNodeStoich, 1))
+        for add, delete, set_stoich, side in sides:
+            before = dict((old.reactants, old.products)[side]) if old is not None else dict()
+            after = dict((new.reactants, new.products)[side])
+            for species_id in before:
+                if species_id not in after:
+                    delete(neti, reai, node_indices[species_id])
+                    changed = True
+            for species_id, stoich in after.items():
+                if species_id not in before:
+                    add(neti, reai, node_indices[species_id], stoich)
+                    changed = True
+                elif before[species_id] != stoich:
+                    set_stoich(neti, reai, node_indices[species_id], stoich)
+        return changed
@@ -3,13 +3,15 @@
 from collections import defaultdict
 from contextlib import contextmanager
 import copy
+from dataclasses import dataclass
 from itertools import chain
 import logging
 from logging import Logger
+import math
 from threading import Thread
 import time
 import typing
-from typing import Collection, DefaultDict, Dict, List, Optional, Set, Tuple, Union, cast
+from typing import Callable, Collection, DefaultDict, Dict, List, Optional, Set, Tuple, Union, cast
 
 from sortedcontainers import SortedKeyList
 import wx
@@ -18,27 +20,31 @@ from ..config import settings, theme
 from ..events import (
     CanvasDidUpdateEvent,
     DidCommitNodePositionsEvent,
+    DidMoveNodesEvent,
     DidPaintCanvasEvent,
     SelectionDidUpdateEvent,
     bind_handler,
     post_event,
 )
 from ..mvc import IController
+from ..profiler import profiler
+from ..spatial import RectSweep, SpatialGrid
 from ..utils import even_round, opacity_mul
+from .cosmetics import CosmeticStyles, SimulationOverlay
 from .data import Compartment, Node, Reaction, ReactionBezier, compute_centroid, init_bezier
 from .elements import CanvasElement, CompartmentElt, NodeElement, ReactionElement, SelectBox
 from .geometry import (
     Rect,
     Vec2,
     clamp_rect_pos,
+    get_bounding_rect,
     padded_rect,
-    rects_overlap,
     within_rect,
 )
-from .overlays import CanvasOverlay, Minimap
+from .overlays import CanvasOverlay, Minimap, ProfilerOverlay
 from .state import InputMode, cstate
 from .utils import Observer, SetSubject, default_handle_positions
-from .utils import draw_rect, get_nodes_by_idx
+from .utils import draw_rect, get_nodes_by_idx, render_network_bitmap
 
 
 BOUNDS_EPS = 0
@@ -49,6 +55,28 @@ BOUNDS_EPS_VEC = Vec2.repeat(BOUNDS_EPS)
 """2D bounds vector formed from BOUNDS_EPS"""
 
 
+@dataclass(frozen=True, eq=False)
+class CanvasViewState:
+    """What the canvas showed of a network, to show it the same way once it is shown again.
+
+    See Canvas.SaveViewState() and Canvas.ShowNetwork().
+
+    Attributes:
+        zoom_level: The zoom level.
+        origin: The unscaled logical position of the top-left corner of the visible window.
+        sel_nodes_idx: The indices of the selected nodes.
+        sel_reactions_idx: The indices of the selected reactions.
+        sel_compartments_idx: The indices of the selected compartments.
+        thumbnail: A picture of the whole network, settings['network_thumbnail_width'] wide.
+    """
+    zoom_level: int
+    origin: Vec2
+    sel_nodes_idx: Set[int]
+    sel_reactions_idx: Set[int]
+    sel_compartments_idx: Set[int]
+    thumbnail: wx.Bitmap
+
+
 # Don't use ScrolledPanel since Canvas does not scroll conventionally.
 class Canvas(wx.ScrolledWindow):
     """The main window onto which nodes, reactions, etc. will be drawn.
@@ -63,7 +91,7 @@ class Canvas(wx.ScrolledWindow):
 
         controller: The associated controller instance.
         realsize: The actual, total size of canvas, including the part offscreen.
-        net_index: The index of the current network. Rightn now it can be zero.
+        net_index: The index of the network shown. See ShowNetwork().
         sel_nodes_idx: The set of indices of the currently selected nodes.
         sel_reactions_idx: The set of indices of the currently selected reactions.
         sel_compartments_idx: The set of indices of the currently selected compartments.
@@ -95,7 +123,7 @@ class Canvas(wx.ScrolledWindow):
     reaction_map: DefaultDict[int, Set[int]]
     logger: Logger
 
-    #: Current network index. Right now this is always 0 since there is only one tab.
+    #: The index of the network shown. Only the items of this network have elements.
     _net_index: int
     _nodes: List[Node]  #: List of Node instances. This contains data needed to render them.
     # TODO move this one to top docstring
@@ -112,10 +140,20 @@ class Canvas(wx.ScrolledWindow):
     _product_idx: Set[int]  #: The list of indices of the currently designated product nodes
     _select_box: SelectBox  #: The select box element.
     _minimap: Minimap  #: The minimap overlay.
+    _profiler_overlay: ProfilerOverlay  #: The overlay that displays the frame-time profiler.
+    #: Per-frame styles that override how nodes and reactions are painted
+    cosmetics: CosmeticStyles
+    simulation_overlay: SimulationOverlay
     _overlays: List[CanvasOverlay]  #: The list of overlays. Used when processing click events.
     _drag_selecting: bool  #: If currently dragging the selection rectangle.
     _drag_select_start: Vec2  #: The (logical) mouse position when the user started drag selecting.
     _drag_rect: Rect  #: The current drag-selection rectangle.
+    #: The grids of the unscaled rectangles of the nodes and compartments, in the order of _nodes
+    #: and _compartments. Built when drag-selecting first starts after a reset or a preview of
+    #: node positions.
+    _select_grids: Optional[Tuple[SpatialGrid, SpatialGrid]]
+    #: Follow the drag-selection rectangle over the grids of the nodes and compartments.
+    _drag_sweeps: Tuple[RectSweep, RectSweep]
     _reverse_status: Dict[str, int]  #: Maps status string in .config.settings to its index.
     #: Flag for whether the mouse is currently outside of the root app window.
     _copied_nodes: List[Node]  #: Copy of nodes currently in clipboard
@@ -168,6 +206,7 @@ class Canvas(wx.ScrolledWindow):
         self.Bind(wx.EVT_ERASE_BACKGROUND, lambda _: None)
 
         bind_handler(DidCommitNodePositionsEvent, self.OnDidCommitNodePositions)
+        bind_handler(CanvasDidUpdateEvent, self.OnCanvasDidUpdate)
 
         # state variables
         cstate.input_mode = InputMode.SELECT
@@ -208,13 +247,17 @@ class Canvas(wx.ScrolledWindow):
         minimap_pos.y -= slider_height + 10
         self._minimap.device_pos = minimap_pos
 
+        self._profiler_overlay = ProfilerOverlay(profiler, device_pos=Vec2(10, 10))
         self._overlays = [self._minimap]
+        self.cosmetics = CosmeticStyles()
+        self.simulation_overlay = SimulationOverlay(self)
 
         self._drag_selecting = False
         self._drag_select_start = Vec2()
         self._drag_rect = Rect(Vec2(), Vec2())
         self.drag_sel_nodes_idx = set()
         self.drag_sel_comp_idx = set()
+        self._select_grids = None
 
         self._status_bar = self.GetTopLevelParent().GetStatusBar()
         assert self._status_bar is not None, "Need to create status bar before creating canvas!"
@@ -238,6 +281,7 @@ class Canvas(wx.ScrolledWindow):
         self._nodes_floating = False
         self._in_selection_group = False
         self._selection_dirty = False
+        self._idle_tasks: List[Callable[[], bool]] = list()
 
         self.SetOverlayPositions()
 
@@ -245,10 +289,23 @@ class Canvas(wx.ScrolledWindow):
         evt.Skip()
 
     def OnIdle(self, evt):
-        if not self.LazyRefresh():
-            # Not processed; request more
+        if len(self._idle_tasks) != 0:
+            # Tasks added while these run are kept for the next idle event
+            tasks = self._idle_tasks
+            self._idle_tasks = list()
+            self._idle_tasks = [task for task in tasks if task()] + self._idle_tasks
+        if not self.LazyRefresh() or len(self._idle_tasks) != 0:
+            # Not processed, or more tasks to run; request more
             evt.RequestMore()
 
+    def AddIdleTask(self, task: Callable[[], bool]):
+        """Run a task each time the canvas is idle, until it returns False.
+
+        The task should return quickly, since the canvas does not respond to the user while it
+        runs. Long computations, such as an animated layout, should be split into time slices.
+        """
+        self._idle_tasks.append(task)
+
     @property
     def nodes(self):
         return self._nodes
@@ -332,7 +389,8 @@ class Canvas(wx.ScrolledWindow):
         # is true for Mac and Linux, however. -Gary
         self._minimap.window_size = Vec2(self.GetSize()) / cstate.scale
         self._minimap.realsize = self.realsize
-        self._minimap.nodes = self._nodes
+        self._profiler_overlay.position = Vec2(
+            *self.CalcUnscrolledPosition(*self._profiler_overlay.device_pos))
 
     def CreateNodeElement(self, node: Node, layers: Union[int, List[int]]) -> NodeElement:
         return NodeElement(node, self, layers)
@@ -353,6 +411,10 @@ class Canvas(wx.ScrolledWindow):
 
     def Reset(self, nodes: List[Node], reactions: List[Reaction], compartments: List[Compartment]):
         """Update the list of nodes and apply the current scale."""
+        with profiler.phase('canvas.reset'):
+            self._Reset(nodes, reactions, compartments)
+
+    def _Reset(self, nodes: List[Node], reactions: List[Reaction], compartments: List[Compartment]):
         # destroy old elements
         for elt in self._elements:
             elt.destroy()
@@ -384,6 +446,7 @@ class Canvas(wx.ScrolledWindow):
         self._nodes = nodes
         self._reactions = reactions
         self._compartments = compartments
+        self._InvalidateSelectGrids()
         self.hovered_element = None
         self.dragged_element = None
 
@@ -441,7 +504,7 @@ class Canvas(wx.ScrolledWindow):
 
         limit = self.realsize * cstate.scale - Vec2(self.GetSize())
         pos.x = min(pos.x, limit.x)
-        pos.y = min(pos.y, limit.x)
+        pos.y = min(pos.y, limit.y)
 
         pos = pos.elem_div(Vec2(self.GetScrollPixelsPerUnit()))
         # need to mult by scale here since self.VirtualPosition is artificially increased, per
@@ -501,6 +564,85 @@ class Canvas(wx.ScrolledWindow):
         """Reset the zoom level, with the anchor on the center of the visible window."""
         self.SetZoomLevel(0, Vec2(self.GetSize()) / 2)
 
+    def ZoomToItems(self, node_indices: Collection[int] = (),
+                    reaction_indices: Collection[int] = (),
+                    compartment_indices: Collection[int] = ()):
+        """Select the given nodes, reactions and compartments, and zoom and scroll to center them.
+
+        The zoom level is the largest at which they fit in settings['zoom_to_fill'] of the canvas.
+        A reaction fits if its reactants and products do. Indices of items that are not on the
+        canvas are ignored.
+        """
+        nodes = [self.node_idx_map[i] for i in node_indices if i in self.node_idx_map]
+        reaction_indices = set(reaction_indices)
+        reactions = [r for r in self._reactions if r.index in reaction_indices]
+        compartment_indices = set(compartment_indices)
+        compartments = [c for c in self._compartments if c.index in compartment_indices]
+        rects = [n.rect for n in nodes] + [c.rect for c in compartments] + \
+            [self.node_idx_map[i].rect for r in reactions for i in chain(r.sources, r.targets)]
+        if len(rects) == 0:
+            return
+
+        with self._SelectGroupEvent():
+            self.sel_nodes_idx.set_item({n.index for n in nodes})
+            self.sel_reactions_idx.set_item({r.index for r in reactions})
+            self.sel_compartments_idx.set_item({c.index for c in compartments})
+
+        bounds = get_bounding_rect(rects)
+        view = Vec2(self.GetSize()) * settings['zoom_to_fill']
+        scale = min(view.x / max(bounds.size.x, 1), view.y / max(bounds.size.y, 1))
+        zoom = math.floor(math.log(scale, 1.2))
+        self.SetZoomLevel(min(max(zoom, self.MIN_ZOOM_LEVEL), self.MAX_ZOOM_LEVEL), Vec2())
+        self.SetOriginPos(bounds.center_point - Vec2(self.GetSize()) / (2 * cstate.scale))
+        self.LazyRefresh()
+
+    def SaveViewState(self) -> CanvasViewState:
+        """Return the zoom level, scroll position and selection of the canvas, and a thumbnail of
+        the network shown, to pass to ShowNetwork() once it is shown again."""
+        return CanvasViewState(
+            zoom_level=self._zoom_level,
+            origin=Vec2(self.CalcUnscrolledPosition(0, 0)) / cstate.scale,
+            sel_nodes_idx=self.sel_nodes_idx.item_copy(),
+            sel_reactions_idx=self.sel_reactions_idx.item_copy(),
+            sel_compartments_idx=self.sel_compartments_idx.item_copy(),
+            thumbnail=render_network_bitmap(self._nodes, self._reactions, self._compartments,
+                                            self.realsize, settings['network_thumbnail_width']),
+        )
+
+    def ShowNetwork(self, net_index: int, nodes: List[Node], reactions: List[Reaction],
+                    compartments: List[Compartment], state: Optional[CanvasViewState] = None):
+        """Show the items of another network, destroying the elements of the network shown now.
+
+        Args:
+            net_index: The index of the network.
+            state: What SaveViewState() returned when the network was last shown, or None to show
+                it from the top-left corner at the default zoom level.
+        """
+        with self._SelectGroupEvent():
+            self.sel_nodes_idx.set_item(set())
+            self.sel_reactions_idx.set_item(set())
+            self.sel_compartments_idx.set_item(set())
+            self._reactant_idx = set()
+            self._product_idx = set()
+            self._net_index = net_index
+            self._select_box.net_index = net_index
+            self.Reset(nodes, reactions, compartments)
+            if state is not None:
+                # Items may have been deleted since, e.g. by an undo
+                self.sel_nodes_idx.set_item(state.sel_nodes_idx & self.node_idx_map.keys())
+                self.sel_reactions_idx.set_item(
+                    state.sel_reactions_idx & {r.index for r in reactions})
+                self.sel_compartments_idx.set_item(
+                    state.sel_compartments_idx & {c.index for c in compartments})
+
+        if state is None:
+            self.SetZoomLevel(0, Vec2())
+            self.SetOriginPos(Vec2())
+        else:
+            self.SetZoomLevel(state.zoom_level, Vec2())
+            self.SetOriginPos(state.origin)
+        self.LazyRefresh()
+
     def _GetUniqueName(self, base: str, names: Collection[str], *args: Collection[str]) -> str:
         """Given a base name "x", try "x_0", "x_1", ... until it is unique in all the collections.
         """
@@ -614,8 +756,7 @@ class Canvas(wx.ScrolledWindow):
                     self._drag_selecting = True
                     self._drag_select_start = logical_pos
                     self._drag_rect = Rect(self._drag_select_start, Vec2())
-                    self.drag_sel_nodes_idx = set()
-                    self.drag_sel_comp_idx = set()
+                    self._StartDragSweeps()
             elif cstate.input_mode == InputMode.ADD_NODES:
                 size = Vec2(theme['node_width'], theme['node_height'])
 
@@ -768,6 +909,10 @@ class Canvas(wx.ScrolledWindow):
         return Vec2(self.CalcUnscrolledPosition(wx.Point(0, 0))) + pos
 
     def OnMotion(self, evt):
+        with profiler.phase('canvas.motion'):
+            self._OnMotion(evt)
+
+    def _OnMotion(self, evt):
         assert isinstance(evt, wx.MouseEvent)
         redraw = False
         try:
@@ -783,12 +928,7 @@ class Canvas(wx.ScrolledWindow):
                                 max(logical_pos.y, self._drag_select_start.y))
                 self._drag_rect = Rect(topleft, botright - topleft)
                 if cstate.input_mode == InputMode.SELECT:
-                    selected_nodes = [n for n in self._nodes
-                                      if rects_overlap(n.s_rect, self._drag_rect)]
-                    selected_comps = [c for c in self._compartments
-                                      if rects_overlap(c.rect * cstate.scale, self._drag_rect)]
-                    self.drag_sel_nodes_idx = set(n.index for n in selected_nodes)
-                    self.drag_sel_comp_idx = set(c.index for c in selected_comps)
+                    self._MoveDragSweeps(topleft / cstate.scale, botright / cstate.scale)
                 elif cstate.input_mode == InputMode.ADD_COMPARTMENTS:
                     pass
                 redraw = True
@@ -873,99 +1013,180 @@ class Canvas(wx.ScrolledWindow):
         gc = wx.GraphicsContext.Create(dc)
 
         if gc:
-            # Draw background
-            draw_rect(
-                gc,
-                Rect(Vec2(), self.realsize * cstate.scale),
-                fill=theme['canvas_bg'],
-            )
+            profiler.begin_frame()
+            frame_start = time.perf_counter()
 
-            # Draw nodes
-            # create font for nodes
-            for el in self._elements:
-                if not el.enabled:
-                    continue
-                el.do_paint(gc)
-
-            sel_node_idx = self.sel_nodes_idx.item_copy()
-            sel_comp_idx = self.sel_compartments_idx.item_copy()
-            orig_count = len(sel_node_idx) + len(sel_comp_idx)
-            drawing_drag = False
-            if self._drag_selecting:
-                sel_node_idx |= self.drag_sel_nodes_idx
-                sel_comp_idx |= self.drag_sel_comp_idx
-                # Flag that indicates whether there are nodes/comps not selected but within
-                # the drag-selection rectangle
-                if len(sel_node_idx) + len(sel_comp_idx) != orig_count:
-                    drawing_drag = True
-            sel_nodes = [n for n in self._nodes if n.index in sel_node_idx]
-            sel_comps = [c for c in self._compartments if c.index in sel_comp_idx]
-            sel_rects = [n.rect * cstate.scale for n in sel_nodes] + \
-                [c.rect * cstate.scale for c in sel_comps]
-
-            # If we are not drag-selecting, don't draw selection outlines if there is only one rect
-            # selected (for aesthetics); but do draw outlines if drawing_drag is True (as
-            # documented above)
-            if len(sel_rects) > 1 or drawing_drag:
-                for rect in sel_rects:
-                    rect = rect.aligned()
-                    # Draw selection outlines
-                    rect = padded_rect(rect, theme['select_outline_padding'])
-                    # draw rect
-                    draw_rect(gc, rect, border=theme['handle_color'],
-                              border_width=theme['select_outline_width'])
-
-            # Draw reactant and product marker outlines
-            def draw_reaction_outline(color: wx.Colour, padding: int):
+            # Draw background
+            with profiler.phase('paint.background'):
                 draw_rect(
                     gc,
-                    padded_rect(node.s_rect.aligned(), padding),
-                    fill=None,
-                    border=color,
-                    border_width=max(even_round(theme['react_node_border_width']), 2),
-                    border_style=wx.PENSTYLE_LONG_DASH,
+                    Rect(Vec2(), self.realsize * cstate.scale),
+                    fill=theme['canvas_bg'],
                 )
 
-            reactants = get_nodes_by_idx(self._nodes, self._reactant_idx)
-            for node in reactants:
-                draw_reaction_outline(theme['reactant_border'], theme['react_node_padding'])
+            # Draw elements. When profiling, time is accumulated per element type for this frame.
+            if profiler.enabled:
+                for el in self._elements:
+                    if not el.enabled:
+                        continue
+                    el_start = time.perf_counter()
+                    el.do_paint(gc)
+                    profiler.add('paint.' + type(el).__name__,
+                                 (time.perf_counter() - el_start) * 1000)
+            else:
+                for el in self._elements:
+                    if not el.enabled:
+                        continue
+                    el.do_paint(gc)
 
-            products = get_nodes_by_idx(self._nodes, self._product_idx)
-            for node in products:
-                pad = theme['react_node_border_width'] + \
-                    3 if node.index in self._reactant_idx else 0
-                draw_reaction_outline(theme['product_border'], pad + theme['react_node_padding'])
+            with profiler.phase('paint.selection'):
+                self._PaintSelectionOutlines(gc)
+                self._PaintReactionMarkers(gc)
+                self._PaintDragRect(gc)
 
-            # Draw drag-selection rect
-            if self._drag_selecting:
-                fill: wx.Colour
-                border: wx.Colour
-                bwidth: int
-                if cstate.input_mode == InputMode.SELECT:
-                    fill = theme['drag_fill']
-                    border = theme['drag_border']
-                    bwidth = theme['drag_border_width']
-                elif cstate.input_mode == InputMode.ADD_COMPARTMENTS:
-                    fill = opacity_mul(theme['comp_fill'], 0.3)
-                    border = opacity_mul(theme['comp_border'], 0.3)
-                    bwidth = theme['comp_border_width']
-                else:
-                    assert False, "Should not be _drag_selecting in any other input mode."
+            # Draw minimap
+            with profiler.phase('paint.minimap'):
+                self._minimap.DoPaint(gc)
+            with profiler.phase('paint.plugins'):
+                post_event(DidPaintCanvasEvent(gc))
+
+            profiler.add('paint', (time.perf_counter() - frame_start) * 1000)
+            profiler.end_frame()
+
+            # Drawn last so that it is on top, and excluded from the frame it is displaying
+            if self._profiler_overlay.visible:
+                self._profiler_overlay.DoPaint(gc)
+
+    def _StartDragSweeps(self):
+        """Start following the drag-selection rectangle over the nodes and compartments."""
+        if self._select_grids is None:
+            self._select_grids = (
+                SpatialGrid([tuple(n.position) for n in self._nodes],
+                            [tuple(n.size) for n in self._nodes]),
+                SpatialGrid([tuple(c.position) for c in self._compartments],
+                            [tuple(c.size) for c in self._compartments]))
+        self._drag_sweeps = (RectSweep(self._select_grids[0]), RectSweep(self._select_grids[1]))
+        self.drag_sel_nodes_idx = set()
+        self.drag_sel_comp_idx = set()
 
-                if bwidth == 0:
-                    border = None
+    def _InvalidateSelectGrids(self):
+        """Discard the grids of drag-selection, e.g. when nodes are reset or moved in place."""
+        self._select_grids = None
+        if self._drag_selecting and cstate.input_mode == InputMode.SELECT:
+            # The rows of the sweeps refer to the old rectangles; start over at the next motion
+            self._StartDragSweeps()
 
-                draw_rect(
-                    gc,
-                    self._drag_rect,
-                    fill=fill,
-                    border=border,
-                    border_width=bwidth,
-                )
+    def _MoveDragSweeps(self, topleft: Vec2, botright: Vec2):
+        """Update the nodes and compartments tentatively selected, given the unscaled corners of
+        the drag-selection rectangle.
 
-            # Draw minimap
-            self._minimap.DoPaint(gc)
-            post_event(DidPaintCanvasEvent(gc))
+        Only those in the strips that the rectangle covered or uncovered since the last motion are
+        tested.
+        """
+        node_sweep, comp_sweep = self._drag_sweeps
+        added, removed = node_sweep.move(tuple(topleft), tuple(botright))
+        self.drag_sel_nodes_idx |= {self._nodes[row].index for row in added}
+        self.drag_sel_nodes_idx -= {self._nodes[row].index for row in removed}
+        added, removed = comp_sweep.move(tuple(topleft), tuple(botright))
+        self.drag_sel_comp_idx |= {self._compartments[row].index for row in added}
+        self.drag_sel_comp_idx -= {self._compartments[row].index for row in removed}
+
+    def _PaintSelectionOutlines(self, gc: wx.GraphicsContext):
+        sel_node_idx = self.sel_nodes_idx.item_copy()
+        sel_comp_idx = self.sel_compartments_idx.item_copy()
+        orig_count = len(sel_node_idx) + len(sel_comp_idx)
+        drawing_drag = False
+        if self._drag_selecting:
+            sel_node_idx |= self.drag_sel_nodes_idx
+            sel_comp_idx |= self.drag_sel_comp_idx
+            # Flag that indicates whether there are nodes/comps not selected but within
+            # the drag-selection rectangle
+            if len(sel_node_idx) + len(sel_comp_idx) != orig_count:
+                drawing_drag = True
+        sel_nodes = [self.node_idx_map[i] for i in sel_node_idx if i in self.node_idx_map]
+        sel_comps = [c for c in self._compartments if c.index in sel_comp_idx]
+        sel_rects = [n.rect * cstate.scale for n in sel_nodes] + \
+            [c.rect * cstate.scale for c in sel_comps]
+
+        # If we are not drag-selecting, don't draw selection outlines if there is only one rect
+        # selected (for aesthetics); but do draw outlines if drawing_drag is True (as
+        # documented above)
+        if len(sel_rects) > 1 or drawing_drag:
+            for rect in sel_rects:
+                rect = rect.aligned()
+                # Draw selection outlines
+                rect = padded_rect(rect, theme['select_outline_padding'])
+                # draw rect
+                draw_rect(gc, rect, border=theme['handle_color'],
+                          border_width=theme['select_outline_width'])
+
+    def _PaintReactionMarkers(self, gc: wx.GraphicsContext):
+        # Draw reactant and product marker outlines
+        def draw_reaction_outline(color: wx.Colour, padding: int):
+            draw_rect(
+                gc,
+                padded_rect(node.s_rect.aligned(), padding),
+                fill=None,
+                border=color,
+                border_width=max(even_round(theme['react_node_border_width']), 2),
+                border_style=wx.PENSTYLE_LONG_DASH,
+            )
+
+        reactants = get_nodes_by_idx(self._nodes, self._reactant_idx)
+        for node in reactants:
+            draw_reaction_outline(theme['reactant_border'], theme['react_node_padding'])
+
+        products = get_nodes_by_idx(self._nodes, self._product_idx)
+        for node in products:
+            pad = theme['react_node_border_width'] + \
+                3 if node.index in self._reactant_idx else 0
+            draw_reaction_outline(theme['product_border'], pad + theme['react_node_padding'])
+
+    def _PaintDragRect(self, gc: wx.GraphicsContext):
+        # Draw drag-selection rect
+        if self._drag_selecting:
+            fill: wx.Colour
+            border: wx.Colour
+            bwidth: int
+            if cstate.input_mode == InputMode.SELECT:
+                fill = theme['drag_fill']
+                border = theme['drag_border']
+                bwidth = theme['drag_border_width']
+            elif cstate.input_mode == InputMode.ADD_COMPARTMENTS:
+                fill = opacity_mul(theme['comp_fill'], 0.3)
+                border = opacity_mul(theme['comp_border'], 0.3)
+                bwidth = theme['comp_border_width']
+            else:
+                assert False, "Should not be _drag_selecting in any other input mode."
+
+            if bwidth == 0:
+                border = None
+
+            draw_rect(
+                gc,
+                self._drag_rect,
+                fill=fill,
+                border=border,
+                border_width=bwidth,
+            )
+
+    @property
+    def profiler_visible(self) -> bool:
+        """Whether the frame-time profiler is running and its overlay is shown."""
+        return self._profiler_overlay.visible
+
+    def ToggleProfiler(self):
+        """Toggle the frame-time profiler and its overlay. Old samples are discarded when enabled."""
+        visible = not self._profiler_overlay.visible
+        if visible:
+            profiler.reset()
+        profiler.enabled = visible
+        self._profiler_overlay.visible = visible
+        self.Refresh()
+
+    def ToggleSimulationOverlay(self):
+        """Show or hide the amounts and fluxes of the last simulation on the canvas."""
+        self.simulation_overlay.Toggle()
 
     def ResetLayer(self, elt: CanvasElement, layers: Union[int, List[int]]):
         if elt in self._elements:
@@ -977,6 +1198,34 @@ class Canvas(wx.ScrolledWindow):
         """Get the list of selected nodes using self.sel_nodes_idx."""
         return [n for n in self._nodes if self.sel_nodes_idx.contains(n.index)]
 
+    def PreviewNodePositions(self, positions: Dict[int, Vec2]):
+        """Show nodes at new positions, without committing the move to the controller.
+
+        This is the path for cosmetic moves, e.g. the intermediate steps of an animated layout: the
+        moves are not recorded for undo, and are lost when the canvas is next reset from the model,
+        unless they are committed.
+
+        Args:
+            positions: The new positions of the top-left corners of the nodes, by node index. Nodes
+                       that are not on the canvas are ignored.
+        """
+        nodes = list()
+        offsets = list()
+        for nodei, pos in positions.items():
+            node = self.node_idx_map.get(nodei)
+            if node is None or node.position == pos:
+                continue
+            offsets.append(pos - node.position)
+            node.position = pos
+            nodes.append(node)
+        if len(nodes) == 0:
+            return
+        self._InvalidateSelectGrids()
+        post_event(DidMoveNodesEvent(nodes, offsets, dragged=False, preview=True))
+        sel_comps = [c for c in self._compartments if self.sel_compartments_idx.contains(c.index)]
+        self._select_box.update(self.GetSelectedNodes(), sel_comps)
+        self.LazyRefresh()
+
     def OnScroll(self, evt):
         # Need to use wx.CallAfter() to ensure the scroll event is finished before we update the
         # position of the dragged node
@@ -1014,6 +1263,9 @@ class Canvas(wx.ScrolledWindow):
         for elt in self._reaction_elements:
             elt.commit_node_pos()
 
+    def OnCanvasDidUpdate(self, evt: CanvasDidUpdateEvent):
+        self._minimap.SetNetwork(evt.nodes, evt.reactions, evt.compartments)
+
     @contextmanager
     def _SelectGroupEvent(self):
         """Context for selection event group. See docs for in_selection_group for details."""
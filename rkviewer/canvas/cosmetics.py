@@ -0,0 +1,193 @@
+"""Cosmetic styles, applied to the nodes and reactions of the canvas when they are painted.
+
+Some views of a network change every frame, e.g. a simulation overlay that colors and sizes the
+nodes by their amounts and thickens the reactions by their fluxes. These styles are not part of the
+model, and rebuilding the canvas from the model for every frame would be far too slow. Instead,
+CosmeticStyles holds arrays of attributes for the current frame, which NodeElement and
+ReactionElement look up when they paint; showing a frame only replaces the arrays and refreshes the
+canvas. Neither iodine nor the undo stack is touched.
+
+SimulationOverlay drives the styles of the canvas with a timer, from the time course of the
+simulation being streamed.
+"""
+# pylint: disable=maybe-no-member
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import wx
+
+from ..config import settings, theme
+from ..events import SimulationDidProgressEvent, bind_handler
+from ..simulation import TimeCourseBuffer
+
+
+FILL_LEVELS = 64  #: The number of fill colors of the nodes of a simulation overlay
+
+
+class CosmeticStyles:
+    """Fill colors and sizes of nodes and line thicknesses of reactions, for the current frame.
+
+    The nodes and reactions are bound to the rows of the arrays once, and each frame only replaces
+    the arrays. The nodes and reactions that are not bound, e.g. those added since, are painted as
+    usual.
+    """
+    _node_rows: Dict[int, int]
+    _reaction_rows: Dict[int, int]
+    _node_fills: Sequence[wx.Colour]
+    _node_scales: Sequence[float]
+    _reaction_thicknesses: Sequence[float]
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """Paint all nodes and reactions as usual."""
+        self.bind((), ())
+
+    def bind(self, node_indices: Sequence[int], reaction_indices: Sequence[int]):
+        """Set the nodes and reactions of the rows of the arrays. No frame is shown until the next
+        call to set_frame()."""
+        self._node_rows = {nodei: row for row, nodei in enumerate(node_indices)}
+        self._reaction_rows = {reai: row for row, reai in enumerate(reaction_indices)}
+        self._node_fills = ()
+        self._node_scales = ()
+        self._reaction_thicknesses = ()
+
+    def set_frame(self, node_fills: Sequence[wx.Colour], node_scales: Sequence[float],
+                  reaction_thicknesses: Sequence[float]):
+        """Set the attributes of the bound nodes and reactions, in the order they were bound.
+
+        Args:
+            node_fills: The fill color of each node.
+            node_scales: The size of each node, relative to its own; nodes are scaled about their
+                         centers.
+            reaction_thicknesses: The line thickness of each reaction.
+        """
+        assert len(node_fills) == len(node_scales) == len(self._node_rows)
+        assert len(reaction_thicknesses) == len(self._reaction_rows)
+        self._node_fills = node_fills
+        self._node_scales = node_scales
+        self._reaction_thicknesses = reaction_thicknesses
+
+    def node_style(self, nodei: int) -> Optional[Tuple[wx.Colour, float]]:
+        """Return the fill color and relative size of a node, or None to paint it as usual."""
+        row = self._node_rows.get(nodei)
+        if row is None or len(self._node_fills) == 0:
+            return None
+        return self._node_fills[row], self._node_scales[row]
+
+    def reaction_thickness(self, reai: int) -> Optional[float]:
+        """Return the line thickness of a reaction, or None to paint it as usual."""
+        row = self._reaction_rows.get(reai)
+        if row is None or len(self._reaction_thicknesses) == 0:
+            return None
+        return self._reaction_thicknesses[row]
+
+
+def _palette(low: wx.Colour, high: wx.Colour, count: int) -> List[wx.Colour]:
+    low_rgba = np.array([low.Red(), low.Green(), low.Blue(), low.Alpha()], dtype=float)
+    high_rgba = np.array([high.Red(), high.Green(), high.Blue(), high.Alpha()], dtype=float)
+    return [wx.Colour(*(low_rgba + (high_rgba - low_rgba) * w).round().astype(int).tolist())
+            for w in np.linspace(0, 1, count)]
+
+
+class SimulationOverlay:
+    """Shows the time course of a simulation on the canvas, as it is streamed.
+
+    Each frame, the amounts and fluxes at the current playback time are interpolated from the time
+    course received so far, and mapped to the fill colors and sizes of the nodes and to the line
+    thicknesses of the reactions, relative to the largest amount and flux so far. Playback starts
+    when a simulation of the network on the canvas starts, advances by
+    settings['overlay_points_per_second'] time points per second, waits for the time points that
+    have not been computed yet, and holds the last frame once the simulation is over.
+
+    Attributes:
+        enabled: Whether the overlay is shown. See Toggle().
+    """
+    enabled: bool
+    _buffer: Optional[TimeCourseBuffer]
+    _event: Optional[SimulationDidProgressEvent]  #: The first event of the simulation
+    _position: float  #: The playback position, as a fractional time point
+    _done: bool  #: Whether the simulation is over
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.enabled = True
+        self._buffer = None
+        self._event = None
+        self._position = 0.0
+        self._done = False
+        self._last_tick = 0.0
+        self._palette = _palette(theme['overlay_low_fill'], theme['overlay_high_fill'],
+                                 FILL_LEVELS)
+        self._timer = wx.Timer(canvas)
+        canvas.Bind(wx.EVT_TIMER, self._OnTimer, self._timer)
+        bind_handler(SimulationDidProgressEvent, self._OnProgress)
+
+    def Toggle(self):
+        """Show or hide the overlay. When shown again, the last simulation is played again."""
+        self.enabled = not self.enabled
+        if self.enabled:
+            self._Restart()
+        else:
+            self._Stop()
+
+    def _Restart(self):
+        if self._buffer is None or len(self._buffer) == 0:
+            return
+        self.canvas.cosmetics.bind(self._event.node_indices, self._event.reaction_indices)
+        self._position = 0.0
+        self._last_tick = time.perf_counter()
+        if not self._timer.IsRunning():
+            self._timer.Start(max(1, int(1000 / settings['overlay_fps'])))
+
+    def _Stop(self):
+        self._timer.Stop()
+        self.canvas.cosmetics.clear()
+        self.canvas.Refresh()
+
+    def _OnProgress(self, evt: SimulationDidProgressEvent):
+        if evt.done:
+            self._done = True
+            return
+        if evt.times[0] == 0:
+            # A new simulation
+            self._buffer = TimeCourseBuffer(len(evt.node_indices), len(evt.reaction_indices))
+            self._event = evt
+            self._done = False
+            self._buffer.append(evt.times, evt.amounts, evt.rates)
+            if self.enabled:
+                self._Restart()
+        elif self._buffer is not None:
+            self._buffer.append(evt.times, evt.amounts, evt.rates)
+
+    def _OnTimer(self, evt):
+        buffer = self._buffer
+        if buffer is None or self._event.net_index != self.canvas.net_index:
+            self._Stop()
+            return
+        now = time.perf_counter()
+        last = len(buffer) - 1
+        self._position = min(self._position + (now - self._last_tick) *
+                             settings['overlay_points_per_second'], last)
+        self._last_tick = now
+        times = buffer.times
+        amounts, rates = buffer.sample(float(np.interp(self._position, np.arange(len(times)),
+                                                       times)))
+
+        levels = np.clip(amounts / buffer.max_amount if buffer.max_amount > 0 else
+                         np.zeros_like(amounts), 0, 1)
+        fluxes = np.abs(rates) / buffer.max_rate if buffer.max_rate > 0 else np.zeros_like(rates)
+        palette = self._palette
+        fills = [palette[level] for level in
+                 (levels * (FILL_LEVELS - 1)).round().astype(int).tolist()]
+        scales = theme['overlay_min_scale'] + (theme['overlay_max_scale'] -
+                                               theme['overlay_min_scale']) * levels
+        thicknesses = theme['overlay_min_thickness'] + (theme['overlay_max_thickness'] -
+                                                        theme['overlay_min_thickness']) * fluxes
+        self.canvas.cosmetics.set_frame(fills, scales.tolist(), thicknesses.tolist())
+        self.canvas.Refresh()
+        if self._done and self._position == last:
+            # Hold the last frame
+            self._timer.Stop()
@@ -371,7 +371,9 @@ class SpeciesBezier:
         return any(pt_on_line(p1 * cstate.scale, p2 * cstate.scale, pos, CURVE_SLACK + self.thickness / 2)
                    for p1, p2 in pairwise(self.bezier_points))
 
-    def do_paint(self, gc: wx.GraphicsContext, fill: wx.Colour, selected: bool):
+    def do_paint(self, gc: wx.GraphicsContext, fill: wx.Colour, selected: bool,
+                 thickness: Optional[float] = None):
+        """Paint the curve, with the given line thickness instead of its own if specified."""
         self._recompute(for_collision=False)
         rxn_color: wx.Colour
         # Draw bezier curve
@@ -380,7 +382,8 @@ class SpeciesBezier:
         else:
             rxn_color = fill
 
-        pen = gc.CreatePen(wx.GraphicsPenInfo(rxn_color).Width(self.thickness))
+        pen = gc.CreatePen(wx.GraphicsPenInfo(rxn_color).Width(
+            self.thickness if thickness is None else thickness))
 
         gc.SetPen(pen)
         # gc.StrokeLines([wx.Point2D(*(p * cstate.scale)) for p in self.bezier_points])
@@ -502,9 +505,10 @@ class ReactionBezier:
             sb.node_rect = rects[i]
         self.src_handle_moved()
 
-    def do_paint(self, gc: wx.GraphicsContext, fill: wx.Colour, selected: bool):
+    def do_paint(self, gc: wx.GraphicsContext, fill: wx.Colour, selected: bool,
+                 thickness: Optional[float] = None):
         for bz in chain(self.src_beziers, self.dest_beziers):
-            bz.do_paint(gc, fill, selected)
+            bz.do_paint(gc, fill, selected, thickness)
 
 
 @dataclass
@@ -117,13 +117,21 @@ class NodeElement(CanvasElement):
             self.gfont = gc.CreateFont(font, wx.BLACK)
         gc.SetFont(self.gfont)
 
-        s_aligned_rect = self.node.s_rect.aligned()
+        s_rect = self.node.s_rect
+        fill = self.node.fill_color
+        # A cosmetic style, e.g. of a simulation overlay, overrides the fill and scales the node
+        # about its center
+        style = self.canvas.cosmetics.node_style(self.node.index)
+        if style is not None:
+            fill, scale = style
+            s_rect = Rect(s_rect.position + s_rect.size * ((1 - scale) / 2), s_rect.size * scale)
+        s_aligned_rect = s_rect.aligned()
         aligned_border_width = max(even_round(self.node.border_width * cstate.scale), 2)
         width, height = s_aligned_rect.size
         draw_rect(
             gc,
             s_aligned_rect,
-            fill=self.node.fill_color,
+            fill=fill,
             border=self.node.border_color,
             border_width=aligned_border_width,
         )
@@ -132,7 +140,7 @@ class NodeElement(CanvasElement):
         tw, th, _, _ = gc.GetFullTextExtent(self.node.id_)  # optimize by caching?
         tx = (width - tw) / 2
         ty = (height - th) / 2
-        gc.DrawText(self.node.id_, self.node.s_position.x + tx, self.node.s_position.y + ty)
+        gc.DrawText(self.node.id_, s_rect.position.x + tx, s_rect.position.y + ty)
 
     def do_left_down(self, _: Vec2):
         return True
@@ -242,7 +250,9 @@ class ReactionElement(CanvasElement):
         super().__init__(layers)
         self.reaction = reaction
         self.bezier = bezier
-        self.moved_handler_id = bind_handler(DidMoveNodesEvent, self.nodes_moved)
+        # Only subscribe to the moves of the nodes of this reaction
+        self.moved_handler_id = bind_handler(DidMoveNodesEvent, self.nodes_moved,
+                                             keys=chain(reaction.sources, reaction.targets))
         # i is 0 for source Beziers, but 1 for dest Beziers. "not" it to get the correct bool.
         self.index_to_bz = {(bz.node_idx, not gi): bz
                             for gi, bz in gchain(bezier.src_beziers,
@@ -300,7 +310,7 @@ class ReactionElement(CanvasElement):
             bz.enabled = val
 
     def nodes_moved(self, evt: CanvasEvent):
-        """Handler for after a node has moved."""
+        """Handler for after a node of this reaction has moved."""
         # If already moving (i.e. self._dirty_indices is not empty), then skip forward
         c_evt = cast(DidMoveNodesEvent, evt)
         nodes = c_evt.nodes
@@ -308,10 +318,16 @@ class ReactionElement(CanvasElement):
         rects = [self.canvas.node_idx_map[idx].rect for idx in chain(
             self.reaction.sources, self.reaction.targets)]
         self.bezier.nodes_moved(rects)
-        if len(self._dirty_indices) == 0:
-            self._dirty_indices = {n.index for n in nodes}
+        if c_evt.preview or len(self._dirty_indices) == 0:
             my_indices = {idx for idx in chain(self.reaction.sources, self.reaction.targets)}
-            self._moving_all = my_indices <= self._dirty_indices
+            moved_indices = {n.index for n in nodes}
+            moving_all = my_indices <= moved_indices
+            # Previews are not committed, so the handles they move are not marked dirty either
+            if not c_evt.preview:
+                self._dirty_indices = moved_indices & my_indices
+                self._moving_all = moving_all
+        else:
+            moving_all = self._moving_all
 
         for i, node in enumerate(nodes):
             for in_src in [True, False]:
@@ -321,13 +337,15 @@ class ReactionElement(CanvasElement):
                     bz.handle.tip += off
                     bz.update_curve(self.bezier.centroid)
 
-        if self._moving_all and isinstance(offset, Vec2):
+        if moving_all and isinstance(offset, Vec2):
             # Only move src_handle_tip if moving all nodes and they are moved by the same amount.
             self.reaction.src_c_handle.tip += offset
             self.bezier.src_handle_moved()
 
     def commit_node_pos(self):
         """Handler for after the controller is told to move a node."""
+        if len(self._dirty_indices) == 0:
+            return
         ctrl = self.canvas.controller
         neti = self.canvas.net_index
         reai = self.reaction.index
@@ -342,6 +360,7 @@ class ReactionElement(CanvasElement):
         if self._moving_all:
             ctrl.set_center_handle(neti, reai, self.reaction.src_c_handle.tip)
         self._dirty_indices = set()
+        self._moving_all = False
 
     def destroy(self):
         unbind_handler(self.moved_handler_id)
@@ -357,7 +376,8 @@ class ReactionElement(CanvasElement):
         return True  # Return True so that this can be selected
 
     def do_paint(self, gc: wx.GraphicsContext):
-        self.bezier.do_paint(gc, self.reaction.fill_color, self.selected)
+        self.bezier.do_paint(gc, self.reaction.fill_color, self.selected,
+                             self.canvas.cosmetics.reaction_thickness(self.reaction.index))
 
         # draw centroid
         color = theme['handle_color'] if self.selected else self.reaction.fill_color
@@ -438,6 +458,16 @@ class SelectBox(CanvasElement):
     _min_resize_ratio: Vec2
     _orig_rect: Optional[Rect]  #: the bounding rect when dragging/resizing started
     _bounds: Rect  #: the bounds that the bounding rect may not exceed
+    #: Nodes moved since the last flush_events(), or None if no move event is pending.
+    _pending_nodes: Optional[List[Node]]
+    #: Accumulated offset of each of the _pending_nodes since the last flush_events().
+    _pending_offsets: List[Vec2]
+    #: Whether all the _pending_nodes were moved by the same offset.
+    _pending_uniform: bool
+    #: Accumulated resize ratio since the last flush_events(), or None if not resized.
+    _pending_ratio: Optional[Vec2]
+    #: Whether a timer is running that will call flush_events().
+    _flush_scheduled: bool
 
     class Mode(enum.Enum):
         IDLE = 0
@@ -480,6 +510,11 @@ class SelectBox(CanvasElement):
         self._hovered_part = -2
 
         self._bounds = bounds
+        self._pending_nodes = None
+        self._pending_offsets = list()
+        self._pending_uniform = True
+        self._pending_ratio = None
+        self._flush_scheduled = False
 
     @property
     def mode(self):
@@ -684,8 +719,70 @@ class SelectBox(CanvasElement):
         else:
             assert False, 'Cannot possibly click on handle when nothing is selected.'
 
+    def _queue_move(self, nodes: List[Node], offset: Union[Vec2, List[Vec2]]):
+        """Accumulate a move of the given nodes, to be posted in flush_events()."""
+        offsets = [offset] * len(nodes) if isinstance(offset, Vec2) else offset
+        if self._pending_nodes is not None and [n.index for n in nodes] != \
+                [n.index for n in self._pending_nodes]:
+            # A different set of nodes; the accumulated offsets would not match
+            self.flush_events()
+
+        if self._pending_nodes is None:
+            self._pending_nodes = nodes
+            self._pending_offsets = list(offsets)
+            self._pending_uniform = isinstance(offset, Vec2)
+        else:
+            self._pending_offsets = [a + b for a, b in zip(self._pending_offsets, offsets)]
+            self._pending_uniform = self._pending_uniform and isinstance(offset, Vec2)
+        self._schedule_flush()
+
+    def _queue_resize(self, ratio: Vec2):
+        """Accumulate an incremental resize ratio, to be posted in flush_events()."""
+        if self._pending_ratio is None:
+            self._pending_ratio = ratio
+        else:
+            self._pending_ratio = self._pending_ratio.elem_mul(ratio)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Call flush_events() after a frame's worth of time, unless a call is already scheduled.
+
+        The events are not posted from OnPaint, since a handler that modifies the model would then
+        reset the canvas while it is being painted.
+        """
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            wx.CallLater(self.canvas.MILLIS_PER_REFRESH, self._scheduled_flush)
+
+    def _scheduled_flush(self):
+        self._flush_scheduled = False
+        self.flush_events()
+
+    def flush_events(self):
+        """Post the move and resize events accumulated since the last call, if any.
+
+        Dragging may produce many mouse motion samples per frame, so instead of posting one
+        DidMoveNodesEvent (and DidDragResizeNodesEvent) per sample, the offsets and ratios are
+        accumulated and posted as a single event. This is called by a timer at most once per frame
+        (see _schedule_flush()), and before the positions are committed.
+        """
+        if self._pending_ratio is not None:
+            ratio = self._pending_ratio
+            self._pending_ratio = None
+            if self._pending_nodes is not None:
+                post_event(DidDragResizeNodesEvent(nodes=self._pending_nodes, ratio=ratio))
+
+        if self._pending_nodes is not None:
+            nodes = self._pending_nodes
+            offset = self._pending_offsets[0] if self._pending_uniform else self._pending_offsets
+            self._pending_nodes = None
+            self._pending_offsets = list()
+            self._pending_uniform = True
+            post_event(DidMoveNodesEvent(nodes, offset, dragged=True))
+
     def do_left_up(self, logical_pos: Vec2):
         assert len(self.nodes) + len(self.compartments) != 0
+        self.flush_events()
         if self._mode == SelectBox.Mode.MOVING:
             if self._did_move:
                 self._did_move = False
@@ -829,10 +926,10 @@ class SelectBox(CanvasElement):
         self.bounding_rect.position = (br_pos + pad_off) / cstate.scale
         self.bounding_rect.size = target_size / cstate.scale
 
-        # STEP 6 post event
+        # STEP 6 queue events; these are posted (at most once per frame) in flush_events()
         if len(self.nodes) != 0:
-            post_event(DidDragResizeNodesEvent(nodes=self.nodes, ratio=inc_ratio))
-            post_event(DidMoveNodesEvent(nodes=self.nodes, offset=offsets, dragged=True))
+            self._queue_resize(inc_ratio)
+            self._queue_move(self.nodes, offsets)
         # TODO post compartment event
 
     def _move(self, pos: Vec2, rect_data: List[RectData], rel_positions: List[Vec2]):
@@ -877,5 +974,5 @@ class SelectBox(CanvasElement):
 
         all_nodes = self.nodes + self.peripheral_nodes
         if len(all_nodes) != 0:
-            post_event(DidMoveNodesEvent(all_nodes, pos_offset, dragged=True))
+            self._queue_move(all_nodes, pos_offset)
         # TODO post compartment event
@@ -3,10 +3,11 @@
 # pylint: disable=maybe-no-member
 import wx
 import abc
-from typing import Callable, List
-from .data import Node
+from typing import Callable, List, Optional
+from ..profiler import Profiler
+from .data import Compartment, Node, Reaction
 from .geometry import Vec2, Rect, clamp_point, within_rect
-from .utils import draw_rect
+from .utils import draw_rect, render_network_bitmap
 
 
 class CanvasOverlay(abc.ABC):
@@ -60,24 +61,32 @@ class CanvasOverlay(abc.ABC):
 # TODO refactor this as a CanvasElement and delete this file
 class Minimap(CanvasOverlay):
     """The minimap class that derives from CanvasOverlay.
+
+    The network is drawn on a bitmap the size of the minimap, which is drawn again only after
+    SetNetwork() is called, i.e. when the model changes. Each paint draws only that bitmap and the
+    rectangle of the visible window.
     
     Attributes:
         Callback: Type of the callback function called when the position of the minimap changes.
+        ITEM_OPACITY: The opacity of the items, as a fraction of that of their fill colors.
 
         window_pos: Position of the canvas window, as updated by canvas.
         window_size: Size of the canvas window, as updated by canvas.
-        nodes: The current list of nodes, as updated by canvas.
     """
     Callback = Callable[[Vec2], None]
+    ITEM_OPACITY = 0.4
     window_pos: Vec2
     window_size: Vec2
-    nodes: List[Node]
     device_pos: Vec2
 
     _position: Vec2  #: Unscrolled, i.e. logical position of the minimap. This varies by scrolling.
     _realsize: Vec2  #: Full size of the canvas
     _width: int
     _callback: Callback #: the function called when the minimap position changes
+    _nodes: List[Node]
+    _reactions: List[Reaction]
+    _compartments: List[Compartment]
+    _bitmap: Optional[wx.Bitmap]  #: The network drawn at the size of the minimap, if up to date
     _dragging: bool
     _drag_rel: Vec2
     """Position of the mouse relative to the top-left corner of the visible window handle on
@@ -102,10 +111,14 @@ class Minimap(CanvasOverlay):
         self._position = pos
         self.device_pos = device_pos  # should stay fixed
         self._width = width
+        self._size = Vec2()
+        self._bitmap = None
         self.realsize = realsize  # use the setter to set the _size as well
         self.window_pos = window_pos
         self.window_size = window_size
-        self.nodes = list()
+        self._nodes = list()
+        self._reactions = list()
+        self._compartments = list()
         self._callback = pos_callback
         self._dragging = False
         self._drag_rel = Vec2()
@@ -119,13 +132,24 @@ class Minimap(CanvasOverlay):
     @realsize.setter
     def realsize(self, val: Vec2):
         self._realsize = val
-        self._size = Vec2(self._width, self._width * val.y / val.x)
+        size = Vec2(self._width, self._width * val.y / val.x)
+        if size != self._size:
+            self._size = size
+            self._bitmap = None
 
     @property
     def dragging(self):
         """Whether the user is current dragging on the minimap window."""
         return self._dragging
 
+    def SetNetwork(self, nodes: List[Node], reactions: List[Reaction],
+                   compartments: List[Compartment]):
+        """Set the items to draw, which are drawn on the next paint."""
+        self._nodes = nodes
+        self._reactions = reactions
+        self._compartments = compartments
+        self._bitmap = None
+
     def DoPaint(self, gc: wx.GraphicsContext):
         # TODO move this somewhere else
         BACKGROUND_USUAL = wx.Colour(155, 155, 155, 50)
@@ -156,13 +180,11 @@ class Minimap(CanvasOverlay):
         # draw visible rect
         draw_rect(gc, Rect(win_pos, win_size), fill=foreground)
 
-        # draw nodes
-        for node in self.nodes:
-            n_pos = node.position * scale + self.position
-            n_size = node.size * scale
-            fc = node.fill_color
-            color = wx.Colour(fc.Red(), fc.Green(), fc.Blue(), 100)
-            draw_rect(gc, Rect(n_pos, n_size), fill=color)
+        # draw the network
+        if self._bitmap is None:
+            self._bitmap = render_network_bitmap(self._nodes, self._reactions, self._compartments,
+                                                 self._realsize, self._width, self.ITEM_OPACITY)
+        gc.DrawBitmap(self._bitmap, self.position.x, self.position.y, self._size.x, self._size.y)
 
     def OnLeftDown(self, device_pos: Vec2):
         if not self._dragging:
@@ -189,3 +211,88 @@ class Minimap(CanvasOverlay):
             else:
                 actual_pos = pos - self._drag_rel
                 self._callback(actual_pos / scale)
+
+
+class ProfilerOverlay(CanvasOverlay):
+    """Overlay that displays the rolling frame-time histogram and per-phase timings of a Profiler.
+
+    The overlay does not respond to mouse events; it is purely informational.
+
+    Attributes:
+        profiler: The profiler whose samples are displayed.
+        device_pos: The fixed device position of the top-left corner of the overlay.
+        visible: Whether the overlay should be painted.
+        frame_phase: The name of the phase used for the histogram.
+    """
+    BIN_WIDTH = 2  #: Width of each histogram bin, in milliseconds.
+    NUM_BINS = 25  #: Number of histogram bins. The last bin includes every slower frame.
+    HIST_HEIGHT = 50  #: Height of the histogram area.
+    LINE_HEIGHT = 14
+    MAX_PHASES = 12  #: Maximum number of phases listed below the histogram, slowest first.
+
+    profiler: Profiler
+    device_pos: Vec2
+    visible: bool
+    frame_phase: str
+
+    def __init__(self, profiler: Profiler, *, device_pos: Vec2, width: int = 300,
+                 frame_phase: str = 'paint'):
+        self.profiler = profiler
+        self.device_pos = device_pos
+        self._position = Vec2()
+        self._size = Vec2(width, self.HIST_HEIGHT + self.LINE_HEIGHT * (self.MAX_PHASES + 2))
+        self.visible = False
+        self.frame_phase = frame_phase
+        self.hovering = False
+
+    def DoPaint(self, gc: wx.GraphicsContext):
+        BACKGROUND = wx.Colour(0, 0, 0, 160)
+        BAR_FAST = wx.Colour(120, 220, 120, 220)
+        BAR_SLOW = wx.Colour(230, 110, 90, 220)  # frames over the 60fps budget
+        TEXT = wx.Colour(255, 255, 255)
+        FRAME_BUDGET = 1000 / 60
+
+        draw_rect(gc, Rect(self.position, self._size), fill=BACKGROUND)
+
+        # histogram of frame times
+        bins = self.profiler.histogram(self.frame_phase, self.BIN_WIDTH, self.NUM_BINS)
+        tallest = max(max(bins), 1)
+        bar_width = (self._size.x - 10) / self.NUM_BINS
+        hist_bottom = self.position.y + self.LINE_HEIGHT + self.HIST_HEIGHT
+        for i, count in enumerate(bins):
+            if count == 0:
+                continue
+            height = (self.HIST_HEIGHT - 4) * count / tallest
+            color = BAR_FAST if i * self.BIN_WIDTH < FRAME_BUDGET else BAR_SLOW
+            draw_rect(gc, Rect(Vec2(self.position.x + 5 + i * bar_width, hist_bottom - height),
+                               Vec2(max(bar_width - 1, 1), height)), fill=color)
+
+        font = wx.Font(wx.FontInfo(8).Family(wx.FONTFAMILY_TELETYPE))
+        gc.SetFont(gc.CreateFont(font, TEXT))
+        frame_stats = self.profiler.stats(self.frame_phase)
+        if frame_stats is None:
+            header = 'frame: no samples'
+        else:
+            header = 'frame: mean {:.1f}ms  p95 {:.1f}ms  max {:.1f}ms'.format(
+                frame_stats.mean, frame_stats.p95, frame_stats.max)
+        gc.DrawText(header, self.position.x + 5, self.position.y + 1)
+
+        # the slowest phases, by mean
+        all_stats = [(name, self.profiler.stats(name)) for name in self.profiler.phases()
+                     if name != self.frame_phase]
+        all_stats = [(name, st) for name, st in all_stats if st is not None]
+        all_stats.sort(key=lambda pair: pair[1].mean, reverse=True)
+        y = hist_bottom + 4
+        for name, st in all_stats[:self.MAX_PHASES]:
+            gc.DrawText('{:<28.28} {:6.2f} {:6.2f}'.format(name, st.mean, st.p95),
+                        self.position.x + 5, y)
+            y += self.LINE_HEIGHT
+
+    def OnLeftDown(self, device_pos: Vec2):
+        pass
+
+    def OnLeftUp(self, device_pos: Vec2):
+        pass
+
+    def OnMotion(self, device_pos: Vec2, is_down: bool):
+        pass
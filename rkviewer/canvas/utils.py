@@ -6,9 +6,10 @@ This includes drawing helpers and 2D geometry functions.
 import wx
 import abc
 import math
+from itertools import chain
 from typing import Collection, Generic, List, Optional, Set, TypeVar, Callable
 from .geometry import Rect, Vec2, rotate_unit
-from .data import Node
+from .data import Compartment, Node, Reaction
 
 
 def get_nodes_by_idx(nodes: List[Node], indices: Collection[int]):
@@ -68,6 +69,53 @@ def draw_rect(gc: wx.GraphicsContext, rect: Rect, *, fill: Optional[wx.Colour] =
     gc.DrawRectangle(x, y, width, height)
 
 
+def render_network_bitmap(nodes: List[Node], reactions: List[Reaction],
+                          compartments: List[Compartment], realsize: Vec2, width: int,
+                          alpha: float = 1) -> wx.Bitmap:
+    """Draw a network on a transparent bitmap, scaled down to the given width.
+
+    This is for pictures too small to show the IDs of the items, e.g. thumbnails of networks.
+    Compartments and nodes are drawn as rectangles of their fill colors, and each reaction as
+    straight lines between the centroid of its nodes and each of them.
+
+    Args:
+        realsize: The full size of the canvas, which the bitmap shows all of.
+        width: The width of the bitmap. The height is set according to perspective.
+        alpha: The opacity of the items, as a fraction of that of their fill colors.
+    """
+    def faded(color: wx.Colour) -> wx.Colour:
+        return wx.Colour(color.Red(), color.Green(), color.Blue(), int(color.Alpha() * alpha))
+
+    scale = width / realsize.x
+    bitmap = wx.Bitmap.FromRGBA(width, max(round(realsize.y * scale), 1))
+    dc = wx.MemoryDC(bitmap)
+    gc = wx.GraphicsContext.Create(dc)
+
+    for comp in compartments:
+        draw_rect(gc, Rect(comp.position * scale, comp.size * scale), fill=faded(comp.fill))
+
+    centers = {node.index: node.rect.center_point * scale for node in nodes}
+    for rxn in reactions:
+        ends = [centers[nodei] for nodei in chain(rxn.sources, rxn.targets) if nodei in centers]
+        if len(ends) == 0:
+            continue
+        centroid = sum(ends, Vec2()) / len(ends)
+        path = gc.CreatePath()
+        for end in ends:
+            path.MoveToPoint(*centroid)
+            path.AddLineToPoint(*end)
+        gc.SetPen(gc.CreatePen(wx.GraphicsPenInfo(faded(rxn.fill_color)).Width(
+            max(rxn.thickness * scale, 1))))
+        gc.StrokePath(path)
+
+    for node in nodes:
+        draw_rect(gc, Rect(node.position * scale, node.size * scale), fill=faded(node.fill_color))
+
+    del gc
+    dc.SelectObject(wx.NullBitmap)
+    return bitmap
+
+
 """Classes for the observer-Subject interface. See https://en.wikipedia.org/wiki/Observer_pattern
 """
 T = TypeVar('T')
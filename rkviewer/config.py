@@ -18,6 +18,7 @@ DEFAULT_THEME = {
     'mode_panel_width': 100,
     'toolbar_height': 40,
     'edit_panel_width': 260,
+    'antimony_panel_width': 320,
     'node_fill': wx.Colour(150, 255, 150, 200),
     'node_border': wx.Colour(19, 173, 2),
     'node_width': 50,
@@ -48,6 +49,15 @@ DEFAULT_THEME = {
     'comp_fill': wx.Colour(158, 169, 255, 200),
     'comp_border': wx.Colour(0, 29, 255),
     'comp_border_width': 2,
+    # Fill colors of the nodes with the smallest and the largest amounts in a simulation overlay
+    'overlay_low_fill': wx.Colour(220, 235, 255),
+    'overlay_high_fill': wx.Colour(215, 25, 28),
+    # Size of the nodes with the smallest and the largest amounts, relative to their own size
+    'overlay_min_scale': 0.7,
+    'overlay_max_scale': 1.3,
+    # Line thickness of the reactions with no flux and with the largest flux
+    'overlay_min_thickness': 1,
+    'overlay_max_thickness': 12,
 }
 
 DEFAULT_ARROW_TIP = [Vec2(1, 15), Vec2(4, 8), Vec2(1, 1), Vec2(21, 8)]
@@ -59,6 +69,7 @@ DEFAULT_SETTINGS = {
         ('cursor', 100),
         ('zoom', 100),
         ('fps', 100),
+        ('simulation', 180),
     ],  # first element: status field identifier; second element: field width
     'decimal_precision': 2,
     'reaction_radius': 6,
@@ -66,6 +77,34 @@ DEFAULT_SETTINGS = {
     'min_node_height': 15,
     'min_comp_width': 350,
     'min_comp_height': 200,
+    # Plugin event handlers that take longer than this (in ms) count as a strike
+    'plugin_handler_budget': 8,
+    # A handler is throttled after this many consecutive strikes, and un-throttled after the same
+    # number of consecutive calls within budget
+    'plugin_strike_limit': 5,
+    # Minimum time (in ms) between two calls to a throttled handler
+    'plugin_throttle_interval': 250,
+    # Maximum number of pending events of a plugin with async_events
+    'plugin_queue_size': 64,
+    # Time (in ms) that an animated layout runs for each time the canvas is idle
+    'layout_time_slice': 20,
+    # Time (in ms) after the last edit in the Antimony panel before its text is applied
+    'antimony_edit_delay': 400,
+    # Default end time and number of time points of a simulation started from the menu
+    'simulation_end_time': 100.0,
+    'simulation_points': 200,
+    # Minimum time (in ms) between two chunks of the time course of a running simulation
+    'simulation_chunk_interval': 100,
+    # Frames per second of the simulation overlay, and the number of time points it plays per
+    # second
+    'overlay_fps': 30,
+    'overlay_points_per_second': 20,
+    # The fraction of the canvas that the items found by a search fill when zoomed to
+    'zoom_to_fill': 0.4,
+    # The maximum number of results of a search from the Find dialog
+    'search_limit': 100,
+    # The width of the thumbnails of the networks on the tabs that are not active
+    'network_thumbnail_width': 96,
 }
 
 
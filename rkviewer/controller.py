@@ -2,26 +2,40 @@
 """
 # pylint: disable=maybe-no-member
 import wx
+from functools import wraps
 import traceback
-from typing import Collection, List, Optional, Set
+from typing import Any, Collection, Dict, List, Optional, Set, Tuple
 import iodine as iod
 import logging
+import numpy as np
 
 from iodine import TColor
 from .utils import gchain, rgba_to_wx_colour
-from .events import DidAddNodeEvent, DidCommitNodePositionsEvent, post_event
+from .antimony import AntimonyDocument, AntimonyError
+from .config import settings
+from .events import (DidAddNodeEvent, DidCommitNodePositionsEvent, SimulationDidProgressEvent,
+                     post_event)
 from .canvas.data import Compartment, Node, Reaction
 from .canvas.geometry import Vec2
 from .canvas.utils import get_nodes_by_ident, get_nodes_by_idx
 from .mvc import IController, IView
+from .profiler import profiler
+from .ratelaw import BoundRateLaw, RateLawCache
+from .simulation import CANCELLED, SimulationModel, SimulationWorker, TimeCourse, build_model
+from .search import SUBSTRING, SearchIndex, SearchMatch
+from .snapshot import NetworkSnapshot, SnapshotCache
+from .stoichiometry import Stoichiometry, StoichiometryCache
 
 
 def iod_setter(controller_iod_setter):
     """Decorator for controller iod_setter methods that catches Errors and auto updates views."""
     # If programmatic is True, then do not trigger a C-Event
+    phase_name = 'controller.' + controller_iod_setter.__name__
 
+    @wraps(controller_iod_setter)
     def ret(self, *args):
-        controller_iod_setter(self, *args)
+        with profiler.phase(phase_name):
+            controller_iod_setter(self, *args)
         '''
         try:
             controller_iod_setter(self, *args)
@@ -36,24 +50,87 @@ def iod_setter(controller_iod_setter):
             self._update_view()
         return True
 
+    ret.is_iod_setter = True  # Used to record the calls of isolated plugins
     return ret
 
 
+# Maps the property names used by the update_*() methods to iodine attribute names. 'position' and
+# 'size' are handled separately since they map to two attributes each.
+NODE_PROPERTIES = {'id_': 'id', 'fill_color': 'fillColor', 'border_color': 'outlineColor',
+                   'border_width': 'outlineThickness'}
+REACTION_PROPERTIES = {'id_': 'id', 'fill_color': 'fillColor', 'thickness': 'thickness',
+                       'ratelaw': 'rateLaw'}
+COMPARTMENT_PROPERTIES = {'id_': 'id', 'fill_color': 'fillColor', 'border_color': 'outlineColor',
+                          'border_width': 'outlineThickness', 'volume': 'volume'}
+
+
+def _to_iod_attributes(props: Dict[str, Any], names: Dict[str, str]) -> Dict[str, Any]:
+    attrs = dict()
+    for name, value in props.items():
+        if name == 'position':
+            attrs['x'], attrs['y'] = value.x, value.y
+        elif name == 'size':
+            attrs['w'], attrs['h'] = value.x, value.y
+        elif name not in names:
+            raise ValueError("Unknown property '{}'".format(name))
+        elif isinstance(value, wx.Colour):
+            attrs[names[name]] = TColor(value.Red(), value.Green(), value.Blue(), value.Alpha())
+        else:
+            attrs[names[name]] = value
+    return attrs
+
+
+def _simulation_done_event(model: SimulationModel,
+                           error: Optional[str]) -> SimulationDidProgressEvent:
+    return SimulationDidProgressEvent(model.net_index, model.node_indices, model.reaction_indices,
+                                      np.empty(0), np.empty((0, len(model.node_indices))),
+                                      np.empty((0, len(model.reaction_indices))), True, error)
+
+
 class Controller(IController):
     """A controller class.
 
     This is not strictly adhering to the MVC architecture, since there is not a separate Model
     interface. Rather, this controller directly interacts with iodine. The model class should
     be implemented if necessary.
+
+    The properties of the nodes, reactions and compartments read from iodine are cached, and each
+    entry is discarded when iodine reports that its item changed (see iodine.addChangeListener()).
+    The get_*() methods still return new objects, which callers are free to modify, although their
+    Vec2 and wx.Colour values are shared and should be treated as immutable.
     """
     view: IView
+    #: The index of the network shown by the view. See activate_network().
+    _net_index: int
+    #: Maps (net index, item index) to the properties of the item, for each kind of item
+    _caches: Dict[str, Dict[Tuple[int, int], Dict[str, Any]]]
 
     def __init__(self, view: IView):
         self.view = view
         iod.reset()
         iod.newNetwork('the one')
-        self.stacklen = 0  # TODO temporary hack to not undo the first newNetwork() operation.
+        # So that undo never removes the first network
+        iod.clearUndoHistory()
         self.group_depth = 0
+        self._net_index = 0
+        self._snapshots = SnapshotCache()
+        self._rate_laws = RateLawCache()
+        self._stoichiometry = StoichiometryCache()
+        self._search = SearchIndex()
+        self._simulation: Optional[SimulationWorker] = None
+        self._caches = {iod.NODE: dict(), iod.REACTION: dict(), iod.COMPARTMENT: dict()}
+        iod.addChangeListener(self._on_model_change)
+
+    def _on_model_change(self, neti: int, kind: str, index: int):
+        if kind != iod.NETWORK:
+            self._caches[kind].pop((neti, index), None)
+        elif neti == -1:
+            for cache in self._caches.values():
+                cache.clear()
+        else:
+            for cache in self._caches.values():
+                for key in [k for k in cache if k[0] == neti]:
+                    del cache[key]
 
     def start_group(self) -> bool:
         self.group_depth += 1
@@ -76,15 +153,29 @@ class Controller(IController):
         self._update_view()
         return True
 
+    def cancel_group(self) -> bool:
+        """End the group, and undo its changes, e.g. if applying them failed half way.
+
+        Only the outermost group can be cancelled, since iodine does not nest groups.
+        """
+        assert self.group_depth == 1
+        self.group_depth = 0
+        iod.cancelGroup()
+        self._update_view()
+        return True
+
     def in_group(self) -> bool:
         return self.group_depth > 0
 
     def undo(self) -> bool:
-        if self.stacklen == 0:
-            return False
+        """Undo the last change to the network shown, or the later creation or closing of a network.
+
+        Each network has its own undo history, but networks are created and closed in all of them;
+        see iodine.undo(). If the network shown is removed, the first network is shown instead.
+        """
         try:
             assert self.group_depth == 0
-            iod.undo()
+            iod.undo(self._net_index)
         except iod.StackEmptyError:
             logging.getLogger('controller').info('Undo stack is empty')
             return False
@@ -92,14 +183,14 @@ class Controller(IController):
             print('Error undoing:', str(e))
             return False
 
-        self.stacklen -= 2  # -2 to correct the +1 in update_view
         self._update_view()
         return True
 
     def redo(self) -> bool:
+        """Redo the last undone change to the network shown. See undo()."""
         try:
             assert self.group_depth == 0
-            iod.redo()
+            iod.redo(self._net_index)
         except iod.StackEmptyError:
             logging.getLogger('controller').info('Redo stack is empty')
             return False
@@ -110,6 +201,80 @@ class Controller(IController):
         self._update_view()
         return True
 
+    def get_active_network(self) -> int:
+        """Return the index of the network shown by the view."""
+        return self._net_index
+
+    def get_list_of_networks(self) -> List[int]:
+        return iod.getListOfNetworks()
+
+    def get_network_id(self, neti: int) -> str:
+        return iod.getNetworkID(neti)
+
+    def activate_network(self, neti: int) -> bool:
+        """Show network neti in the view, in place of the network shown now.
+
+        This is not an undo step. The cached properties of the items of the other networks are
+        discarded, since the view only keeps the items of the network it shows.
+
+        Returns:
+            Whether the network shown changed.
+        """
+        if neti not in iod.networkDict:
+            raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(neti))
+        assert self.group_depth == 0
+        if neti == self._net_index:
+            return False
+        self._set_active_network(neti)
+        self._update_view()
+        return True
+
+    def new_network(self, net_id: str) -> int:
+        """Create an empty network and show it.
+
+        This is a single undo step, undone from any network. See undo().
+
+        Returns:
+            The index of the new network.
+        """
+        assert self.group_depth == 0
+        iod.newNetwork(net_id)
+        self._set_active_network(iod.getNetworkIndex(net_id))
+        self._update_view()
+        return self._net_index
+
+    def close_network(self, neti: int) -> bool:
+        """Delete a network.
+
+        This is a single undo step, undone from any network, which reopens the network as it was
+        closed. Its earlier changes can no longer be undone. See undo().
+
+        If the network is shown, the network next to it is shown instead. The last network is
+        never closed.
+
+        Returns:
+            Whether the network was closed.
+        """
+        assert self.group_depth == 0
+        networks = iod.getListOfNetworks()
+        if neti not in networks or len(networks) == 1:
+            return False
+        iod.deleteNetwork(neti)
+        if neti == self._net_index:
+            position = networks.index(neti)
+            self._set_active_network(networks[position + 1] if position + 1 < len(networks)
+                                     else networks[position - 1])
+        self._update_view()
+        return True
+
+    def _set_active_network(self, neti: int):
+        if neti == self._net_index:
+            return
+        self._net_index = neti
+        for cache in self._caches.values():
+            for key in [k for k in cache if k[0] != neti]:
+                del cache[key]
+
     @iod_setter
     def add_node_g(self, neti: int, node: Node, programmatic: bool = False):
         '''
@@ -201,6 +366,124 @@ class Controller(IController):
     def set_node_border_width(self, neti: int, nodei: int, width: float):
         iod.setNodeOutlineThickness(neti, nodei, width)
 
+    @iod_setter
+    def update_nodes(self, neti: int, updates: Dict[int, Dict[str, Any]]):
+        """Update the properties of many nodes with a single iodine call.
+
+        Args:
+            neti: The network index.
+            updates: Maps node indices to the properties to change. The properties are named
+                     after the arguments of rkplugin.api.update_node(), i.e. id_, fill_color,
+                     border_color, border_width, position and size.
+        """
+        iod.setNodesAttributes(neti, {nodei: _to_iod_attributes(props, NODE_PROPERTIES)
+                                      for nodei, props in updates.items()})
+        if any('position' in props for props in updates.values()):
+            post_event(DidCommitNodePositionsEvent())
+
+    @iod_setter
+    def update_reactions(self, neti: int, updates: Dict[int, Dict[str, Any]]):
+        """Update the properties of many reactions with a single iodine call.
+
+        See update_nodes(). The properties are id_, fill_color, thickness and ratelaw.
+        """
+        iod.setReactionsAttributes(neti, {reai: _to_iod_attributes(props, REACTION_PROPERTIES)
+                                          for reai, props in updates.items()})
+
+    @iod_setter
+    def update_compartments(self, neti: int, updates: Dict[int, Dict[str, Any]]):
+        """Update the properties of many compartments with a single iodine call.
+
+        See update_nodes(). The properties are id_, fill_color, border_color, border_width,
+        volume, position and size.
+        """
+        iod.setCompartmentsAttributes(
+            neti, {compi: _to_iod_attributes(props, COMPARTMENT_PROPERTIES)
+                   for compi, props in updates.items()})
+
+    @iod_setter
+    def update_reaction_handles(self, neti: int, updates: Dict[int, Dict[str, Any]]):
+        """Set the handle positions of many reactions with a single iodine call.
+
+        Args:
+            neti: The network index.
+            updates: Maps reaction indices to dicts with any of the keys 'center' (a Vec2),
+                     'sources' and 'targets' (which map node indices to Vec2).
+        """
+        handles = dict()
+        for reai, props in updates.items():
+            rea_handles = dict()
+            if 'center' in props:
+                rea_handles['center'] = props['center'].as_tuple()
+            for name, key in (('sources', 'src'), ('targets', 'dest')):
+                if name in props:
+                    rea_handles[key] = {nodei: pos.as_tuple()
+                                        for nodei, pos in props[name].items()}
+            handles[reai] = rea_handles
+        iod.setReactionsHandlePositions(neti, handles)
+
+    @iod_setter
+    def load_network(self, neti: int, network: iod.TNetwork):
+        """Replace a network with one built outside of iodine, e.g. read from a file.
+
+        See rkviewer.sbml.read_sbml(). This is a single undo step.
+        """
+        iod.setNetwork(neti, network)
+
+    def apply_antimony(self, document: AntimonyDocument, text: str) -> List[AntimonyError]:
+        """Apply an edited Antimony text to the network of the document.
+
+        See rkviewer.antimony.AntimonyDocument. This is a single undo step if anything changed.
+
+        Returns:
+            The lines of the text that could not be read, as errors.
+        """
+        version = iod.getModelVersion()
+        with profiler.phase('controller.apply_antimony'):
+            errors = document.update(text)
+        if iod.getModelVersion() != version:
+            self._update_view()
+        return errors
+
+    def simulate(self, neti: int, end_time: float, num_points: int,
+                 initial_amounts: Optional[Dict[str, float]] = None,
+                 parameters: Optional[Dict[str, float]] = None):
+        """Start simulating a network on a worker thread, cancelling the running simulation.
+
+        The ODEs are compiled here, and integrated on the worker; see rkviewer.simulation. The time
+        course is posted in chunks on the UI thread, as SimulationDidProgressEvent, followed by an
+        event with done set. Raises rkviewer.simulation.SimulationError if the network cannot be
+        simulated.
+        """
+        self.cancel_simulation()
+        model = build_model(neti)
+
+        # Both are called on the UI thread, after self._simulation is set
+        def on_chunk(chunk: TimeCourse):
+            if not worker.cancelled:
+                post_event(SimulationDidProgressEvent(
+                    neti, model.node_indices, model.reaction_indices, chunk.times, chunk.amounts,
+                    chunk.rates, False, None))
+
+        def on_done(_course: Optional[TimeCourse], error: Optional[str]):
+            if self._simulation is worker:
+                self._simulation = None
+                post_event(_simulation_done_event(model, error))
+
+        worker = SimulationWorker(model, end_time, num_points, initial_amounts, parameters,
+                                  wx.CallAfter, on_chunk, on_done,
+                                  settings['simulation_chunk_interval'] / 1000)
+        self._simulation = worker
+
+    def cancel_simulation(self):
+        """Cancel the running simulation, if any; its last event has done set and an error."""
+        worker = self._simulation
+        if worker is None:
+            return
+        self._simulation = None
+        worker.cancel()
+        post_event(_simulation_done_event(worker.model, CANCELLED))
+
     @iod_setter
     def delete_node(self, neti: int, nodei: int):
         iod.deleteNode(neti, nodei)
@@ -290,18 +573,11 @@ class Controller(IController):
         return iod.getListOfNodeIDs(neti)
 
     def get_list_of_nodes(self, neti: int) -> List[Node]:
-        nodes = list()
-        for id_ in iod.getListOfNodeIDs(neti):
-            nodei = iod.getNodeIndex(neti, id_)
-            nodes.append(self.get_node_by_index(neti, nodei))
-        return nodes
+        return [self.get_node_by_index(neti, nodei) for nodei in iod.getListOfNodeIndices(neti)]
 
     def get_list_of_reactions(self, neti: int) -> List[Reaction]:
-        reactions = list()
-        for id_ in iod.getListOfReactionIDs(neti):
-            reai = iod.getReactionIndex(neti, id_)
-            reactions.append(self.get_reaction_by_index(neti, reai))
-        return reactions
+        return [self.get_reaction_by_index(neti, reai)
+                for reai in iod.getListOfReactionIndices(neti)]
 
     def get_list_of_compartments(self, neti: int) -> List[Compartment]:
         return [self.get_compartment_by_index(neti, compi)
@@ -335,28 +611,45 @@ class Controller(IController):
     def get_reaction_index(self, neti: int, rxn_id: str) -> int:
         return iod.getReactionIndex(neti, rxn_id)
 
-    def get_node_by_index(self, neti: int, nodei: int) -> Node:
-        id_ = iod.getNodeID(neti, nodei)
+    def _cached(self, kind: str, neti: int, index: int, read) -> Dict[str, Any]:
+        """Return the cached properties of the given item, reading them with read() if needed."""
+        cache = self._caches[kind]
+        props = cache.get((neti, index))
+        if props is None:
+            props = read(neti, index)
+            cache[(neti, index)] = props
+        return props
+
+    def _read_node(self, neti: int, nodei: int) -> Dict[str, Any]:
         x, y, w, h = iod.getNodeCoordinateAndSize(neti, nodei)
         fill_alpha = iod.getNodeFillColorAlpha(neti, nodei)
         fill_rgb = iod.getNodeFillColorRGB(neti, nodei)
-        fill_color = rgba_to_wx_colour(fill_rgb, fill_alpha)
         border_alpha = iod.getNodeOutlineColorAlpha(neti, nodei)
         border_rgb = iod.getNodeOutlineColorRGB(neti, nodei)
-        border_color = rgba_to_wx_colour(border_rgb, border_alpha)
-        return Node(
-            id_,
-            index=nodei,
+        return dict(
+            id_=iod.getNodeID(neti, nodei),
             pos=Vec2(x, y),
             size=Vec2(w, h),
-            fill_color=fill_color,
-            border_color=border_color,
+            fill_color=rgba_to_wx_colour(fill_rgb, fill_alpha),
+            border_color=rgba_to_wx_colour(border_rgb, border_alpha),
             border_width=iod.getNodeOutlineThickness(neti, nodei),
             comp_idx=iod.getCompartmentOfNode(neti, nodei),
         )
 
-    def get_reaction_by_index(self, neti: int, reai: int) -> Reaction:
-        id_ = iod.getReactionID(neti, reai)
+    def get_node_by_index(self, neti: int, nodei: int) -> Node:
+        props = self._cached(iod.NODE, neti, nodei, self._read_node)
+        return Node(
+            props['id_'],
+            index=nodei,
+            pos=props['pos'],
+            size=props['size'],
+            fill_color=props['fill_color'],
+            border_color=props['border_color'],
+            border_width=props['border_width'],
+            comp_idx=props['comp_idx'],
+        )
+
+    def _read_reaction(self, neti: int, reai: int) -> Dict[str, Any]:
         sindices = iod.getListOfReactionSrcNodes(neti, reai)
         tindices = iod.getListOfReactionDestNodes(neti, reai)
         fill_rgb = iod.getReactionFillColorRGB(neti, reai)
@@ -368,27 +661,71 @@ class Controller(IController):
         items += [self.get_src_node_handle(neti, reai, i) for i in sindices]
         items += [self.get_dest_node_handle(neti, reai, i) for i in tindices]
 
-        return Reaction(id_,
-                        sources=sindices,
-                        targets=tindices,
-                        fill_color=rgba_to_wx_colour(fill_rgb, fill_alpha),
-                        line_thickness=iod.getReactionLineThickness(neti, reai),
+        return dict(
+            id_=iod.getReactionID(neti, reai),
+            sources=sindices,
+            targets=tindices,
+            fill_color=rgba_to_wx_colour(fill_rgb, fill_alpha),
+            line_thickness=iod.getReactionLineThickness(neti, reai),
+            rate_law=iod.getReactionRateLaw(neti, reai),
+            handle_positions=items,
+        )
+
+    def get_reaction_by_index(self, neti: int, reai: int) -> Reaction:
+        props = self._cached(iod.REACTION, neti, reai, self._read_reaction)
+        return Reaction(props['id_'],
+                        sources=list(props['sources']),
+                        targets=list(props['targets']),
+                        fill_color=props['fill_color'],
+                        line_thickness=props['line_thickness'],
                         index=reai,
-                        rate_law=iod.getReactionRateLaw(neti, reai),
-                        handle_positions=items
+                        rate_law=props['rate_law'],
+                        handle_positions=list(props['handle_positions'])
                         )
 
+    def get_snapshot(self, neti: int) -> NetworkSnapshot:
+        """Return a read-only snapshot of the network, which is reused until the model changes."""
+        return self._snapshots.get(neti)
+
+    def get_rate_law(self, neti: int, reai: int) -> BoundRateLaw:
+        """Return the compiled rate law of a reaction, which is reused until the reaction or the
+        IDs of the nodes change. Raises rkviewer.ratelaw.RateLawError if it is not valid.
+        """
+        return self._rate_laws.get(neti, reai)
+
+    def get_stoichiometry(self, neti: int) -> Stoichiometry:
+        """Return the sparse stoichiometry of the network, which is updated as its reactions
+        change and reused until the network changes."""
+        return self._stoichiometry.get(neti)
+
+    def search(self, neti: int, query: str, mode: str = SUBSTRING,
+               kinds: Optional[Collection[str]] = None, limit: int = 50) -> List[SearchMatch]:
+        """Return the items of the network whose IDs, or the symbols of whose rate laws, match
+        the query. See rkviewer.search.SearchIndex.search()."""
+        return self._search.search(neti, query, mode, kinds, limit)
+
+    def _read_compartment(self, neti: int, compi: int) -> Dict[str, Any]:
+        return dict(
+            id_=iod.getCompartmentID(neti, compi),
+            nodes=iod.getNodesInCompartment(neti, compi),
+            volume=iod.getCompartmentVolume(neti, compi),
+            position=Vec2(iod.getCompartmentPosition(neti, compi)),
+            size=Vec2(iod.getCompartmentSize(neti, compi)),
+            fill=self.tcolor_to_wx(iod.getCompartmentFillColor(neti, compi)),
+            border=self.tcolor_to_wx(iod.getCompartmentOutlineColor(neti, compi)),
+            border_width=iod.getCompartmentOutlineThickness(neti, compi),
+        )
+
     def get_compartment_by_index(self, neti: int, compi: int) -> Compartment:
-        id_ = iod.getCompartmentID(neti, compi)
-
-        return Compartment(id_,
-                           nodes=iod.getNodesInCompartment(neti, compi),
-                           volume=iod.getCompartmentVolume(neti, compi),
-                           position=Vec2(iod.getCompartmentPosition(neti, compi)),
-                           size=Vec2(iod.getCompartmentSize(neti, compi)),
-                           fill=self.tcolor_to_wx(iod.getCompartmentFillColor(neti, compi)),
-                           border=self.tcolor_to_wx(iod.getCompartmentOutlineColor(neti, compi)),
-                           border_width=iod.getCompartmentOutlineThickness(neti, compi),
+        props = self._cached(iod.COMPARTMENT, neti, compi, self._read_compartment)
+        return Compartment(props['id_'],
+                           nodes=list(props['nodes']),
+                           volume=props['volume'],
+                           position=props['position'],
+                           size=props['size'],
+                           fill=props['fill'],
+                           border=props['border'],
+                           border_width=props['border_width'],
                            index=compi,
                            )
 
@@ -396,8 +733,13 @@ class Controller(IController):
 
     def _update_view(self):
         """tell the view to update by re-populating its list of nodes."""
-
-        self.stacklen += 1  # TODO remove once fixed
-        neti = 0
-        self.view.update_all(self.get_list_of_nodes(neti), self.get_list_of_reactions(neti),
-                             self.get_list_of_compartments(neti))
+        if self._net_index not in iod.networkDict and len(iod.networkDict) != 0:
+            # The network was removed, e.g. its creation was undone
+            self._set_active_network(min(iod.networkDict))
+        neti = self._net_index
+        with profiler.phase('controller.read_model'):
+            nodes = self.get_list_of_nodes(neti)
+            reactions = self.get_list_of_reactions(neti)
+            compartments = self.get_list_of_compartments(neti)
+        with profiler.phase('view.update_all'):
+            self.view.update_all(neti, nodes, reactions, compartments)
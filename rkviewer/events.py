@@ -8,9 +8,12 @@ from __future__ import annotations
 from collections import defaultdict
 from dataclasses import dataclass, fields, is_dataclass
 from typing import (
+    Any,
     Callable,
     DefaultDict,
     Dict,
+    Hashable,
+    Iterable,
     List,
     Optional,
     Set,
@@ -18,6 +21,7 @@ from typing import (
     Type, Union,
 )
 
+import numpy as np
 import wx
 
 from rkviewer.canvas.data import Compartment, Node, Reaction
@@ -30,6 +34,15 @@ class CanvasEvent:
 
         return tuple(getattr(self, f.name) for f in fields(self))
 
+    def routing_keys(self) -> Iterable[Hashable]:
+        """Return the keys of the objects this event concerns, for keyed handlers.
+
+        Handlers bound with keys (see bind_handler) are only called for events whose routing keys
+        include at least one of their keys. By default an event has no routing keys, so that only
+        the handlers bound without keys are called.
+        """
+        return ()
+
 
 @dataclass
 class SelectionDidUpdateEvent(CanvasEvent):
@@ -71,10 +84,21 @@ class DidMoveNodesEvent(CanvasEvent):
         nodes: The nodes that were moved.
         offset: The position offset. If all nodes were moved by the same offset, then a single Vec2
                 is given; otherwise, a list of offsets are given, with each offset matching a node.
+        dragged: Whether the nodes were moved by dragging them.
+        preview: Whether the move is only shown, and is never committed as is; see
+                 Canvas.PreviewNodePositions(). This is not passed to plugins.
     """
     nodes: List[Node]
     offset: Union[Vec2, List[Vec2]]
     dragged: bool
+    preview: bool = False
+
+    def to_tuple(self):
+        return (self.nodes, self.offset, self.dragged)
+
+    def routing_keys(self):
+        """The indices of the moved nodes."""
+        return (n.index for n in self.nodes)
 
 
 @dataclass
@@ -127,21 +151,56 @@ class DidPaintCanvasEvent(CanvasEvent):
     gc: wx.GraphicsContext
 
 
+@dataclass
+class SimulationDidProgressEvent(CanvasEvent):
+    """Called with each chunk of the time course of a running simulation, and once it is over.
+
+    See rkviewer.simulation. The chunks of a simulation arrive in order, and add up to its whole
+    time course.
+
+    Attributes:
+        net_index: The index of the simulated network.
+        node_indices: The index of the node of each species, in the order of the columns of
+                      amounts.
+        reaction_indices: The index of each reaction, in the order of the columns of rates.
+        times: The time points of the chunk, of shape (k,).
+        amounts: The amounts of the species at those time points, of shape (k, len(node_indices)).
+        rates: The rates of the reactions at those time points, of shape
+               (k, len(reaction_indices)).
+        done: Whether the simulation is over, in which case times, amounts and rates are empty.
+        error: If the simulation failed, why; otherwise None.
+    """
+    net_index: int
+    node_indices: Tuple[int, ...]
+    reaction_indices: Tuple[int, ...]
+    times: np.ndarray
+    amounts: np.ndarray
+    rates: np.ndarray
+    done: bool
+    error: Optional[str]
+
+
 class HandlerNode:
     next_: Optional[HandlerNode]
     prev: Optional[HandlerNode]
     handler: EventCallback
+    id_: int  #: The ID returned by bind_handler(); increases in the order handlers are bound.
 
-    def __init__(self, handler: EventCallback):
+    def __init__(self, handler: EventCallback, id_: int):
         self.handler = handler
+        self.id_ = id_
         self.next_ = None
+        self.prev = None
 
 
 EventCallback = Callable[[CanvasEvent], None]
-# Maps CanvasElement to a dict that maps events to handler nodes
-handler_map: Dict[int, Tuple[HandlerChain, HandlerNode]] = dict()
+# Maps handler ID to the (chain, node) pairs of that handler. A keyed handler has a node in the
+# chain of each of its keys.
+handler_map: Dict[int, List[Tuple[HandlerChain, HandlerNode]]] = dict()
 # Maps event to a chain of handlers
 event_chains: DefaultDict[Type[CanvasEvent], HandlerChain] = defaultdict(lambda: HandlerChain())
+# Maps event to a dict that maps a routing key to the chain of handlers bound with that key
+keyed_chains: DefaultDict[Type[CanvasEvent], Dict[Any, HandlerChain]] = defaultdict(dict)
 
 handler_id = 0
 
@@ -149,11 +208,14 @@ handler_id = 0
 class HandlerChain:
     head: Optional[HandlerNode]
     tail: Optional[HandlerNode]
+    #: For the chain of a key, the dict containing it and the key, so it can be dropped once empty.
+    owner: Optional[Tuple[Dict[Any, HandlerChain], Any]]
 
-    def __init__(self):
+    def __init__(self, owner: Optional[Tuple[Dict[Any, HandlerChain], Any]] = None):
         self.head = None
         self.tail = None
         self.it_cur = None
+        self.owner = owner
 
     def remove(self, node: HandlerNode):
         if node.prev is not None:
@@ -178,8 +240,18 @@ class HandlerChain:
         self.it_cur = self.it_cur.next_
         return ret
 
-    def append(self, handler: EventCallback) -> HandlerNode:
-        node = HandlerNode(handler)
+    def empty(self) -> bool:
+        return self.head is None
+
+    def nodes(self):
+        """Iterate over the handler nodes. Unlike __iter__, this may be nested."""
+        cur = self.head
+        while cur is not None:
+            yield cur
+            cur = cur.next_
+
+    def append(self, handler: EventCallback, id_: int) -> HandlerNode:
+        node = HandlerNode(handler, id_)
         if self.head is None:
             assert self.tail is None
             self.head = self.tail = node
@@ -192,22 +264,64 @@ class HandlerChain:
         return node
 
 
-def bind_handler(evt_cls: Type[CanvasEvent], callback: EventCallback) -> int:
+def bind_handler(evt_cls: Type[CanvasEvent], callback: EventCallback,
+                 keys: Optional[Iterable[Hashable]] = None) -> int:
+    """Bind a handler to the given event class, and return its ID for unbind_handler().
+
+    Args:
+        evt_cls: The event class.
+        callback: The handler.
+        keys: If given, the handler is only called for the events whose routing_keys() include at
+            least one of these keys (e.g. the indices of the nodes whose moves are of interest).
+            The handler is called once per event, even if several of its keys match. Dispatching
+            to keyed handlers takes time proportional to the number of handlers notified, rather
+            than the number of handlers bound.
+    """
     global handler_id
     ret = handler_id
-    chain = event_chains[evt_cls]
-    hnode = chain.append(callback)
-    handler_map[ret] = (chain, hnode)
+    if keys is None:
+        chain = event_chains[evt_cls]
+        handler_map[ret] = [(chain, chain.append(callback, ret))]
+    else:
+        key_chains = keyed_chains[evt_cls]
+        pairs = list()
+        for key in set(keys):
+            if key not in key_chains:
+                key_chains[key] = HandlerChain(owner=(key_chains, key))
+            chain = key_chains[key]
+            pairs.append((chain, chain.append(callback, ret)))
+        handler_map[ret] = pairs
     handler_id += 1
     return ret
 
 
 def unbind_handler(handler_id: int):
-    chain, hnode = handler_map[handler_id]
-    chain.remove(hnode)
+    for chain, hnode in handler_map[handler_id]:
+        chain.remove(hnode)
+        # Drop the chain of a key that no longer has any handler
+        if chain.owner is not None and chain.empty():
+            key_chains, key = chain.owner
+            del key_chains[key]
     del handler_map[handler_id]
 
 
 def post_event(evt: CanvasEvent):
+    """Call the handlers bound to the type of the event.
+
+    The handlers bound without keys are called first, then the keyed handlers matching the
+    event's routing keys; both in the order they were bound.
+    """
     for callback in iter(event_chains[type(evt)]):
         callback(evt)
+
+    key_chains = keyed_chains.get(type(evt))
+    if not key_chains:
+        return
+    matched: Dict[int, EventCallback] = dict()
+    for key in evt.routing_keys():
+        chain = key_chains.get(key)
+        if chain is not None:
+            for hnode in chain.nodes():
+                matched[hnode.id_] = hnode.handler
+    for id_ in sorted(matched):
+        matched[id_](evt)
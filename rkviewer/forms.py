@@ -10,6 +10,7 @@ from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 from .config import theme, settings
 from .events import DidMoveNodesEvent, post_event
 from .mvc import IController
+from .ratelaw import RateLawError, compile_rate_law
 from .utils import no_rzeros, on_msw, resource_path
 from .canvas.canvas import Canvas, Node
 from .canvas.data import Compartment, Reaction
@@ -68,14 +69,13 @@ class EditPanelForm(ScrolledPanel):
         FloatCallback: Callback type for when a float input is changed.
         canvas: The associated canvas.
         controller: The associated controller.
-        net_index: The current network index. For now it is 0 since there is only one tab.
+        net_index: The index of the network shown on the canvas.
     """
     ColorCallback = Callable[[wx.Colour], None]
     FloatCallback = Callable[[float], None]
 
     canvas: Canvas
     controller: IController
-    net_index: int
     labels: Dict[str, wx.Window]
     badges: Dict[str, wx.Window]
     _label_font: wx.Font  #: font for the form input label.
@@ -88,7 +88,6 @@ class EditPanelForm(ScrolledPanel):
         super().__init__(parent, style=wx.VSCROLL)
         self.canvas = canvas
         self.controller = controller
-        self.net_index = 0
         self.labels = dict()
         self.badges = dict()
         self._label_font = wx.Font(wx.FontInfo().Bold())
@@ -101,6 +100,10 @@ class EditPanelForm(ScrolledPanel):
         self._self_changes = False
         self._selected_idx = set()
 
+    @property
+    def net_index(self) -> int:
+        return self.canvas.net_index
+
     @property
     def selected_idx(self):
         return self._selected_idx
@@ -849,6 +852,13 @@ class ReactionForm(EditPanelForm):
         [reai] = self._selected_idx
         self._self_changes = True
         self.controller.set_reaction_ratelaw(self.net_index, reai, ratelaw)
+        # The rate law is saved even if it is not valid, so that it can be typed in several steps
+        try:
+            if ratelaw.strip() != '':
+                compile_rate_law(ratelaw)
+            self._SetValidationState(True, self.ratelaw_ctrl.GetId())
+        except RateLawError as e:
+            self._SetValidationState(False, self.ratelaw_ctrl.GetId(), str(e))
 
     def UpdateReactions(self, reactions: List[Reaction]):
         """Function called after the list of nodes have been updated."""
@@ -0,0 +1,17 @@
+"""Automatic layout of networks.
+
+The layout algorithms work on a NetworkSnapshot and return plain NumPy arrays, so that they do not
+depend on the GUI and can run in an isolated plugin process or in a benchmark. The results are
+applied to the model with rkplugin.api.apply_layout(), as a single undo step, or shown step by
+step on the canvas with rkplugin.api.animate_layout().
+
+Modules:
+    graph: The bipartite graph of nodes and reactions that the algorithms work on, and the default
+           placement of the reaction handles.
+    force: Force-directed layout.
+    layered: Layered (Sugiyama-style) layout, for pathways.
+    routing: Placement of the reaction handles so that the curves overlap less, for the nodes
+             where they are.
+    animated: Applying a layout to the canvas, at once or animated over its idle time. This is the
+              only module that depends on wx.
+"""
@@ -0,0 +1,172 @@
+"""Apply layouts to the canvas, either at once or animated over the idle time of the canvas.
+
+Unlike the rest of rkviewer.layout, this module works with the GUI, and so depends on wx.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+from ..canvas.geometry import Vec2
+from ..events import DidMoveNodesEvent, bind_handler, unbind_handler
+from ..snapshot import NetworkSnapshot
+from .force import ForceLayout
+from .graph import ReactionHandles, default_handles
+
+
+def commit_layout(controller, snapshot: NetworkSnapshot, node_positions: Optional[np.ndarray],
+                  handles: Optional[ReactionHandles] = None):
+    """Move the nodes of a network to the positions computed by a layout, as a single undo step.
+
+    Args:
+        controller: The controller.
+        snapshot: The snapshot that the layout was computed from. The nodes and reactions of the
+                  network must not have changed since.
+        node_positions: The new positions of the top-left corners of the nodes, in the order of the
+                        rows of the snapshot, or None to leave the nodes where they are.
+        handles: If specified, the new positions of the reaction handles.
+    """
+    net_index = snapshot.net_index
+    node_indices = snapshot.node_indices.tolist()
+    controller.start_group()
+    try:
+        if node_positions is not None:
+            controller.update_nodes(net_index, {
+                nodei: {'position': Vec2(x, y)}
+                for nodei, (x, y) in zip(node_indices, node_positions.tolist())})
+        if handles is None:
+            return
+        reaction_indices = snapshot.reaction_indices.tolist()
+        handle_updates = {reai: {'center': Vec2(x, y), 'sources': dict(), 'targets': dict()}
+                          for reai, (x, y) in zip(reaction_indices, handles.centers.tolist())}
+        for name, edges, positions in (('sources', snapshot.reactant_edges, handles.reactants),
+                                       ('targets', snapshot.product_edges, handles.products)):
+            for (row, node_row), (x, y) in zip(edges.tolist(), positions.tolist()):
+                handle_updates[reaction_indices[row]][name][node_indices[node_row]] = Vec2(x, y)
+        controller.update_reaction_handles(net_index, handle_updates)
+    finally:
+        controller.end_group()
+
+
+def _same_structure(a: NetworkSnapshot, b: NetworkSnapshot) -> bool:
+    """Return whether two snapshots have the same nodes, reactions and compartments."""
+    if a is b:
+        return True
+    return (a.net_index == b.net_index
+            and np.array_equal(a.node_indices, b.node_indices)
+            and np.array_equal(a.node_compartments, b.node_compartments)
+            and np.array_equal(a.reaction_indices, b.reaction_indices)
+            and np.array_equal(a.reactant_edges, b.reactant_edges)
+            and np.array_equal(a.product_edges, b.product_edges)
+            and np.array_equal(a.compartment_positions, b.compartment_positions)
+            and np.array_equal(a.compartment_sizes, b.compartment_sizes))
+
+
+class AnimatedLayout:
+    """Runs a force-directed layout over the idle time of the canvas, showing its progress.
+
+    Each time the canvas is idle, the layout runs for a time slice, and the canvas shows the nodes
+    at their intermediate positions through Canvas.PreviewNodePositions(), which does not touch the
+    model. When the layout is done, the result is committed as a single undo step, with the
+    reaction handles reset.
+
+    The nodes that the user drags while the layout runs are pinned where they are dropped. If the
+    nodes, reactions or compartments of the network change in the meantime, the layout is
+    cancelled, and the nodes go back to their positions in the model.
+
+    Args:
+        canvas: The canvas.
+        controller: The controller.
+        layout: The layout to run, built from the current snapshot of the network on the canvas.
+        time_slice: The time to run the layout for each time the canvas is idle, in seconds.
+
+    Attributes:
+        running: Whether the layout is still running, i.e. was neither committed nor cancelled.
+    """
+
+    def __init__(self, canvas, controller, layout: ForceLayout, time_slice: float):
+        self.canvas = canvas
+        self.controller = controller
+        self.layout = layout
+        self.time_slice = time_slice
+        self.running = False
+        self._snapshot = layout.graph.snapshot
+        self._rows = {nodei: row for row, nodei in enumerate(self._snapshot.node_indices.tolist())}
+        # Translation of the free nodes from the layout to the canvas, fixed once a node is pinned
+        # so that the pinned nodes stay where they were dropped
+        self._offset: Optional[np.ndarray] = None
+        self._handler_id: Optional[int] = None
+
+    def start(self):
+        """Start running the layout when the canvas is idle."""
+        self.running = True
+        self._handler_id = bind_handler(DidMoveNodesEvent, self._nodes_moved)
+        self.canvas.AddIdleTask(self._tick)
+
+    def cancel(self):
+        """Stop the layout without committing it, and show the nodes where they are in the model."""
+        if not self.running:
+            return
+        self._stop()
+        snapshot = self.controller.get_snapshot(self._snapshot.net_index)
+        if self.canvas.net_index == snapshot.net_index:
+            self.canvas.PreviewNodePositions({
+                nodei: Vec2(x, y) for nodei, (x, y) in zip(snapshot.node_indices.tolist(),
+                                                           snapshot.node_positions.tolist())})
+
+    def _stop(self):
+        self.running = False
+        unbind_handler(self._handler_id)
+        self._handler_id = None
+
+    def _node_positions(self) -> np.ndarray:
+        graph = self.layout.graph
+        offset = self._offset if self._offset is not None else \
+            graph.origin_offset(self.layout.centers)
+        return graph.node_positions(self.layout.centers, offset=offset)
+
+    def _nodes_moved(self, evt):
+        """Pin the nodes dragged by the user."""
+        if not evt.dragged:
+            return
+        graph = self.layout.graph
+        if self._offset is None:
+            self._offset = graph.origin_offset(self.layout.centers)
+        nodes = [n for n in evt.nodes if n.index in self._rows]
+        if len(nodes) == 0:
+            return
+        rows = [self._rows[n.index] for n in nodes]
+        centers = np.array([(n.position + n.size / 2).as_tuple() for n in nodes]).reshape(-1, 2)
+        # The centers of the pinned nodes are given in the coordinates of the layout
+        centers -= np.where(graph.free[rows, None], self._offset, 0)
+        self.layout.pin(rows, centers)
+
+    def _tick(self) -> bool:
+        """Run the layout for a time slice, and return whether to run it again."""
+        if not self.running:
+            return False
+        snapshot = self.controller.get_snapshot(self._snapshot.net_index)
+        if self.canvas.net_index != self._snapshot.net_index or \
+                not _same_structure(snapshot, self._snapshot):
+            # The canvas was already reset from the model by the change
+            self._stop()
+            return False
+        if self.layout.done:
+            if self.canvas.dragged_element is not None:
+                # Committing would reset the canvas under the user's drag; wait until it ends
+                return True
+            self._stop()
+            positions = self._node_positions()
+            handles = default_handles(self._snapshot, positions + self._snapshot.node_sizes / 2)
+            commit_layout(self.controller, self._snapshot, positions, handles)
+            return False
+
+        self.layout.run_for(self.time_slice)
+        positions = self._node_positions()
+        movable = self.layout.movable
+        preview: Dict[int, Vec2] = {
+            nodei: Vec2(x, y)
+            for row, (nodei, (x, y)) in enumerate(zip(self._snapshot.node_indices.tolist(),
+                                                      positions.tolist()))
+            if movable[row]}
+        self.canvas.PreviewNodePositions(preview)
+        return True
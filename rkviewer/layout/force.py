@@ -0,0 +1,245 @@
+"""Force-directed layout.
+
+This is the Fruchterman-Reingold algorithm, vectorized with NumPy. Linked vertices attract each
+other with a force of d^2/k, and all vertices repel each other with a force of k^2/d, where d is
+their distance and k the ideal edge length. A pull towards the middle of the layout, proportional
+to the distance from it, keeps the parts of the network that are not linked from drifting apart;
+with the default strength, a layout of V vertices is about 2k*sqrt(V) wide.
+
+Computing the repulsion between all pairs of vertices is O(V^2), so it is approximated as in the
+Barnes-Hut algorithm, on a hierarchy of grids (i.e. a complete quadtree) over the layout. At each
+level, a vertex is repelled by the cells that are not adjacent to its own cell, but that are
+within the neighborhood of its parent cell (the cells further away having been handled at the
+levels above), each cell acting as a single vertex at its center of mass. Only the vertices in the
+same or adjacent finest cells, which are found with a k-d tree, repel each other directly. An
+iteration is then O(V log V).
+
+Each iteration moves the vertices by at most the current temperature, which decreases linearly to
+zero, and then clamps the nodes in compartments to their bounds (see LayoutGraph).
+"""
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .graph import LayoutGraph, sum_rows
+
+
+MAX_LEVELS = 10  #: The maximum depth of the grid hierarchy
+CHUNK_SIZE = 4096  #: The number of vertices whose interactions with cells are computed at once
+
+
+def _interaction_offsets() -> np.ndarray:
+    """Return the offsets of the cells that a vertex interacts with, relative to its own cell.
+
+    These are the cells within the neighborhood of the parent cell that are not adjacent to the
+    vertex's cell; they depend on the position of the cell in its parent, which is given by the
+    parities of its coordinates. The result is indexed by (x parity, y parity), and has 27 (x, y)
+    offsets for each.
+    """
+    offsets = np.empty((2, 2, 27, 2), dtype=np.int64)
+    for parity_x in range(2):
+        for parity_y in range(2):
+            offsets[parity_x, parity_y] = [
+                (x - parity_x, y - parity_y) for x in range(-2, 4) for y in range(-2, 4)
+                if max(abs(x - parity_x), abs(y - parity_y)) >= 2]
+    return offsets
+
+
+_OFFSETS = _interaction_offsets()
+
+
+def _cell_repulsion(centers: np.ndarray, cells: np.ndarray, padded_side: int,
+                    masses: np.ndarray, mass_x: np.ndarray, mass_y: np.ndarray, k2: float,
+                    min_dist2: float) -> np.ndarray:
+    """Return the repulsion on the vertices by the cells in their interaction lists.
+
+    The masses and centers of mass of the cells are given as a grid padded with two empty cells on
+    each side, so that the offsets never go out of the grid.
+    """
+    offsets = _OFFSETS[cells[:, 0] % 2, cells[:, 1] % 2]
+    other_ids = ((cells[:, 0, None] + 2 + offsets[:, :, 0]) * padded_side
+                 + cells[:, 1, None] + 2 + offsets[:, :, 1])
+    # The x and y coordinates are handled separately, since NumPy is slow to reduce arrays along a
+    # short last axis
+    delta_x = centers[:, 0, None] - mass_x[other_ids]
+    delta_y = centers[:, 1, None] - mass_y[other_ids]
+    dist2 = np.maximum(delta_x * delta_x + delta_y * delta_y, min_dist2)
+    weights = masses[other_ids] * k2 / dist2
+    return np.stack([(delta_x * weights).sum(axis=1), (delta_y * weights).sum(axis=1)], axis=1)
+
+
+def repulsion(centers: np.ndarray, k: float) -> np.ndarray:
+    """Return the approximate repulsion on each vertex, with an ideal edge length of k."""
+    forces = np.zeros_like(centers)
+    num_vertices = len(centers)
+    if num_vertices < 2:
+        return forces
+    origin = centers.min(axis=0)
+    extent = max(np.ptp(centers, axis=0).max(), 2 * k)
+    # The finest cells are at most k wide
+    levels = min(int(np.ceil(np.log2(extent / k))), MAX_LEVELS)
+    min_dist2 = 1e-6 * k * k
+
+    # The vertices in the same or adjacent finest cells repel each other directly
+    side = 2 ** levels
+    cells = np.clip(((centers - origin) * (side / extent)).astype(np.int64), 0, side - 1)
+    pairs = cKDTree(centers).query_pairs(2 * np.sqrt(2) * extent / side, output_type='ndarray')
+    if len(pairs) != 0:
+        pairs = pairs[np.abs(cells[pairs[:, 0]] - cells[pairs[:, 1]]).max(axis=1) <= 1]
+        delta = centers[pairs[:, 0]] - centers[pairs[:, 1]]
+        dist2 = np.maximum(np.einsum('ij,ij->i', delta, delta), min_dist2)
+        # Magnitude k^2/d along the unit vector delta/d
+        pair_forces = delta * (k * k / dist2)[:, None]
+        forces += sum_rows(pairs[:, 0], pair_forces, num_vertices)
+        forces -= sum_rows(pairs[:, 1], pair_forces, num_vertices)
+
+    for level in range(1, levels + 1):
+        side = 2 ** level
+        padded_side = side + 4
+        cells = np.clip(((centers - origin) * (side / extent)).astype(np.int64), 0, side - 1)
+        cell_ids = (cells[:, 0] + 2) * padded_side + cells[:, 1] + 2
+        masses = np.bincount(cell_ids, minlength=padded_side * padded_side)
+        mass_x, mass_y = (sum_rows(cell_ids, centers, padded_side * padded_side)
+                          / np.maximum(masses, 1)[:, None]).T.copy()
+        # In chunks, to bound the size of the temporary arrays
+        for begin in range(0, num_vertices, CHUNK_SIZE):
+            chunk = slice(begin, begin + CHUNK_SIZE)
+            forces[chunk] += _cell_repulsion(centers[chunk], cells[chunk], padded_side, masses,
+                                             mass_x, mass_y, k * k, min_dist2)
+    return forces
+
+
+class ForceLayout:
+    """The force-directed layout of a graph, computed one iteration at a time.
+
+    Args:
+        graph: The graph to lay out.
+        iterations: The number of iterations to run.
+        ideal_length: The ideal length k of an edge, i.e. between a node and a reaction centroid.
+                      Defaults to 1.5 times the average diagonal of the nodes, reduced if needed
+                      for the layout to fit in the canvas.
+        gravity: The strength of the pull towards the middle of the layout.
+        pinned: Rows of the nodes that must not move.
+        seed: Seed of the random jitter added to the initial positions.
+
+    Attributes:
+        centers: The current centers of the vertices.
+        iteration: The number of iterations run so far.
+    """
+
+    def __init__(self, graph: LayoutGraph, iterations: int = 100,
+                 ideal_length: Optional[float] = None, gravity: float = 1,
+                 pinned: Iterable[int] = (), seed: Optional[int] = 0):
+        self.graph = graph
+        self.iterations = iterations
+        self.gravity = gravity
+        num_vertices = graph.num_vertices
+        if ideal_length is None:
+            node_sizes = graph.sizes[:graph.num_nodes]
+            ideal_length = 1.5 * np.hypot(node_sizes[:, 0], node_sizes[:, 1]).mean() \
+                if len(node_sizes) != 0 else 1
+            ideal_length = min(ideal_length,
+                               np.sqrt(np.prod(graph.bounds) / max(num_vertices, 1)) / 2)
+        self.k = ideal_length
+        self.movable = np.ones(num_vertices, dtype=bool)
+        self.movable[list(pinned)] = False
+
+        rng = np.random.default_rng(seed)
+        self.centers = graph.initial_centers()
+        extent = np.ptp(self.centers, axis=0).max() if num_vertices != 0 else 0
+        spread = self.k * np.sqrt(num_vertices)
+        if extent < spread / 10:
+            # Everything is (nearly) on top of each other, e.g. in a network that was just
+            # imported; start from a random placement instead
+            middle = self.centers[self.movable].mean(axis=0) if self.movable.any() else 0
+            start = middle + rng.uniform(-spread / 2, spread / 2, self.centers.shape)
+            self.centers[self.movable] = start[self.movable]
+            extent = spread
+        # Jitter, so that no two vertices are exactly on top of each other
+        self.centers[self.movable] += rng.uniform(-self.k / 100, self.k / 100,
+                                                  (self.movable.sum(), 2))
+        graph.clamp(self.centers)
+        self.initial_temperature = max(extent, spread) / 10
+        self.iteration = 0
+
+    @property
+    def done(self) -> bool:
+        return self.iteration >= self.iterations
+
+    @property
+    def temperature(self) -> float:
+        return self.initial_temperature * (1 - self.iteration / self.iterations)
+
+    def forces(self) -> np.ndarray:
+        """Return the sum of the forces on each vertex, at the current positions."""
+        centers = self.centers
+        num_vertices = len(centers)
+        k = self.k
+        forces = np.zeros_like(centers)
+
+        forces += repulsion(centers, k)
+
+        edges = self.graph.edges
+        if len(edges) != 0:
+            delta = centers[edges[:, 0]] - centers[edges[:, 1]]
+            # Magnitude d^2/k along the unit vector delta/d
+            attraction = delta * (np.hypot(delta[:, 0], delta[:, 1]) / k)[:, None]
+            forces -= sum_rows(edges[:, 0], attraction, num_vertices)
+            forces += sum_rows(edges[:, 1], attraction, num_vertices)
+
+        forces += (centers.mean(axis=0) - centers) * self.gravity
+        return forces
+
+    def step(self) -> bool:
+        """Run one iteration, and return whether there are more to run."""
+        if self.done:
+            return False
+        forces = self.forces()
+        length = np.maximum(np.hypot(forces[:, 0], forces[:, 1]), 1e-9)
+        moves = forces * (np.minimum(length, self.temperature) / length)[:, None]
+        # Only the movable vertices are clamped, so that a node pinned where the user dropped it
+        # stays there
+        movable = self.movable
+        graph = self.graph
+        self.centers[movable] = np.clip(self.centers[movable] + moves[movable],
+                                        graph.lower[movable], graph.upper[movable])
+        self.iteration += 1
+        return not self.done
+
+    def run_for(self, seconds: float) -> bool:
+        """Run iterations for about the given time, and return whether there are more to run.
+
+        At least one iteration is run, so that the layout always progresses.
+        """
+        deadline = time.perf_counter() + seconds
+        while self.step():
+            if time.perf_counter() >= deadline:
+                return True
+        return False
+
+    def run(self) -> np.ndarray:
+        """Run the remaining iterations, and return the centers of the vertices."""
+        while self.step():
+            pass
+        return self.centers
+
+    def pin(self, rows: Iterable[int], centers: np.ndarray):
+        """Fix the given nodes at the given centers for the remaining iterations.
+
+        Args:
+            rows: The rows of the nodes in the snapshot.
+            centers: The new centers of the nodes, one row for each.
+        """
+        rows = np.fromiter(rows, dtype=np.int64)
+        self.centers[rows] = centers
+        self.movable[rows] = False
+
+
+def force_layout(graph: LayoutGraph, **kwargs) -> np.ndarray:
+    """Lay out the graph, and return the new positions of the top-left corners of the nodes.
+
+    The keyword arguments are passed to ForceLayout.
+    """
+    return graph.node_positions(ForceLayout(graph, **kwargs).run())
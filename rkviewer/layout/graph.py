@@ -0,0 +1,214 @@
+"""The graph that the layout algorithms work on.
+
+The nodes and reactions of a network form a bipartite graph, in which each reaction is a vertex
+linked to its reactants and products. A reaction vertex stands for the centroid of the reaction,
+which is not stored in the model but computed from the positions of its nodes when it is drawn;
+so a layout only returns the positions of the nodes, and the reaction handles are then reset
+around the new centroids with default_handles().
+
+Vertices are numbered with the nodes first, in the order of the rows of the snapshot, followed by
+the reactions. All positions are (x, y) rows of a float array.
+"""
+from dataclasses import dataclass
+import math
+from typing import Optional
+
+import numpy as np
+
+from ..snapshot import NetworkSnapshot
+
+
+# Same as in rkviewer.canvas.utils, which cannot be imported without wx
+CENTER_RATIO = 2/3
+DUPLICATE_RATIO = 3/4
+DUPLICATE_ROT = -math.pi/3
+
+
+def sum_rows(indices: np.ndarray, values: np.ndarray, num_rows: int) -> np.ndarray:
+    """Return the sums of the rows of 'values' with the same index, as a (num_rows, 2) array."""
+    return np.stack([np.bincount(indices, weights=values[:, 0], minlength=num_rows),
+                     np.bincount(indices, weights=values[:, 1], minlength=num_rows)], axis=1)
+
+
+@dataclass(frozen=True, eq=False)
+class LayoutGraph:
+    """A network, as a graph to lay out.
+
+    The center of each vertex in a compartment must stay between 'lower' and 'upper', so that it
+    stays within the compartment. The other vertices are free to move anywhere while the layout
+    runs, and node_positions() then moves them back within the canvas. Nodes that are not in a
+    compartment are not kept out of the compartments.
+
+    Attributes:
+        snapshot: The snapshot the graph was built from.
+        bounds: The (width, height) of the canvas.
+        edges: One (node vertex, reaction vertex) pair for each reactant and each product.
+        sizes: The sizes of the vertices; reactions have size 0.
+        free: Whether each vertex is free, i.e. not a node in a compartment.
+        lower: The lowest position of the center of each vertex.
+        upper: The highest position of the center of each vertex.
+    """
+    snapshot: NetworkSnapshot
+    bounds: np.ndarray
+    edges: np.ndarray
+    sizes: np.ndarray
+    free: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+
+    @classmethod
+    def from_snapshot(cls, snapshot: NetworkSnapshot, bounds) -> 'LayoutGraph':
+        """Build the graph of a snapshot, to be laid out on a canvas of the given size."""
+        bounds = np.asarray(bounds, dtype=np.float64)
+        num_nodes = snapshot.num_nodes
+        edges = np.concatenate([snapshot.reactant_edges, snapshot.product_edges])[:, ::-1].copy()
+        edges[:, 1] += num_nodes
+
+        sizes = np.zeros((num_nodes + snapshot.num_reactions, 2))
+        sizes[:num_nodes] = snapshot.node_sizes
+        free = np.ones(len(sizes), dtype=bool)
+        lower = np.full_like(sizes, -np.inf)
+        upper = np.full_like(sizes, np.inf)
+
+        in_comp = np.flatnonzero(snapshot.node_compartments != -1)
+        free[in_comp] = False
+        if len(in_comp) != 0:
+            comp_rows = np.array([snapshot.compartment_row(c)
+                                  for c in snapshot.node_compartments[in_comp]])
+            comp_lower = snapshot.compartment_positions[comp_rows]
+            comp_upper = comp_lower + snapshot.compartment_sizes[comp_rows]
+            half = sizes[in_comp] / 2
+            lower[in_comp] = comp_lower + half
+            upper[in_comp] = comp_upper - half
+            # A node that does not fit in its compartment is kept at the compartment's center
+            too_big = lower[in_comp] > upper[in_comp]
+            middle = (comp_lower + comp_upper) / 2
+            lower[in_comp] = np.where(too_big, middle, lower[in_comp])
+            upper[in_comp] = np.where(too_big, middle, upper[in_comp])
+
+        return cls(snapshot=snapshot, bounds=bounds, edges=edges, sizes=sizes, free=free,
+                   lower=lower, upper=upper)
+
+    @property
+    def num_nodes(self) -> int:
+        return self.snapshot.num_nodes
+
+    @property
+    def num_vertices(self) -> int:
+        return len(self.sizes)
+
+    def initial_centers(self) -> np.ndarray:
+        """Return the current centers of the nodes, and the centroids of the reactions.
+
+        A reaction without any node is placed at the center of the canvas.
+        """
+        num_nodes = self.num_nodes
+        centers = np.empty((self.num_vertices, 2))
+        centers[:num_nodes] = self.snapshot.node_centers()
+        reaction_rows = self.edges[:, 1] - num_nodes
+        num_reactions = self.num_vertices - num_nodes
+        counts = np.bincount(reaction_rows, minlength=num_reactions)
+        sums = sum_rows(reaction_rows, centers[self.edges[:, 0]], num_reactions)
+        centers[num_nodes:] = np.where(counts[:, None] != 0,
+                                       sums / np.maximum(counts, 1)[:, None], self.bounds / 2)
+        return centers
+
+    def clamp(self, centers: np.ndarray):
+        """Clamp the centers of the vertices to their bounds, in place."""
+        np.clip(centers, self.lower, self.upper, out=centers)
+
+    def origin_offset(self, centers: np.ndarray) -> np.ndarray:
+        """Return the translation that node_positions() applies to the free nodes by default.
+
+        This moves the free nodes together so that the top-left corner of their bounding box is
+        where it was in the snapshot, as far as the canvas allows.
+        """
+        num_nodes = self.num_nodes
+        free = self.free[:num_nodes]
+        if not free.any():
+            return np.zeros(2)
+        node_sizes = self.sizes[:num_nodes][free]
+        positions = centers[:num_nodes][free] - node_sizes / 2
+        top_left = positions.min(axis=0)
+        extent = (positions + node_sizes).max(axis=0) - top_left
+        origin = self.snapshot.node_positions[free].min(axis=0)
+        origin = np.clip(origin, 0, np.maximum(self.bounds - extent, 0))
+        return origin - top_left
+
+    def node_positions(self, centers: np.ndarray, keep_origin: bool = True,
+                       offset: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the positions of the top-left corners of the nodes, given the vertex centers.
+
+        Args:
+            centers: The centers of the vertices.
+            keep_origin: If True, the free nodes are translated by origin_offset(). Otherwise they
+                         are only clamped to the canvas.
+            offset: If given, the translation of the free nodes, instead of origin_offset().
+        """
+        num_nodes = self.num_nodes
+        node_sizes = self.sizes[:num_nodes]
+        positions = centers[:num_nodes] - node_sizes / 2
+        if offset is None and keep_origin:
+            offset = self.origin_offset(centers)
+        if offset is not None:
+            positions[self.free[:num_nodes]] += offset
+        return np.clip(positions, 0, self.bounds - node_sizes)
+
+
+@dataclass(frozen=True, eq=False)
+class ReactionHandles:
+    """The positions of the Bezier handles of the reactions of a snapshot.
+
+    Attributes:
+        centers: The center handle of each reaction row.
+        reactants: The handle of each reactant, in the order of snapshot.reactant_edges.
+        products: The handle of each product, in the order of snapshot.product_edges.
+    """
+    centers: np.ndarray
+    reactants: np.ndarray
+    products: np.ndarray
+
+
+def reaction_centroids(snapshot: NetworkSnapshot, node_centers: np.ndarray) -> np.ndarray:
+    """Return the centroid of each reaction row, given the centers of the nodes in row order.
+
+    The centroid is the mean of the centers of the reactants and products, as the canvas draws it.
+    """
+    num_reactions = snapshot.num_reactions
+    all_edges = np.concatenate([snapshot.reactant_edges, snapshot.product_edges])
+    counts = np.bincount(all_edges[:, 0], minlength=num_reactions)
+    centroids = sum_rows(all_edges[:, 0], node_centers[all_edges[:, 1]], num_reactions)
+    return centroids / np.maximum(counts, 1)[:, None]
+
+
+def default_handles(snapshot: NetworkSnapshot, node_centers: np.ndarray) -> ReactionHandles:
+    """Place the handles of all the reactions as a newly created reaction would have them.
+
+    This is a vectorized rkviewer.canvas.utils.default_handle_positions(), given the centers of the
+    nodes in snapshot row order.
+    """
+    reactant_edges = snapshot.reactant_edges
+    product_edges = snapshot.product_edges
+    centroids = reaction_centroids(snapshot, node_centers)
+
+    centers = centroids.copy()
+    # The center handle is on the side of the first reactant
+    rows, first = np.unique(reactant_edges[:, 0], return_index=True)
+    centers[rows] = (node_centers[reactant_edges[first, 1]] * (1 - CENTER_RATIO)
+                     + centroids[rows] * CENTER_RATIO)
+
+    reactants = (node_centers[reactant_edges[:, 1]] + centroids[reactant_edges[:, 0]]) / 2
+    product_centers = node_centers[product_edges[:, 1]]
+    product_centroids = centroids[product_edges[:, 0]]
+    products = (product_centers + product_centroids) / 2
+
+    # Products that are also reactants are rotated, so that the two curves do not overlap
+    num_nodes = snapshot.num_nodes
+    duplicate = np.isin(product_edges[:, 0] * num_nodes + product_edges[:, 1],
+                        reactant_edges[:, 0] * num_nodes + reactant_edges[:, 1])
+    diff = product_centroids[duplicate] - product_centers[duplicate]
+    length = np.hypot(diff[:, 0], diff[:, 1]) * DUPLICATE_RATIO
+    angle = np.arctan2(diff[:, 1], diff[:, 0]) + DUPLICATE_ROT
+    products[duplicate] = (product_centers[duplicate]
+                           + np.stack([np.cos(angle), np.sin(angle)], axis=1) * length[:, None])
+    return ReactionHandles(centers=centers, reactants=reactants, products=products)
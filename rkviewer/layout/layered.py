@@ -0,0 +1,415 @@
+"""Layered (Sugiyama-style) layout, for pathway diagrams.
+
+The reactions are laid out from top to bottom: each reactant is above its reaction, and each
+product below it, so that a pathway reads as a flow down the page. This follows the usual steps
+of the Sugiyama framework, on the directed graph in which each reactant has an edge to its
+reaction, and each reaction an edge to its products:
+
+1. Cycles are broken by reversing the back edges of a depth-first search.
+2. Each vertex is assigned a layer, as far down as its longest path from a source, and sources are
+   then moved down to just above their highest successor. Nodes end up on even layers and
+   reactions on odd ones. Edges spanning several layers are split by dummy vertices.
+3. The layers are swept down and up, ordering the vertices of each layer by the barycenter of
+   their neighbors in the layer just swept, until a sweep no longer reduces the crossings.
+   Crossings are counted as the inversions between the edges of all layers at once, in
+   O(E log^2 E).
+4. Each vertex is moved towards the mean of its neighbors, as far as the order and the spacing of
+   its layer allow, a number of times. Since the neighbors of a layer are all in layers of the
+   other parity, all the odd layers are placed at once given the even ones, then the even layers
+   given the odd ones, so that the number of NumPy operations does not grow with the number of
+   layers, which is large for long pathways.
+
+A network of 10000 reactions is laid out in about a second (see scripts/bench_layered.py).
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from ..profiler import profiler
+from ..snapshot import NetworkSnapshot
+from .graph import LayoutGraph, ReactionHandles, reaction_centroids
+
+
+def _adjacency(num_vertices: int, edges: np.ndarray) -> Tuple[List[int], List[int]]:
+    """Return the targets of the edges sorted by source, and where each source's targets start."""
+    order = np.argsort(edges[:, 0], kind='stable')
+    starts = np.searchsorted(edges[order, 0], np.arange(num_vertices + 1))
+    return edges[order, 1].tolist(), starts.tolist()
+
+
+def depth_first_search(num_vertices: int, edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Search a directed graph depth-first, starting from the sources.
+
+    Reversing the back edges makes the graph acyclic, and the reverse of the postorder is then a
+    topological order. Starting from the sources keeps the direction of the edges of a graph that is
+    already acyclic.
+
+    Returns:
+        Whether each edge is a back edge, and the vertices in postorder.
+    """
+    order = np.argsort(edges[:, 0], kind='stable')
+    targets, starts = _adjacency(num_vertices, edges)
+    in_degrees = np.bincount(edges[:, 1], minlength=num_vertices)
+    roots = np.concatenate([np.flatnonzero(in_degrees == 0), np.flatnonzero(in_degrees != 0)])
+
+    # 0: not visited, 1: on the stack, 2: done
+    state = [0] * num_vertices
+    back: List[int] = list()
+    postorder: List[int] = list()
+    for root in roots.tolist():
+        if state[root] != 0:
+            continue
+        state[root] = 1
+        stack = [[root, starts[root]]]
+        while stack:
+            top = stack[-1]
+            vertex, i = top
+            if i == starts[vertex + 1]:
+                state[vertex] = 2
+                postorder.append(vertex)
+                stack.pop()
+                continue
+            top[1] = i + 1
+            target = targets[i]
+            if state[target] == 1:
+                back.append(i)
+            elif state[target] == 0:
+                state[target] = 1
+                stack.append([target, starts[target]])
+    is_back = np.zeros(len(edges), dtype=bool)
+    is_back[order[back]] = True
+    return is_back, np.array(postorder, dtype=np.int64)
+
+
+def assign_layers(initial: np.ndarray, edges: np.ndarray,
+                  topological_order: np.ndarray) -> np.ndarray:
+    """Return the layer of each vertex of a directed acyclic graph.
+
+    Each vertex is as far down as its longest path from a source, and the sources are then moved
+    down to just above their highest successor, so that their edges are short.
+
+    Args:
+        initial: The lowest layer of each vertex. Each edge then goes down at least one layer.
+        edges: The (source, target) edges.
+        topological_order: The vertices in a topological order.
+    """
+    num_vertices = len(initial)
+    targets, starts = _adjacency(num_vertices, edges)
+    layers = initial.tolist()
+    for vertex in topological_order.tolist():
+        below = layers[vertex] + 1
+        for target in targets[starts[vertex]:starts[vertex + 1]]:
+            if layers[target] < below:
+                layers[target] = below
+    layers = np.array(layers, dtype=np.int64)
+
+    is_source = np.bincount(edges[:, 1], minlength=num_vertices) == 0
+    highest = np.full(num_vertices, np.iinfo(np.int64).max)
+    np.minimum.at(highest, edges[:, 0], layers[edges[:, 1]])
+    movable = is_source & (highest != np.iinfo(np.int64).max)
+    layers[movable] = np.maximum(layers[movable], highest[movable] - 1)
+    return layers
+
+
+def split_long_edges(layers: np.ndarray,
+                     edges: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split the edges spanning several layers with dummy vertices.
+
+    Returns:
+        The layers of all the vertices, the dummies being numbered after the others; the (upper,
+        lower) edges, which all span a single layer; and for each dummy, the edge it is on.
+    """
+    num_vertices = len(layers)
+    spans = layers[edges[:, 1]] - layers[edges[:, 0]]
+    short = edges[spans == 1]
+    long = edges[spans > 1]
+    num_dummies = spans[spans > 1] - 1
+    if len(long) == 0:
+        return layers, short, np.empty((0, 2), dtype=edges.dtype)
+
+    offsets = np.cumsum(num_dummies) - num_dummies
+    total = num_dummies.sum()
+    dummies = num_vertices + np.arange(total)
+    steps = np.arange(total) - np.repeat(offsets, num_dummies)
+    dummy_layers = np.repeat(layers[long[:, 0]], num_dummies) + steps + 1
+    firsts = num_vertices + offsets
+    lasts = firsts + num_dummies - 1
+    not_last = np.ones(total, dtype=bool)
+    not_last[lasts - num_vertices] = False
+    chain = np.stack([dummies[not_last], dummies[not_last] + 1], axis=1)
+    all_edges = np.concatenate([short,
+                                np.stack([long[:, 0], firsts], axis=1),
+                                chain,
+                                np.stack([lasts, long[:, 1]], axis=1)])
+    return np.concatenate([layers, dummy_layers]), all_edges, np.repeat(long, num_dummies, axis=0)
+
+
+def count_inversions(values: np.ndarray) -> int:
+    """Return the number of pairs i < j such that values[i] > values[j].
+
+    The values must be non-negative integers. This is a bottom-up merge sort, in which each merge
+    of all pairs of sorted blocks is a single sort of (block, value) keys.
+    """
+    num_values = len(values)
+    bound = int(values.max()) + 1 if num_values != 0 else 1
+    indices = np.arange(num_values)
+    total = 0
+    width = 1
+    while width < num_values:
+        blocks = indices // (2 * width)
+        keys = blocks * bound + values
+        in_right = indices % (2 * width) >= width
+        # Both halves of each block are sorted, so the keys of the left halves are sorted; each
+        # value in a right half is inverted with the larger values in the left half of its block
+        left_keys = keys[~in_right]
+        right_blocks = blocks[in_right]
+        block_ends = np.searchsorted(left_keys, (right_blocks + 1) * bound)
+        total += int((block_ends - np.searchsorted(left_keys, keys[in_right], side='right')).sum())
+        values = np.sort(keys) - blocks * bound
+        width *= 2
+    return total
+
+
+def _segment_offsets(layers: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Return offsets that make the values of each layer larger than those of the layers before.
+
+    Accumulating the maximum (or the minimum, backwards) of the offset values then never carries
+    a value from one layer to the next.
+    """
+    spread = np.ptp(values) + 1 if len(values) != 0 else 1
+    return layers * spread
+
+
+class _LayeredGraph:
+    """The acyclic, properly layered graph, with the vertices numbered layer by layer.
+
+    The layers are ordered one at a time, since that converges to much fewer crossings than
+    ordering all the layers of the same parity at once; but they are placed by parity.
+    """
+
+    def __init__(self, layers: np.ndarray, edges: np.ndarray, initial_x: np.ndarray):
+        # Number the vertices by layer, then by initial x, so that each layer is a range of
+        # vertices whose initial order is their initial position
+        order = np.lexsort((initial_x, layers))
+        self.ids = np.empty_like(order)
+        self.ids[order] = np.arange(len(order))
+        self.layers = layers[order]
+        self.num_layers = int(self.layers.max()) + 1 if len(order) != 0 else 0
+        self.starts = np.searchsorted(self.layers, np.arange(self.num_layers + 1))
+        self.sizes = np.diff(self.starts)
+        self.upper = self.ids[edges[:, 0]]
+        self.lower = self.ids[edges[:, 1]]
+        self.parities = [np.flatnonzero(self.layers % 2 == parity) for parity in range(2)]
+
+    def initial_positions(self) -> np.ndarray:
+        """Return the position of each vertex in its layer, in the initial order."""
+        return np.arange(len(self.layers)) - self.starts[self.layers]
+
+    def crossings(self, positions: np.ndarray) -> int:
+        """Return the number of edge crossings, given the position of each vertex in its layer."""
+        # With the edges sorted by upper vertex, then lower vertex, two edges between the same
+        # layers cross if their lower vertices are in the opposite order. The edges between other
+        # layers are never inverted, since the ranks increase with the layer.
+        ranks = self.starts[self.layers] + positions
+        order = np.lexsort((ranks[self.lower], ranks[self.upper]))
+        return count_inversions(ranks[self.lower][order])
+
+    def _neighbor_means(self, values: np.ndarray, default: np.ndarray) -> np.ndarray:
+        """Return the mean of the values of the neighbors of each vertex, or the default if none."""
+        num_vertices = len(self.layers)
+        ends = np.concatenate([self.upper, self.lower])
+        others = np.concatenate([self.lower, self.upper])
+        sums = np.bincount(ends, weights=values[others], minlength=num_vertices)
+        counts = np.bincount(ends, minlength=num_vertices)
+        return np.where(counts != 0, sums / np.maximum(counts, 1), default)
+
+    def _sides(self, own: np.ndarray, other: np.ndarray):
+        """Return, for each layer, its edges to the adjacent layer on one side.
+
+        Each item is the layer's vertices' offsets in the layer, for each edge, the vertices at the
+        other end, and whether each vertex of the layer has any edge; own and other give the end
+        of each edge in the layer and in the adjacent one.
+        """
+        order = np.argsort(own, kind='stable')
+        own = own[order]
+        other = other[order]
+        bounds = np.searchsorted(own, self.starts).tolist()
+        sides = list()
+        for layer in range(self.num_layers):
+            begin, end = bounds[layer], bounds[layer + 1]
+            offsets = own[begin:end] - self.starts[layer]
+            counts = np.bincount(offsets, minlength=self.sizes[layer])
+            sides.append((offsets, other[begin:end], counts != 0, 1 / np.maximum(counts, 1)))
+        return sides
+
+    def order(self, sweeps: int) -> np.ndarray:
+        """Return the position of each vertex in its layer, with few crossings.
+
+        Each sweep goes down the layers, ordering each by the barycenter of its neighbors in the
+        layer above, then up the layers, ordering each by its neighbors in the layer below. The
+        order with the fewest crossings after a sweep is kept.
+        """
+        positions = self.initial_positions().astype(np.float64)
+        best = positions.copy()
+        best_crossings = self.crossings(best.astype(np.int64))
+        above = self._sides(self.lower, self.upper)
+        below = self._sides(self.upper, self.lower)
+        starts = self.starts.tolist()
+        # The vertices of each layer, in their current order
+        in_order = [np.arange(starts[layer], starts[layer + 1])
+                    for layer in range(self.num_layers)]
+        passes = ((range(1, self.num_layers), above),
+                  (range(self.num_layers - 2, -1, -1), below))
+        for _ in range(sweeps):
+            if best_crossings == 0:
+                break
+            for layers, sides in passes:
+                for layer in layers:
+                    offsets, others, connected, inverse_counts = sides[layer]
+                    begin = starts[layer]
+                    own_positions = positions[begin:starts[layer + 1]]
+                    means = np.bincount(offsets, weights=positions[others],
+                                        minlength=len(own_positions)) * inverse_counts
+                    # The vertices without neighbors keep their position; ties keep the order
+                    means = np.where(connected, means, own_positions)
+                    vertices = in_order[layer]
+                    vertices = vertices[np.argsort(means[vertices - begin], kind='stable')]
+                    in_order[layer] = vertices
+                    positions[vertices] = np.arange(len(vertices))
+            crossings = self.crossings(positions.astype(np.int64))
+            if crossings >= best_crossings:
+                break
+            best_crossings = crossings
+            best = positions.copy()
+        return best.astype(np.int64)
+
+    def coordinates(self, positions: np.ndarray, widths: np.ndarray, gap: float,
+                    iterations: int) -> np.ndarray:
+        """Return the x coordinate of the center of each vertex.
+
+        Args:
+            positions: The position of each vertex in its layer.
+            widths: The width of each vertex.
+            gap: The minimum horizontal gap between two vertices of a layer.
+            iterations: The number of times each vertex is moved towards its neighbors.
+        """
+        # The vertices in layer order, then in the order of their positions
+        in_order = np.empty_like(positions)
+        in_order[self.starts[self.layers] + positions] = np.arange(len(positions))
+        layers = self.layers
+        # The minimum distance of each vertex from the first vertex of its layer
+        ordered_widths = widths[in_order]
+        steps = np.zeros(len(positions))
+        steps[1:] = (ordered_widths[:-1] + ordered_widths[1:]) / 2 + gap
+        steps[self.starts[:-1]] = 0
+        mins = np.cumsum(steps)
+        mins -= mins[self.starts[layers]]
+        # Each layer starts centered on 0
+        xs = np.empty(len(positions))
+        xs[in_order] = mins - mins[self.starts[1:] - 1][layers] / 2
+
+        for _ in range(iterations):
+            for vertices in self.parities:
+                # The vertices of these layers, in order
+                ordered = in_order[vertices]
+                wanted = self._neighbor_means(xs, xs)[ordered] - mins[vertices]
+                # The closest coordinates that keep the order and the spacing, when pushing the
+                # vertices to the right and to the left; their mean also keeps them
+                offsets = _segment_offsets(layers[vertices], wanted)
+                right = np.maximum.accumulate(wanted + offsets) - offsets
+                left = np.minimum.accumulate((wanted + offsets)[::-1])[::-1] - offsets
+                xs[ordered] = (right + left) / 2 + mins[vertices]
+        return xs
+
+
+def layered_centers(graph: LayoutGraph, layer_gap: float = 80, node_gap: float = 30,
+                    sweeps: int = 16, iterations: int = 16) -> np.ndarray:
+    """Return the centers of the vertices in a layered layout of the graph.
+
+    Args:
+        graph: The graph to lay out.
+        layer_gap: The vertical gap between two layers of nodes.
+        node_gap: The minimum horizontal gap between two nodes of the same layer.
+        sweeps: The maximum number of times the layers are ordered to reduce the crossings.
+        iterations: The number of times each vertex is moved towards its neighbors.
+    """
+    num_nodes = graph.num_nodes
+    num_vertices = graph.num_vertices
+    if num_vertices == 0:
+        return np.empty((0, 2))
+    snapshot = graph.snapshot
+    num_reactants = len(snapshot.reactant_edges)
+    with profiler.phase('layered.layers'):
+        # Reactant -> reaction, and reaction -> product
+        edges = graph.edges.copy()
+        edges[num_reactants:] = edges[num_reactants:, ::-1]
+        reverse, postorder = depth_first_search(num_vertices, edges)
+        edges[reverse] = edges[reverse, ::-1]
+        # Nodes start on even layers and reactions on odd ones, which every edge then preserves
+        initial = np.zeros(num_vertices, dtype=np.int64)
+        initial[num_nodes:] = 1
+        layers = assign_layers(initial, edges, postorder[::-1])
+        all_layers, unit_edges, dummy_edges = split_long_edges(layers, edges)
+
+        # The dummies start on the line between the ends of their edge
+        initial_x = graph.initial_centers()[:, 0]
+        upper_x = initial_x[dummy_edges[:, 0]]
+        lower_x = initial_x[dummy_edges[:, 1]]
+        upper_layers = layers[dummy_edges[:, 0]]
+        ratios = ((all_layers[num_vertices:] - upper_layers)
+                  / (layers[dummy_edges[:, 1]] - upper_layers))
+        initial_x = np.concatenate([initial_x, upper_x + (lower_x - upper_x) * ratios])
+        layered = _LayeredGraph(all_layers, unit_edges, initial_x)
+
+    with profiler.phase('layered.order'):
+        positions = layered.order(sweeps)
+    with profiler.phase('layered.coordinates'):
+        widths = np.zeros(len(all_layers))
+        widths[layered.ids[:num_vertices]] = graph.sizes[:, 0]
+        xs = layered.coordinates(positions, widths, node_gap, iterations)
+
+    row_height = (graph.sizes[:num_nodes, 1].max() if num_nodes != 0 else 0) + layer_gap
+    centers = np.stack([xs[layered.ids[:num_vertices]], layers * row_height / 2], axis=1)
+
+    # Scaled down if needed to fit in the canvas, at the risk of overlaps
+    max_size = graph.sizes.max(axis=0)
+    extent = np.ptp(centers, axis=0)
+    scale = np.minimum(1, np.maximum(graph.bounds - max_size, 0) / np.maximum(extent, 1e-9))
+    centers = (centers - centers.min(axis=0)) * scale
+    graph.clamp(centers)
+    return centers
+
+
+def layered_layout(graph: LayoutGraph, **kwargs) -> np.ndarray:
+    """Lay out the graph in layers, and return the new positions of the top-left corners of nodes.
+
+    The keyword arguments are passed to layered_centers(). As with the force-directed layout, the
+    free nodes are then moved together near their previous position, and the nodes in compartments
+    are only moved within them.
+    """
+    return graph.node_positions(layered_centers(graph, **kwargs))
+
+
+def layered_handles(snapshot: NetworkSnapshot, node_centers: np.ndarray) -> ReactionHandles:
+    """Place the handles of the reactions so that their curves flow vertically between layers.
+
+    The handle of each reactant and product is halfway between the node and the centroid of its
+    reaction, vertically; and the center handle is halfway towards the mean height of the
+    reactants. Each curve then leaves its node and enters the centroid vertically.
+    """
+    centroids = reaction_centroids(snapshot, node_centers)
+    num_reactions = snapshot.num_reactions
+
+    def node_handles(edges: np.ndarray) -> np.ndarray:
+        handles = node_centers[edges[:, 1]].copy()
+        handles[:, 1] = (handles[:, 1] + centroids[edges[:, 0], 1]) / 2
+        return handles
+
+    reactant_edges = snapshot.reactant_edges
+    counts = np.bincount(reactant_edges[:, 0], minlength=num_reactions)
+    mean_y = np.bincount(reactant_edges[:, 0], weights=node_centers[reactant_edges[:, 1], 1],
+                         minlength=num_reactions) / np.maximum(counts, 1)
+    centers = centroids.copy()
+    centers[:, 1] = np.where(counts != 0, (centroids[:, 1] + mean_y) / 2, centroids[:, 1])
+    return ReactionHandles(centers=centers, reactants=node_handles(reactant_edges),
+                           products=node_handles(snapshot.product_edges))
@@ -0,0 +1,239 @@
+"""Routing of the reaction curves, i.e. placement of the Bezier handles, to reduce overlaps.
+
+default_handles() places the handles of each reaction from the positions of its own nodes only,
+so in a dense network, many curves cross other nodes, and reactions between nearby nodes have
+curves on top of each other. route_handles() starts from the default handles, and chooses for
+each reaction a rotation of its center handle around the centroid, and for each reactant and
+product a bend of its handle, among a few candidates each, so as to minimize:
+
+- the number of points of the curves within nodes other than their own, found with a SpatialGrid
+  of the nodes;
+- the crowding of the curves, i.e. the number of points of the curves of other reactions in the
+  same cell of a fine grid;
+- a small penalty for moving away from the default handles.
+
+Each curve is represented by the same points that the canvas uses for hit-testing. All the curves
+are evaluated at once for each candidate, and the choices are made for all the reactions (then for
+all the curves) at once, given the others, a few times over. The cost of routing is then a few
+dozen vectorized passes over the points of all the curves.
+"""
+from dataclasses import dataclass
+import math
+from typing import Tuple
+
+import numpy as np
+
+from ..snapshot import NetworkSnapshot
+from ..spatial import SpatialGrid
+from .graph import ReactionHandles, default_handles, reaction_centroids
+
+
+# Same as in rkviewer.canvas.data, which cannot be imported without wx
+MAXSEGS = 8
+NODE_EDGE_GAP_DISTANCE = 4
+
+#: Rotations of the center handles, and bends of the species handles relative to the length of
+#: their curve, that are tried; each further from the default than the one before
+ROTATIONS = tuple(math.radians(a) for a in (0, -30, 30, -60, 60, -90, 90))
+BENDS = (0, -0.25, 0.25, -0.5, 0.5)
+NODE_WEIGHT = 1  #: Cost of a point of a curve within another node
+CROWDING_WEIGHT = 0.2  #: Cost of a point of a curve for each point of another reaction nearby
+CHANGE_WEIGHT = 0.5  #: Cost of each step away from the default handles, per curve
+CROWDING_CELL = 12  #: Side of the cells in which the points of curves crowd each other
+
+_T = np.linspace(0, 1, MAXSEGS + 1)
+#: Bernstein coefficients of the cubic Bezier curves, one row per point
+_BERNSTEIN = np.stack([(1 - _T) ** 3, 3 * (1 - _T) ** 2 * _T, 3 * (1 - _T) * _T ** 2, _T ** 3],
+                      axis=1)
+
+
+@dataclass(frozen=True, eq=False)
+class _Curves:
+    """The curves of all the reactants and products of a snapshot, in a single array each.
+
+    Attributes:
+        reactions: The reaction row of each curve.
+        nodes: The node row of each curve.
+        is_product: Whether each curve is of a product.
+        node_centers: The center of the node of each curve.
+        node_halves: Half the size of the node of each curve, padded as the canvas does.
+        centroids: The centroid of the reaction of each curve.
+    """
+    reactions: np.ndarray
+    nodes: np.ndarray
+    is_product: np.ndarray
+    node_centers: np.ndarray
+    node_halves: np.ndarray
+    centroids: np.ndarray
+
+    def points(self, handles: np.ndarray, center_handles: np.ndarray) -> np.ndarray:
+        """Return the points of the curves, as a (curves, MAXSEGS + 1, 2) array.
+
+        Args:
+            handles: The handle of each curve.
+            center_handles: The center handle of the reaction of each curve, which is mirrored
+                            for the products.
+        """
+        # The curve starts where the handle, seen from the node's center, leaves the padded node
+        direction = handles - self.node_centers
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        direction = np.where(length[:, None] > 1e-3, direction, (0, 1))
+        with np.errstate(divide='ignore'):
+            scale = np.min(self.node_halves / np.abs(direction), axis=1)
+        start = self.node_centers + direction * scale[:, None]
+        center = np.where(self.is_product[:, None], 2 * self.centroids - center_handles,
+                          center_handles)
+        controls = np.stack([start, handles, center, self.centroids], axis=1)
+        return np.einsum('sk,ckd->csd', _BERNSTEIN, controls)
+
+
+def _curves(snapshot: NetworkSnapshot, node_centers: np.ndarray,
+            centroids: np.ndarray) -> _Curves:
+    edges = np.concatenate([snapshot.reactant_edges, snapshot.product_edges])
+    nodes = edges[:, 1]
+    return _Curves(
+        reactions=edges[:, 0],
+        nodes=nodes,
+        is_product=np.arange(len(edges)) >= len(snapshot.reactant_edges),
+        node_centers=node_centers[nodes],
+        node_halves=snapshot.node_sizes[nodes] / 2 + NODE_EDGE_GAP_DISTANCE,
+        centroids=centroids[edges[:, 0]],
+    )
+
+
+class _Crowding:
+    """The number of points of the curves of each reaction in each cell of a grid."""
+    _NUM_CELLS = 1 << 40  #: Cells are numbered below this
+
+    def __init__(self, points: np.ndarray, reactions: np.ndarray):
+        cells = self._cells(points)
+        flat = cells.reshape(-1)
+        self._cells_all, self._counts_all = np.unique(flat, return_counts=True)
+        # Cells by reaction, for the points of the curves of the same reaction
+        own = np.repeat(reactions, points.shape[1]) * self._NUM_CELLS + flat
+        self._cells_own, self._counts_own = np.unique(own, return_counts=True)
+
+    @staticmethod
+    def _cells(points: np.ndarray) -> np.ndarray:
+        cells = np.floor(points / CROWDING_CELL).astype(np.int64) + (1 << 19)
+        cells = np.clip(cells, 0, (1 << 20) - 1)
+        return cells[..., 0] * (1 << 20) + cells[..., 1]
+
+    @staticmethod
+    def _lookup(keys: np.ndarray, counts: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        found = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+        return np.where(keys[found] == queries, counts[found], 0)
+
+    def costs(self, points: np.ndarray, reactions: np.ndarray) -> np.ndarray:
+        """Return the number of points of other reactions near the points of each curve."""
+        cells = self._cells(points)
+        others = self._lookup(self._cells_all, self._counts_all, cells)
+        own = self._lookup(self._cells_own, self._counts_own,
+                           reactions[:, None] * self._NUM_CELLS + cells)
+        return (others - own).sum(axis=1)
+
+
+def _steps(num_candidates: int) -> np.ndarray:
+    """Return how far each candidate is from the default, the first one."""
+    return (np.arange(num_candidates) + 1) // 2
+
+
+def _node_costs(grid: SpatialGrid, points: np.ndarray, curves: _Curves) -> np.ndarray:
+    """Return the number of points of each curve within nodes other than its own."""
+    # The first point is on the curve's own node
+    inner = points[:, 1:].reshape(-1, 2)
+    point_rows, nodes = grid.point_hits(inner)
+    point_curves = point_rows // (points.shape[1] - 1)
+    others = nodes != curves.nodes[point_curves]
+    return np.bincount(point_curves[others], minlength=len(points))
+
+
+def routing_costs(snapshot: NetworkSnapshot, node_centers: np.ndarray,
+                  handles: ReactionHandles) -> Tuple[int, int]:
+    """Return how much the curves overlap other nodes and each other.
+
+    Returns:
+        The number of points of the curves within nodes other than their own, and the number of
+        pairs of points of curves of different reactions in the same cell of a fine grid.
+    """
+    curves = _curves(snapshot, node_centers, reaction_centroids(snapshot, node_centers))
+    if len(curves.reactions) == 0:
+        return 0, 0
+    grid = SpatialGrid(node_centers - snapshot.node_sizes / 2, snapshot.node_sizes)
+    points = curves.points(np.concatenate([handles.reactants, handles.products]),
+                           handles.centers[curves.reactions])
+    crowding = _Crowding(points, curves.reactions)
+    return (int(_node_costs(grid, points, curves).sum()),
+            int(crowding.costs(points, curves.reactions).sum()) // 2)
+
+
+def route_handles(snapshot: NetworkSnapshot, node_centers: np.ndarray = None,
+                  iterations: int = 2) -> ReactionHandles:
+    """Place the handles of all the reactions so that their curves overlap less.
+
+    Args:
+        snapshot: The snapshot of the network.
+        node_centers: The centers of the nodes in snapshot row order, if not where they are in
+                      the snapshot (e.g. after a layout).
+        iterations: The number of times the handles of all the reactions are chosen.
+    """
+    if node_centers is None:
+        node_centers = snapshot.node_centers()
+    defaults = default_handles(snapshot, node_centers)
+    num_reactions = snapshot.num_reactions
+    centroids = reaction_centroids(snapshot, node_centers)
+    curves = _curves(snapshot, node_centers, centroids)
+    if len(curves.reactions) == 0:
+        return defaults
+    grid = SpatialGrid(node_centers - snapshot.node_sizes / 2, snapshot.node_sizes)
+    default_species = np.concatenate([defaults.reactants, defaults.products])
+    curve_counts = np.bincount(curves.reactions, minlength=num_reactions)
+
+    # The candidate center handles of each reaction, rotated around the centroid
+    arm = defaults.centers - centroids
+    center_candidates = [centroids + np.stack([arm[:, 0] * math.cos(a) - arm[:, 1] * math.sin(a),
+                                               arm[:, 0] * math.sin(a) + arm[:, 1] * math.cos(a)],
+                                              axis=1)
+                         for a in ROTATIONS]
+    # The candidate handles of each curve, bent across the line from the node to the centroid
+    line = curves.centroids - curves.node_centers
+    normal = np.stack([-line[:, 1], line[:, 0]], axis=1)
+    species_candidates = [default_species + normal * bend for bend in BENDS]
+
+    rotation = np.zeros(num_reactions, dtype=np.int64)
+    bend = np.zeros(len(default_species), dtype=np.int64)
+    rows = np.arange(len(default_species))
+
+    def current():
+        centers = np.stack(center_candidates)[rotation, np.arange(num_reactions)]
+        species = np.stack(species_candidates)[bend, rows]
+        return centers, species
+
+    def curve_costs(points: np.ndarray, crowding: _Crowding) -> np.ndarray:
+        return (NODE_WEIGHT * _node_costs(grid, points, curves)
+                + CROWDING_WEIGHT * crowding.costs(points, curves.reactions))
+
+    for _ in range(iterations):
+        centers, species = current()
+        crowding = _Crowding(curves.points(species, centers[curves.reactions]), curves.reactions)
+        # Rotations of the center handles, given the species handles
+        costs = np.stack([
+            np.bincount(curves.reactions, weights=curve_costs(
+                curves.points(species, candidate[curves.reactions]), crowding),
+                minlength=num_reactions)
+            for candidate in center_candidates])
+        costs += CHANGE_WEIGHT * _steps(len(ROTATIONS))[:, None] * curve_counts
+        rotation = np.argmin(costs, axis=0)
+
+        # Bends of the species handles, given the center handles
+        centers, species = current()
+        curve_centers = centers[curves.reactions]
+        costs = np.stack([curve_costs(curves.points(candidate, curve_centers), crowding)
+                          for candidate in species_candidates])
+        costs += CHANGE_WEIGHT * _steps(len(BENDS))[:, None]
+        bend = np.argmin(costs, axis=0)
+
+    centers, species = current()
+    num_reactants = len(snapshot.reactant_edges)
+    return ReactionHandles(centers=centers, reactants=species[:num_reactants],
+                           products=species[num_reactants:])
@@ -27,6 +27,11 @@ class IController(abc.ABC):
         """Try to signal end of group operation"""
         pass
 
+    @abc.abstractmethod
+    def cancel_group(self) -> bool:
+        """End the outermost group operation, and undo its changes"""
+        pass
+
     @abc.abstractmethod
     def in_group(self) -> bool:
         """Returns whether the controller is in the middle of a group operation."""
@@ -254,6 +259,10 @@ class IView(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def update_all(self, nodes, reactions, compartments):
-        """Update all the graph objects, and redraw everything at the end"""
+    def update_all(self, neti, nodes, reactions, compartments):
+        """Update all the graph objects of network neti, and redraw everything at the end.
+
+        neti is the network that the controller shows, which changes when another network is
+        activated.
+        """
         pass
@@ -0,0 +1,217 @@
+"""Running command plugins in a separate process.
+
+An isolated plugin (see Plugin.isolated) is run in a child process, so that a long computation
+does not freeze the editor. The child receives a pickled copy of the current network and
+selection, and runs the plugin against a local controller backed by that copy. Every controller
+setter the plugin calls is recorded, and the recorded list of mutations is sent back. The parent
+then replays it on the real controller in a single group, so it can be undone as one action.
+
+The network is copied by pickling rather than shared, since iodine stores it as Python objects;
+for the network sizes the editor handles, copying it takes a few milliseconds.
+"""
+# pylint: disable=maybe-no-member
+from dataclasses import dataclass
+import logging
+import multiprocessing
+import pickle
+import threading
+import time
+import traceback
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+import iodine as iod
+from .canvas.geometry import Vec2
+from .canvas.utils import SetSubject
+from .controller import Controller
+from .mvc import IController, IView
+
+
+Mutation = Tuple[str, Tuple]  #: (controller setter name, positional arguments)
+
+
+@dataclass
+class NetworkPayload:
+    """What the child process receives.
+
+    Attributes:
+        net_index: The index of the network.
+        network: A copy of the iodine network.
+        realsize: The size of the canvas.
+        selected_nodes: Indices of the selected nodes.
+        selected_reactions: Indices of the selected reactions.
+        selected_compartments: Indices of the selected compartments.
+    """
+    net_index: int
+    network: Any  # iod.TNetwork
+    realsize: Vec2
+    selected_nodes: Set[int]
+    selected_reactions: Set[int]
+    selected_compartments: Set[int]
+
+
+@dataclass
+class IsolatedResult:
+    """What the child process sends back.
+
+    Attributes:
+        mutations: The controller setters called by the plugin, in order.
+        error: If the plugin raised, the formatted traceback; otherwise None.
+        run_ms: How long the plugin took to run in the child.
+    """
+    mutations: List[Mutation]
+    error: Optional[str]
+    run_ms: float
+
+
+def make_payload(canvas) -> bytes:
+    """Serialize the current network and selection of the canvas for the child process."""
+    payload = NetworkPayload(
+        net_index=canvas.net_index,
+        network=iod.networkDict[canvas.net_index],
+        realsize=canvas.realsize,
+        selected_nodes=canvas.sel_nodes_idx.item_copy(),
+        selected_reactions=canvas.sel_reactions_idx.item_copy(),
+        selected_compartments=canvas.sel_compartments_idx.item_copy(),
+    )
+    return pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class _NullView(IView):
+    def bind_controller(self, controller: IController):
+        pass
+
+    def main_loop(self):
+        pass
+
+    def update_all(self, neti, nodes, reactions, compartments):
+        pass
+
+
+class _SnapshotCanvas:
+    """Stands in for the canvas in the child process, for the parts the plugin API uses."""
+
+    def __init__(self, payload: NetworkPayload, controller: IController):
+        self.net_index = payload.net_index
+        self.realsize = payload.realsize
+        self.controller = controller
+        self.sel_nodes_idx = SetSubject(payload.selected_nodes)
+        self.sel_reactions_idx = SetSubject(payload.selected_reactions)
+        self.sel_compartments_idx = SetSubject(payload.selected_compartments)
+
+    def GetSelectedNodes(self):
+        return [n for n in self.controller.get_list_of_nodes(self.net_index)
+                if self.sel_nodes_idx.contains(n.index)]
+
+    def ArrowTipChanged(self):
+        pass
+
+
+class RecordingController:
+    """Proxy of a controller that records the calls to its setters.
+
+    The calls are forwarded, so that the plugin sees the effect of its own changes. Group calls
+    are forwarded but not recorded, since all the mutations are replayed in a single group.
+    """
+
+    def __init__(self, controller: Controller):
+        self._controller = controller
+        self.mutations: List[Mutation] = list()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._controller, name)
+        if not getattr(attr, 'is_iod_setter', False):
+            return attr
+
+        def record(*args):
+            self.mutations.append((name, args))
+            return attr(*args)
+        return record
+
+
+def _child_main(plugin_path: str, class_name: str, payload_bytes: bytes, conn):
+    """Entry point of the child process."""
+    mutations: List[Mutation] = list()
+    error = None
+    start = time.perf_counter()
+    try:
+        # Imported here, since the plugin manager imports this module
+        from rkplugin.api import init_api
+        from rkviewer.plugin_manage import import_plugin_classes
+
+        payload: NetworkPayload = pickle.loads(payload_bytes)
+        controller = Controller(_NullView())
+        iod.networkDict[payload.net_index] = payload.network
+        recorder = RecordingController(controller)
+        init_api(_SnapshotCanvas(payload, controller), recorder)
+
+        classes = {cls.__name__: cls for cls in import_plugin_classes(plugin_path)[0]}
+        plugin = classes[class_name]()
+        recorder.start_group()
+        try:
+            plugin.run()
+        finally:
+            recorder.end_group()
+        mutations = recorder.mutations
+    except Exception:
+        error = traceback.format_exc()
+    result = IsolatedResult(mutations=mutations, error=error,
+                            run_ms=(time.perf_counter() - start) * 1000)
+    conn.send_bytes(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+    conn.close()
+
+
+def replay(controller: IController, mutations: List[Mutation]):
+    """Apply recorded mutations to the controller as a single group.
+
+    Either all the mutations are applied, or none: if one raises, the group is cancelled, undoing
+    the others, and the exception is propagated.
+    """
+    controller.start_group()
+    try:
+        for name, args in mutations:
+            getattr(controller, name)(*args)
+    except BaseException:
+        controller.cancel_group()
+        raise
+    controller.end_group()
+
+
+class IsolatedRun:
+    """Runs one command plugin in a child process.
+
+    The child is started with the 'spawn' method, so that it does not inherit the state of the GUI.
+    The result is awaited on a background thread and passed to 'on_done' through 'dispatch', which
+    should run it on the UI thread (i.e. wx.CallAfter).
+    """
+
+    def __init__(self, plugin_path: str, class_name: str, payload: bytes,
+                 dispatch: Callable[..., Any], on_done: Callable[[IsolatedResult], None]):
+        self._dispatch = dispatch
+        self._on_done = on_done
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe(duplex=False)
+        self._process = ctx.Process(target=_child_main, daemon=True,
+                                    args=(plugin_path, class_name, payload, child_conn))
+        self._process.start()
+        child_conn.close()
+        self._thread = threading.Thread(target=self._wait, daemon=True,
+                                        name='isolated-{}'.format(class_name))
+        self._thread.start()
+
+    def _wait(self):
+        try:
+            result = pickle.loads(self._conn.recv_bytes())
+        except (EOFError, OSError):
+            result = IsolatedResult(mutations=list(), run_ms=0,
+                                    error='The plugin process exited unexpectedly.')
+        self._process.join()
+        self._dispatch(self._on_done, result)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Wait for the result to be dispatched. Mostly useful outside of the GUI."""
+        self._thread.join(timeout)
+
+    def terminate(self):
+        if self._process.is_alive():
+            self._process.terminate()
+            logging.getLogger('plugin-manager').info('Terminated isolated plugin process.')
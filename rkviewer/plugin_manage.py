@@ -1,102 +1,464 @@
 """Classes for managing plugins."""
 # pylint: disable=maybe-no-member
 import wx
+import iodine as iod
 # pylint: disable=no-name-in-module
 from wx.html import HtmlWindow
+from dataclasses import dataclass, field
+import html
 import sys
 import os
 import importlib.abc
 import importlib.util
 import inspect
-from rkviewer.events import CanvasEvent, DidAddNodeEvent, DidCommitNodePositionsEvent, DidMoveNodesEvent, DidPaintCanvasEvent, SelectionDidUpdateEvent, bind_handler
+import logging
+import time
+import traceback
+from rkviewer.config import settings
+from rkviewer.events import CanvasEvent, DidAddNodeEvent, DidCommitNodePositionsEvent, DidMoveNodesEvent, DidPaintCanvasEvent, SelectionDidUpdateEvent, SimulationDidProgressEvent, bind_handler
 from rkviewer.mvc import IController
-from typing import Any, Callable, List, cast
-from rkplugin.plugins import CommandPlugin, Plugin, PluginType, WindowedPlugin
+from rkviewer.plugin_isolation import IsolatedResult, IsolatedRun, make_payload, replay
+from rkviewer.plugin_manifest import ClassManifest, ManifestCache
+from rkviewer.plugin_worker import MergeFunction, PluginWorker, merge_move_args, snapshot_args
+from rkviewer.profiler import profiler
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
+from rkplugin.plugins import CommandPlugin, Plugin, PluginMetadata, PluginType, WindowedPlugin
+
+
+#: Handlers for which only the latest event matters, so deferred calls may be coalesced into one.
+COALESCED_HANDLERS = {'on_did_move_nodes', 'on_did_commit_node_positions',
+                      'on_selection_did_change'}
+#: Coalesced handlers whose events carry deltas, which are merged rather than replaced.
+MERGED_HANDLERS: Dict[str, MergeFunction] = {'on_did_move_nodes': merge_move_args}
+#: Handlers that must run synchronously (e.g. the GraphicsContext is only valid during the paint),
+#: so throttling them means skipping calls instead of deferring them.
+SYNC_HANDLERS = {'on_did_paint_canvas'}
+#: Name of the plugin manifest cache, stored in the __pycache__ folder of the plugin directory.
+MANIFEST_CACHE_NAME = 'rkplugin-manifest.json'
+
+
+@dataclass
+class HandlerStats:
+    """Timing statistics of one event handler of one plugin. Times are in milliseconds.
+
+    Attributes:
+        calls: The number of times the handler was called.
+        total: The total time spent in the handler.
+        max: The longest call.
+        over_budget: The number of calls that took longer than the budget.
+        strikes: The number of consecutive calls over budget, or, when throttled, the number of
+            consecutive calls within budget.
+        throttled: Whether the handler is currently throttled.
+        deferred: The number of events whose delivery was deferred while throttled.
+        skipped: The number of events that were never delivered, because they were coalesced or
+            because the (synchronous) handler was called too recently.
+        last_call: The time.perf_counter() value at the start of the last call, in seconds.
+        pending: Arguments of the deferred events that are yet to be delivered.
+        scheduled: Whether a deferred delivery is currently scheduled.
+    """
+    calls: int = 0
+    total: float = 0
+    max: float = 0
+    over_budget: int = 0
+    strikes: int = 0
+    throttled: bool = False
+    deferred: int = 0
+    skipped: int = 0
+    last_call: float = 0
+    pending: List[Tuple] = field(default_factory=list)
+    scheduled: bool = False
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls != 0 else 0
+
+    def add_sample(self, duration: float, budget: float) -> bool:
+        """Record the timing of a call that took 'duration' ms. Returns True if over budget."""
+        self.calls += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        over = duration > budget
+        if over:
+            self.over_budget += 1
+        return over
+
+    def record(self, duration: float, budget: float, strike_limit: int) -> bool:
+        """Record a call that took 'duration' ms. Returns True if the throttled state changed."""
+        over = self.add_sample(duration, budget)
+
+        # When not throttled, count consecutive slow calls; when throttled, count consecutive
+        # fast calls.
+        if over != self.throttled:
+            self.strikes += 1
+        else:
+            self.strikes = 0
+        if self.strikes >= strike_limit:
+            self.throttled = not self.throttled
+            self.strikes = 0
+            return True
+        return False
+
+
+def import_plugin_classes(path: str) -> Tuple[List[type], float]:
+    """Import the given plugin file as a new module.
+
+    Returns the plugin classes the file defines, and how long the import took in milliseconds.
+    """
+    f = os.path.basename(path)
+    mod_name = '_rkplugin_{}'.format(f[:-3])  # remove extension
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(mod_name, path)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    loader = cast(importlib.abc.Loader, spec.loader)
+    loader.exec_module(mod)
+    import_ms = (time.perf_counter() - start) * 1000
+
+    def pred(o): return o.__module__ == mod_name and issubclass(o, Plugin)
+    cur_classes = [m[1] for m in inspect.getmembers(mod, inspect.isclass) if pred(m[1])]
+    for cls in cur_classes:
+        if inspect.isabstract(cls):
+            raise ValueError("In file {}, {} is an abstract class", f)
+    return cur_classes, import_ms
+
+
+class PluginEntry:
+    """A discovered plugin, which may not have been imported yet.
+
+    Attributes:
+        metadata: The metadata of the plugin.
+        ptype: The type of the plugin.
+        path: The file that defines the plugin.
+        class_name: The name of the plugin class.
+        instance: The plugin instance, or None if it has not been loaded yet.
+        isolated: Whether the plugin is run in a separate process; see Plugin.isolated. Such a
+            plugin is never loaded in the editor process.
+    """
+    metadata: PluginMetadata
+    ptype: PluginType
+    path: str
+    class_name: str
+    instance: Optional[Plugin]
+    isolated: bool
+
+    def __init__(self, metadata: PluginMetadata, ptype: PluginType, path: str, class_name: str,
+                 instance: Optional[Plugin] = None, isolated: bool = False):
+        self.metadata = metadata
+        self.ptype = ptype
+        self.path = path
+        self.class_name = class_name
+        self.instance = instance
+        self.isolated = isolated
 
 
 class PluginManager:
+    """Discovers and loads plugins, and dispatches events to them.
+
+    Plugins are discovered from a manifest (see rkviewer.plugin_manifest) without importing them.
+    A plugin file is only imported at startup if one of its plugins handles events; otherwise it is
+    imported when the plugin is first used.
+
+    Attributes:
+        entries: All the discovered plugins, loaded or not.
+        plugins: The plugins that have been loaded, i.e. imported and instantiated.
+        canvas: The canvas, used to take the snapshot given to isolated plugins. Set by
+            bind_canvas().
+    """
+    entries: List[PluginEntry]
     plugins: List[Plugin]
+    canvas: Optional[Any]
+    #: Maps a plugin to the stats of each of its handlers
+    stats: Dict[Plugin, Dict[str, HandlerStats]]
+    #: Maps each plugin with async_events to the worker that delivers its events
+    workers: Dict[Plugin, PluginWorker]
 
     def __init__(self, controller: IController):
+        self.entries = list()
         self.plugins = list()
+        self._modules = dict()
+        self._manifest_cache = None
+        self.stats = dict()
+        self.workers = dict()
+        self.canvas = None
+        self._isolated_runs = dict()  # Maps an isolated PluginEntry to its current run
         self.controller = controller
+        self.logger = logging.getLogger('plugin-manager')
         bind_handler(DidAddNodeEvent, self.make_notify('on_did_add_node'))
         bind_handler(DidMoveNodesEvent, self.make_notify('on_did_move_nodes'))
         bind_handler(DidCommitNodePositionsEvent, self.make_notify('on_did_commit_node_positions'))
         bind_handler(SelectionDidUpdateEvent, self.make_notify('on_selection_did_change'))
         bind_handler(DidPaintCanvasEvent, self.make_notify('on_did_paint_canvas'))
+        bind_handler(SimulationDidProgressEvent, self.make_notify('on_simulation_did_progress'))
 
     # Also TODO might want a more sophisticated file system structure, including data storage and
     # temp folder
     def load_from(self, dir_path: str) -> bool:
-        """Load plugins from the given directory. Returns False if the dir does not exist.
+        """Discover plugins in the given directory. Returns False if the dir does not exist.
+
+        Plugins that handle events (or that cannot be understood without importing them) are
+        loaded right away; the others are loaded on first use, see load().
         """
         if not os.path.exists(dir_path):
             return False
 
-        plugin_classes = list()
-        for f in os.listdir(dir_path):
-            if not f.endswith('.py'):
-                continue
-            mod_name = '_rkplugin_{}'.format(f[:-2])  # remove extension
-            spec = importlib.util.spec_from_file_location(mod_name, os.path.join(dir_path, f))
-            mod = importlib.util.module_from_spec(spec)
-            assert spec.loader is not None
-            loader = cast(importlib.abc.Loader, spec.loader)
-            loader.exec_module(mod)
-
-            def pred(o): return o.__module__ == mod_name and issubclass(o, Plugin)
-            cur_classes = [m[1] for m in inspect.getmembers(mod, inspect.isclass) if pred(m[1])]
-            for cls in cur_classes:
-                if inspect.isabstract(cls):
-                    raise ValueError("In file {}, {} is an abstract class", f)
-            plugin_classes += cur_classes
-
-        self.plugins = [cls() for cls in plugin_classes]
+        start = time.perf_counter()
+        cache = ManifestCache(os.path.join(dir_path, '__pycache__', MANIFEST_CACHE_NAME))
+        self._manifest_cache = cache
+        paths = sorted(os.path.join(dir_path, f) for f in os.listdir(dir_path) if f.endswith('.py'))
+        cache.prune(paths)
+
+        num_deferred = 0
+        deferred_ms = 0.0
+        num_unmeasured = 0
+        for path in paths:
+            manifest = cache.get(path)
+            entries = None
+            if not manifest.needs_import:
+                assert manifest.classes is not None
+                entries = self._entries_from_manifest(path, manifest.classes)
+            if entries is None:
+                # Import now and create the entries from the instances
+                for cls in self._import_file(path):
+                    self.entries.append(self._entry_from_instance(path, cls()))
+            else:
+                self.entries += entries
+                if len(entries) != 0:
+                    num_deferred += 1
+                    if manifest.import_ms is None:
+                        num_unmeasured += 1
+                    else:
+                        deferred_ms += manifest.import_ms
+
+        cache.save()
+        self.logger.info('Discovered %d plugins in %.1fms. Deferred importing %d plugin files, '
+                         'saving about %.1fms at startup%s.', len(self.entries),
+                         (time.perf_counter() - start) * 1000, num_deferred, deferred_ms,
+                         '' if num_unmeasured == 0 else
+                         ' ({} files not measured yet)'.format(num_unmeasured))
         return True
 
+    def bind_canvas(self, canvas):
+        self.canvas = canvas
+
+    def _entries_from_manifest(self, path: str,
+                               classes: List[ClassManifest]) -> Optional[List[PluginEntry]]:
+        try:
+            return [PluginEntry(PluginMetadata(**c.metadata), PluginType[c.ptype.upper()], path,
+                                c.name, isolated=c.isolated and c.ptype == 'command')
+                    for c in classes]
+        except (TypeError, KeyError):
+            # The metadata in the file is incomplete; importing it will report the problem
+            return None
+
+    def _entry_from_instance(self, path: str, plugin: Plugin) -> PluginEntry:
+        self._add_loaded(plugin)
+        return PluginEntry(plugin.metadata, plugin.ptype, path, type(plugin).__name__, plugin,
+                           isolated=plugin.isolated and plugin.ptype == PluginType.COMMAND)
+
+    def _import_file(self, path: str) -> List[type]:
+        """Import the given plugin file (at most once) and return the plugin classes it defines."""
+        if path in self._modules:
+            return self._modules[path]
+
+        cur_classes, import_ms = import_plugin_classes(path)
+        self._modules[path] = cur_classes
+        if self._manifest_cache is not None:
+            self._manifest_cache.set_import_ms(path, import_ms)
+            self._manifest_cache.save()
+        return cur_classes
+
+    def _add_loaded(self, plugin: Plugin):
+        self.plugins.append(plugin)
+        self.stats[plugin] = dict()
+        if plugin.async_events:
+            self._start_worker(plugin)
+
+    def load(self, entry: PluginEntry) -> Plugin:
+        """Return the instance of the given plugin, importing and instantiating it if needed."""
+        if entry.instance is None:
+            classes = {cls.__name__: cls for cls in self._import_file(entry.path)}
+            if entry.class_name not in classes:
+                raise ValueError("Plugin class {} not found in {}; the plugin manifest may be out "
+                                 "of date".format(entry.class_name, entry.path))
+            entry.instance = classes[entry.class_name]()
+            self._add_loaded(entry.instance)
+            self.logger.info("Loaded plugin '%s' on demand.", entry.metadata.name)
+        return entry.instance
+
+    def _start_worker(self, plugin: Plugin):
+        worker = PluginWorker(plugin, 'plugin-{}'.format(plugin.metadata.name), wx.CallAfter,
+                              settings['plugin_queue_size'], COALESCED_HANDLERS, MERGED_HANDLERS)
+        stats = self.stats[plugin]
+
+        # Called on the worker thread. Only that thread writes these stats once the plugin is
+        # asynchronous, and the dialog only reads them.
+        def on_done(handler_name: str, duration: float):
+            stats.setdefault(handler_name, HandlerStats()).add_sample(
+                duration, settings['plugin_handler_budget'])
+
+        worker.on_done = on_done
+        self.workers[plugin] = worker
+
+    def shutdown(self, timeout: float = 1.0):
+        """Stop the workers of the plugins, dropping the events they have yet to deliver.
+
+        Each worker is waited for at most 'timeout' seconds, in case its current handler is slow.
+        """
+        for worker in self.workers.values():
+            worker.stop(timeout, discard=True)
+        self.workers.clear()
+
     def make_notify(self, handler_name: str):
         assert callable(getattr(Plugin, handler_name, None)), "{} is not a method defined by \
 Plugin!".format(handler_name)
 
+        base_handler = getattr(Plugin, handler_name)
+
         def ret(evt: CanvasEvent):
             args = evt.to_tuple()
             for plugin in self.plugins:
-                getattr(plugin, handler_name)(*args)
+                # Plugins that do not override the handler would do nothing; don't time those.
+                if getattr(type(plugin), handler_name) is base_handler:
+                    continue
+                worker = self.workers.get(plugin)
+                if worker is not None and handler_name not in SYNC_HANDLERS:
+                    # Node, Reaction, etc. are mutated in place by the canvas, so send a snapshot
+                    worker.post(handler_name, snapshot_args(args))
+                    continue
+                stats = self.stats[plugin].setdefault(handler_name, HandlerStats())
+                if stats.throttled:
+                    self._deliver_throttled(plugin, handler_name, stats, args)
+                else:
+                    self._call_handler(plugin, handler_name, stats, args)
 
         return ret
 
+    def _call_handler(self, plugin: Plugin, handler_name: str, stats: HandlerStats, args: Tuple):
+        start = time.perf_counter()
+        stats.last_call = start
+        getattr(plugin, handler_name)(*args)
+        duration = (time.perf_counter() - start) * 1000
+        profiler.add('plugin.{}.{}'.format(plugin.metadata.name, handler_name), duration)
+
+        if stats.record(duration, settings['plugin_handler_budget'],
+                        settings['plugin_strike_limit']):
+            if stats.throttled:
+                self.logger.warning("Plugin '%s' exceeded the %sms budget in %s repeatedly; "
+                                    "throttling it.", plugin.metadata.name,
+                                    settings['plugin_handler_budget'], handler_name)
+            else:
+                self.logger.info("Plugin '%s' is within budget in %s again; no longer throttled.",
+                                 plugin.metadata.name, handler_name)
+
+    def _deliver_throttled(self, plugin: Plugin, handler_name: str, stats: HandlerStats,
+                           args: Tuple):
+        """Deliver an event to a throttled handler.
+
+        Synchronous handlers are called at most once per throttle interval, and other events are
+        skipped. Other handlers are deferred and delivered together after the interval, with
+        only the latest event delivered for handlers in COALESCED_HANDLERS, or the events merged
+        into one for those in MERGED_HANDLERS.
+        """
+        interval = settings['plugin_throttle_interval']
+        if handler_name in SYNC_HANDLERS:
+            if (time.perf_counter() - stats.last_call) * 1000 >= interval:
+                self._call_handler(plugin, handler_name, stats, args)
+            else:
+                stats.skipped += 1
+            return
+
+        stats.deferred += 1
+        if handler_name in COALESCED_HANDLERS and len(stats.pending) != 0:
+            if handler_name in MERGED_HANDLERS:
+                args = MERGED_HANDLERS[handler_name](stats.pending[-1], args)
+            stats.skipped += len(stats.pending)
+            stats.pending.clear()
+        stats.pending.append(args)
+
+        if not stats.scheduled:
+            stats.scheduled = True
+            wx.CallLater(interval, self._flush_deferred, plugin, handler_name, stats)
+
+    def _flush_deferred(self, plugin: Plugin, handler_name: str, stats: HandlerStats):
+        stats.scheduled = False
+        pending = stats.pending
+        stats.pending = list()
+        for args in pending:
+            self._call_handler(plugin, handler_name, stats, args)
+
     def register_menu(self, menu: wx.Menu, parent: wx.Window):
-        commands = [cast(CommandPlugin, p) for p in self.plugins if p.ptype == PluginType.COMMAND]
-        windowed = [cast(WindowedPlugin, p) for p in self.plugins if p.ptype == PluginType.WINDOWED]
+        commands = [e for e in self.entries if e.ptype == PluginType.COMMAND]
+        windowed = [e for e in self.entries if e.ptype == PluginType.WINDOWED]
 
-        if len(self.plugins) != 0:
+        if len(self.entries) != 0:
             menu.AppendSeparator()
 
-        for plugin in commands:
+        for entry in commands:
             id_ = wx.NewIdRef(count=1)
-            item = menu.Append(id_, plugin.metadata.name)
-            menu.Bind(wx.EVT_MENU, self.make_command_callback(plugin), item)
+            item = menu.Append(id_, entry.metadata.name)
+            menu.Bind(wx.EVT_MENU, self.make_command_callback(entry), item)
 
         if len(commands) != 0 and len(windowed) != 0:
             menu.AppendSeparator()
 
-        for plugin in windowed:
+        for entry in windowed:
             id_ = wx.NewIdRef(count=1)
-            item = menu.Append(id_, plugin.metadata.name)
-            menu.Bind(wx.EVT_MENU, self.make_windowed_callback(plugin, parent), item)
+            item = menu.Append(id_, entry.metadata.name)
+            menu.Bind(wx.EVT_MENU, self.make_windowed_callback(entry, parent), item)
 
-    def make_command_callback(self, command: CommandPlugin) -> Callable[[Any], None]:
+    def make_command_callback(self, entry: PluginEntry) -> Callable[[Any], None]:
         def command_cb(_):
+            if entry.isolated:
+                self._run_isolated(entry)
+                return
+            command = cast(CommandPlugin, self.load(entry))
             self.controller.start_group()
             command.run()
             self.controller.end_group()
 
         return command_cb
 
-    def make_windowed_callback(self, windowed: WindowedPlugin,
+    def _run_isolated(self, entry: PluginEntry):
+        """Run the given command plugin in a separate process; see rkviewer.plugin_isolation."""
+        if entry in self._isolated_runs:
+            self.logger.info("Plugin '%s' is already running.", entry.metadata.name)
+            return
+        assert self.canvas is not None
+        payload = make_payload(self.canvas)
+        version = iod.getModelVersion()
+        start = time.perf_counter()
+
+        def on_done(result: IsolatedResult):
+            del self._isolated_runs[entry]
+            name = entry.metadata.name
+            if result.error is not None:
+                self.logger.error("Caught error in isolated plugin '%s':", name)
+                self.logger.error(result.error)
+                return
+            if iod.getModelVersion() != version:
+                # The mutations refer to items by index, which may now be other items
+                self.logger.warning("The network changed while plugin '%s' was running; its "
+                                    "changes were discarded.", name)
+                wx.MessageBox("The network changed while plugin '{}' was running, so its changes "
+                              "were discarded. Run it again.".format(name), name,
+                              wx.OK | wx.ICON_WARNING)
+                return
+            try:
+                replay(self.controller, result.mutations)
+            except Exception:
+                self.logger.error("Caught error when applying the changes of plugin '%s':", name)
+                self.logger.error(traceback.format_exc())
+                return
+            self.logger.info("Isolated plugin '%s' ran in %.1fms (%.1fms in total); applied %d "
+                             "changes.", name, result.run_ms, (time.perf_counter() - start) * 1000,
+                             len(result.mutations))
+
+        self._isolated_runs[entry] = IsolatedRun(entry.path, entry.class_name, payload,
+                                                 wx.CallAfter, on_done)
+
+    def make_windowed_callback(self, entry: PluginEntry,
                                parent: wx.Window) -> Callable[[Any], None]:
-        title = windowed.metadata.name
+        title = entry.metadata.name
         dialog_exists = False
         dialog: wx.Window = None
 
@@ -104,6 +466,7 @@ Plugin!".format(handler_name)
             nonlocal dialog_exists, dialog
 
             if not dialog_exists:
+                windowed = cast(WindowedPlugin, self.load(entry))
                 dialog = wx.Dialog(parent, title=title)
                 dialog_exists = True
                 window = windowed.create_window(dialog)
@@ -125,11 +488,13 @@ Plugin!".format(handler_name)
         return windowed_cb
 
     def create_dialog(self, parent):
-        return PluginDialog(parent, self.plugins)
+        dropped = {plugin: worker.queue.dropped for plugin, worker in self.workers.items()}
+        return PluginDialog(parent, self.entries, self.stats, dropped)
 
 
 class PluginDialog(wx.Dialog):
-    def __init__(self, parent, plugins: List[Plugin]):
+    def __init__(self, parent, entries: List[PluginEntry],
+                 stats: Dict[Plugin, Dict[str, HandlerStats]], dropped: Dict[Plugin, int]):
         super().__init__(parent, title='Manage Plugins', size=(900, 550))
         notebook = wx.Listbook(self, style=wx.LB_LEFT)
         notebook.GetListView().SetFont(wx.Font(wx.FontInfo(10)))
@@ -138,35 +503,69 @@ class PluginDialog(wx.Dialog):
         sizer = wx.BoxSizer()
         sizer.Add(notebook, proportion=1, flag=wx.EXPAND)
 
-        for plugin in plugins:
-            page = PluginPage(notebook, plugin)
-            notebook.AddPage(page, text=plugin.metadata.name)
+        for entry in entries:
+            page = PluginPage(notebook, entry.metadata, stats.get(entry.instance, dict()),
+                              dropped.get(entry.instance))
+            notebook.AddPage(page, text=entry.metadata.name)
 
         self.SetSizer(sizer)
 
 
 class PluginPage(HtmlWindow):
-    def __init__(self, parent: wx.Window, plugin: Plugin):
+    def __init__(self, parent: wx.Window, metadata: PluginMetadata, stats: Dict[str, HandlerStats],
+                 dropped: Optional[int] = None):
+        """
+        Args:
+            parent: The parent window.
+            metadata: The metadata of the plugin.
+            stats: The stats of each event handler of the plugin.
+            dropped: If the plugin receives events asynchronously, the number of events dropped
+                from its queue; otherwise None.
+        """
         super().__init__(parent)
 
-        html = '''
+        page = '''
         <h3>{name}</h3>
         <div>{author}｜v{version}</div>
         <hr/>
         <div>
             {description}
         </div>
+        {stats}
         '''.format(
-            name=plugin.metadata.name,
-            version=plugin.metadata.version,
-            author=plugin.metadata.author,
-            description=plugin.metadata.long_desc,
+            name=metadata.name,
+            version=metadata.version,
+            author=metadata.author,
+            description=metadata.long_desc,
+            stats=self._StatsTable(stats, dropped),
         )
 
-        self.SetPage(html)
+        self.SetPage(page)
         # inherit parent background color for better look
         self.SetBackgroundColour(parent.GetBackgroundColour())
 
+    def _StatsTable(self, stats: Dict[str, HandlerStats], dropped: Optional[int]) -> str:
+        if len(stats) == 0 and dropped is None:
+            return ''
+        rows = list()
+        for handler_name, st in sorted(stats.items()):
+            rows.append('''<tr><td>{}</td><td>{}</td><td>{:.2f}</td><td>{:.2f}</td><td>{}</td>
+                <td>{}</td><td>{}</td><td>{}</td></tr>'''.format(
+                html.escape(handler_name), st.calls, st.mean, st.max, st.over_budget,
+                st.deferred, st.skipped, 'throttled' if st.throttled else 'ok'))
+        return '''
+        <hr/>
+        <h4>Event handlers (budget {budget}ms)</h4>
+        {mode}
+        <table border="1" cellpadding="2">
+            <tr><th>handler</th><th>calls</th><th>mean (ms)</th><th>max (ms)</th>
+                <th>over budget</th><th>deferred</th><th>skipped</th><th>status</th></tr>
+            {rows}
+        </table>
+        '''.format(budget=settings['plugin_handler_budget'], rows=''.join(rows),
+                   mode='' if dropped is None else
+                   '<div>Asynchronous; {} queued events dropped or coalesced.</div>'.format(dropped))
+
         '''
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer_flags = wx.SizerFlags().Border(wx.TOP | wx.LEFT, 10)
@@ -0,0 +1,252 @@
+"""Discovery of plugins without importing them.
+
+Plugin files are parsed (not executed) to find the plugin classes, their metadata and the event
+handlers they override. This is enough to build the plugin menus, so that a plugin module only
+needs to be imported when it is first used, or at startup if it handles events.
+
+The results are cached in a JSON file, keyed by the path, modification time and size of each
+plugin file. The cache also remembers how long importing each file took, which is used to estimate
+the startup time saved by not importing it.
+"""
+import ast
+from dataclasses import asdict, dataclass, field
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+
+#: Plugin methods that are event handlers. A plugin that overrides any of these must be imported
+#: at startup, so that it receives the events.
+EVENT_HANDLERS = frozenset((
+    'on_did_add_node',
+    'on_did_move_nodes',
+    'on_did_commit_node_positions',
+    'on_did_paint_canvas',
+    'on_selection_did_change',
+    'on_simulation_did_progress',
+))
+#: Names of the plugin base classes, mapped to the plugin type.
+PLUGIN_BASES = {'CommandPlugin': 'command', 'WindowedPlugin': 'windowed'}
+#: Boolean class attributes of a plugin that are recorded in the manifest.
+FLAG_ATTRIBUTES = ('async_events', 'isolated')
+MANIFEST_VERSION = 4  #: Version of the cache format; older caches are discarded.
+
+
+@dataclass
+class ClassManifest:
+    """What is known about a plugin class without importing it.
+
+    Attributes:
+        name: The name of the class.
+        ptype: Either 'command' or 'windowed'.
+        metadata: The keyword arguments of the PluginMetadata the plugin is constructed with.
+        handlers: The event handlers (see EVENT_HANDLERS) that the class overrides.
+        hidden_handlers: Whether the class may override event handlers other than by a def in its
+            body, e.g. by inheriting them from another base class or by assigning them.
+        async_events: Whether the class sets async_events to True.
+        isolated: Whether the class sets isolated to True.
+    """
+    name: str
+    ptype: str
+    metadata: Dict[str, str]
+    handlers: List[str] = field(default_factory=list)
+    hidden_handlers: bool = False
+    async_events: bool = False
+    isolated: bool = False
+
+    @property
+    def needs_import(self) -> bool:
+        """Whether the plugin should be imported at startup, since it handles events."""
+        return len(self.handlers) != 0 or self.hidden_handlers
+
+
+@dataclass
+class FileManifest:
+    """The result of scanning a plugin file.
+
+    Attributes:
+        path: The path of the file.
+        mtime: The modification time of the file when it was scanned.
+        size: The size of the file when it was scanned.
+        classes: The plugin classes found in the file, or None if the file could not be fully
+            understood (e.g. the metadata is not a literal), in which case it has to be imported.
+        import_ms: How long importing the file took the last time it was imported, if ever.
+    """
+    path: str
+    mtime: float
+    size: int
+    classes: Optional[List[ClassManifest]]
+    import_ms: Optional[float] = None
+
+    @property
+    def needs_import(self) -> bool:
+        return self.classes is None or any(c.needs_import for c in self.classes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @staticmethod
+    def from_dict(d: Dict[str, Any]) -> 'FileManifest':
+        classes = d['classes']
+        if classes is not None:
+            classes = [ClassManifest(**c) for c in classes]
+        return FileManifest(path=d['path'], mtime=d['mtime'], size=d['size'], classes=classes,
+                            import_ms=d.get('import_ms'))
+
+
+def _base_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _literal_metadata(call: ast.expr) -> Optional[Dict[str, str]]:
+    """Return the keyword arguments of a PluginMetadata(...) call, if they are all literals."""
+    if not isinstance(call, ast.Call) or _base_name(call.func) != 'PluginMetadata' or call.args:
+        return None
+    try:
+        return {kw.arg: ast.literal_eval(kw.value) for kw in call.keywords if kw.arg is not None}
+    except ValueError:
+        return None
+
+
+def scan_source(source: str) -> Optional[List[ClassManifest]]:
+    """Find the plugin classes defined in the given source code.
+
+    Returns None if the source defines plugin classes whose metadata cannot be determined
+    statically. The metadata may either be a module-level assignment
+    'metadata = PluginMetadata(...)' with literal arguments (the convention used by the bundled
+    plugins), or a PluginMetadata(...) call with literal arguments inside the class body.
+    """
+    tree = ast.parse(source)
+    module_metadata = None
+    for stmt in tree.body:
+        if isinstance(stmt, ast.Assign) and any(isinstance(t, ast.Name) and t.id == 'metadata'
+                                                for t in stmt.targets):
+            module_metadata = _literal_metadata(stmt.value)
+
+    classes = list()
+    for stmt in tree.body:
+        if not isinstance(stmt, ast.ClassDef):
+            continue
+        base_names = [_base_name(b) for b in stmt.bases]
+        if any(b is None or (b.endswith('Plugin') and b not in PLUGIN_BASES) for b in base_names):
+            # Possibly derived from a plugin class indirectly; only an import can tell
+            return None
+        ptypes = [PLUGIN_BASES[b] for b in base_names if b in PLUGIN_BASES]
+        if len(ptypes) == 0:
+            continue
+
+        metadata = None
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Call) and _base_name(node.func) == 'PluginMetadata':
+                metadata = _literal_metadata(node)
+                break
+        else:
+            metadata = module_metadata
+        if metadata is None:
+            return None
+
+        handlers = list()
+        flags = dict()
+        # Handlers may come from any other base class, e.g. a mixin
+        hidden_handlers = any(b not in PLUGIN_BASES and b not in ('ABC', 'object')
+                              for b in base_names)
+        for item in stmt.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if item.name in EVENT_HANDLERS:
+                    handlers.append(item.name)
+                continue
+            for node in ast.walk(item):
+                # A handler bound otherwise, e.g. 'on_did_move_nodes = handle_moves'
+                if (isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+                        and node.id in EVENT_HANDLERS):
+                    hidden_handlers = True
+            if isinstance(item, ast.Assign):
+                for target in item.targets:
+                    if isinstance(target, ast.Name) and target.id in FLAG_ATTRIBUTES:
+                        try:
+                            flags[target.id] = bool(ast.literal_eval(item.value))
+                        except ValueError:
+                            return None
+        classes.append(ClassManifest(name=stmt.name, ptype=ptypes[0], metadata=metadata,
+                                     handlers=handlers, hidden_handlers=hidden_handlers, **flags))
+    return classes
+
+
+def scan_file(path: str) -> FileManifest:
+    stat = os.stat(path)
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    try:
+        classes = scan_source(source)
+    except SyntaxError:
+        # Let the import report the error
+        classes = None
+    return FileManifest(path=path, mtime=stat.st_mtime, size=stat.st_size, classes=classes)
+
+
+class ManifestCache:
+    """Cache of FileManifests, stored as JSON.
+
+    Attributes:
+        cache_path: The path of the JSON file.
+        dirty: Whether the cache has changed since it was loaded.
+    """
+    cache_path: str
+    dirty: bool
+    _manifests: Dict[str, FileManifest]
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.dirty = False
+        self._manifests = dict()
+        try:
+            with open(cache_path) as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self._manifests = {d['path']: FileManifest.from_dict(d) for d in data['files']}
+        except (OSError, ValueError, KeyError, TypeError):
+            logging.getLogger('plugin-manager').info('Plugin manifest cache not loaded; '
+                                                     'rescanning all plugins.')
+
+    def get(self, path: str) -> FileManifest:
+        """Return the manifest of the given file, scanning it if not cached or out of date."""
+        stat = os.stat(path)
+        manifest = self._manifests.get(path)
+        if manifest is None or manifest.mtime != stat.st_mtime or manifest.size != stat.st_size:
+            import_ms = manifest.import_ms if manifest is not None else None
+            manifest = scan_file(path)
+            manifest.import_ms = import_ms  # Still a good estimate
+            self._manifests[path] = manifest
+            self.dirty = True
+        return manifest
+
+    def set_import_ms(self, path: str, import_ms: float):
+        if path in self._manifests:
+            self._manifests[path].import_ms = import_ms
+            self.dirty = True
+
+    def prune(self, paths: List[str]):
+        """Forget the files that are not in the given list, e.g. removed plugins."""
+        keep = set(paths)
+        for path in list(self._manifests):
+            if path not in keep:
+                del self._manifests[path]
+                self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            with open(self.cache_path, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION,
+                           'files': [m.to_dict() for m in self._manifests.values()]}, f)
+            self.dirty = False
+        except OSError:
+            logging.getLogger('plugin-manager').warning('Could not write the plugin manifest '
+                                                        'cache to %s', self.cache_path)
@@ -0,0 +1,198 @@
+"""Off-UI-thread delivery of events to plugins.
+
+A plugin that opts in (see Plugin.async_events) gets its own PluginWorker thread. Events are
+queued on an EventQueue, which is bounded and coalesces events for which only the latest matters,
+or which can be merged (e.g. moves while dragging), so that a flood of events cannot build an
+unbounded backlog. The arguments of the events are copied with snapshot_args() on the UI thread,
+since the canvas mutates its nodes in place.
+
+This module does not depend on wx; the function used to run results on the UI thread (i.e.
+wx.CallAfter) is passed in by the plugin manager.
+"""
+from collections import deque
+import copy
+import logging
+import threading
+import time
+import traceback
+from typing import Any, Callable, Collection, Deque, Dict, Mapping, Optional, Tuple
+
+
+QueueItem = Tuple[str, Tuple]  #: (handler name, handler arguments)
+#: Merges the arguments of a pending event and of a newer one into those of a single event
+MergeFunction = Callable[[Tuple, Tuple], Tuple]
+
+
+def merge_move_args(old: Tuple, new: Tuple) -> Tuple:
+    """Merge the arguments of two on_did_move_nodes events, i.e. (nodes, offset, dragged).
+
+    The offsets of the events are deltas, so each node is moved by the sum of its offsets. The
+    offset is a single one if both events moved the same nodes by a single offset, and a list with
+    one offset per node otherwise.
+    """
+    if not isinstance(old[1], list) and not isinstance(new[1], list) and \
+            [n.index for n in old[0]] == [n.index for n in new[0]]:
+        return new[0], old[1] + new[1], new[2]
+    nodes: Dict[int, Any] = dict()
+    offsets: Dict[int, Any] = dict()
+    for moved, offset, _ in (old, new):
+        for i, node in enumerate(moved):
+            delta = offset[i] if isinstance(offset, list) else offset
+            offsets[node.index] = offsets[node.index] + delta if node.index in offsets else delta
+            nodes[node.index] = node  # The newer copy of the node
+    return list(nodes.values()), list(offsets.values()), new[2]
+
+
+def snapshot_args(args: Tuple) -> Tuple:
+    """Return a copy of the arguments of an event that later changes by the canvas do not affect.
+
+    The canvas mutates its nodes, reactions and compartments in place, but replaces their
+    attributes rather than mutating them (e.g. Vec2 has no in-place operators), so shallow copies
+    of them, and of the containers that hold them, are enough. This is much cheaper than a deep
+    copy, which would copy every color too.
+    """
+    def snapshot(value):
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return type(value)(snapshot(item) for item in value)
+        return copy.copy(value)
+
+    return tuple(snapshot(arg) for arg in args)
+
+
+class EventQueue:
+    """A bounded, thread-safe FIFO of (handler name, arguments) items.
+
+    Attributes:
+        maxlen: The maximum number of pending items. When full, the oldest item is dropped.
+        coalesced: Handler names whose consecutive items are coalesced: a new item replaces the
+            last item in the queue if that is for the same handler. Items are only coalesced
+            with the last one, so that no item is delivered before an earlier one.
+        merge: Maps some of the coalesced handler names to the function that merges the arguments
+            of the pending item with those of the new one, instead of replacing them.
+        dropped: The number of items that were dropped, either because the queue was full or
+            because they were coalesced.
+    """
+    maxlen: int
+    coalesced: Collection[str]
+    merge: Mapping[str, MergeFunction]
+    dropped: int
+    _items: Deque[QueueItem]
+    _cond: threading.Condition
+    _closed: bool
+
+    def __init__(self, maxlen: int, coalesced: Collection[str] = (),
+                 merge: Optional[Mapping[str, MergeFunction]] = None):
+        assert maxlen > 0
+        self.maxlen = maxlen
+        self.coalesced = coalesced
+        self.merge = merge or dict()
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, handler_name: str, args: Tuple):
+        with self._cond:
+            if self._closed:
+                return
+            if (handler_name in self.coalesced and len(self._items) != 0
+                    and self._items[-1][0] == handler_name):
+                if handler_name in self.merge:
+                    args = self.merge[handler_name](self._items[-1][1], args)
+                self._items[-1] = (handler_name, args)
+                self.dropped += 1
+                return
+            if len(self._items) == self.maxlen:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append((handler_name, args))
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[QueueItem]:
+        """Remove and return the oldest item, waiting for one if necessary.
+
+        Returns None if the queue is closed (and empty), or if the timeout expired.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._items) != 0 or self._closed, timeout):
+                return None
+            if len(self._items) == 0:
+                return None
+            return self._items.popleft()
+
+    def close(self, discard: bool = False):
+        """Stop accepting items. Items already queued may still be retrieved, unless discard is
+        True."""
+        with self._cond:
+            self._closed = True
+            if discard:
+                self.dropped += len(self._items)
+                self._items.clear()
+            self._cond.notify_all()
+
+
+class PluginWorker:
+    """A daemon thread that delivers queued events to the handlers of one plugin.
+
+    If a handler returns a callable, that callable is passed to 'dispatch', which should run it on
+    the UI thread. This is how an asynchronous handler applies its results, since only the UI
+    thread may modify the model or the view.
+
+    Attributes:
+        queue: The queue of pending events.
+        on_done: If not None, called after each handler call with the handler name and the
+            duration of the call in milliseconds.
+    """
+    queue: EventQueue
+    on_done: Optional[Callable[[str, float], None]]
+
+    def __init__(self, target: Any, name: str, dispatch: Callable[[Callable], Any], maxlen: int,
+                 coalesced: Collection[str] = (),
+                 merge: Optional[Mapping[str, MergeFunction]] = None):
+        """
+        Args:
+            target: The object whose handlers are called, i.e. the plugin.
+            name: Name of the worker thread.
+            dispatch: Function that runs a callable on the UI thread, e.g. wx.CallAfter.
+            maxlen: Maximum number of pending events; see EventQueue.
+            coalesced: Handler names whose pending events are coalesced; see EventQueue.
+            merge: How the arguments of some coalesced events are merged; see EventQueue.
+        """
+        self.queue = EventQueue(maxlen, coalesced, merge)
+        self.on_done = None
+        self._target = target
+        self._dispatch = dispatch
+        self._logger = logging.getLogger('plugin-worker')
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def post(self, handler_name: str, args: Tuple):
+        self.queue.put(handler_name, args)
+
+    def stop(self, timeout: Optional[float] = None, discard: bool = False):
+        """Stop the worker after the events already queued are delivered, or right after the
+        current one if discard is True."""
+        self.queue.close(discard)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            handler_name, args = item
+            start = time.perf_counter()
+            try:
+                result = getattr(self._target, handler_name)(*args)
+            except Exception:
+                self._logger.error('Caught error in asynchronous handler %s:', handler_name)
+                self._logger.error(traceback.format_exc())
+                continue
+            if self.on_done is not None:
+                self.on_done(handler_name, (time.perf_counter() - start) * 1000)
+            if callable(result):
+                self._dispatch(result)
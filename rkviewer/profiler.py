@@ -0,0 +1,152 @@
+"""Lightweight, always-available profiler for the canvas and controller hot paths.
+
+Timings are recorded per named phase (e.g. 'paint.background', 'motion', 'controller.move_node')
+into rolling windows, so that the most recent behavior can be inspected live (see
+ProfilerOverlay) or dumped to JSON for offline analysis with scripts/stat.py.
+
+Recording is a no-op unless the profiler is enabled, so the instrumentation can stay in the hot
+paths permanently.
+"""
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+import json
+import math
+import time
+from typing import DefaultDict, Deque, Dict, IO, Iterator, List, Optional
+
+
+DEFAULT_WINDOW = 120  #: Number of samples kept for each phase.
+PROFILE_FORMAT_VERSION = 1  #: Version number of the JSON dump format.
+
+
+@dataclass
+class PhaseStats:
+    """Summary of the samples currently in the window of a phase. All times are in milliseconds.
+
+    Attributes:
+        count: The number of samples in the window.
+        total: The sum of all samples.
+        mean: The mean of the samples.
+        p95: The 95th percentile of the samples.
+        max: The largest sample.
+    """
+    count: int
+    total: float
+    mean: float
+    p95: float
+    max: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return {'count': self.count, 'total_ms': self.total, 'mean_ms': self.mean,
+                'p95_ms': self.p95, 'max_ms': self.max}
+
+
+class Profiler:
+    """Records rolling timing samples for named phases.
+
+    Phases recorded between begin_frame() and end_frame() are summed over the frame and stored as
+    a single sample, so that e.g. the time spent painting all NodeElements in one paint appears as
+    one 'paint.NodeElement' sample. Phases recorded outside of a frame are stored directly.
+
+    Attributes:
+        enabled: Whether samples are being recorded.
+        window: The maximum number of samples kept for each phase.
+    """
+    enabled: bool
+    window: int
+    _samples: DefaultDict[str, Deque[float]]
+    _frame: Optional[Dict[str, float]]  #: Accumulated times of the current frame, if in one.
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.enabled = False
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._frame = None
+
+    def reset(self):
+        """Discard all recorded samples."""
+        self._samples.clear()
+        self._frame = None
+
+    def begin_frame(self):
+        if self.enabled:
+            self._frame = dict()
+
+    def end_frame(self):
+        if self._frame is not None:
+            for name, duration in self._frame.items():
+                self._samples[name].append(duration)
+            self._frame = None
+
+    def add(self, name: str, duration: float):
+        """Record a sample of 'duration' milliseconds for phase 'name'."""
+        if not self.enabled:
+            return
+        if self._frame is not None:
+            self._frame[name] = self._frame.get(name, 0) + duration
+        else:
+            self._samples[name].append(duration)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Context manager that records the time spent inside it as a sample of phase 'name'."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def phases(self) -> List[str]:
+        return sorted(self._samples.keys())
+
+    def samples(self, name: str) -> List[float]:
+        """Return the samples (in ms) currently in the window of the given phase, oldest first."""
+        if name not in self._samples:
+            return list()
+        return list(self._samples[name])
+
+    def stats(self, name: str) -> Optional[PhaseStats]:
+        """Return the summary of the given phase, or None if it has no samples."""
+        samples = self.samples(name)
+        if len(samples) == 0:
+            return None
+        ordered = sorted(samples)
+        total = sum(ordered)
+        p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+        return PhaseStats(count=len(ordered), total=total, mean=total / len(ordered), p95=p95,
+                          max=ordered[-1])
+
+    def histogram(self, name: str, bin_width: float, num_bins: int) -> List[int]:
+        """Return the histogram of the samples of the given phase.
+
+        Bins are [0, bin_width), [bin_width, 2 * bin_width), etc. The last bin also counts all the
+        samples that are larger than its upper bound.
+        """
+        bins = [0] * num_bins
+        for sample in self.samples(name):
+            bins[min(int(sample / bin_width), num_bins - 1)] += 1
+        return bins
+
+    def to_dict(self) -> Dict:
+        phases = dict()
+        for name in self.phases():
+            stats = self.stats(name)
+            if stats is None:
+                continue
+            phases[name] = dict(stats.to_dict(), samples_ms=self.samples(name))
+        return {
+            'version': PROFILE_FORMAT_VERSION,
+            'window': self.window,
+            'phases': phases,
+        }
+
+    def dump_json(self, fp: IO[str]):
+        """Write the current samples and their summaries as JSON; see scripts/stat.py."""
+        json.dump(self.to_dict(), fp, indent=2)
+
+
+profiler = Profiler()
@@ -0,0 +1,312 @@
+"""Parsing rate laws once, and compiling them to vectorized NumPy functions.
+
+A rate law is an infix expression such as 'Vm * S1^h / (Km^h + S1^h)', where '^' and '**' are
+both powers. compile_rate_law() parses it into an AST, checks that it only uses arithmetic, numbers,
+symbols and the functions in FUNCTIONS, and compiles it to a function of the values of its symbols.
+The values may be NumPy arrays of any (broadcastable) shape, e.g. one value per time point, so a
+rate law is evaluated for many states at once. Compiled rate laws are cached by their text, so
+reactions with the same rate law, or a rate law set back to a previous value, share one compilation.
+
+Which symbols of a rate law are species depends on the network: a symbol is a species if it is the
+ID of a node, and a parameter otherwise, and 'time' is the simulation time. RateLawCache binds the
+compiled rate laws of the reactions of iodine networks to their nodes, and drops a binding when the
+reaction changes or when a node of its network is renamed, added or deleted.
+"""
+import ast
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+import iodine as iod
+
+
+#: The functions a rate law may call, with the NumPy function each one is compiled to
+FUNCTIONS = {
+    'exp': 'np.exp', 'log': 'np.log', 'ln': 'np.log', 'log10': 'np.log10', 'sqrt': 'np.sqrt',
+    'abs': 'np.abs', 'floor': 'np.floor', 'ceil': 'np.ceil', 'sin': 'np.sin', 'cos': 'np.cos',
+    'tan': 'np.tan', 'asin': 'np.arcsin', 'acos': 'np.arccos', 'atan': 'np.arctan',
+    'sinh': 'np.sinh', 'cosh': 'np.cosh', 'tanh': 'np.tanh', 'pow': 'np.power',
+    'min': 'np.minimum', 'max': 'np.maximum',
+}
+_BINARY_FUNCTIONS = {'pow', 'min', 'max'}
+#: Names that are constants rather than symbols
+CONSTANTS = {'pi': 'np.pi'}
+TIME = 'time'  #: The name of the simulation time in rate laws
+
+_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow)
+_COMPILED_CACHE_SIZE = 4096
+
+RateFunction = Callable[[Sequence[Any], Any], Any]
+
+
+class RateLawError(ValueError):
+    """Raised for a rate law that cannot be parsed or compiled."""
+    pass
+
+
+def parse_rate_law(rate_law: str) -> ast.Expression:
+    """Parse a rate law into a Python AST, with '^' read as a power.
+
+    Raises:
+        RateLawError: If the rate law is not a valid expression.
+    """
+    if rate_law.strip() == '':
+        raise RateLawError('The rate law is empty')
+    try:
+        return ast.parse(rate_law.replace('^', '**').strip(), mode='eval')
+    except (SyntaxError, ValueError) as e:
+        raise RateLawError('Invalid rate law: {}'.format(getattr(e, 'msg', e))) from None
+    except RecursionError:
+        raise RateLawError('The rate law is nested too deeply') from None
+
+
+def number_value(node: ast.AST) -> Optional[Union[int, float]]:
+    """Return the value of a numeric literal, or None if the node is not one.
+
+    Python 3.7 parses numbers as ast.Num rather than ast.Constant.
+    """
+    if isinstance(node, ast.Constant):
+        value = node.value
+    elif sys.version_info < (3, 8) and isinstance(node, ast.Num):
+        value = node.n
+    else:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def numpy_tree(node: ast.AST, symbol_source: Callable[[str], str],
+               time_source: str = 't') -> ast.expr:
+    """Return the AST of a NumPy expression that computes a parsed rate law.
+
+    Args:
+        node: The parsed rate law, or any of its nodes.
+        symbol_source: Returns the source of the value of each symbol, e.g. 'v[0]'.
+        time_source: The source of the time.
+
+    Raises:
+        RateLawError: If the rate law uses anything but arithmetic, numbers, symbols and the
+                      functions in FUNCTIONS.
+    """
+    def parsed(source: str) -> ast.expr:
+        return ast.parse(source, mode='eval').body
+
+    def convert(node: ast.AST) -> ast.expr:
+        if isinstance(node, ast.Expression):
+            return convert(node.body)
+        if isinstance(node, ast.Name):
+            if node.id == TIME:
+                return parsed(time_source)
+            if node.id in CONSTANTS:
+                return parsed(CONSTANTS[node.id])
+            return parsed(symbol_source(node.id))
+        value = number_value(node)
+        if value is not None:
+            # Integer powers of float arrays, unlike those of integers, may be negative
+            return ast.Constant(float(value))
+        if isinstance(node, ast.BinOp) and isinstance(node.op, _OPERATORS):
+            return ast.BinOp(convert(node.left), node.op, convert(node.right))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            return ast.UnaryOp(node.op, convert(node.operand))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name not in FUNCTIONS:
+                raise RateLawError('Unknown function: {}'.format(name))
+            arity = 2 if name in _BINARY_FUNCTIONS else 1
+            if len(node.args) != arity:
+                raise RateLawError('{} takes {} argument{}'.format(name, arity,
+                                                                    '' if arity == 1 else 's'))
+            return ast.Call(parsed(FUNCTIONS[name]), [convert(arg) for arg in node.args], [])
+        raise RateLawError('Unsupported expression: {}'.format(type(node).__name__))
+
+    try:
+        return convert(node)
+    except RecursionError:
+        raise RateLawError('The rate law is nested too deeply') from None
+
+
+def compile_tree(template: str, trees: Mapping[str, ast.expr]) -> Dict[str, Any]:
+    """Run the given source with the expressions of the trees in place of the given names.
+
+    The trees, e.g. from numpy_tree(), are spliced into the parsed template rather than unparsed,
+    which ast.unparse() would need Python 3.9 for.
+
+    Args:
+        template: The source, e.g. 'def rate(v, t):\n    return RATE\n'.
+        trees: Maps each placeholder name of the template to its expression.
+
+    Returns:
+        The namespace the source was run in, which only has NumPy as np besides its definitions.
+
+    Raises:
+        RateLawError: If the trees are nested too deeply to be compiled.
+    """
+    class Splice(ast.NodeTransformer):
+        def visit_Name(self, node: ast.Name) -> ast.expr:
+            return trees.get(node.id, node)
+
+    namespace: Dict[str, Any] = {'np': np}
+    try:
+        tree = ast.fix_missing_locations(Splice().visit(ast.parse(template)))
+        exec(compile(tree, '<rate law>', 'exec'), namespace)
+    except (RecursionError, SyntaxError, MemoryError):
+        raise RateLawError('The rate law is nested too deeply') from None
+    return namespace
+
+
+def rate_law_symbols(tree: ast.AST) -> Tuple[str, ...]:
+    """Return the symbols of a parsed rate law, in the order they first appear."""
+    functions = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    names = [node for node in ast.walk(tree) if isinstance(node, ast.Name)
+             and id(node) not in functions and node.id != TIME and node.id not in CONSTANTS]
+    # ast.walk() is breadth-first
+    names.sort(key=lambda node: (node.lineno, node.col_offset))
+    return tuple(dict.fromkeys(node.id for node in names))
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledRateLaw:
+    """A rate law, parsed and compiled.
+
+    Attributes:
+        text: The rate law.
+        tree: The parsed rate law, with '^' as ast.Pow.
+        symbols: The names of the species and parameters of the rate law, in the order they first
+                 appear.
+        uses_time: Whether the rate law depends on the time.
+        function: function(v, t) evaluates the rate law, where v is the sequence of the values of
+                  the symbols, e.g. a (len(symbols), ...) array, and t is the time.
+    """
+    text: str
+    tree: ast.Expression
+    symbols: Tuple[str, ...]
+    uses_time: bool
+    function: RateFunction
+
+    def evaluate(self, values: Mapping[str, Any], time: Any = 0.0) -> Any:
+        """Evaluate the rate law given the value of each of its symbols, e.g. as arrays."""
+        return self.function([values[symbol] for symbol in self.symbols], time)
+
+
+@lru_cache(maxsize=_COMPILED_CACHE_SIZE)
+def compile_rate_law(rate_law: str) -> CompiledRateLaw:
+    """Parse and compile a rate law, or return the cached compilation of the same text.
+
+    Raises:
+        RateLawError: If the rate law cannot be parsed or compiled.
+    """
+    tree = parse_rate_law(rate_law)
+    symbols = rate_law_symbols(tree)
+    indices = {symbol: i for i, symbol in enumerate(symbols)}
+    body = numpy_tree(tree, lambda symbol: 'v[{}]'.format(indices[symbol]))
+    function = compile_tree('def rate(v, t):\n    return RATE\n', {'RATE': body})['rate']
+    uses_time = any(isinstance(node, ast.Name) and node.id == TIME for node in ast.walk(tree))
+    return CompiledRateLaw(rate_law, tree, symbols, uses_time, function)
+
+
+@dataclass(frozen=True, eq=False)
+class BoundRateLaw:
+    """The compiled rate law of a reaction, with the node that each of its symbols stands for.
+
+    Attributes:
+        compiled: The compiled rate law.
+        nodes: The index of the node of each symbol in compiled.symbols, or -1 if the symbol is a
+               parameter.
+    """
+    compiled: CompiledRateLaw
+    nodes: Tuple[int, ...]
+
+    @property
+    def species(self) -> Tuple[str, ...]:
+        return tuple(s for s, nodei in zip(self.compiled.symbols, self.nodes) if nodei != -1)
+
+    @property
+    def parameters(self) -> Tuple[str, ...]:
+        return tuple(s for s, nodei in zip(self.compiled.symbols, self.nodes) if nodei == -1)
+
+    def evaluate(self, amounts: Mapping[int, Any], parameters: Mapping[str, Any],
+                 time: Any = 0.0) -> Any:
+        """Evaluate the rate law given the amount of each node, by index, and the value of each
+        parameter, by name."""
+        return self.compiled.function([amounts[nodei] if nodei != -1 else parameters[symbol]
+                                       for symbol, nodei in zip(self.compiled.symbols,
+                                                                self.nodes)], time)
+
+
+@dataclass
+class _NetworkRateLaws:
+    last_node_index: int  # Nodes were added if this has changed
+    node_indices: Dict[str, int]
+    node_ids: Dict[int, str]
+    rate_laws: Dict[int, BoundRateLaw]
+    # Nodes that changed, e.g. moved; iodine reports changes before making them
+    dirty_nodes: Set[int]
+
+    def nodes_changed(self, net) -> bool:
+        """Return whether nodes were added, deleted or renamed since the bindings were made."""
+        if self.last_node_index != net.lastNodeIdx:
+            return True
+        changed = any(self.node_ids.get(nodei) != getattr(net.nodes.get(nodei), 'id', None)
+                      for nodei in self.dirty_nodes)
+        self.dirty_nodes.clear()
+        return changed
+
+
+class RateLawCache:
+    """The rate laws of the reactions of iodine networks, compiled and bound to their nodes.
+
+    A bound rate law is kept until its reaction changes, or until a node of its network is
+    renamed, added or deleted, which may change which of its symbols are species.
+    """
+    _networks: Dict[int, _NetworkRateLaws]
+
+    def __init__(self):
+        self._networks = dict()
+        iod.addChangeListener(self._on_model_change)
+
+    def close(self):
+        iod.removeChangeListener(self._on_model_change)
+
+    def _on_model_change(self, neti: int, kind: str, index: int):
+        if kind == iod.REACTION:
+            if neti in self._networks:
+                self._networks[neti].rate_laws.pop(index, None)
+        elif kind == iod.NODE:
+            if neti in self._networks:
+                self._networks[neti].dirty_nodes.add(index)
+        elif kind == iod.NETWORK and neti != -1:
+            self._networks.pop(neti, None)
+        elif kind == iod.NETWORK:
+            self._networks.clear()
+
+    def get(self, net_index: int, reaction_index: int) -> BoundRateLaw:
+        """Return the bound rate law of a reaction.
+
+        Raises:
+            RateLawError: If the rate law of the reaction cannot be parsed or compiled.
+        """
+        net = iod.networkDict.get(net_index)
+        if net is None:
+            raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(net_index))
+        reaction = net.reactions.get(reaction_index)
+        if reaction is None:
+            raise iod.ReactionIndexNotFoundError(
+                'Unknown reaction index: {}'.format(reaction_index))
+        laws = self._networks.get(net_index)
+        if laws is None or laws.nodes_changed(net):
+            laws = _NetworkRateLaws(net.lastNodeIdx,
+                                    {node.id: nodei for nodei, node in net.nodes.items()},
+                                    {nodei: node.id for nodei, node in net.nodes.items()}, dict(),
+                                    set())
+            self._networks[net_index] = laws
+        bound = laws.rate_laws.get(reaction_index)
+        if bound is None:
+            compiled = compile_rate_law(reaction.rateLaw)
+            bound = BoundRateLaw(compiled, tuple(laws.node_indices.get(symbol, -1)
+                                                 for symbol in compiled.symbols))
+            laws.rate_laws[reaction_index] = bound
+        return bound
@@ -0,0 +1,846 @@
+"""Reading and writing SBML, including the Layout and Render packages.
+
+Both directions stream, so that memory for the XML stays bounded however large the model is.
+
+read_sbml() parses with ElementTree.iterparse(). Each compartment, species, reaction, glyph and
+style is handled as soon as its end tag is read, and is then removed from the partial tree, so at
+any time the tree only holds the element being read and its ancestors. Glyphs and styles that
+refer to items not read yet, e.g. in a Level 2 annotation before the species, are kept as small
+records until the end of the document, rather than as elements. The items are built
+directly as iodine objects, and the result is a TNetwork, to be added to iodine as a single undo
+step with iodine.addNetwork() or iodine.setNetwork(), rather than through one validated call per
+item.
+
+write_sbml() writes SBML Level 3 Version 1 with the Layout and Render packages, one element at a
+time, from the iodine network.
+
+Only what iodine represents is kept: compartments with their volume, species, and reactions with
+their stoichiometries and kinetic laws (as infix rate laws); the glyphs of the first layout, with
+the fill and stroke of their render styles. Parameters, rules, events, modifiers and species
+aliases are ignored. Compartments without a glyph are not drawn, so their species are read as
+not being in any compartment. Species without a glyph are placed on a grid below the others, and
+reactions without curves for all their species get the default handles.
+"""
+import ast
+import copy
+import math
+import re
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+import iodine as iod
+from .layout.graph import CENTER_RATIO, DUPLICATE_RATIO, DUPLICATE_ROT
+from .ratelaw import number_value, parse_rate_law
+
+
+CORE_NS = 'http://www.sbml.org/sbml/level3/version1/core'
+LAYOUT_NS = 'http://www.sbml.org/sbml/level3/version1/layout/version1'
+RENDER_NS = 'http://www.sbml.org/sbml/level3/version1/render/version1'
+MATHML_NS = 'http://www.w3.org/1998/Math/MathML'
+XSI_NS = 'http://www.w3.org/2001/XMLSchema-instance'
+
+DEFAULT_NODE_SIZE = (50, 30)  #: Same as the default node size of the editor
+GRID_SPACING = (80, 60)  #: Spacing of the grid on which species without a glyph are placed
+
+#: Elements that are handled as a whole once read, and then dropped
+_RECORDS = {'compartment', 'species', 'reaction', 'compartmentGlyph', 'speciesGlyph',
+            'reactionGlyph', 'textGlyph', 'generalGlyph', 'colorDefinition', 'style'}
+#: Elements of the layout and render information, which are parsed into records first, since they
+#: may have to wait for the species and reactions that they refer to
+_LAYOUT_TAGS = {'compartmentGlyph', 'speciesGlyph', 'reactionGlyph', 'colorDefinition', 'style'}
+_REACTANT_ROLES = {'substrate', 'sidesubstrate'}
+_PRODUCT_ROLES = {'product', 'sideproduct'}
+
+
+class SBMLError(ValueError):
+    """Raised when a file is not SBML, or refers to items that it does not define."""
+    pass
+
+
+_local_names: Dict[str, str] = dict()
+
+
+def _local(tag: str) -> str:
+    """Return a tag name without its namespace."""
+    name = _local_names.get(tag)
+    if name is None:
+        name = _local_names[tag] = tag.rsplit('}', 1)[-1]
+    return name
+
+
+def _attr(elem: ET.Element, name: str, default: Optional[str] = None) -> Optional[str]:
+    """Return an attribute, whether or not it is prefixed with a namespace, as the packages vary.
+    """
+    value = elem.get(name)
+    if value is not None:
+        return value
+    for namespace in (LAYOUT_NS, RENDER_NS):
+        value = elem.get('{%s}%s' % (namespace, name))
+        if value is not None:
+            return value
+    suffix = '}' + name
+    for key, value in elem.attrib.items():
+        if key.endswith(suffix):
+            return value
+    return default
+
+
+def _child(elem: ET.Element, name: str) -> Optional[ET.Element]:
+    for child in elem:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _descendants(elem: ET.Element, name: str) -> Iterator[ET.Element]:
+    return (e for e in elem.iter() if _local(e.tag) == name)
+
+
+def _point(elem: ET.Element) -> Tuple[float, float]:
+    return float(_attr(elem, 'x', '0')), float(_attr(elem, 'y', '0'))
+
+
+def _bounding_box(glyph: ET.Element) -> Optional[Tuple[float, float, float, float]]:
+    box = _child(glyph, 'boundingBox')
+    if box is None:
+        return None
+    position = _child(box, 'position')
+    dimensions = _child(box, 'dimensions')
+    x, y = _point(position) if position is not None else (0, 0)
+    if dimensions is None:
+        return x, y, 0, 0
+    return x, y, float(_attr(dimensions, 'width', '0')), float(_attr(dimensions, 'height', '0'))
+
+
+# The records of the layout elements
+_Box = Tuple[float, float, float, float]
+#: The ID of a compartment or species glyph, the ID of its item, and its bounding box
+_Glyph = Tuple[Optional[str], Optional[str], Optional[_Box]]
+#: The speciesGlyph and role of a species reference glyph, and the start, first base point,
+#: last base point and end of its curve if it has Bezier segments
+_SpeciesReference = Tuple[Optional[str], str, Optional[List[Tuple[float, float]]]]
+#: The ID of a reaction glyph, the ID of its reaction, and its species reference glyphs
+_ReactionGlyph = Tuple[Optional[str], Optional[str], List[_SpeciesReference]]
+#: The fill, stroke and stroke-width of a style
+_Paint = Tuple[Optional[str], Optional[str], float]
+#: The idList and typeList of a style, and its paint if it has a group
+_Style = Tuple[List[str], Set[str], Optional[_Paint]]
+
+
+def _read_glyph(elem: ET.Element, item: str) -> _Glyph:
+    return _attr(elem, 'id'), _attr(elem, item), _bounding_box(elem)
+
+
+def _read_reaction_glyph(elem: ET.Element) -> _ReactionGlyph:
+    references = list()
+    for ref in _descendants(elem, 'speciesReferenceGlyph'):
+        beziers = [seg for seg in _descendants(ref, 'curveSegment')
+                   if _child(seg, 'basePoint1') is not None]
+        points = None
+        if len(beziers) != 0:
+            points = [_point(_child(beziers[0], 'start')), _point(_child(beziers[0], 'basePoint1')),
+                      _point(_child(beziers[-1], 'basePoint2')), _point(_child(beziers[-1], 'end'))]
+        references.append((_attr(ref, 'speciesGlyph'), _attr(ref, 'role', ''), points))
+    return _attr(elem, 'id'), _attr(elem, 'reaction'), references
+
+
+def _read_style(elem: ET.Element) -> _Style:
+    group = _child(elem, 'g')
+    paint = None
+    if group is not None:
+        paint = (_attr(group, 'fill'), _attr(group, 'stroke'),
+                 float(_attr(group, 'stroke-width', '0')))
+    return (_attr(elem, 'idList', '').split(), set(_attr(elem, 'typeList', '').split()), paint)
+
+
+# Precedences of the infix operators, for parenthesizing
+_ADD, _MUL, _NEG, _POW, _ATOM = range(1, 6)
+
+_MATHML_FUNCTIONS = {'exp', 'ln', 'log', 'abs', 'floor', 'ceiling', 'factorial', 'sin', 'cos',
+                     'tan', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh'}
+
+
+def _infix(elem: ET.Element) -> Tuple[str, int]:
+    """Return the infix form of a MathML expression, and the precedence of its operator."""
+    tag = _local(elem.tag)
+    if tag == 'ci':
+        return elem.text.strip(), _ATOM
+    if tag == 'cn':
+        kind = elem.get('type', 'real')
+        parts = [elem.text or ''] + [child.tail or '' for child in elem]
+        parts = [p.strip() for p in parts]
+        if kind == 'e-notation':
+            return '{}e{}'.format(*parts), _ATOM
+        if kind == 'rational':
+            return '{}/{}'.format(*parts), _MUL
+        return parts[0], _NEG if parts[0].startswith('-') else _ATOM
+    if tag == 'csymbol':
+        return ('time' if elem.get('definitionURL', '').endswith('time')
+                else elem.text.strip()), _ATOM
+    if tag in ('pi', 'true', 'false', 'exponentiale', 'infinity', 'notanumber'):
+        return tag, _ATOM
+    if tag == 'math' or tag == 'semantics':
+        return _infix(next(iter(elem)))
+    if tag != 'apply':
+        # e.g. piecewise, written as a function of its pieces
+        args = [_infix(child)[0] for child in elem if _local(child.tag) != 'annotation']
+        return '{}({})'.format(tag, ', '.join(args)), _ATOM
+
+    children = list(elem)
+    op = _local(children[0].tag)
+    qualifiers = {_local(c.tag): c for c in children[1:] if _local(c.tag) in ('degree', 'logbase')}
+    args = [_infix(c) for c in children[1:] if _local(c.tag) not in qualifiers]
+
+    def wrap(arg: Tuple[str, int], precedence: int) -> str:
+        return '({})'.format(arg[0]) if arg[1] < precedence else arg[0]
+
+    if op == 'plus':
+        if len(args) == 0:
+            return '0', _ATOM
+        return ' + '.join(wrap(a, _ADD) for a in args), _ADD
+    if op == 'minus':
+        if len(args) == 1:
+            return '-' + wrap(args[0], _POW), _NEG
+        return '{} - {}'.format(wrap(args[0], _ADD), wrap(args[1], _MUL)), _ADD
+    if op == 'times':
+        if len(args) == 0:
+            return '1', _ATOM
+        return ' * '.join(wrap(a, _MUL) for a in args), _MUL
+    if op == 'divide':
+        return '{} / {}'.format(wrap(args[0], _MUL), wrap(args[1], _NEG)), _MUL
+    if op == 'power':
+        return '{}^{}'.format(wrap(args[0], _ATOM), wrap(args[1], _ATOM)), _POW
+    if op == 'root':
+        if 'degree' not in qualifiers:
+            return 'sqrt({})'.format(args[0][0]), _ATOM
+        degree = _infix(next(iter(qualifiers['degree'])))
+        return '{}^(1 / {})'.format(wrap(args[0], _ATOM), wrap(degree, _MUL)), _POW
+    if op == 'log' and 'logbase' in qualifiers:
+        base = _infix(next(iter(qualifiers['logbase'])))
+        return 'log({}) / log({})'.format(args[0][0], base[0]), _MUL
+    name = _infix(children[0])[0] if op == 'ci' else op
+    return '{}({})'.format(name, ', '.join(a[0] for a in args)), _ATOM
+
+
+def _parse_color(value: Optional[str], definitions: Dict[str, iod.TColor]) -> Optional[iod.TColor]:
+    if value is None:
+        return None
+    if value in definitions:
+        return definitions[value]
+    if value == 'none':
+        return iod.TColor(0, 0, 0, 0)
+    if re.fullmatch(r'#[0-9a-fA-F]{6}([0-9a-fA-F]{2})?', value):
+        channels = [int(value[i:i + 2], 16) for i in range(1, len(value), 2)]
+        return iod.TColor(*channels, *([255] if len(channels) == 3 else []))
+    return None
+
+
+class _Reader:
+    """The state of read_sbml() between the elements that it streams."""
+
+    def __init__(self):
+        self.net: Optional[iod.TNetwork] = None
+        self.compartments: Dict[str, iod.TCompartment] = dict()
+        self.species: Dict[str, int] = dict()  #: Node index of each species
+        self.species_compartments: Dict[int, str] = dict()
+        self.reactions: Dict[str, int] = dict()  #: Reaction index of each reaction
+        self.layouts = 0
+        # The items of the glyphs, by glyph ID, for the render styles
+        self.compartment_glyphs: Dict[str, str] = dict()
+        self.species_glyphs: Dict[str, int] = dict()
+        self.reaction_glyphs: Dict[str, int] = dict()
+        self.drawn_compartments: Set[str] = set()
+        self.placed_nodes: Set[int] = set()
+        self.routed_reactions: Set[int] = set()
+        self.colors: Dict[str, iod.TColor] = dict()
+        self.styled: Set[Tuple[str, int]] = set()
+        self.type_styles: List[Tuple[Set[str], _Paint]] = list()
+        # The records of the layout elements that refer to items not read yet, e.g. in a Level 2
+        # annotation before the species and reactions, and of all the layout elements after them,
+        # so that they are handled in order
+        self.deferred: List[Tuple[str, Any]] = list()
+        self.handlers = {
+            'compartment': self._compartment,
+            'species': self._species,
+            'reaction': self._reaction,
+        }
+        self.parsers: Dict[str, Callable[[ET.Element], Any]] = {
+            'compartmentGlyph': lambda elem: _read_glyph(elem, 'compartment'),
+            'speciesGlyph': lambda elem: _read_glyph(elem, 'species'),
+            'reactionGlyph': _read_reaction_glyph,
+            'colorDefinition': lambda elem: (_attr(elem, 'id'), _attr(elem, 'value')),
+            'style': _read_style,
+        }
+        self.layout_handlers: Dict[str, Callable[[Any], None]] = {
+            'compartmentGlyph': self._compartment_glyph,
+            'speciesGlyph': self._species_glyph,
+            'reactionGlyph': self._reaction_glyph,
+            'colorDefinition': self._color_definition,
+            'style': self._style,
+        }
+
+    def start(self, tag: str, elem: ET.Element):
+        if tag == 'sbml':
+            self.net = iod.TNetwork('sbml')
+        elif tag == 'model':
+            self.net.id = elem.get('id') or elem.get('name') or self.net.id
+        elif tag == 'layout':
+            self.layouts += 1
+
+    def end(self, tag: str, elem: ET.Element):
+        if self.net is None:
+            raise SBMLError('Not an SBML document')
+        if tag in _LAYOUT_TAGS:
+            if self.layouts == 1 or tag == 'colorDefinition':  # Only the first layout is read
+                record = self.parsers[tag](elem)
+                if len(self.deferred) == 0 and self._resolved(tag, record):
+                    self.layout_handlers[tag](record)
+                else:
+                    self.deferred.append((tag, record))
+            return
+        handler = self.handlers.get(tag)
+        if handler is not None:
+            handler(elem)
+
+    def _resolved(self, tag: str, record: Any) -> bool:
+        """Whether the items that a layout record refers to are all read."""
+        if tag == 'compartmentGlyph':
+            return record[1] in self.compartments
+        if tag == 'speciesGlyph':
+            return record[1] in self.species
+        if tag == 'reactionGlyph':
+            return record[1] in self.reactions and all(
+                ref[0] in self.species_glyphs for ref in record[2])
+        if tag == 'style':
+            return all(glyph in self.compartment_glyphs or glyph in self.species_glyphs
+                       or glyph in self.reaction_glyphs for glyph in record[0])
+        return True
+
+    def _get(self, items: Dict[str, int], key: Optional[str], kind: str) -> int:
+        if key not in items:
+            raise SBMLError('Unknown {}: {}'.format(kind, key))
+        return items[key]
+
+    def _compartment(self, elem: ET.Element):
+        comp = iod.TCompartment(elem.get('id'), 0, 0, 0, 0, volume=float(elem.get('size', 1)),
+                                fillColor=iod.TColor(0, 247, 255, 255),
+                                outlineColor=iod.TColor(0, 106, 255, 255))
+        self.compartments[comp.id] = comp
+
+    def _species(self, elem: ET.Element):
+        nodei = self.net.lastNodeIdx
+        self.net.addNode(iod.TNode(elem.get('id'), 0, 0, *DEFAULT_NODE_SIZE))
+        self.species[elem.get('id')] = nodei
+        self.species_compartments[nodei] = elem.get('compartment')
+
+    def _reaction(self, elem: ET.Element):
+        reaction = iod.TReaction(elem.get('id'))
+        for list_name, species_dict in (('listOfReactants', reaction.srcDict),
+                                        ('listOfProducts', reaction.destDict)):
+            references = _child(elem, list_name)
+            for ref in references if references is not None else ():
+                nodei = self._get(self.species, ref.get('species'), 'species')
+                stoich = float(ref.get('stoichiometry', 1))
+                if nodei in species_dict:
+                    species_dict[nodei].stoich += stoich
+                else:
+                    species_dict[nodei] = iod.TSpeciesNode(stoich)
+        law = _child(elem, 'kineticLaw')
+        math_elem = _child(law, 'math') if law is not None else None
+        if math_elem is not None and len(math_elem) != 0:
+            reaction.rateLaw = _infix(math_elem)[0]
+        self.reactions[reaction.id] = self.net.lastReactionIdx
+        self.net.addReaction(reaction)
+
+    def _compartment_glyph(self, record: _Glyph):
+        glyph, compartment, box = record
+        if compartment not in self.compartments or box is None:
+            return
+        self.compartment_glyphs[glyph] = compartment
+        if compartment not in self.drawn_compartments:
+            self.drawn_compartments.add(compartment)
+            comp = self.compartments[compartment]
+            comp.x, comp.y, comp.w, comp.h = box
+
+    def _species_glyph(self, record: _Glyph):
+        glyph, species, box = record
+        nodei = self._get(self.species, species, 'species')
+        self.species_glyphs[glyph] = nodei
+        if box is not None and nodei not in self.placed_nodes:
+            self.placed_nodes.add(nodei)
+            node = self.net.nodes[nodei]
+            node.x, node.y = box[:2]
+            if box[2] > 0 and box[3] > 0:
+                node.w, node.h = box[2:]
+
+    def _reaction_glyph(self, record: _ReactionGlyph):
+        glyph, reaction_id, references = record
+        reai = self._get(self.reactions, reaction_id, 'reaction')
+        self.reaction_glyphs[glyph] = reai
+        reaction = self.net.reactions[reai]
+        routed = set()
+        center = None
+        for species_glyph, role, points in references:
+            nodei = self.species_glyphs.get(species_glyph)
+            if role in _REACTANT_ROLES or (role not in _PRODUCT_ROLES
+                                           and nodei not in reaction.destDict):
+                species, is_product = reaction.srcDict.get(nodei), False
+            else:
+                species, is_product = reaction.destDict.get(nodei), True
+            if species is None or points is None:
+                continue
+            # Of the two ends of the curve, the one closest to the species is on its side
+            node = self.net.nodes[nodei]
+            node_center = (node.x + node.w / 2, node.y + node.h / 2)
+            points = list(points)
+            if math.hypot(points[0][0] - node_center[0], points[0][1] - node_center[1]) < \
+                    math.hypot(points[3][0] - node_center[0], points[3][1] - node_center[1]):
+                points.reverse()
+            species.handleX, species.handleY = points[2]
+            routed.add((nodei, is_product))
+            if center is None:
+                # The curves of the products mirror the center handle
+                center = points[1] if not is_product else (2 * points[0][0] - points[1][0],
+                                                           2 * points[0][1] - points[1][1])
+        expected = {(nodei, False) for nodei in reaction.srcDict} \
+            | {(nodei, True) for nodei in reaction.destDict}
+        if center is not None and routed == expected:
+            reaction.centerHandleX, reaction.centerHandleY = center
+            self.routed_reactions.add(reai)
+
+    def _color_definition(self, record: Tuple[Optional[str], Optional[str]]):
+        color = _parse_color(record[1], dict())
+        if color is not None:
+            self.colors[record[0]] = color
+
+    def _style(self, record: _Style):
+        ids, types, paint = record
+        if paint is None:
+            return
+        for glyph in ids:
+            self._apply_style(glyph, paint)
+        if len(types) != 0:
+            self.type_styles.append((types, paint))
+
+    def _apply_style(self, glyph: str, paint: _Paint, types: Optional[Set[str]] = None):
+        """Apply a style to a glyph, given its ID, or to the glyphs of the given types."""
+        fill = _parse_color(paint[0], self.colors)
+        stroke = _parse_color(paint[1], self.colors)
+        width = paint[2]
+        kinds = (('compartment', self.compartment_glyphs, 'COMPARTMENTGLYPH'),
+                 ('species', self.species_glyphs, 'SPECIESGLYPH'),
+                 ('reaction', self.reaction_glyphs, 'REACTIONGLYPH'))
+        for kind, glyphs, type_name in kinds:
+            if types is None:
+                targets = [glyphs[glyph]] if glyph in glyphs else []
+            elif type_name in types or 'ANY' in types:
+                targets = glyphs.values()
+            else:
+                continue
+            for target in targets:
+                key = (kind, target)
+                if types is not None and key in self.styled:
+                    continue  # Styles by ID take precedence
+                self.styled.add(key)
+                if kind == 'reaction':
+                    item = self.net.reactions[target]
+                    if stroke is not None:
+                        item.fillColor = copy.copy(stroke)
+                    if width > 0:
+                        item.thickness = width
+                    continue
+                item = self.compartments[target] if kind == 'compartment' \
+                    else self.net.nodes[target]
+                # Iodine changes colors in place, so each item has its own
+                if fill is not None:
+                    item.fillColor = copy.copy(fill)
+                if stroke is not None:
+                    item.outlineColor = copy.copy(stroke)
+                if width > 0:
+                    item.outlineThickness = width
+
+    def finish(self) -> iod.TNetwork:
+        net = self.net
+        if net is None:
+            raise SBMLError('Not an SBML document')
+        for tag, record in self.deferred:
+            self.layout_handlers[tag](record)
+        for types, paint in self.type_styles:
+            self._apply_style('', paint, types)
+
+        # Only the compartments with a glyph are drawn
+        compartment_indices = dict()
+        for comp_id, comp in self.compartments.items():
+            if comp_id in self.drawn_compartments:
+                compartment_indices[comp_id] = net.addCompartment(comp)
+                comp.comp_idx = compartment_indices[comp_id]
+        for nodei, comp_id in self.species_compartments.items():
+            compi = compartment_indices.get(comp_id)
+            if compi is not None:
+                net.nodes[nodei].compi = compi
+                net.compartments[compi].node_indices.add(nodei)
+                net.baseNodes.discard(nodei)
+
+        # Iodine positions are non-negative
+        items = [net.nodes[i] for i in self.placed_nodes] + list(net.compartments.values())
+        min_x = min((item.x for item in items), default=0)
+        min_y = min((item.y for item in items), default=0)
+        dx, dy = max(-min_x, 0), max(-min_y, 0)
+        if dx != 0 or dy != 0:
+            for item in items:
+                item.x += dx
+                item.y += dy
+            for reai in self.routed_reactions:
+                reaction = net.reactions[reai]
+                reaction.centerHandleX += dx
+                reaction.centerHandleY += dy
+                for species in (*reaction.srcDict.values(), *reaction.destDict.values()):
+                    species.handleX += dx
+                    species.handleY += dy
+
+        unplaced = [nodei for nodei in net.nodes if nodei not in self.placed_nodes]
+        for nodei, (x, y) in zip(unplaced, grid_positions(items, len(unplaced))):
+            net.nodes[nodei].x = x
+            net.nodes[nodei].y = y
+
+        for reai, reaction in net.reactions.items():
+            if reai not in self.routed_reactions:
+                handles = default_reaction_handles(net, reaction)
+                reaction.centerHandleX, reaction.centerHandleY = handles['center']
+                for key, species_dict in (('src', reaction.srcDict), ('dest', reaction.destDict)):
+                    for nodei, (x, y) in handles[key].items():
+                        species_dict[nodei].handleX = x
+                        species_dict[nodei].handleY = y
+        return net
+
+
+def grid_positions(items: Iterable[Union[iod.TNode, iod.TCompartment]],
+                   count: int) -> List[Tuple[float, float]]:
+    """Return the positions of 'count' new nodes on a grid below the given nodes and compartments.
+    """
+    top = max((item.y + item.h for item in items), default=-GRID_SPACING[1]) + GRID_SPACING[1]
+    columns = max(math.ceil(math.sqrt(count)), 1)
+    return [((k % columns) * GRID_SPACING[0], top + (k // columns) * GRID_SPACING[1])
+            for k in range(count)]
+
+
+def default_reaction_handles(net: iod.TNetwork, reaction: iod.TReaction) -> Dict[str, Any]:
+    """Return the handles of a reaction as rkviewer.canvas.utils.default_handle_positions() would
+    place them, in the format of iodine.setReactionsHandlePositions().
+    """
+    nodes = [*reaction.srcDict, *reaction.destDict]
+    centers = {nodei: (net.nodes[nodei].x + net.nodes[nodei].w / 2,
+                       net.nodes[nodei].y + net.nodes[nodei].h / 2) for nodei in nodes}
+    if len(centers) == 0:
+        return {'center': (reaction.centerHandleX, reaction.centerHandleY), 'src': dict(),
+                'dest': dict()}
+    cx = sum(centers[nodei][0] for nodei in nodes) / len(nodes)
+    cy = sum(centers[nodei][1] for nodei in nodes) / len(nodes)
+    first = centers[nodes[0]]
+    center = (first[0] * (1 - CENTER_RATIO) + cx * CENTER_RATIO,
+              first[1] * (1 - CENTER_RATIO) + cy * CENTER_RATIO)
+    src = {nodei: ((centers[nodei][0] + cx) / 2, (centers[nodei][1] + cy) / 2)
+           for nodei in reaction.srcDict}
+    dest = dict()
+    for nodei in reaction.destDict:
+        x, y = centers[nodei]
+        if nodei in reaction.srcDict:
+            # Also a reactant; rotate the handle so that the two curves do not overlap
+            length = math.hypot(cx - x, cy - y) * DUPLICATE_RATIO
+            angle = math.atan2(cy - y, cx - x) + DUPLICATE_ROT
+            dest[nodei] = (x + math.cos(angle) * length, y + math.sin(angle) * length)
+        else:
+            dest[nodei] = ((x + cx) / 2, (y + cy) / 2)
+    return {'center': center, 'src': src, 'dest': dest}
+
+
+def read_sbml(source: Union[str, IO]) -> iod.TNetwork:
+    """Read an SBML model, with its layout if it has one.
+
+    Args:
+        source: The path of the file, or a binary file object.
+
+    Returns:
+        The network, to be added to iodine with iodine.addNetwork() or iodine.setNetwork().
+
+    Raises:
+        SBMLError: If the file is not well-formed SBML.
+    """
+    reader = _Reader()
+    stack: List[ET.Element] = list()
+    records = 0  # The number of records being read that contain the current element
+    try:
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            tag = _local(elem.tag)
+            if event == 'start':
+                stack.append(elem)
+                reader.start(tag, elem)
+                if tag in _RECORDS:
+                    records += 1
+                continue
+            stack.pop()
+            if tag in _RECORDS:
+                records -= 1
+                if records == 0:
+                    reader.end(tag, elem)
+            elif records == 0:
+                reader.end(tag, elem)
+            # Drop the elements of lists once read. The element is the last child of its parent,
+            # since the parser has not read further yet.
+            if records == 0 and len(stack) != 0 and _local(stack[-1].tag).startswith('listOf'):
+                del stack[-1][-1]
+    except SBMLError:
+        raise
+    except ET.ParseError as e:
+        raise SBMLError(str(e)) from e
+    except (TypeError, ValueError, AttributeError, IndexError, StopIteration) as e:
+        raise SBMLError('Malformed SBML: {}'.format(e)) from e
+    return reader.finish()
+
+
+_SID_INVALID = re.compile(r'[^A-Za-z0-9_]')
+
+
+def _make_sid(name: str, used: Set[str]) -> str:
+    """Return a valid and unused SBML ID for an item, as close to its name as possible."""
+    sid = _SID_INVALID.sub('_', name) or '_'
+    if sid[0].isdigit():
+        sid = '_' + sid
+    base, k = sid, 2
+    while sid in used:
+        sid = '{}_{}'.format(base, k)
+        k += 1
+    used.add(sid)
+    return sid
+
+
+_MATHML_NAMES = {
+    ast.Add: 'plus', ast.Sub: 'minus', ast.Mult: 'times', ast.Div: 'divide', ast.Pow: 'power',
+}
+_RATE_LAW_FUNCTIONS = {name: name for name in _MATHML_FUNCTIONS}
+_RATE_LAW_FUNCTIONS.update({'ceil': 'ceiling', 'log10': 'log', 'asin': 'arcsin', 'acos': 'arccos',
+                            'atan': 'arctan'})
+
+
+def _mathml(node: ast.AST) -> str:
+    """Return the MathML content markup of a parsed rate law."""
+    if isinstance(node, ast.Expression):
+        return _mathml(node.body)
+    if isinstance(node, ast.Name):
+        if node.id == 'time':
+            return ('<csymbol encoding="text" definitionURL='
+                    '"http://www.sbml.org/sbml/symbols/time"> time </csymbol>')
+        return '<ci> {} </ci>'.format(node.id)
+    value = number_value(node)
+    if value is not None:
+        if isinstance(value, int):
+            return '<cn type="integer"> {} </cn>'.format(value)
+        return '<cn> {!r} </cn>'.format(value)
+    if isinstance(node, ast.BinOp) and type(node.op) in _MATHML_NAMES:
+        return '<apply><{}/>{}{}</apply>'.format(_MATHML_NAMES[type(node.op)],
+                                                 _mathml(node.left), _mathml(node.right))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        if isinstance(node.op, ast.UAdd):
+            return _mathml(node.operand)
+        return '<apply><minus/>{}</apply>'.format(_mathml(node.operand))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        args = ''.join(_mathml(arg) for arg in node.args)
+        name = node.func.id
+        if name == 'sqrt':
+            return '<apply><root/>{}</apply>'.format(args)
+        if name == 'pow':
+            return '<apply><power/>{}</apply>'.format(args)
+        if name in _RATE_LAW_FUNCTIONS:
+            return '<apply><{}/>{}</apply>'.format(_RATE_LAW_FUNCTIONS[name], args)
+        return '<apply><ci> {} </ci>{}</apply>'.format(name, args)
+    raise ValueError('Unsupported expression')
+
+
+def rate_law_mathml(rate_law: str) -> Optional[str]:
+    """Return a rate law as a MathML <math> element, or None if it cannot be converted."""
+    try:
+        return '<math xmlns="{}">{}</math>'.format(MATHML_NS, _mathml(parse_rate_law(rate_law)))
+    except (ValueError, RecursionError):
+        return None
+
+
+def _hex(color: iod.TColor) -> str:
+    return '#{:02x}{:02x}{:02x}{:02x}'.format(color.r, color.g, color.b, color.a)
+
+
+def _box(x: float, y: float, w: float, h: float) -> str:
+    return ('<layout:boundingBox><layout:position layout:x="{!r}" layout:y="{!r}"/>'
+            '<layout:dimensions layout:width="{!r}" layout:height="{!r}"/></layout:boundingBox>'
+            ).format(float(x), float(y), float(w), float(h))
+
+
+def _bezier(start, base1, base2, end) -> str:
+    points = ''.join('<layout:{} layout:x="{!r}" layout:y="{!r}"/>'.format(
+        name, float(x), float(y)) for name, (x, y) in (('start', start), ('end', end),
+                                                       ('basePoint1', base1),
+                                                       ('basePoint2', base2)))
+    return ('<layout:curve><layout:listOfCurveSegments><layout:curveSegment '
+            'xsi:type="CubicBezier">{}</layout:curveSegment></layout:listOfCurveSegments>'
+            '</layout:curve>').format(points)
+
+
+def _style(glyph_id: str, fill: Optional[iod.TColor], stroke: iod.TColor, width: float) -> str:
+    return ('<render:style render:idList={}><render:g render:stroke="{}" '
+            'render:stroke-width="{!r}" render:fill="{}"/></render:style>').format(
+                quoteattr(glyph_id), _hex(stroke), float(width),
+                _hex(fill) if fill is not None else 'none')
+
+
+def _sbml_lines(net: iod.TNetwork) -> Iterator[str]:
+    """Yield the lines of the SBML document of a network."""
+    used: Set[str] = set()
+    node_sids = {nodei: _make_sid(node.id, used) for nodei, node in net.nodes.items()}
+    comp_sids = {compi: _make_sid(comp.id, used) for compi, comp in net.compartments.items()}
+    reaction_sids = {reai: _make_sid(rea.id, used) for reai, rea in net.reactions.items()}
+    # SBML species are all in a compartment; the base nodes go in one that is not drawn
+    default_sid = _make_sid('default_compartment', used)
+
+    yield '<?xml version="1.0" encoding="UTF-8"?>'
+    yield ('<sbml xmlns="{}" xmlns:layout="{}" xmlns:render="{}" level="3" version="1" '
+           'layout:required="false" render:required="false">').format(CORE_NS, LAYOUT_NS,
+                                                                       RENDER_NS)
+    yield '  <model id={}>'.format(quoteattr(_make_sid(net.id, set())))
+    yield '    <listOfCompartments>'
+    template = '      <compartment id={} size="{!r}" spatialDimensions="3" constant="true"/>'
+    yield template.format(quoteattr(default_sid), 1.0)
+    for compi, comp in net.compartments.items():
+        yield template.format(quoteattr(comp_sids[compi]), float(comp.volume))
+    yield '    </listOfCompartments>'
+
+    if len(net.nodes) != 0:
+        yield '    <listOfSpecies>'
+        for nodei, node in net.nodes.items():
+            yield ('      <species id={} compartment={} initialConcentration="0" '
+                   'hasOnlySubstanceUnits="false" boundaryCondition="false" '
+                   'constant="false"/>').format(
+                       quoteattr(node_sids[nodei]),
+                       quoteattr(comp_sids.get(node.compi, default_sid)))
+        yield '    </listOfSpecies>'
+
+    if len(net.reactions) != 0:
+        yield '    <listOfReactions>'
+        for reai, rea in net.reactions.items():
+            yield '      <reaction id={} reversible="false" fast="false">'.format(
+                quoteattr(reaction_sids[reai]))
+            for list_name, species_dict in (('listOfReactants', rea.srcDict),
+                                            ('listOfProducts', rea.destDict)):
+                if len(species_dict) == 0:
+                    continue
+                yield '        <{}>'.format(list_name)
+                for nodei, species in species_dict.items():
+                    yield ('          <speciesReference species={} stoichiometry="{!r}" '
+                           'constant="true"/>').format(quoteattr(node_sids[nodei]),
+                                                       float(species.stoich))
+                yield '        </{}>'.format(list_name)
+            math_text = rate_law_mathml(rea.rateLaw) if rea.rateLaw.strip() else None
+            if math_text is not None:
+                yield '        <kineticLaw>{}</kineticLaw>'.format(math_text)
+            yield '      </reaction>'
+        yield '    </listOfReactions>'
+
+    # The layout
+    width = max((item.x + item.w for item in (*net.nodes.values(), *net.compartments.values())),
+                default=0)
+    height = max((item.y + item.h for item in (*net.nodes.values(), *net.compartments.values())),
+                 default=0)
+    yield '    <layout:listOfLayouts xmlns:xsi="{}">'.format(XSI_NS)
+    yield '      <layout:layout layout:id="layout">'
+    yield '        <layout:dimensions layout:width="{!r}" layout:height="{!r}"/>'.format(
+        float(width), float(height))
+    if len(net.compartments) != 0:
+        yield '        <layout:listOfCompartmentGlyphs>'
+        for compi, comp in net.compartments.items():
+            sid = comp_sids[compi]
+            yield ('          <layout:compartmentGlyph layout:id={} layout:compartment={}>{}'
+                   '</layout:compartmentGlyph>').format(quoteattr('cg_' + sid), quoteattr(sid),
+                                                        _box(comp.x, comp.y, comp.w, comp.h))
+        yield '        </layout:listOfCompartmentGlyphs>'
+    if len(net.nodes) != 0:
+        yield '        <layout:listOfSpeciesGlyphs>'
+        for nodei, node in net.nodes.items():
+            sid = node_sids[nodei]
+            yield ('          <layout:speciesGlyph layout:id={} layout:species={}>{}'
+                   '</layout:speciesGlyph>').format(quoteattr('sg_' + sid), quoteattr(sid),
+                                                    _box(node.x, node.y, node.w, node.h))
+        yield '        </layout:listOfSpeciesGlyphs>'
+    if len(net.reactions) != 0:
+        yield '        <layout:listOfReactionGlyphs>'
+        for reai, rea in net.reactions.items():
+            sid = reaction_sids[reai]
+            nodes = [net.nodes[nodei] for nodei in (*rea.srcDict, *rea.destDict)]
+            centroid = (sum(n.x + n.w / 2 for n in nodes) / max(len(nodes), 1),
+                        sum(n.y + n.h / 2 for n in nodes) / max(len(nodes), 1))
+            center = (rea.centerHandleX, rea.centerHandleY)
+            mirrored = (2 * centroid[0] - center[0], 2 * centroid[1] - center[1])
+            yield ('          <layout:reactionGlyph layout:id={} layout:reaction={}>{}'
+                   ).format(quoteattr('rg_' + sid), quoteattr(sid), _box(*centroid, 0, 0))
+            if len(nodes) != 0:
+                yield '            <layout:listOfSpeciesReferenceGlyphs>'
+            # The curves go from the reaction to the species
+            for role, species_dict, center_handle in (('substrate', rea.srcDict, center),
+                                                      ('product', rea.destDict, mirrored)):
+                for nodei, species in species_dict.items():
+                    node = net.nodes[nodei]
+                    node_sid = node_sids[nodei]
+                    yield ('              <layout:speciesReferenceGlyph layout:id={} '
+                           'layout:speciesGlyph={} layout:role="{}">{}'
+                           '</layout:speciesReferenceGlyph>').format(
+                               quoteattr('srg_{}_{}_{}'.format(sid, role, node_sid)),
+                               quoteattr('sg_' + node_sid), role,
+                               _bezier(centroid, center_handle, (species.handleX, species.handleY),
+                                       (node.x + node.w / 2, node.y + node.h / 2)))
+            if len(nodes) != 0:
+                yield '            </layout:listOfSpeciesReferenceGlyphs>'
+            yield '          </layout:reactionGlyph>'
+        yield '        </layout:listOfReactionGlyphs>'
+
+    # The colors, with one style per glyph
+    if len(net.nodes) + len(net.compartments) + len(net.reactions) != 0:
+        yield '        <render:listOfRenderInformation>'
+        yield '          <render:renderInformation render:id="render">'
+        yield '            <render:listOfStyles>'
+        for compi, comp in net.compartments.items():
+            yield '              ' + _style('cg_' + comp_sids[compi], comp.fillColor,
+                                            comp.outlineColor, comp.outlineThickness)
+        for nodei, node in net.nodes.items():
+            yield '              ' + _style('sg_' + node_sids[nodei], node.fillColor,
+                                            node.outlineColor, node.outlineThickness)
+        for reai, rea in net.reactions.items():
+            yield '              ' + _style('rg_' + reaction_sids[reai], None, rea.fillColor,
+                                            rea.thickness)
+        yield '            </render:listOfStyles>'
+        yield '          </render:renderInformation>'
+        yield '        </render:listOfRenderInformation>'
+    yield '      </layout:layout>'
+    yield '    </layout:listOfLayouts>'
+    yield '  </model>'
+    yield '</sbml>'
+
+
+def write_sbml(net_index: int, dest: Union[str, IO]):
+    """Write a network of iodine as SBML, with its layout.
+
+    Args:
+        net_index: The index of the network.
+        dest: The path of the file, or a text file object.
+    """
+    net = iod.networkDict.get(net_index)
+    if net is None:
+        raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(net_index))
+    if isinstance(dest, str):
+        with open(dest, 'w', encoding='utf-8', newline='\n') as fp:
+            _write_lines(net, fp)
+    else:
+        _write_lines(net, dest)
+
+
+def _write_lines(net: iod.TNetwork, fp: IO):
+    for line in _sbml_lines(net):
+        fp.write(line)
+        fp.write('\n')
@@ -0,0 +1,238 @@
+"""Indexed search over the IDs of the nodes, reactions and compartments of networks.
+
+SearchIndex keeps, for each network, the IDs of its items and the symbols of the rate laws of its
+reactions, lowercased, in a sorted list. Like the other caches of the model, it is told by iodine
+which items change, and re-reads only those; items created since are found by their indices.
+
+A prefix query is a bisection of the sorted list. Substring and fuzzy queries scan one string
+that joins all the entries, which the re module and str.find() do in C; the string is joined
+again on the first such query after a change. Each query stops as soon as it has enough
+results, so prefix and substring queries take well under a millisecond on networks of tens of
+thousands of items, and fuzzy queries a few milliseconds at most.
+"""
+import itertools
+import re
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Collection, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from sortedcontainers import SortedList
+
+import iodine as iod
+from .ratelaw import RateLawError, parse_rate_law, rate_law_symbols
+
+
+PREFIX = 'prefix'  #: Matches the entries that start with the query
+SUBSTRING = 'substring'  #: Matches the entries that contain the query; prefix matches come first
+#: Matches the entries that contain the characters of the query in order, tightest first
+FUZZY = 'fuzzy'
+MODES = (PREFIX, SUBSTRING, FUZZY)
+KINDS = (iod.NODE, iod.REACTION, iod.COMPARTMENT)
+
+_FUZZY_CANDIDATES = 200  #: The number of fuzzy matches ranked, at most
+_SEPARATOR = '\n'  #: Separates the entries of the joined string; IDs cannot contain it
+
+#: (lowercased text, kind, index, text, whether the text is a rate law symbol)
+_Entry = Tuple[str, str, int, str, bool]
+
+
+@dataclass(frozen=True, eq=False)
+class SearchMatch:
+    """An item whose ID, or the rate law of which, matched a query.
+
+    Attributes:
+        kind: The kind of item, i.e. iodine.NODE, iodine.REACTION or iodine.COMPARTMENT.
+        index: The index of the item.
+        text: The text that matched, i.e. the ID of the item or a symbol of its rate law.
+        in_rate_law: Whether text is a symbol of the rate law of the reaction, rather than its ID.
+    """
+    kind: str
+    index: int
+    text: str
+    in_rate_law: bool
+
+
+def _read_entries(net, kind: str, index: int) -> Tuple[_Entry, ...]:
+    if kind == iod.NODE:
+        item = net.nodes.get(index)
+    elif kind == iod.REACTION:
+        item = net.reactions.get(index)
+    else:
+        item = net.compartments.get(index)
+    if item is None:
+        return ()
+    entries = [(item.id.lower(), kind, index, item.id, False)]
+    if kind == iod.REACTION and item.rateLaw.strip() != '':
+        try:
+            symbols = rate_law_symbols(parse_rate_law(item.rateLaw))
+        except RateLawError:
+            symbols = ()
+        entries += [(symbol.lower(), kind, index, symbol, True) for symbol in symbols]
+    return tuple(entries)
+
+
+class _NetworkIndex:
+    """The entries of a network, and the string that joins them if it is up to date."""
+    last_indices: Dict[str, int]  # Items were created if these have changed
+    items: Dict[Tuple[str, int], Tuple[_Entry, ...]]
+    entries: SortedList
+    dirty: Set[Tuple[str, int]]  # Items to re-read, if they still exist
+    joined: Optional[str]
+    starts: np.ndarray  # The position of each entry in joined
+
+    def __init__(self, net):
+        self.last_indices = _last_indices(net)
+        self.items = dict()
+        for kind, items in ((iod.NODE, net.nodes), (iod.REACTION, net.reactions),
+                            (iod.COMPARTMENT, net.compartments)):
+            for index in items:
+                self.items[(kind, index)] = _read_entries(net, kind, index)
+        self.entries = SortedList(itertools.chain.from_iterable(self.items.values()))
+        self.dirty = set()
+        self.joined = None
+        self.starts = np.zeros(0, dtype=np.int64)
+
+    def update(self, net):
+        last_indices = _last_indices(net)
+        for kind, last in last_indices.items():
+            self.dirty.update((kind, index) for index in range(self.last_indices[kind], last))
+        self.last_indices = last_indices
+        for key in self.dirty:
+            old = self.items.pop(key, ())
+            new = _read_entries(net, *key)
+            if new != old:
+                for entry in old:
+                    self.entries.remove(entry)
+                self.entries.update(new)
+                self.joined = None
+            if len(new) != 0:
+                self.items[key] = new
+        self.dirty.clear()
+
+    def join(self):
+        if self.joined is None:
+            texts = list(map(itemgetter(0), self.entries))
+            self.joined = _SEPARATOR.join(texts)
+            ends = np.cumsum(np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)) + 1)
+            self.starts = np.concatenate([[0], ends[:-1]])
+
+    def row_at(self, position: int) -> int:
+        """Return the row of the entry at the given position of the joined string."""
+        return int(np.searchsorted(self.starts, position, side='right')) - 1
+
+    def next_start(self, row: int) -> int:
+        """Return the position of the entry after the given one in the joined string."""
+        return int(self.starts[row]) + len(self.entries[row][0]) + 1
+
+
+def _last_indices(net) -> Dict[str, int]:
+    return {iod.NODE: net.lastNodeIdx, iod.REACTION: net.lastReactionIdx,
+            iod.COMPARTMENT: net.lastCompartmentIdx}
+
+
+class SearchIndex:
+    """Searches the IDs of the items of iodine networks, and the symbols of their rate laws."""
+    _networks: Dict[int, _NetworkIndex]
+
+    def __init__(self):
+        self._networks = dict()
+        iod.addChangeListener(self._on_model_change)
+
+    def close(self):
+        iod.removeChangeListener(self._on_model_change)
+
+    def _on_model_change(self, neti: int, kind: str, index: int):
+        if kind == iod.NETWORK:
+            if neti == -1:
+                self._networks.clear()
+            else:
+                self._networks.pop(neti, None)
+        elif neti in self._networks:
+            self._networks[neti].dirty.add((kind, index))
+
+    def _get(self, net_index: int) -> _NetworkIndex:
+        net = iod.networkDict.get(net_index)
+        if net is None:
+            raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(net_index))
+        index = self._networks.get(net_index)
+        if index is None:
+            index = _NetworkIndex(net)
+            self._networks[net_index] = index
+        else:
+            index.update(net)
+        return index
+
+    def search(self, net_index: int, query: str, mode: str = SUBSTRING,
+               kinds: Optional[Collection[str]] = None, limit: int = 50) -> List[SearchMatch]:
+        """Return the items of a network that match a query, best first, ignoring case.
+
+        An item matches if its ID matches, or, for a reaction, a symbol of its rate law. Each item
+        is returned once, for its first match in that order.
+
+        Args:
+            net_index: The index of the network.
+            query: The text to search for.
+            mode: PREFIX, SUBSTRING or FUZZY. See their descriptions.
+            kinds: The kinds of items to return, among KINDS. Defaults to all of them.
+            limit: The maximum number of items to return.
+        """
+        if mode not in MODES:
+            raise ValueError('Unknown search mode: {}'.format(mode))
+        index = self._get(net_index)
+        query = query.strip().lower()
+        if query == '' or _SEPARATOR in query or limit <= 0:
+            return list()
+        if mode == PREFIX:
+            entries = self._prefix_entries(index, query)
+        elif mode == SUBSTRING:
+            entries = itertools.chain(self._prefix_entries(index, query),
+                                      self._substring_entries(index, query))
+        else:
+            # Contiguous matches are the tightest
+            entries = itertools.chain(self._prefix_entries(index, query),
+                                      self._substring_entries(index, query),
+                                      self._fuzzy_entries(index, query))
+
+        kinds = KINDS if kinds is None else kinds
+        matches: Dict[Tuple[str, int], SearchMatch] = dict()
+        for _, kind, item_index, text, in_rate_law in entries:
+            if kind in kinds and (kind, item_index) not in matches:
+                matches[(kind, item_index)] = SearchMatch(kind, item_index, text, in_rate_law)
+                if len(matches) == limit:
+                    break
+        return list(matches.values())
+
+    def _prefix_entries(self, index: _NetworkIndex, query: str) -> Iterator[_Entry]:
+        # In the order of the lowercased text, then of the kind and index of the item. An item whose
+        # ID is also a symbol of its rate law is matched by its ID, since False < True
+        for entry in index.entries.irange(minimum=(query,)):
+            if not entry[0].startswith(query):
+                return
+            yield entry
+
+    def _substring_entries(self, index: _NetworkIndex, query: str) -> Iterator[_Entry]:
+        index.join()
+        position = index.joined.find(query)
+        while position != -1:
+            row = index.row_at(position)
+            if position != index.starts[row]:  # Prefix matches were found already
+                yield index.entries[row]
+            position = index.joined.find(query, index.next_start(row))
+
+    def _fuzzy_entries(self, index: _NetworkIndex, query: str) -> Iterator[_Entry]:
+        index.join()
+        # Each character is matched at its first occurrence after the previous one, which needs no
+        # backtracking
+        pattern = re.compile(re.escape(query[0]) + ''.join(
+            '[^{}]*{}'.format(re.escape(_SEPARATOR + c), re.escape(c)) for c in query[1:]))
+        # Ranked by the length of the match, i.e. the characters skipped, then by the length of
+        # the entry, then in order
+        candidates: List[Tuple[int, int, int]] = list()
+        match = pattern.search(index.joined)
+        while match is not None and len(candidates) < _FUZZY_CANDIDATES:
+            row = index.row_at(match.start())
+            candidates.append((match.end() - match.start(), len(index.entries[row][0]), row))
+            match = pattern.search(index.joined, index.next_start(row))
+        for _, _, row in sorted(candidates):
+            yield index.entries[row]
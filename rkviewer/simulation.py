@@ -0,0 +1,408 @@
+"""Simulating the ODEs of an iodine network.
+
+Each node is a species, whose amount changes at the rate
+
+    dy/dt = N @ v(y, t)
+
+where N is the (sparse) stoichiometry matrix, with one row per species and one column per
+reaction, and v is the vector of the rates of the reactions. build_model() compiles the rate laws
+of all the reactions into one function that computes v, and finds the pattern of the nonzero
+entries of the Jacobian, i.e. which species each rate depends on. simulate() integrates the ODEs
+with SciPy's BDF solver, which is adaptive and suited to the stiff systems of biochemical
+networks; the sparsity pattern lets it estimate the Jacobian with few evaluations of v.
+
+The network does not store initial amounts or parameter values, so they are given when simulating;
+those not given default to DEFAULT_AMOUNT and DEFAULT_PARAMETER_VALUE.
+
+SimulationWorker runs a simulation on a separate thread, so that the UI stays responsive, and
+streams the time course in chunks as it is computed; TimeCourseBuffer collects the chunks.
+Like rkviewer.plugin_worker, this module does not depend on wx; the function used to run results
+on the UI thread is passed in.
+"""
+import ast
+from dataclasses import dataclass
+import logging
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.integrate import BDF
+
+import iodine as iod
+from .ratelaw import RateLawError, compile_rate_law, compile_tree, numpy_tree
+
+
+DEFAULT_AMOUNT = 1.0  #: The initial amount of the species not given one
+DEFAULT_PARAMETER_VALUE = 1.0  #: The value of the parameters not given one
+CANCELLED = 'The simulation was cancelled'  #: The error of a cancelled simulation
+
+RatesFunction = Callable[[Sequence[Any], Any, Sequence[float], np.ndarray], np.ndarray]
+
+
+class SimulationError(ValueError):
+    """Raised for a network that cannot be simulated, or a simulation that fails."""
+    pass
+
+
+class SimulationCancelled(Exception):
+    """Raised by simulate() when it is cancelled."""
+    pass
+
+
+def stoichiometry_matrix(net) -> Tuple[List[int], List[int], sparse.csr_matrix]:
+    """Return the sparse stoichiometry matrix of an iodine network.
+
+    Returns:
+        The node indices, in the order of the rows; the reaction indices, in the order of the
+        columns; and the matrix, whose entry (i, j) is the net number of units of species i that
+        reaction j produces.
+    """
+    node_indices = sorted(net.nodes)
+    reaction_indices = sorted(net.reactions)
+    rows = {nodei: row for row, nodei in enumerate(node_indices)}
+    entries: Tuple[List[int], List[int], List[float]] = (list(), list(), list())
+    for col, reai in enumerate(reaction_indices):
+        reaction = net.reactions[reai]
+        for stoichs, sign in ((reaction.srcDict, -1), (reaction.destDict, 1)):
+            for nodei, stoich in stoichs.items():
+                entries[0].append(rows[nodei])
+                entries[1].append(col)
+                entries[2].append(sign * stoich.stoich)
+    # Duplicate entries, for a species that is both a reactant and a product, are summed
+    matrix = sparse.coo_matrix((entries[2], (entries[0], entries[1])),
+                               shape=(len(node_indices), len(reaction_indices)), dtype=float)
+    return node_indices, reaction_indices, matrix.tocsr()
+
+
+@dataclass(frozen=True, eq=False)
+class SimulationModel:
+    """The ODEs of a network, compiled.
+
+    Attributes:
+        net_index: The index of the network.
+        node_indices: The index of the node of each species, in the order of the state vector.
+        species_ids: The ID of each species.
+        reaction_indices: The index of each reaction, in the order of the rate vector.
+        parameters: The names of the parameters of the rate laws, in the order of their values.
+        stoichiometry: The stoichiometry matrix, of shape (len(node_indices),
+                       len(reaction_indices)).
+        jac_sparsity: The pattern of the nonzero entries of the Jacobian of the ODEs.
+        rates: rates(y, t, p, out) computes the rates of the reactions into out, and returns it,
+               where y is the state, p the parameter values and t the time. y may have any number
+               of columns, i.e. one state per column, if out has the same.
+    """
+    net_index: int
+    node_indices: Tuple[int, ...]
+    species_ids: Tuple[str, ...]
+    reaction_indices: Tuple[int, ...]
+    parameters: Tuple[str, ...]
+    stoichiometry: sparse.csr_matrix
+    jac_sparsity: sparse.csr_matrix
+    rates: RatesFunction
+
+    def initial_state(self, amounts: Optional[Mapping[str, float]] = None) -> np.ndarray:
+        """Return the state vector given the amount of each species, by ID."""
+        amounts = amounts or dict()
+        return np.array([amounts.get(species, DEFAULT_AMOUNT) for species in self.species_ids],
+                        dtype=float)
+
+    def parameter_values(self, values: Optional[Mapping[str, float]] = None) -> List[float]:
+        """Return the parameter vector given the value of each parameter, by name."""
+        values = values or dict()
+        return [float(values.get(name, DEFAULT_PARAMETER_VALUE)) for name in self.parameters]
+
+    def rhs(self, parameter_values: Sequence[float]) -> Callable[[float, np.ndarray], np.ndarray]:
+        """Return the function f(t, y) that computes dy/dt, for y of shape (n,) or (n, k)."""
+        num_reactions = len(self.reaction_indices)
+
+        def f(t: float, y: np.ndarray) -> np.ndarray:
+            out = np.empty((num_reactions,) + y.shape[1:])
+            if y.ndim == 1 or y.shape[1] == 1:
+                # Arithmetic on floats is much faster than on NumPy scalars or rows. The solvers
+                # pass a single state as a column when the function is vectorized.
+                self.rates(y.ravel().tolist(), t, parameter_values, out.reshape(-1))
+            else:
+                self.rates(y, t, parameter_values, out)
+            return self.stoichiometry @ out
+        return f
+
+    def rate_values(self, times: np.ndarray, amounts: np.ndarray,
+                    parameter_values: Sequence[float]) -> np.ndarray:
+        """Return the rates of the reactions at a number of time points, in one evaluation.
+
+        Args:
+            times: The time points, of shape (k,).
+            amounts: The states at those time points, of shape (k, number of species).
+            parameter_values: The parameter vector.
+
+        Returns:
+            The rates, of shape (k, number of reactions).
+        """
+        out = np.empty((len(self.reaction_indices), len(times)))
+        self.rates(amounts.T, times, parameter_values, out)
+        return out.T
+
+
+def build_model(net_index: int) -> SimulationModel:
+    """Compile the ODEs of an iodine network.
+
+    Raises:
+        SimulationError: If the network has no reactions, or a reaction has no rate law or one
+                         that cannot be compiled.
+    """
+    net = iod.networkDict.get(net_index)
+    if net is None:
+        raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(net_index))
+    if len(net.reactions) == 0:
+        raise SimulationError('The network has no reactions')
+    node_indices, reaction_indices, stoichiometry = stoichiometry_matrix(net)
+    species_ids = tuple(net.nodes[nodei].id for nodei in node_indices)
+    rows = {species: row for row, species in enumerate(species_ids)}
+    parameters: Dict[str, int] = dict()
+
+    def symbol_source(symbol: str) -> str:
+        if symbol in rows:
+            return 'y[{}]'.format(rows[symbol])
+        return 'p[{}]'.format(parameters.setdefault(symbol, len(parameters)))
+
+    lines = ['def rates(y, t, p, out):']
+    trees: Dict[str, ast.expr] = dict()
+    dependencies: Tuple[List[int], List[int]] = (list(), list())
+    for col, reai in enumerate(reaction_indices):
+        reaction = net.reactions[reai]
+        try:
+            compiled = compile_rate_law(reaction.rateLaw)
+            tree = numpy_tree(compiled.tree, symbol_source)
+        except RateLawError as e:
+            raise SimulationError('Reaction {}: {}'.format(reaction.id, e)) from None
+        trees['RATE_{}'.format(col)] = tree
+        lines.append('    out[{0}] = RATE_{0}'.format(col))
+        for symbol in compiled.symbols:
+            if symbol in rows:
+                dependencies[0].append(col)
+                dependencies[1].append(rows[symbol])
+    lines.append('    return out')
+    try:
+        rates = compile_tree('\n'.join(lines), trees)['rates']
+    except RateLawError as e:
+        raise SimulationError(str(e)) from None
+
+    depends = sparse.csr_matrix((np.ones(len(dependencies[0])), dependencies),
+                                shape=(len(reaction_indices), len(node_indices)))
+    # dy_i/dy_k is nonzero only if a reaction that changes species i depends on species k
+    jac_sparsity = (abs(stoichiometry) @ depends).tocsr()
+    jac_sparsity.data[:] = 1
+    return SimulationModel(net_index, tuple(node_indices), species_ids, tuple(reaction_indices),
+                           tuple(parameters), stoichiometry, jac_sparsity, rates)
+
+
+@dataclass(frozen=True, eq=False)
+class TimeCourse:
+    """The amounts of the species of a simulated network, and the rates of its reactions, at a
+    number of time points.
+
+    Attributes:
+        times: The time points, of shape (k,).
+        amounts: The amounts, of shape (k, number of species), in the order of the species of the
+                 model.
+        rates: The rates, i.e. fluxes, of shape (k, number of reactions), in the order of the
+               reactions of the model.
+    """
+    times: np.ndarray
+    amounts: np.ndarray
+    rates: np.ndarray
+
+
+def simulate(model: SimulationModel, end_time: float, num_points: int,
+             initial_amounts: Optional[Mapping[str, float]] = None,
+             parameters: Optional[Mapping[str, float]] = None, rtol: float = 1e-6,
+             atol: float = 1e-9, on_chunk: Optional[Callable[[TimeCourse], Any]] = None,
+             chunk_interval: float = 0.1,
+             cancel: Optional[threading.Event] = None) -> TimeCourse:
+    """Integrate the ODEs of a model from time 0 to end_time.
+
+    Args:
+        model: The model.
+        end_time: The end time.
+        num_points: The number of evenly spaced time points to return, including 0 and end_time.
+        initial_amounts: The initial amount of each species, by ID.
+        parameters: The value of each parameter, by name.
+        rtol: The relative tolerance of the solver.
+        atol: The absolute tolerance of the solver.
+        on_chunk: If not None, called with the time points computed since the previous call, at
+                  most every chunk_interval seconds, and once more at the end. The chunks add up
+                  to the returned time course.
+        chunk_interval: See on_chunk.
+        cancel: If not None, the simulation stops, raising SimulationCancelled, once this is set.
+
+    Raises:
+        SimulationError: If the solver fails, e.g. because the amounts become infinite.
+        SimulationCancelled: If cancelled.
+    """
+    if end_time <= 0 or num_points < 2:
+        raise SimulationError('The end time must be positive, with at least two time points')
+    times = np.linspace(0.0, end_time, num_points)
+    amounts = np.empty((num_points, len(model.node_indices)))
+    amounts[0] = model.initial_state(initial_amounts)
+    parameter_values = model.parameter_values(parameters)
+    solver = BDF(model.rhs(parameter_values), 0.0, amounts[0], end_time,
+                 rtol=rtol, atol=atol, jac_sparsity=model.jac_sparsity, vectorized=True)
+    done = 1  # The number of time points computed
+    sent = 0  # The number of time points passed to on_chunk
+    last_chunk = time.perf_counter()
+    while solver.status == 'running':
+        if cancel is not None and cancel.is_set():
+            raise SimulationCancelled()
+        message = solver.step()
+        if solver.status == 'failed':
+            raise SimulationError('The solver failed at time {:g}: {}'.format(solver.t, message))
+        end = int(np.searchsorted(times, solver.t, side='right'))
+        if end > done:
+            amounts[done:end] = solver.dense_output()(times[done:end]).T
+            done = end
+        if on_chunk is not None and done > sent:
+            now = time.perf_counter()
+            if solver.status != 'running' or now - last_chunk >= chunk_interval:
+                chunk_amounts = amounts[sent:done].copy()
+                on_chunk(TimeCourse(times[sent:done], chunk_amounts,
+                                    model.rate_values(times[sent:done], chunk_amounts,
+                                                      parameter_values)))
+                sent = done
+                last_chunk = now
+    return TimeCourse(times, amounts, model.rate_values(times, amounts, parameter_values))
+
+
+class TimeCourseBuffer:
+    """Collects the chunks of a time course as they are streamed, and interpolates it.
+
+    Attributes:
+        max_amount: The largest amount so far, or 0.
+        max_rate: The largest absolute rate so far, or 0.
+    """
+    max_amount: float
+    max_rate: float
+    _size: int
+    _times: np.ndarray
+    _amounts: np.ndarray
+    _rates: np.ndarray
+
+    def __init__(self, num_species: int, num_reactions: int):
+        self.max_amount = 0.0
+        self.max_rate = 0.0
+        self._size = 0
+        self._times = np.empty(0)
+        self._amounts = np.empty((0, num_species))
+        self._rates = np.empty((0, num_reactions))
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[:self._size]
+
+    def append(self, times: np.ndarray, amounts: np.ndarray, rates: np.ndarray):
+        """Append the next chunk, whose times follow those already appended."""
+        end = self._size + len(times)
+        if end > len(self._times):
+            # Grow geometrically, so that appending is amortized O(chunk)
+            capacity = max(end, 2 * len(self._times), 16)
+            self._times = np.resize(self._times, capacity)
+            self._amounts = np.resize(self._amounts, (capacity, self._amounts.shape[1]))
+            self._rates = np.resize(self._rates, (capacity, self._rates.shape[1]))
+        self._times[self._size:end] = times
+        self._amounts[self._size:end] = amounts
+        self._rates[self._size:end] = rates
+        self._size = end
+        if amounts.size != 0:
+            self.max_amount = max(self.max_amount, float(np.nanmax(amounts)))
+        if rates.size != 0:
+            self.max_rate = max(self.max_rate, float(np.nanmax(np.abs(rates))))
+
+    def sample(self, time: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the amounts and the rates at a time, interpolated linearly, and clamped to the
+        times appended so far."""
+        assert self._size != 0
+        times = self.times
+        i = int(np.searchsorted(times, time, side='right'))
+        if i == 0:
+            return self._amounts[0], self._rates[0]
+        if i == self._size:
+            return self._amounts[i - 1], self._rates[i - 1]
+        w = (time - times[i - 1]) / (times[i] - times[i - 1])
+        return ((1 - w) * self._amounts[i - 1] + w * self._amounts[i],
+                (1 - w) * self._rates[i - 1] + w * self._rates[i])
+
+
+class SimulationWorker:
+    """A daemon thread that runs one simulation and streams its time course.
+
+    on_chunk and on_done are passed to 'dispatch', which should run them on the UI thread.
+
+    Attributes:
+        model: The model being simulated.
+    """
+    model: SimulationModel
+
+    def __init__(self, model: SimulationModel, end_time: float, num_points: int,
+                 initial_amounts: Optional[Mapping[str, float]],
+                 parameters: Optional[Mapping[str, float]], dispatch: Callable[[Callable], Any],
+                 on_chunk: Callable[[TimeCourse], None],
+                 on_done: Callable[[Optional[TimeCourse], Optional[str]], None],
+                 chunk_interval: float = 0.1):
+        """
+        Args:
+            model: The model.
+            end_time: See simulate().
+            num_points: See simulate().
+            initial_amounts: See simulate().
+            parameters: See simulate().
+            dispatch: Function that runs a callable on the UI thread, e.g. wx.CallAfter.
+            on_chunk: Called with each chunk of the time course; see simulate().
+            on_done: Called once the simulation is over, with the whole time course and None, or
+                     with None and an error message if it failed. Not called if it is cancelled.
+            chunk_interval: See simulate().
+        """
+        self.model = model
+        self._args = (end_time, num_points, initial_amounts, parameters)
+        self._dispatch = dispatch
+        self._on_chunk = on_chunk
+        self._on_done = on_done
+        self._chunk_interval = chunk_interval
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='simulation', daemon=True)
+        self._thread.start()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Stop the simulation. The chunks that were already dispatched are still delivered."""
+        self._cancel.set()
+
+    def join(self, timeout: Optional[float] = None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        def on_chunk(chunk: TimeCourse):
+            self._dispatch(lambda: self._on_chunk(chunk))
+
+        try:
+            course = simulate(self.model, *self._args, on_chunk=on_chunk,
+                              chunk_interval=self._chunk_interval, cancel=self._cancel)
+        except SimulationCancelled:
+            return
+        except SimulationError as e:
+            message = str(e)
+            self._dispatch(lambda: self._on_done(None, message))
+            return
+        except Exception:
+            error = traceback.format_exc()
+            logging.getLogger('simulation').error('Caught error in simulation:\n%s', error)
+            self._dispatch(lambda: self._on_done(None, error))
+            return
+        self._dispatch(lambda: self._on_done(course, None))
@@ -0,0 +1,229 @@
+"""Read-only, array-backed snapshots of a network.
+
+A NetworkSnapshot holds the state of every node, reaction and compartment of a network in NumPy
+arrays, built by reading the model directly (rather than through the per-item getters, which
+validate their arguments on every call). This makes it cheap to analyze a whole network, e.g. in a
+plugin. The arrays are not writeable, so a snapshot can be shared between callers without copying;
+SnapshotCache returns the same snapshot until the model changes.
+
+Items are stored in rows, in increasing order of their index. The index of the item in each row is
+given by e.g. node_indices, and the row of an index by e.g. node_row().
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+import iodine as iod
+
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+def _colors(colors: Sequence[iod.TColor]) -> np.ndarray:
+    return _frozen(np.array([(c.r, c.g, c.b, c.a) for c in colors], dtype=np.uint8).reshape(-1, 4))
+
+
+def _floats(values, columns: int = 0) -> np.ndarray:
+    array = np.array(values, dtype=np.float64)
+    if columns != 0:
+        array = array.reshape(-1, columns)
+    return _frozen(array)
+
+
+def _ints(values) -> np.ndarray:
+    return _frozen(np.array(values, dtype=np.int64))
+
+
+@dataclass(frozen=True, eq=False)
+class NetworkSnapshot:
+    """The state of a network at a given model version.
+
+    Colors are RGBA rows of uint8. Positions and sizes are (x, y) rows.
+
+    Attributes:
+        net_index: The index of the network.
+        version: The model version (see iodine.getModelVersion()) the snapshot was taken at.
+        node_indices: The index of the node in each row.
+        node_ids: The ID of the node in each row.
+        node_positions: The positions of the top-left corners of the nodes.
+        node_sizes: The sizes of the nodes.
+        node_fill_colors: The fill colors of the nodes.
+        node_border_colors: The border colors of the nodes.
+        node_border_widths: The border widths of the nodes.
+        node_compartments: The index of the compartment of each node, or -1 if it is in none.
+        reaction_indices: The index of the reaction in each row.
+        reaction_ids: The ID of the reaction in each row.
+        reaction_fill_colors: The fill colors of the reactions.
+        reaction_thicknesses: The line thicknesses of the reactions.
+        rate_laws: The rate laws of the reactions.
+        reactant_edges: One (reaction row, node row) pair for each reactant of each reaction.
+        reactant_stoich: The stoichiometry of each pair in reactant_edges.
+        product_edges: One (reaction row, node row) pair for each product of each reaction.
+        product_stoich: The stoichiometry of each pair in product_edges.
+        compartment_indices: The index of the compartment in each row.
+        compartment_ids: The ID of the compartment in each row.
+        compartment_positions: The positions of the top-left corners of the compartments.
+        compartment_sizes: The sizes of the compartments.
+        compartment_volumes: The volumes of the compartments.
+    """
+    net_index: int
+    version: int
+    node_indices: np.ndarray
+    node_ids: Tuple[str, ...]
+    node_positions: np.ndarray
+    node_sizes: np.ndarray
+    node_fill_colors: np.ndarray
+    node_border_colors: np.ndarray
+    node_border_widths: np.ndarray
+    node_compartments: np.ndarray
+    reaction_indices: np.ndarray
+    reaction_ids: Tuple[str, ...]
+    reaction_fill_colors: np.ndarray
+    reaction_thicknesses: np.ndarray
+    rate_laws: Tuple[str, ...]
+    reactant_edges: np.ndarray
+    reactant_stoich: np.ndarray
+    product_edges: np.ndarray
+    product_stoich: np.ndarray
+    compartment_indices: np.ndarray
+    compartment_ids: Tuple[str, ...]
+    compartment_positions: np.ndarray
+    compartment_sizes: np.ndarray
+    compartment_volumes: np.ndarray
+    _node_rows: Dict[int, int]
+    _reaction_rows: Dict[int, int]
+    _compartment_rows: Dict[int, int]
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_reactions(self) -> int:
+        return len(self.reaction_ids)
+
+    @property
+    def num_compartments(self) -> int:
+        return len(self.compartment_ids)
+
+    def node_row(self, node_index: int) -> int:
+        """Return the row of the node with the given index. Raises KeyError if there is none."""
+        return self._node_rows[node_index]
+
+    def reaction_row(self, reaction_index: int) -> int:
+        return self._reaction_rows[reaction_index]
+
+    def compartment_row(self, comp_index: int) -> int:
+        return self._compartment_rows[comp_index]
+
+    def node_centers(self) -> np.ndarray:
+        return self.node_positions + self.node_sizes / 2
+
+    def stoichiometry_matrix(self) -> sparse.csr_matrix:
+        """Return the sparse (num_nodes, num_reactions) stoichiometry matrix.
+
+        Entry (i, j) is the net amount of the node in row i produced by the reaction in row j,
+        i.e. its product stoichiometry minus its reactant stoichiometry.
+        """
+        # Duplicate entries, for a node that is both a reactant and a product, are summed
+        matrix = sparse.coo_matrix(
+            (np.concatenate([self.product_stoich, -self.reactant_stoich]),
+             (np.concatenate([self.product_edges[:, 1], self.reactant_edges[:, 1]]),
+              np.concatenate([self.product_edges[:, 0], self.reactant_edges[:, 0]]))),
+            shape=(self.num_nodes, self.num_reactions)).tocsr()
+        matrix.eliminate_zeros()
+        return matrix
+
+    def adjacency_matrix(self) -> sparse.csr_matrix:
+        """Return the sparse (num_nodes, num_nodes) boolean matrix of nodes linked by a reaction.
+
+        Entry (i, j) is True if some reaction has the node in row i as a reactant and the node in
+        row j as a product.
+        """
+        def incidence(edges: np.ndarray) -> sparse.csr_matrix:
+            """Entry (i, j) is 1 if the node in row j is in the reaction in row i."""
+            return sparse.csr_matrix((np.ones(len(edges), dtype=np.int64),
+                                      (edges[:, 0], edges[:, 1])),
+                                     shape=(self.num_reactions, self.num_nodes))
+
+        linked = incidence(self.reactant_edges).T @ incidence(self.product_edges)
+        return linked.astype(bool).tocsr()
+
+
+def take_snapshot(net_index: int) -> NetworkSnapshot:
+    """Take a snapshot of the given network at the current model version."""
+    net = iod.networkDict.get(net_index)
+    if net is None:
+        raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(net_index))
+
+    node_indices = sorted(net.nodes)
+    nodes = [net.nodes[i] for i in node_indices]
+    node_rows = {nodei: row for row, nodei in enumerate(node_indices)}
+    reaction_indices = sorted(net.reactions)
+    reactions = [net.reactions[i] for i in reaction_indices]
+    comp_indices = sorted(net.compartments)
+    comps = [net.compartments[i] for i in comp_indices]
+
+    reactant_edges = list()
+    reactant_stoich = list()
+    product_edges = list()
+    product_stoich = list()
+    for row, rea in enumerate(reactions):
+        for nodei, species in rea.srcDict.items():
+            reactant_edges.append((row, node_rows[nodei]))
+            reactant_stoich.append(species.stoich)
+        for nodei, species in rea.destDict.items():
+            product_edges.append((row, node_rows[nodei]))
+            product_stoich.append(species.stoich)
+
+    return NetworkSnapshot(
+        net_index=net_index,
+        version=iod.getModelVersion(),
+        node_indices=_ints(node_indices),
+        node_ids=tuple(n.id for n in nodes),
+        node_positions=_floats([(n.x, n.y) for n in nodes], 2),
+        node_sizes=_floats([(n.w, n.h) for n in nodes], 2),
+        node_fill_colors=_colors([n.fillColor for n in nodes]),
+        node_border_colors=_colors([n.outlineColor for n in nodes]),
+        node_border_widths=_floats([n.outlineThickness for n in nodes]),
+        node_compartments=_ints([n.compi for n in nodes]),
+        reaction_indices=_ints(reaction_indices),
+        reaction_ids=tuple(r.id for r in reactions),
+        reaction_fill_colors=_colors([r.fillColor for r in reactions]),
+        reaction_thicknesses=_floats([r.thickness for r in reactions]),
+        rate_laws=tuple(r.rateLaw for r in reactions),
+        reactant_edges=_frozen(np.array(reactant_edges, dtype=np.int64).reshape(-1, 2)),
+        reactant_stoich=_floats(reactant_stoich),
+        product_edges=_frozen(np.array(product_edges, dtype=np.int64).reshape(-1, 2)),
+        product_stoich=_floats(product_stoich),
+        compartment_indices=_ints(comp_indices),
+        compartment_ids=tuple(c.id for c in comps),
+        compartment_positions=_floats([(c.x, c.y) for c in comps], 2),
+        compartment_sizes=_floats([(c.w, c.h) for c in comps], 2),
+        compartment_volumes=_floats([c.volume for c in comps]),
+        _node_rows=node_rows,
+        _reaction_rows={reai: row for row, reai in enumerate(reaction_indices)},
+        _compartment_rows={compi: row for row, compi in enumerate(comp_indices)},
+    )
+
+
+class SnapshotCache:
+    """Keeps the latest snapshot of each network, and retakes it only if the model has changed."""
+    _snapshots: Dict[int, NetworkSnapshot]
+
+    def __init__(self):
+        self._snapshots = dict()
+
+    def get(self, net_index: int) -> NetworkSnapshot:
+        snapshot: Optional[NetworkSnapshot] = self._snapshots.get(net_index)
+        if snapshot is None or snapshot.version != iod.getModelVersion():
+            snapshot = take_snapshot(net_index)
+            self._snapshots[net_index] = snapshot
+        return snapshot
+
+    def clear(self):
+        self._snapshots.clear()
@@ -0,0 +1,208 @@
+"""A spatial index of rectangles, for finding those that contain given points or overlap a region.
+
+SpatialGrid buckets axis-aligned rectangles (e.g. nodes) into a uniform grid of square cells, each
+rectangle being listed in every cell that it overlaps. A query then only tests the rectangles
+listed in the cells it touches, rather than all of them. Queries of many points at once are
+vectorized with NumPy. RectSweep follows a query rectangle that moves little at a time, e.g. when
+drag-selecting, testing only the strips that it covers or uncovers at each move.
+
+The grid does not depend on the GUI, and works on the arrays of a NetworkSnapshot as well as on
+the rectangles of the canvas.
+"""
+from typing import List, Optional, Set, Tuple
+
+import numpy as np
+
+
+_HALF_RANGE = 1 << 30  #: The cell coordinates are clipped to [-_HALF_RANGE, _HALF_RANGE)
+
+
+def _cell_keys(cells_x: np.ndarray, cells_y: np.ndarray) -> np.ndarray:
+    """Return a single integer key for each cell, given its (x, y) coordinates in the grid."""
+    return (cells_x + _HALF_RANGE) * (2 * _HALF_RANGE) + cells_y + _HALF_RANGE
+
+
+class SpatialGrid:
+    """A uniform grid over axis-aligned rectangles.
+
+    The rectangles are given as the arrays of their top-left corners and sizes, and are referred to
+    by their row in these arrays. A rectangle contains the points on its border.
+
+    Args:
+        positions: The top-left corners of the rectangles.
+        sizes: The sizes of the rectangles.
+        cell_size: The side of the cells. Defaults to twice the median of the larger side of the
+                   rectangles, so that most rectangles are listed in at most four cells.
+
+    Attributes:
+        cell_size: The side of the cells.
+        lower: The top-left corners of the rectangles.
+        upper: The bottom-right corners of the rectangles.
+    """
+
+    def __init__(self, positions: np.ndarray, sizes: np.ndarray,
+                 cell_size: Optional[float] = None):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+        if cell_size is None:
+            cell_size = 2 * float(np.median(sizes.max(axis=1))) if len(sizes) != 0 else 1
+        self.cell_size = max(cell_size, 1e-6)
+        self.lower = positions
+        self.upper = positions + sizes
+
+        # One (cell, rectangle) entry for each cell overlapped by each rectangle
+        first = self._cells(self.lower)
+        last = self._cells(self.upper)
+        spans = last - first + 1
+        counts = spans[:, 0] * spans[:, 1]
+        rects = np.repeat(np.arange(len(positions)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        span_y = spans[rects, 1]
+        cells_x = first[rects, 0] + offsets // span_y
+        cells_y = first[rects, 1] + offsets % span_y
+        keys = _cell_keys(cells_x, cells_y)
+        order = np.argsort(keys, kind='stable')
+        self._keys, self._starts = np.unique(keys[order], return_index=True)
+        self._ends = np.append(self._starts[1:], len(keys))
+        self._rects = rects[order]
+
+    def __len__(self) -> int:
+        return len(self.lower)
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        cells = np.floor(np.clip(points / self.cell_size, -_HALF_RANGE, _HALF_RANGE - 1))
+        return cells.astype(np.int64)
+
+    def _candidates(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the (query, rectangle) pairs for the rectangles listed in the cell of each query.
+        """
+        found = np.searchsorted(self._keys, keys)
+        found = np.minimum(found, max(len(self._keys) - 1, 0))
+        hit = (self._keys[found] == keys) if len(self._keys) != 0 else np.zeros(len(keys), bool)
+        queries = np.flatnonzero(hit)
+        starts = self._starts[found[queries]]
+        counts = self._ends[found[queries]] - starts
+        offsets = np.cumsum(counts) - counts
+        entries = np.arange(counts.sum()) - np.repeat(offsets - starts, counts)
+        return np.repeat(queries, counts), self._rects[entries]
+
+    def point_hits(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the pairs of (point, rectangle) rows such that the rectangle contains the point.
+
+        Args:
+            points: The (x, y) points, one per row.
+
+        Returns:
+            The rows of the points, and the rows of the rectangles, of the pairs.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cells = self._cells(points)
+        point_rows, rects = self._candidates(_cell_keys(cells[:, 0], cells[:, 1]))
+        inside = np.all((points[point_rows] >= self.lower[rects])
+                        & (points[point_rows] <= self.upper[rects]), axis=1)
+        return point_rows[inside], rects[inside]
+
+    def query_rect(self, lower, upper) -> np.ndarray:
+        """Return the rows of the rectangles that overlap the given rectangle, in increasing order.
+
+        Args:
+            lower: The top-left corner of the rectangle.
+            upper: The bottom-right corner of the rectangle.
+        """
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        if len(self) == 0 or np.any(upper < lower):
+            return np.empty(0, dtype=np.int64)
+        first = self._cells(lower)
+        last = self._cells(upper)
+        if np.prod(last - first + 1) > len(self._keys):
+            # The query covers more cells than the grid has; test all the rectangles instead
+            rects = np.arange(len(self))
+        else:
+            cells_x, cells_y = np.meshgrid(np.arange(first[0], last[0] + 1),
+                                           np.arange(first[1], last[1] + 1), indexing='ij')
+            _, rects = self._candidates(_cell_keys(cells_x.ravel(), cells_y.ravel()))
+            rects = np.unique(rects)
+        overlap = np.all((self.lower[rects] <= upper) & (self.upper[rects] >= lower), axis=1)
+        return rects[overlap]
+
+
+def _difference(lower: np.ndarray, upper: np.ndarray, other_lower: np.ndarray,
+                other_upper: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Return at most four rectangles that cover the part of a rectangle outside of another one.
+
+    The rectangles also cover the border of the other rectangle where it is inside the first one,
+    since the rectangles overlapping only that border may overlap the first one and not the other.
+    """
+    if np.any(upper < other_lower) or np.any(other_upper < lower):
+        return [(lower, upper)]
+    (x0, y0), (x1, y1) = lower, upper
+    (u0, v0), (u1, v1) = other_lower, other_upper
+    strips = list()
+    if y0 < v0:
+        strips.append(((x0, y0), (x1, v0)))
+    if v1 < y1:
+        strips.append(((x0, v1), (x1, y1)))
+    top, bottom = max(y0, v0), min(y1, v1)
+    if x0 < u0:
+        strips.append(((x0, top), (u0, bottom)))
+    if u1 < x1:
+        strips.append(((u1, top), (x1, bottom)))
+    return [(np.array(a), np.array(b)) for a, b in strips]
+
+
+class RectSweep:
+    """The rectangles of a SpatialGrid that overlap a query rectangle that moves little at a time.
+
+    This is meant for drag-selection, where the selection rectangle follows the mouse. Each move
+    only tests the rectangles in the strips that the query rectangle has covered or uncovered since
+    the previous move, rather than all of those that it overlaps.
+
+    Args:
+        grid: The grid of the rectangles.
+
+    Attributes:
+        grid: The grid of the rectangles.
+        rows: The rows of the rectangles that overlap the query rectangle.
+    """
+    grid: SpatialGrid
+    rows: Set[int]
+    _lower: Optional[np.ndarray]
+    _upper: Optional[np.ndarray]
+
+    def __init__(self, grid: SpatialGrid):
+        self.grid = grid
+        self.rows = set()
+        self._lower = None
+        self._upper = None
+
+    def move(self, lower, upper) -> Tuple[Set[int], Set[int]]:
+        """Move the query rectangle, and update rows.
+
+        Args:
+            lower: The top-left corner of the query rectangle.
+            upper: The bottom-right corner of the query rectangle.
+
+        Returns:
+            The rows of the rectangles that the query rectangle now overlaps and did not, and those
+            that it overlapped and no longer does.
+        """
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        if self._lower is None or np.any(self._upper < self._lower) or np.any(upper < lower):
+            strips = [(lower, upper)]
+            candidates = np.array(list(self.rows), dtype=np.int64)
+        else:
+            strips = (_difference(lower, upper, self._lower, self._upper)
+                      + _difference(self._lower, self._upper, lower, upper))
+            candidates = np.empty(0, dtype=np.int64)
+        self._lower, self._upper = lower, upper
+        candidates = np.unique(np.concatenate(
+            [candidates] + [self.grid.query_rect(a, b) for a, b in strips]))
+        overlap = np.all((self.grid.lower[candidates] <= upper)
+                         & (self.grid.upper[candidates] >= lower), axis=1)
+        added = set(candidates[overlap].tolist()) - self.rows
+        removed = self.rows.intersection(candidates[~overlap].tolist())
+        self.rows |= added
+        self.rows -= removed
+        return added, removed
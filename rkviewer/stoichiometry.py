@@ -0,0 +1,448 @@
+"""The sparse stoichiometry matrix of a network, and structural analyses of it.
+
+StoichiometryCache keeps the reactants and products of each reaction of the iodine networks, and
+is told by iodine which reactions change (e.g. by addSrcNode(), setReactionDestNodeStoich() or
+deleteReaction()), so it re-reads only those and replaces their columns in the matrices with a
+few array operations. This is much faster than walking the model, let alone calling
+getListOfReactionSrcNodes() for every reaction.
+
+A Stoichiometry is immutable, and is reused until its network changes. The analyses on it, i.e.
+conservation laws, dead-end species, connected components and reachability, work on the sparse
+matrices, and are computed once per Stoichiometry.
+"""
+import heapq
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+import iodine as iod
+
+
+_TOLERANCE = 1e-9  #: Entries this small are zero in the elimination
+_PIVOT_THRESHOLD = 0.1  #: Pivots are at least this fraction of the largest value in the row
+
+
+class _cached_property:
+    """Like functools.cached_property, which needs Python 3.8.
+
+    The value is computed on first access and stored in the __dict__ of the instance, which is
+    looked up before this descriptor from then on. This works on frozen dataclasses too.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.__doc__ = function.__doc__
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name] = self.function(instance)
+        return value
+
+
+@dataclass(frozen=True, eq=False)
+class Component:
+    """A connected component of a network, i.e. species and reactions linked by reactions.
+
+    Attributes:
+        node_indices: The indices of the nodes of the component, sorted.
+        reaction_indices: The indices of the reactions of the component, sorted. This is empty
+                          for a node that is in no reaction.
+    """
+    node_indices: Tuple[int, ...]
+    reaction_indices: Tuple[int, ...]
+
+
+@dataclass(frozen=True, eq=False)
+class Stoichiometry:
+    """The reactants and products of the reactions of a network, as sparse matrices.
+
+    The rows are the nodes, sorted by index, and the columns the reactions, sorted by index. The
+    matrices must not be modified.
+
+    Attributes:
+        net_index: The index of the network.
+        node_indices: The index of the node of each row.
+        reaction_indices: The index of the reaction of each column.
+        reactants: Entry (i, j) is the stoichiometry of node i as a reactant of reaction j.
+        products: Entry (i, j) is the stoichiometry of node i as a product of reaction j.
+    """
+    net_index: int
+    node_indices: np.ndarray
+    reaction_indices: np.ndarray
+    reactants: sparse.csc_matrix
+    products: sparse.csc_matrix
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_indices)
+
+    @property
+    def num_reactions(self) -> int:
+        return len(self.reaction_indices)
+
+    def node_row(self, node_index: int) -> int:
+        """Return the row of the node with the given index. Raises KeyError if there is none."""
+        return _position(self.node_indices, node_index)
+
+    def reaction_column(self, reaction_index: int) -> int:
+        return _position(self.reaction_indices, reaction_index)
+
+    @_cached_property
+    def matrix(self) -> sparse.csr_matrix:
+        """The stoichiometry matrix, whose entry (i, j) is the net number of units of node i that
+        reaction j produces. A node that is both a reactant and a product of a reaction has the
+        difference, which may be zero."""
+        matrix = (self.products - self.reactants).tocsr()
+        matrix.eliminate_zeros()
+        return _frozen(matrix)
+
+    @_cached_property
+    def _incidence(self) -> sparse.csr_matrix:
+        """Entry (i, j) is 1 if node i is a reactant or a product of reaction j."""
+        return ((self.reactants != 0) + (self.products != 0)).astype(np.int8).tocsr()
+
+    def conservation_laws(self) -> sparse.csr_matrix:
+        """Return a basis of the conservation laws of the network, one per row.
+
+        Each row L has one column per node, and L @ x is constant in time for the amounts x,
+        whatever the rate laws, i.e. L is in the left null space of the matrix. There is one law
+        per free node of the sparse elimination (see _left_null_space()), with coefficient 1 for
+        that node and 0 for the other free nodes. A node that is in no reaction is a conservation
+        law by itself.
+        """
+        return self._conservation_laws
+
+    @_cached_property
+    def _conservation_laws(self) -> sparse.csr_matrix:
+        return _frozen(_left_null_space(self.matrix))
+
+    def dead_end_species(self) -> Tuple[int, ...]:
+        """Return the indices of the nodes that some reaction produces but none consumes, or that
+        some reaction consumes but none produces, i.e. whose amounts can only grow or only
+        shrink. Nodes that are in no reaction are not included."""
+        matrix = self.matrix
+        produced = np.asarray((matrix > 0).sum(axis=1)).ravel() > 0
+        consumed = np.asarray((matrix < 0).sum(axis=1)).ravel() > 0
+        return tuple(self.node_indices[produced != consumed].tolist())
+
+    def connected_components(self) -> List[Component]:
+        """Return the connected components of the network, ordered by their smallest node index.
+
+        Two nodes are connected if they are reactants or products of the same reaction, so
+        modifiers that a reaction both consumes and produces connect it too.
+        """
+        return [Component(tuple(self.node_indices[nodes].tolist()),
+                          tuple(self.reaction_indices[reactions].tolist()))
+                for nodes, reactions in self._component_rows]
+
+    @_cached_property
+    def _component_rows(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        n = self.num_nodes
+        incidence = self._incidence
+        # The bipartite graph of the nodes, then the reactions
+        graph = sparse.bmat([[None, incidence], [incidence.T, None]], format='csr',
+                            dtype=np.int8) if n + self.num_reactions > 0 else \
+            sparse.csr_matrix((0, 0))
+        _, labels = csgraph.connected_components(graph, directed=False)
+        # Labels are numbered by their first vertex, so by their first node, except for reactions
+        # with no nodes, which come last
+        order = np.argsort(labels, kind='stable')
+        bounds = np.flatnonzero(np.diff(labels[order])) + 1
+        components = list()
+        for vertices in np.split(order, bounds) if len(order) else ():
+            components.append((vertices[vertices < n], vertices[vertices >= n] - n))
+        return components
+
+    @_cached_property
+    def _flow_graph(self) -> sparse.csr_matrix:
+        """The directed graph from each reactant to its reactions, and from each reaction to its
+        products. The vertices are the nodes, then the reactions."""
+        consumes = (self.reactants != 0).astype(np.int8)
+        produces = (self.products != 0).astype(np.int8)
+        return sparse.bmat([[None, consumes], [produces.T, None]], format='csr', dtype=np.int8) \
+            if self.num_nodes + self.num_reactions > 0 else sparse.csr_matrix((0, 0))
+
+    def reachable(self, node_indices: Iterable[int] = (), reaction_indices: Iterable[int] = (),
+                  upstream: bool = False) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """Return the nodes and reactions that can be reached from the given ones.
+
+        A reaction is reached from each of its reactants, and reaches each of its products, so
+        this is everything the given nodes and reactions may affect. If upstream is True, the
+        links are followed backwards instead, i.e. this is everything that may affect them.
+
+        Returns:
+            The indices of the nodes and of the reactions reached, sorted, including those given.
+
+        Raises:
+            KeyError: If a node or reaction is not in the network.
+        """
+        n = self.num_nodes
+        starts = [self.node_row(nodei) for nodei in node_indices] + \
+            [n + self.reaction_column(reai) for reai in reaction_indices]
+        graph = self._flow_graph.T.tocsr() if upstream else self._flow_graph
+        reached = np.zeros(graph.shape[0], dtype=bool)
+        for start in starts:
+            if not reached[start]:
+                reached[csgraph.breadth_first_order(graph, start, directed=True,
+                                                    return_predecessors=False)] = True
+        vertices = np.flatnonzero(reached)
+        return (tuple(self.node_indices[vertices[vertices < n]].tolist()),
+                tuple(self.reaction_indices[vertices[vertices >= n] - n].tolist()))
+
+
+def _position(indices: np.ndarray, index: int) -> int:
+    position = int(np.searchsorted(indices, index))
+    if position == len(indices) or indices[position] != index:
+        raise KeyError(index)
+    return position
+
+
+def _frozen(matrix: sparse.spmatrix) -> sparse.spmatrix:
+    for array in (matrix.data, matrix.indices, matrix.indptr):
+        array.flags.writeable = False
+    return matrix
+
+
+def _left_null_space(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Return a basis of the left null space of a sparse (n, m) matrix, as a (k, n) matrix.
+
+    This is Gauss-Jordan elimination on the columns, i.e. the reactions, each a dict from row to
+    value. Each step pivots on the row with the fewest entries left, in the column with the
+    fewest entries among those with a large enough value there, which keeps the fill-in small:
+    in most networks, many species are in only one reaction, and pivoting on them fills in
+    nothing. Every row that is no pivot is free, and gives the law with 1 for itself and minus
+    its value in each pivot column for the pivot row of that column.
+    """
+    n, m = matrix.shape
+    csc = matrix.tocsc()
+    columns: Dict[int, Dict[int, float]] = {
+        col: dict(zip(csc.indices[csc.indptr[col]:csc.indptr[col + 1]].tolist(),
+                      csc.data[csc.indptr[col]:csc.indptr[col + 1]].tolist()))
+        for col in range(m)}
+    # The columns that have an entry in each row
+    rows: Dict[int, Set[int]] = {row: set() for row in range(n)}
+    for col, entries in columns.items():
+        for row in entries:
+            rows[row].add(col)
+
+    pivots: Dict[int, int] = dict()  # Pivot row of each pivot column
+    pivot_rows: Set[int] = set()
+    heap = [(len(cols), row) for row, cols in rows.items() if cols]
+    heapq.heapify(heap)
+    while heap:
+        count, row = heapq.heappop(heap)
+        cols = rows[row]
+        if row in pivot_rows or count != len(cols):
+            if row not in pivot_rows and cols:
+                heapq.heappush(heap, (len(cols), row))
+            continue
+        candidates = [col for col in cols if col not in pivots]
+        if not candidates:
+            continue
+        largest = max(abs(columns[col][row]) for col in candidates)
+        col = min((c for c in candidates if abs(columns[c][row]) >= _PIVOT_THRESHOLD * largest),
+                  key=lambda c: len(columns[c]))
+        pivot = columns[col]
+        scale = pivot[row]
+        for r in pivot:
+            pivot[r] /= scale
+        pivots[col] = row
+        pivot_rows.add(row)
+        # Eliminate the row from every other column, including pivot columns
+        for other in list(cols):
+            if other == col:
+                continue
+            entries = columns[other]
+            factor = entries[row]
+            for r, value in pivot.items():
+                new = entries.get(r, 0.0) - factor * value
+                if abs(new) <= _TOLERANCE:
+                    if r in entries:
+                        del entries[r]
+                        rows[r].discard(other)
+                        heapq.heappush(heap, (len(rows[r]), r))
+                else:
+                    if r not in entries:
+                        rows[r].add(other)
+                        heapq.heappush(heap, (len(rows[r]), r))
+                    entries[r] = new
+    free = [row for row in range(n) if row not in pivot_rows]
+    law_of_row = {row: i for i, row in enumerate(free)}
+    law_rows = list(range(len(free)))
+    node_cols = list(free)
+    values = [1.0] * len(free)
+    for col, pivot_row in pivots.items():
+        for row, value in columns[col].items():
+            if row != pivot_row:
+                law_rows.append(law_of_row[row])
+                node_cols.append(pivot_row)
+                values.append(-value)
+    laws = sparse.csr_matrix((values, (law_rows, node_cols)), shape=(len(free), n))
+    laws.sort_indices()
+    return laws
+
+
+#: The reactants and products of a reaction, as (node index, stoichiometry) pairs
+_Column = Tuple[Tuple[Tuple[int, float], ...], Tuple[Tuple[int, float], ...]]
+
+
+def _read_column(reaction) -> _Column:
+    return (tuple(zip(reaction.srcDict, [s.stoich for s in reaction.srcDict.values()])),
+            tuple(zip(reaction.destDict, [s.stoich for s in reaction.destDict.values()])))
+
+
+def _assemble(node_indices: np.ndarray, columns: List[_Column], part: int) -> sparse.csc_matrix:
+    """Assemble the reactant (part 0) or product (part 1) matrix from the columns."""
+    data, rows, indptr = _column_arrays(node_indices, columns, part)
+    matrix = sparse.csc_matrix((data, rows, indptr), shape=(len(node_indices), len(columns)))
+    matrix.sort_indices()
+    return _frozen(matrix)
+
+
+def _column_arrays(node_indices: np.ndarray, columns: List[_Column],
+                   part: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    indptr = np.zeros(len(columns) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, (column[part] for column in columns)), dtype=np.int64,
+                          count=len(columns)), out=indptr[1:])
+    entries = np.array([entry for column in columns for entry in column[part]],
+                       dtype=float).reshape(-1, 2)
+    return entries[:, 1], np.searchsorted(node_indices, entries[:, 0].astype(np.int64)), indptr
+
+
+def _replace_columns(matrix: sparse.csc_matrix, node_indices: np.ndarray, positions: List[int],
+                     columns: List[_Column], part: int) -> sparse.csc_matrix:
+    """Return a copy of the reactant (part 0) or product (part 1) matrix, with the columns at the
+    given positions, in increasing order, replaced. This copies the arrays of the matrix in
+    slices, so it takes a few array operations however many columns it has."""
+    data, rows, new_indptr = _column_arrays(node_indices, columns, part)
+    indptr = matrix.indptr
+    data_pieces = list()
+    row_pieces = list()
+    start = 0
+    for i, position in enumerate(positions):
+        data_pieces += [matrix.data[indptr[start]:indptr[position]],
+                        data[new_indptr[i]:new_indptr[i + 1]]]
+        row_pieces += [matrix.indices[indptr[start]:indptr[position]],
+                       rows[new_indptr[i]:new_indptr[i + 1]]]
+        start = position + 1
+    data_pieces.append(matrix.data[indptr[start]:])
+    row_pieces.append(matrix.indices[indptr[start]:])
+    lengths = np.diff(indptr)
+    lengths[positions] = np.diff(new_indptr)
+    replaced = sparse.csc_matrix((np.concatenate(data_pieces), np.concatenate(row_pieces),
+                                  np.concatenate([[0], np.cumsum(lengths)])),
+                                 shape=matrix.shape)
+    replaced.sort_indices()
+    return _frozen(replaced)
+
+
+class _NetworkColumns:
+    """The cached columns of a network, and its latest Stoichiometry."""
+    last_node_index: int  # Nodes were added since the latest Stoichiometry if this has changed
+    last_reaction_index: int  # Reactions were created if this has changed
+    columns: Dict[int, _Column]
+    dirty: Set[int]  # Reactions to re-read, if they still exist
+    stoichiometry: Optional[Stoichiometry]  # None until first built
+
+    def __init__(self, net):
+        self.last_node_index = net.lastNodeIdx
+        self.last_reaction_index = net.lastReactionIdx
+        self.columns = {reai: _read_column(rea) for reai, rea in net.reactions.items()}
+        self.dirty = set()
+        self.stoichiometry = None
+
+
+class StoichiometryCache:
+    """The stoichiometry of iodine networks, updated as their reactions change.
+
+    Changing a reaction only re-reads that reaction, and replaces its column in the matrices of
+    the previous Stoichiometry. Adding or deleting nodes or reactions reassembles the matrices
+    from the cached columns, and only undo, redo and whole-network changes re-read every reaction.
+    """
+    _networks: Dict[int, _NetworkColumns]
+
+    def __init__(self):
+        self._networks = dict()
+        iod.addChangeListener(self._on_model_change)
+
+    def close(self):
+        iod.removeChangeListener(self._on_model_change)
+
+    def _on_model_change(self, neti: int, kind: str, index: int):
+        if kind == iod.NETWORK:
+            if neti == -1:
+                self._networks.clear()
+            else:
+                self._networks.pop(neti, None)
+        elif kind == iod.REACTION and neti in self._networks:
+            self._networks[neti].dirty.add(index)
+
+    def get(self, net_index: int) -> Stoichiometry:
+        """Return the stoichiometry of a network, which is reused until the network changes."""
+        net = iod.networkDict.get(net_index)
+        if net is None:
+            raise iod.NetIndexNotFoundError('Unknown network index: {}'.format(net_index))
+        columns = self._networks.get(net_index)
+        if columns is None:
+            columns = _NetworkColumns(net)
+            self._networks[net_index] = columns
+        if columns.last_reaction_index != net.lastReactionIdx:
+            # Reactions were created, which is not reported
+            columns.dirty.update(range(columns.last_reaction_index, net.lastReactionIdx))
+            columns.last_reaction_index = net.lastReactionIdx
+        last = columns.stoichiometry
+        # Nodes are only ever added with a new index, so the rows changed if and only if nodes
+        # were added or the number of nodes changed
+        same_rows = last is not None and columns.last_node_index == net.lastNodeIdx and \
+            len(net.nodes) == last.num_nodes
+        if same_rows and len(columns.dirty) == 0:
+            return last
+
+        for reai in columns.dirty:
+            reaction = net.reactions.get(reai)
+            if reaction is None:
+                columns.columns.pop(reai, None)
+            else:
+                columns.columns[reai] = _read_column(reaction)
+        changed = sorted(columns.dirty)
+        columns.dirty.clear()
+
+        if same_rows and len(columns.columns) == last.num_reactions and \
+                all(reai in columns.columns for reai in changed):
+            positions = [last.reaction_column(reai) for reai in changed]
+            changed_columns = [columns.columns[reai] for reai in changed]
+            columns.stoichiometry = Stoichiometry(
+                net_index=net_index,
+                node_indices=last.node_indices,
+                reaction_indices=last.reaction_indices,
+                reactants=_replace_columns(last.reactants, last.node_indices, positions,
+                                           changed_columns, 0),
+                products=_replace_columns(last.products, last.node_indices, positions,
+                                          changed_columns, 1),
+            )
+            return columns.stoichiometry
+
+        if same_rows:
+            node_indices = last.node_indices
+        else:
+            node_indices = np.array(sorted(net.nodes), dtype=np.int64)
+            node_indices.flags.writeable = False
+            columns.last_node_index = net.lastNodeIdx
+        reaction_indices = np.array(sorted(columns.columns), dtype=np.int64)
+        reaction_indices.flags.writeable = False
+        ordered = [columns.columns[reai] for reai in reaction_indices.tolist()]
+        columns.stoichiometry = Stoichiometry(
+            net_index=net_index,
+            node_indices=node_indices,
+            reaction_indices=reaction_indices,
+            reactants=_assemble(node_indices, ordered, 0),
+            products=_assemble(node_indices, ordered, 1),
+        )
+        return columns.stoichiometry
@@ -7,18 +7,28 @@ from rkviewer.plugin_manage import PluginManager
 import wx
 import wx.lib.agw.flatnotebook as fnb
 import wx.lib.agw.shortcuteditor as sedit
-from typing import Callable, List, Dict, Any, Tuple
+import os
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from .events import DidDragResizeNodesEvent, DidMoveNodesEvent, bind_handler, CanvasDidUpdateEvent, \
-    SelectionDidUpdateEvent
-from .canvas.canvas import Canvas
+    SelectionDidUpdateEvent, SimulationDidProgressEvent
+from .antimony import AntimonyDocument, AntimonyError, read_antimony
+from .canvas.canvas import Canvas, CanvasViewState
 from .canvas.data import Compartment, Node, Reaction
 from .canvas.state import cstate, InputMode
 from .config import settings, theme
 from .forms import CompartmentForm, NodeForm, ReactionForm
 from .mvc import IController, IView
+from .profiler import profiler
+from .sbml import SBMLError, read_sbml, write_sbml
+from .search import FUZZY, KINDS, PREFIX, SUBSTRING, SearchMatch
+from .simulation import CANCELLED, SimulationError
 from .utils import ButtonGroup, get_path
 
 
+SBML_WILDCARD = 'SBML files (*.xml;*.sbml)|*.xml;*.sbml|All files (*.*)|*.*'
+ANTIMONY_WILDCARD = 'Antimony files (*.ant;*.txt)|*.ant;*.txt|All files (*.*)|*.*'
+
+
 class EditPanel(fnb.FlatNotebook):
     """Panel that displays and allows editing of the details of a node.
 
@@ -142,6 +152,74 @@ class EditPanel(fnb.FlatNotebook):
         self.node_form.UpdateDidDragResizeNodes()
 
 
+class AntimonyPanel(wx.Panel):
+    """Side panel that shows the network as Antimony text, and applies the edits made to it.
+
+    See rkviewer.antimony.AntimonyDocument. The text is applied once it has not been edited for
+    settings['antimony_edit_delay'] ms, and is replaced with the text of the network whenever the
+    network is changed otherwise, e.g. on the canvas or by an undo.
+    """
+    document: Optional[AntimonyDocument]
+    apply_later: Optional[wx.CallLater]
+
+    def __init__(self, parent, canvas: Canvas, controller: IController, **kw):
+        super().__init__(parent, **kw)
+        self.canvas = canvas
+        self.controller = controller
+        self.document = None
+        self.apply_later = None
+
+        self.text_ctrl = wx.TextCtrl(self, style=wx.TE_MULTILINE | wx.TE_DONTWRAP | wx.TE_RICH2)
+        self.text_ctrl.SetFont(wx.Font(wx.FontInfo(9).Family(wx.FONTFAMILY_TELETYPE)))
+        self.status = wx.StaticText(self, style=wx.ST_ELLIPSIZE_END)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.text_ctrl, wx.SizerFlags(1).Expand())
+        sizer.Add(self.status, wx.SizerFlags().Expand().Border(wx.ALL, 4))
+        self.SetSizer(sizer)
+
+        self.text_ctrl.Bind(wx.EVT_TEXT, self.OnText)
+        bind_handler(CanvasDidUpdateEvent, self.OnCanvasDidUpdate)
+
+    def Reload(self):
+        """Show the text of the network, discarding the edits that were not applied."""
+        if self.apply_later is not None:
+            self.apply_later.Stop()
+        self.document = AntimonyDocument(self.canvas.net_index)
+        self.text_ctrl.ChangeValue(self.document.text)
+        self.ShowErrors(self.document.errors)
+
+    def OnText(self, evt):
+        if self.apply_later is not None and self.apply_later.IsRunning():
+            self.apply_later.Restart()
+        else:
+            self.apply_later = wx.CallLater(settings['antimony_edit_delay'], self.ApplyText)
+
+    def ApplyText(self):
+        if self.document is None:
+            return
+        self.ShowErrors(self.controller.apply_antimony(self.document, self.text_ctrl.GetValue()))
+
+    def ShowErrors(self, errors: List[AntimonyError]):
+        if len(errors) == 0:
+            self.status.SetLabel('')
+        else:
+            self.status.SetLabel('{} ({} line{} not read)'.format(
+                errors[0], len(errors), '' if len(errors) == 1 else 's'))
+            self.status.SetToolTip('\n'.join(str(e) for e in errors[:20]))
+
+    def OnCanvasDidUpdate(self, evt):
+        if not self.IsShown():
+            return
+        if self.document is None or self.document.net_index != self.canvas.net_index:
+            # Another network is shown; edits not applied to the previous one are discarded
+            self.Reload()
+            return
+        # Edits waiting to be applied take precedence over the changes made elsewhere
+        pending = self.apply_later is not None and self.apply_later.IsRunning()
+        if not pending and self.document.stale:
+            self.Reload()
+
+
 class Toolbar(wx.Panel):
     """ModePanel at the top of the app."""
 
@@ -220,6 +298,93 @@ class ModePanel(wx.Panel):
         sizer.Add(line, wx.SizerFlags().Expand().Border(wx.TOP, 10))
 
 
+class NetworkTabs(wx.Panel):
+    """Tabs above the canvas, one for each network, to choose the network shown on the canvas.
+
+    Only the network of the active tab has elements on the canvas. For the other networks, only
+    what Canvas.SaveViewState() returned when they were last shown is kept, including the
+    thumbnails shown on their tabs, so the memory used does not grow with their items.
+    """
+    _buttons: Dict[int, wx.ToggleButton]  #: Maps network index to its tab
+    _states: Dict[int, CanvasViewState]  #: Maps the index of each inactive network to its state
+
+    def __init__(self, parent, canvas: Canvas, controller: IController, **kw):
+        super().__init__(parent, **kw)
+        self.canvas = canvas
+        self.controller = controller
+        self._buttons = dict()
+        self._states = dict()
+
+        self.tab_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        new_button = wx.Button(self, label='+', style=wx.BU_EXACTFIT)
+        new_button.SetToolTip('New network')
+        new_button.Bind(wx.EVT_BUTTON, lambda _: self.NewNetwork())
+        sizer = wx.BoxSizer(wx.HORIZONTAL)
+        sizer.Add(self.tab_sizer, wx.SizerFlags().Align(wx.ALIGN_BOTTOM))
+        sizer.Add(new_button, wx.SizerFlags().Align(wx.ALIGN_CENTER_VERTICAL).Border(wx.LEFT, 4))
+        self.SetSizer(sizer)
+        self.UpdateTabs()
+
+    def ShowNetwork(self, net_index: int, nodes: List[Node], reactions: List[Reaction],
+                    compartments: List[Compartment]):
+        """Show the items of a network on the canvas, switching tabs if it is not shown already."""
+        old_index = self.canvas.net_index
+        if net_index == old_index:
+            self.canvas.Reset(nodes, reactions, compartments)
+        else:
+            if old_index in self.controller.get_list_of_networks():
+                self._states[old_index] = self.canvas.SaveViewState()
+            self.canvas.ShowNetwork(net_index, nodes, reactions, compartments,
+                                    self._states.pop(net_index, None))
+        self.canvas.LazyRefresh()
+        self.UpdateTabs()
+
+    def UpdateTabs(self):
+        """Add and remove tabs to match the networks, and update their labels and thumbnails."""
+        networks = self.controller.get_list_of_networks()
+        changed = False
+        for neti in [i for i in self._buttons if i not in networks]:
+            self._buttons.pop(neti).Destroy()
+            self._states.pop(neti, None)
+            changed = True
+        for neti in networks:
+            button = self._buttons.get(neti)
+            if button is None:
+                button = wx.ToggleButton(self, style=wx.BU_EXACTFIT)
+                button.SetToolTip('Click to show this network, middle-click to close it')
+                button.Bind(wx.EVT_TOGGLEBUTTON, lambda _, neti=neti: self.Activate(neti))
+                button.Bind(wx.EVT_MIDDLE_UP,
+                            lambda _, neti=neti: self.controller.close_network(neti))
+                self._buttons[neti] = button
+                changed = True
+            net_id = self.controller.get_network_id(neti)
+            if button.GetLabel() != net_id:
+                button.SetLabel(net_id)
+            button.SetValue(neti == self.canvas.net_index)
+            state = self._states.get(neti)
+            button.SetBitmap(wx.NullBitmap if state is None else state.thumbnail, wx.TOP)
+
+        if changed:
+            # Networks brought back by an undo keep their place
+            self.tab_sizer.Clear()
+            for neti in networks:
+                self.tab_sizer.Add(self._buttons[neti], wx.SizerFlags().Border(wx.RIGHT, 2))
+        self.Layout()
+
+    def Activate(self, net_index: int):
+        if not self.controller.activate_network(net_index):
+            # Clicking the active tab toggled it off
+            self.UpdateTabs()
+
+    def NewNetwork(self):
+        net_ids = {self.controller.get_network_id(neti)
+                   for neti in self.controller.get_list_of_networks()}
+        count = len(net_ids)
+        while 'network_{}'.format(count) in net_ids:
+            count += 1
+        self.controller.new_network('network_{}'.format(count))
+
+
 class MainPanel(wx.Panel):
     """The main panel, which is the only chlid of the root Frame."""
     controller: IController
@@ -227,7 +392,9 @@ class MainPanel(wx.Panel):
     canvas: Canvas
     mode_panel: ModePanel
     toolbar: Toolbar
+    network_tabs: NetworkTabs
     edit_panel: EditPanel
+    antimony_panel: AntimonyPanel
 
     def __init__(self, parent, controller: IController):
         # ensure the parent's __init__ is called
@@ -263,22 +430,33 @@ class MainPanel(wx.Panel):
                                edit_panel_callback=self.ToggleEditPanel)
         self.toolbar.SetBackgroundColour(theme['toolbar_bg'])
 
+        self.network_tabs = NetworkTabs(self, self.canvas, self.controller)
+        self.network_tabs.SetBackgroundColour(theme['toolbar_bg'])
+
         self.edit_panel = EditPanel(self, self.canvas, self.controller,
                                     size=(theme['edit_panel_width'],
                                           theme['canvas_height']))
         self.edit_panel.SetBackgroundColour(theme['toolbar_bg'])
 
+        # Not in the sizer until it is shown
+        self.antimony_panel = AntimonyPanel(self, self.canvas, self.controller,
+                                            size=(theme['antimony_panel_width'],
+                                                  theme['canvas_height']))
+        self.antimony_panel.SetBackgroundColour(theme['toolbar_bg'])
+        self.antimony_panel.Hide()
+
         # and create a sizer to manage the layout of child widgets
         sizer = wx.GridBagSizer(vgap=theme['vgap'], hgap=theme['hgap'])
 
         sizer.Add(self.toolbar, wx.GBPosition(0, 1), wx.GBSpan(1, 2), flag=wx.EXPAND)
-        sizer.Add(self.mode_panel, wx.GBPosition(1, 0), flag=wx.EXPAND)
-        sizer.Add(self.canvas, wx.GBPosition(1, 1),  flag=wx.EXPAND)
-        sizer.Add(self.edit_panel, wx.GBPosition(1, 2), flag=wx.EXPAND)
+        sizer.Add(self.network_tabs, wx.GBPosition(1, 1), flag=wx.EXPAND)
+        sizer.Add(self.mode_panel, wx.GBPosition(2, 0), flag=wx.EXPAND)
+        sizer.Add(self.canvas, wx.GBPosition(2, 1),  flag=wx.EXPAND)
+        sizer.Add(self.edit_panel, wx.GBPosition(2, 2), flag=wx.EXPAND)
 
         # allow the canvas to grow
         sizer.AddGrowableCol(1, 1)
-        sizer.AddGrowableRow(1, 1)
+        sizer.AddGrowableRow(2, 1)
 
         # Set the sizer and *prevent the user from resizing it to a smaller size
         self.SetSizerAndFit(sizer)
@@ -291,15 +469,29 @@ class MainPanel(wx.Panel):
         sizer = self.GetSizer()
         if self.edit_panel.IsShown():
             sizer.Detach(self.edit_panel)
+            sizer.SetItemSpan(self.network_tabs, wx.GBSpan(1, 2))
             sizer.SetItemSpan(self.canvas, wx.GBSpan(1, 2))
             self.edit_panel.Hide()
         else:
+            sizer.SetItemSpan(self.network_tabs, wx.GBSpan(1, 1))
             sizer.SetItemSpan(self.canvas, wx.GBSpan(1, 1))
-            sizer.Add(self.edit_panel, wx.GBPosition(1, 2), flag=wx.EXPAND)
+            sizer.Add(self.edit_panel, wx.GBPosition(2, 2), flag=wx.EXPAND)
             self.edit_panel.Show()
 
         self.Layout()
 
+    def ToggleAntimonyPanel(self):
+        sizer = self.GetSizer()
+        if self.antimony_panel.IsShown():
+            sizer.Detach(self.antimony_panel)
+            self.antimony_panel.Hide()
+        else:
+            sizer.Add(self.antimony_panel, wx.GBPosition(2, 3), flag=wx.EXPAND)
+            self.antimony_panel.Show()
+            self.antimony_panel.Reload()
+
+        self.Layout()
+
 
 class AboutDialog(wx.Dialog):
     def __init__(self, parent: wx.Window):
@@ -326,6 +518,51 @@ class AboutDialog(wx.Dialog):
         sizer.Add(right, self.rightflags)
 
 
+class FindDialog(wx.Dialog):
+    """Searches the IDs of the items of the network on the canvas as the query is typed, and zooms
+    to the selected result. It is modeless, so that the results can be browsed."""
+    MODES = [('Substring', SUBSTRING), ('Prefix', PREFIX), ('Fuzzy', FUZZY)]
+
+    def __init__(self, parent: wx.Window, canvas: Canvas, controller: IController):
+        super().__init__(parent, title='Find', style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.canvas = canvas
+        self.controller = controller
+        self.matches: List[SearchMatch] = list()
+        self.query_ctrl = wx.TextCtrl(self, style=wx.TE_PROCESS_ENTER)
+        self.mode_ctrl = wx.RadioBox(self, label='Match', choices=[m[0] for m in self.MODES],
+                                     majorDimension=len(self.MODES))
+        self.results_ctrl = wx.ListBox(self, size=(300, 300), style=wx.LB_SINGLE)
+        self.query_ctrl.Bind(wx.EVT_TEXT, lambda _: self.Search())
+        self.query_ctrl.Bind(wx.EVT_TEXT_ENTER, lambda _: self.ZoomTo(0))
+        self.mode_ctrl.Bind(wx.EVT_RADIOBOX, lambda _: self.Search())
+        self.results_ctrl.Bind(wx.EVT_LISTBOX, lambda evt: self.ZoomTo(evt.GetSelection()))
+        bind_handler(CanvasDidUpdateEvent, self.OnCanvasDidUpdate)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.query_ctrl, wx.SizerFlags().Expand().Border(wx.ALL, 5))
+        sizer.Add(self.mode_ctrl, wx.SizerFlags().Expand().Border(wx.LEFT | wx.RIGHT, 5))
+        sizer.Add(self.results_ctrl, wx.SizerFlags(1).Expand().Border(wx.ALL, 5))
+        self.SetSizerAndFit(sizer)
+
+    def Search(self):
+        mode = self.MODES[self.mode_ctrl.GetSelection()][1]
+        self.matches = self.controller.search(self.canvas.net_index, self.query_ctrl.GetValue(),
+                                              mode, limit=settings['search_limit'])
+        self.results_ctrl.Set(['{} ({} rate law)'.format(m.text, m.kind) if m.in_rate_law
+                               else '{} ({})'.format(m.text, m.kind) for m in self.matches])
+
+    def ZoomTo(self, row: int):
+        if row == wx.NOT_FOUND or row >= len(self.matches):
+            return
+        match = self.matches[row]
+        # The arguments of ZoomToItems() are in the order of KINDS
+        self.canvas.ZoomToItems(*[[match.index] if match.kind == kind else [] for kind in KINDS])
+
+    def OnCanvasDidUpdate(self, evt):
+        if self.IsShown() and self.query_ctrl.GetValue() != '':
+            self.Search()
+
+
 class MainFrame(wx.Frame):
     """The main frame."""
 
@@ -348,6 +585,22 @@ class MainFrame(wx.Frame):
 
         self.menu_events = list()
         file_menu = wx.Menu()
+        self.AddMenuItem(file_menu, '&New Network', 'Create an empty network in a new tab',
+                         lambda _: self.main_panel.network_tabs.NewNetwork(), entries,
+                         key=(wx.ACCEL_CTRL, ord('N')))
+        self.AddMenuItem(file_menu, '&Close Network', 'Close the network shown',
+                         lambda _: controller.close_network(canvas.net_index), entries,
+                         key=(wx.ACCEL_CTRL, ord('W')))
+        file_menu.AppendSeparator()
+        self.AddMenuItem(file_menu, '&Import SBML...', 'Replace the network with an SBML model',
+                         lambda _: self.ImportSBML(controller), entries,
+                         key=(wx.ACCEL_CTRL, ord('O')))
+        self.AddMenuItem(file_menu, '&Export SBML...', 'Save the network as an SBML model',
+                         lambda _: self.ExportSBML(), entries, key=(wx.ACCEL_CTRL, ord('S')))
+        self.AddMenuItem(file_menu, 'Import &Antimony...',
+                         'Replace the network with the reactions of an Antimony model',
+                         lambda _: self.ImportAntimony(controller), entries)
+        file_menu.AppendSeparator()
         self.AddMenuItem(file_menu, 'E&xit', 'Exit application', lambda _: self.Close(), entries,
                          id_=wx.ID_EXIT)
 
@@ -367,6 +620,11 @@ class MainFrame(wx.Frame):
         self.AddMenuItem(edit_menu, '&Delete selected', 'Deleted selected',
                          lambda _: canvas.DeleteSelectedItems(), entries,
                          key=(wx.ACCEL_NORMAL, wx.WXK_DELETE))
+        edit_menu.AppendSeparator()
+        self.find_dialog = FindDialog(self, canvas, controller)
+        self.AddMenuItem(edit_menu, '&Find...', 'Find nodes, reactions and compartments by ID',
+                         lambda _: self.ShowFindDialog(), entries,
+                         key=(wx.ACCEL_CTRL, ord('F')))
 
         select_menu = wx.Menu()
         self.AddMenuItem(select_menu, 'Select &All', 'Select all',
@@ -382,6 +640,19 @@ class MainFrame(wx.Frame):
                          lambda _: canvas.ZoomCenter(False), entries, key=(wx.ACCEL_CTRL, ord('-')))
         self.AddMenuItem(view_menu, '&Reset Zoom', 'Reset canva zoom',
                          lambda _: canvas.ResetZoom(), entries, key=(wx.ACCEL_CTRL, ord(' ')))
+        view_menu.AppendSeparator()
+        self.AddMenuItem(view_menu, 'Toggle &Profiler', 'Show or hide the frame-time profiler',
+                         lambda _: canvas.ToggleProfiler(), entries,
+                         key=(wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('F')))
+        self.AddMenuItem(view_menu, '&Dump Profile Data...', 'Save the profiler samples as JSON',
+                         self.DumpProfile, entries)
+        view_menu.AppendSeparator()
+        self.AddMenuItem(view_menu, 'Toggle &Simulation Overlay',
+                         'Show or hide the amounts and fluxes of the last simulation',
+                         lambda _: canvas.ToggleSimulationOverlay(), entries)
+        self.AddMenuItem(view_menu, '&Antimony Editor', 'Show or hide the network as Antimony text',
+                         lambda _: self.main_panel.ToggleAntimonyPanel(), entries,
+                         key=(wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('A')))
 
         reaction_menu = wx.Menu()
         self.AddMenuItem(reaction_menu, 'Mark Selected as &Reactants',
@@ -397,6 +668,15 @@ class MainFrame(wx.Frame):
                          lambda _: canvas.CreateReactionFromMarked(), entries,
                          key=(wx.ACCEL_CTRL, ord('R')))
 
+        simulation_menu = wx.Menu()
+        self.AddMenuItem(simulation_menu, '&Run Simulation...',
+                         'Simulate the ODEs of the network on a worker thread',
+                         lambda _: self.RunSimulation(controller), entries,
+                         key=(wx.ACCEL_NORMAL, wx.WXK_F5))
+        self.AddMenuItem(simulation_menu, '&Cancel Simulation', 'Cancel the running simulation',
+                         lambda _: controller.cancel_simulation(), entries,
+                         key=(wx.ACCEL_SHIFT, wx.WXK_F5))
+
         plugins_menu = wx.Menu()
         self.AddMenuItem(plugins_menu, '&Plugins...', 'Manage plugins', self.ManagePlugins, entries,
                          key=(wx.ACCEL_CTRL | wx.ACCEL_SHIFT, ord('P')))
@@ -410,6 +690,7 @@ class MainFrame(wx.Frame):
         menu_bar.Append(select_menu, '&Select')
         menu_bar.Append(view_menu, '&View')
         menu_bar.Append(reaction_menu, '&Reaction')
+        menu_bar.Append(simulation_menu, 'Si&mulation')
         menu_bar.Append(plugins_menu, '&Plugins')
         menu_bar.Append(help_menu, '&Help')
 
@@ -421,6 +702,8 @@ class MainFrame(wx.Frame):
 
         self.OverrideAccelTable(self)
 
+        bind_handler(SimulationDidProgressEvent, self.OnSimulationDidProgress)
+
         # set sizer at the end, after adding the menus.
         self.SetSizerAndFit(sizer)
         self.Center()
@@ -449,6 +732,105 @@ class MainFrame(wx.Frame):
             else:
                 pass  # exited by clicking some button
 
+    def DumpProfile(self, evt):
+        with wx.FileDialog(self, 'Save profile data', wildcard='JSON files (*.json)|*.json',
+                           defaultFile='rkviewer-profile.json',
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dlg:
+            if dlg.ShowModal() == wx.ID_CANCEL:
+                return
+            path = dlg.GetPath()
+        with open(path, 'w') as fp:
+            profiler.dump_json(fp)
+
+    def ImportSBML(self, controller: IController):
+        with wx.FileDialog(self, 'Import SBML', wildcard=SBML_WILDCARD,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dlg:
+            if dlg.ShowModal() == wx.ID_CANCEL:
+                return
+            path = dlg.GetPath()
+        try:
+            with wx.BusyCursor():
+                network = read_sbml(path)
+        except (OSError, SBMLError) as e:
+            wx.MessageBox('Could not import {}:\n{}'.format(path, e), 'Import SBML',
+                          wx.OK | wx.ICON_ERROR, self)
+            return
+        controller.load_network(self.main_panel.canvas.net_index, network)
+
+    def ExportSBML(self):
+        with wx.FileDialog(self, 'Export SBML', wildcard=SBML_WILDCARD,
+                           defaultFile='model.xml',
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dlg:
+            if dlg.ShowModal() == wx.ID_CANCEL:
+                return
+            path = dlg.GetPath()
+        try:
+            with wx.BusyCursor():
+                write_sbml(self.main_panel.canvas.net_index, path)
+        except OSError as e:
+            wx.MessageBox('Could not export {}:\n{}'.format(path, e), 'Export SBML',
+                          wx.OK | wx.ICON_ERROR, self)
+
+    def ImportAntimony(self, controller: IController):
+        with wx.FileDialog(self, 'Import Antimony', wildcard=ANTIMONY_WILDCARD,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dlg:
+            if dlg.ShowModal() == wx.ID_CANCEL:
+                return
+            path = dlg.GetPath()
+        try:
+            with wx.BusyCursor():
+                with open(path, encoding='utf-8') as fp:
+                    network = read_antimony(fp.read(), os.path.splitext(os.path.basename(path))[0])
+        except (OSError, UnicodeDecodeError, AntimonyError) as e:
+            wx.MessageBox('Could not import {}:\n{}'.format(path, e), 'Import Antimony',
+                          wx.OK | wx.ICON_ERROR, self)
+            return
+        controller.load_network(self.main_panel.canvas.net_index, network)
+
+    def RunSimulation(self, controller: IController):
+        with wx.TextEntryDialog(self, 'End time:', 'Run Simulation',
+                                '{:g}'.format(settings['simulation_end_time'])) as dlg:
+            if dlg.ShowModal() == wx.ID_CANCEL:
+                return
+            text = dlg.GetValue()
+        try:
+            end_time = float(text)
+        except ValueError:
+            wx.MessageBox('Invalid end time: {}'.format(text), 'Run Simulation',
+                          wx.OK | wx.ICON_ERROR, self)
+            return
+        try:
+            controller.simulate(self.main_panel.canvas.net_index, end_time,
+                                settings['simulation_points'])
+        except SimulationError as e:
+            wx.MessageBox('Could not simulate the network:\n{}'.format(e), 'Run Simulation',
+                          wx.OK | wx.ICON_ERROR, self)
+            return
+        self.SetSimulationStatus('Simulating...')
+
+    def OnSimulationDidProgress(self, evt: SimulationDidProgressEvent):
+        if not evt.done:
+            self.SetSimulationStatus('Simulating: t = {:g}'.format(evt.times[-1]))
+        elif evt.error is None:
+            self.SetSimulationStatus('Simulation done')
+        elif evt.error == CANCELLED:
+            self.SetSimulationStatus('Simulation cancelled')
+        else:
+            self.SetSimulationStatus('Simulation failed')
+            wx.MessageBox('The simulation failed:\n{}'.format(evt.error), 'Run Simulation',
+                          wx.OK | wx.ICON_ERROR, self)
+
+    def SetSimulationStatus(self, text: str):
+        names = [name for name, _ in settings['status_fields']]
+        if 'simulation' in names:
+            self.SetStatusText(text, names.index('simulation'))
+
+    def ShowFindDialog(self):
+        self.find_dialog.Show()
+        self.find_dialog.Raise()
+        self.find_dialog.query_ctrl.SetFocus()
+        self.find_dialog.query_ctrl.SelectAll()
+
     def ShowAbout(self, evt):
         with AboutDialog(self) as dlg:
             dlg.Centre()
@@ -506,17 +888,18 @@ class View(IView):
         self.manager.load_from('plugins')
         self.frame = MainFrame(self.controller, self.manager, title='RK Network Viewer')
         self.canvas_panel = self.frame.main_panel.canvas
+        self.manager.bind_canvas(self.canvas_panel)
 
     def main_loop(self):
         assert self.app is not None
         self.frame.Show()
         self.app.MainLoop()
+        self.manager.shutdown()
 
-    def update_all(self, nodes: List[Node], reactions: List[Reaction],
+    def update_all(self, neti: int, nodes: List[Node], reactions: List[Reaction],
                    compartments: List[Compartment]):
-        """Update the list of nodes.
+        """Update the list of nodes, showing network neti.
 
         Note that View takes ownership of the list of nodes and may modify it.
         """
-        self.canvas_panel.Reset(nodes, reactions, compartments)
-        self.canvas_panel.LazyRefresh()
+        self.frame.main_panel.network_tabs.ShowNetwork(neti, nodes, reactions, compartments)
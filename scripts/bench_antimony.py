@@ -0,0 +1,82 @@
+"""Benchmark reading Antimony text, and editing it with AntimonyDocument.
+
+Usage: python scripts/bench_antimony.py [max_lines]
+
+Each model has one reaction per line, with one or two reactants and products among twice as many
+species as lines, and a mass-action rate law. For each size, this prints the time taken by
+read_antimony() and iodine.addNetwork(), and the time an AntimonyDocument takes to apply a few
+typical edits: an unchanged text, a changed rate law, a changed reactant, an added line and a
+removed line. It also prints the time of a group with a single change to the same network, i.e.
+of the undo step that every edit that changes the network includes.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.antimony import AntimonyDocument, read_antimony  # noqa: E402
+
+
+def make_text(num_lines: int, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    num_species = 2 * num_lines
+    lines = list()
+    for reai in range(num_lines):
+        species = rng.choice(num_species, 4, replace=False).tolist()
+        reactants = ['S{}'.format(i) for i in species[:rng.integers(1, 3)]]
+        products = ['S{}'.format(i) for i in species[2:2 + rng.integers(1, 3)]]
+        lines.append('J{}: {} -> {}; k{} * {}'.format(reai, ' + '.join(reactants),
+                                                     ' + '.join(products), reai,
+                                                     ' * '.join(reactants)))
+    return '\n'.join(lines)
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def bench(num_lines: int):
+    text = make_text(num_lines)
+    iod.reset()
+    start = time.perf_counter()
+    net = read_antimony(text)
+    read_ms = (time.perf_counter() - start) * 1000
+    add_ms = timed(iod.addNetwork, net)
+    document = AntimonyDocument(0)
+
+    lines = document.text.split('\n')
+    middle = num_lines // 2
+    edits = dict()
+    edits['unchanged'] = '\n'.join(lines)
+    lines[middle] = lines[middle].replace('; k', '; 2 * k')
+    edits['rate law'] = '\n'.join(lines)
+    lines[middle] = lines[middle].replace(':', ': X +', 1)
+    edits['reactant'] = '\n'.join(lines)
+    lines.insert(middle, 'Y -> Z; k * Y')
+    edits['add line'] = '\n'.join(lines)
+    del lines[middle]
+    edits['remove line'] = '\n'.join(lines)
+    times = ', '.join('{} {:6.1f} ms'.format(name, timed(document.update, edit))
+                      for name, edit in edits.items())
+
+    def one_change():
+        iod.startGroup()
+        iod.setRateLaw(0, 0, 'k')
+        iod.endGroup()
+
+    undo_ms = timed(one_change)
+    print('{:>6} lines: read {:7.1f} ms, addNetwork {:7.1f} ms; update: {}; undo step {:6.1f} ms'
+          .format(num_lines, read_ms, add_ms, times, undo_ms))
+
+
+if __name__ == '__main__':
+    max_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for size in (500, 1000, 2000, 5000, 10000, 20000):
+        if size <= max_lines:
+            bench(size)
@@ -0,0 +1,57 @@
+"""Benchmark drag-selection over random nodes with RectSweep.
+
+Usage: python scripts/bench_drag_select.py [num_nodes]
+
+The nodes are scattered uniformly over a square canvas with about one node per 200x200 area. A
+drag starts at the center, and its corner moves by a few pixels per motion event toward a corner of
+the canvas and back. This prints the average time per motion event of RectSweep, compared to
+testing every node against the selection rectangle as the canvas used to.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rkviewer.spatial import RectSweep, SpatialGrid  # noqa: E402
+
+
+def loop_select(rects, lower, upper):
+    return {i for i, (x0, y0, x1, y1) in enumerate(rects)
+            if x0 <= upper[0] and lower[0] <= x1 and y0 <= upper[1] and lower[1] <= y1}
+
+
+def bench(num_nodes: int):
+    rng = np.random.default_rng(0)
+    side = 200 * np.sqrt(num_nodes)
+    positions = rng.uniform(0, side, (num_nodes, 2))
+    sizes = np.tile([50.0, 30.0], (num_nodes, 1))
+    rects = np.hstack([positions, positions + sizes]).tolist()
+
+    start = time.perf_counter()
+    sweep = RectSweep(SpatialGrid(positions, sizes))
+    grid_ms = (time.perf_counter() - start) * 1000
+
+    center = np.full(2, side / 2)
+    steps = np.linspace(0, side / 2, 200)
+    corners = [center + d for d in np.concatenate([steps, steps[::-1]])]
+    start = time.perf_counter()
+    for corner in corners:
+        sweep.move(center, corner)
+    sweep_ms = (time.perf_counter() - start) * 1000 / len(corners)
+    start = time.perf_counter()
+    for corner in corners:
+        loop_select(rects, center, corner)
+    loop_ms = (time.perf_counter() - start) * 1000 / len(corners)
+    print('{} nodes: grid {:.1f} ms, per motion {:.3f} ms, loop over the nodes {:.2f} ms'.format(
+        num_nodes, grid_ms, sweep_ms, loop_ms))
+
+
+if __name__ == '__main__':
+    max_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    num_nodes = 1000
+    while num_nodes <= max_nodes:
+        bench(num_nodes)
+        num_nodes *= 4
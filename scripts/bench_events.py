@@ -0,0 +1,52 @@
+"""Benchmark the dispatch of DidMoveNodesEvent to per-reaction handlers.
+
+Usage: python scripts/bench_events.py [num_reactions]
+
+Each reaction subscribes to the moves of its two nodes, once with an unkeyed handler (which is
+called for every move and has to check whether it is concerned) and once with a keyed handler
+(which is only called for the moves of its own nodes).
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rkviewer.canvas.geometry import Vec2  # noqa: E402
+from rkviewer.events import DidMoveNodesEvent, bind_handler, post_event, unbind_handler  # noqa: E402
+
+
+class BenchNode:
+    def __init__(self, index: int):
+        self.index = index
+
+
+def bench(num_reactions: int, repeat: int = 20):
+    # A chain of reactions: reaction i converts node i into node i + 1
+    nodes = [BenchNode(i) for i in range(num_reactions + 1)]
+    evt = DidMoveNodesEvent([nodes[num_reactions // 2]], Vec2(1, 1), dragged=True)
+    notified = 0
+
+    def make_handler(my_nodes):
+        def handler(evt):
+            nonlocal notified
+            if any(n.index in my_nodes for n in evt.nodes):
+                notified += 1
+        return handler
+
+    for keyed in (False, True):
+        ids = list()
+        for i in range(num_reactions):
+            my_nodes = {i, i + 1}
+            ids.append(bind_handler(DidMoveNodesEvent, make_handler(my_nodes),
+                                    keys=my_nodes if keyed else None))
+        notified = 0
+        secs = timeit.timeit(lambda: post_event(evt), number=repeat) / repeat
+        print('{:>8} {:>10} reactions: {:10.3f} ms/event, {} handlers notified per event'.format(
+            'keyed' if keyed else 'unkeyed', num_reactions, secs * 1000, notified // repeat))
+        for id_ in ids:
+            unbind_handler(id_)
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,103 @@
+"""Benchmark the layered layout on synthetic pathways.
+
+Usage: python scripts/bench_layered.py [max_reactions]
+
+Each pathway grows from a few starting species: each reaction consumes one or two species, mostly
+among the most recent ones, and produces one or two new species, or sometimes a recent one, which
+merges branches and closes cycles. For each size, this prints the time taken by each step of the
+layout (see the 'layered.*' profiler phases), the total time of the layout, and the time taken by
+iodine to apply the result (node positions and reaction handles) as one undo step.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.layout.graph import LayoutGraph  # noqa: E402
+from rkviewer.layout.layered import layered_centers, layered_handles  # noqa: E402
+from rkviewer.profiler import profiler  # noqa: E402
+from rkviewer.snapshot import take_snapshot  # noqa: E402
+
+
+def make_pathway(num_reactions: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    iod.reset()
+    iod.newNetwork('bench')
+    iod.startGroup()
+    num_species = 0
+
+    def add_species():
+        nonlocal num_species
+        x, y = rng.uniform(0, 2000, 2)
+        iod.addNode(0, 's{}'.format(num_species), x, y, 50, 30)
+        num_species += 1
+        return num_species - 1
+
+    for _ in range(5):
+        add_species()
+    for reai in range(num_reactions):
+        iod.createReaction(0, 'r{}'.format(reai))
+        # Mostly the recent species, so that the pathway is deep rather than wide
+        window = min(num_species, 20)
+        reactants = set(num_species - 1 - rng.integers(0, window, rng.integers(1, 3)))
+        for nodei in reactants:
+            iod.addSrcNode(0, reai, int(nodei), 1)
+        products = set()
+        for _ in range(rng.integers(1, 3)):
+            if rng.random() < 0.1:
+                # An earlier species of the same part of the pathway
+                nodei = int(num_species - 1 - rng.integers(0, min(num_species, 50)))
+                if nodei in reactants or nodei in products:
+                    continue
+            else:
+                nodei = add_species()
+            products.add(nodei)
+            iod.addDestNode(0, reai, nodei, 1)
+    iod.endGroup()
+
+
+def bench(num_reactions: int):
+    make_pathway(num_reactions)
+    snapshot = take_snapshot(0)
+    graph = LayoutGraph.from_snapshot(snapshot, (1e6, 1e6))
+
+    profiler.reset()
+    start = time.perf_counter()
+    centers = layered_centers(graph)
+    positions = graph.node_positions(centers)
+    handles = layered_handles(snapshot, positions + snapshot.node_sizes / 2)
+    layout_secs = time.perf_counter() - start
+
+    # What rkplugin.api.apply_layout() passes to iodine, through the controller
+    start = time.perf_counter()
+    iod.startGroup()
+    node_indices = snapshot.node_indices.tolist()
+    reaction_indices = snapshot.reaction_indices.tolist()
+    iod.setNodesAttributes(0, {nodei: {'x': x, 'y': y}
+                               for nodei, (x, y) in zip(node_indices, positions.tolist())})
+    handle_updates = {reai: {'center': tuple(pos), 'src': dict(), 'dest': dict()}
+                      for reai, pos in zip(reaction_indices, handles.centers.tolist())}
+    for key, edges, edge_handles in (('src', snapshot.reactant_edges, handles.reactants),
+                                     ('dest', snapshot.product_edges, handles.products)):
+        for (row, node_row), pos in zip(edges.tolist(), edge_handles.tolist()):
+            handle_updates[reaction_indices[row]][key][node_indices[node_row]] = tuple(pos)
+    iod.setReactionsHandlePositions(0, handle_updates)
+    iod.endGroup()
+    apply_secs = time.perf_counter() - start
+
+    phases = ', '.join('{} {:7.1f} ms'.format(name.split('.')[1], profiler.samples(name)[0])
+                       for name in ('layered.layers', 'layered.order', 'layered.coordinates'))
+    print('{:>6} reactions, {:>6} species: {}, layout {:7.1f} ms, apply {:7.1f} ms'.format(
+        num_reactions, snapshot.num_nodes, phases, layout_secs * 1000, apply_secs * 1000))
+
+
+if __name__ == '__main__':
+    profiler.enabled = True
+    max_reactions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for size in (500, 1000, 2000, 5000, 10000):
+        if size <= max_reactions:
+            bench(size)
@@ -0,0 +1,85 @@
+"""Benchmark the force-directed layout on random networks.
+
+Usage: python scripts/bench_layout.py [max_nodes]
+
+Each network has as many reactions as nodes, each converting one or two random nodes into one or
+two others, and starts with the nodes scattered over a canvas sized to fit them. For each size,
+this prints the time taken to build the layout graph, the time per layout iteration, and the time
+taken by iodine to apply the result (node positions and reaction handles) as one undo step.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.layout.force import ForceLayout  # noqa: E402
+from rkviewer.layout.graph import LayoutGraph, default_handles  # noqa: E402
+from rkviewer.snapshot import take_snapshot  # noqa: E402
+
+
+def make_network(num_nodes: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    side = np.sqrt(num_nodes) * 150
+    iod.reset()
+    iod.newNetwork('bench')
+    iod.startGroup()
+    for i, (x, y) in enumerate(rng.uniform(0, side - 50, (num_nodes, 2))):
+        iod.addNode(0, 'n{}'.format(i), x, y, 50, 30)
+    for reai in range(num_nodes):
+        iod.createReaction(0, 'r{}'.format(reai))
+        nodes = rng.choice(num_nodes, size=rng.integers(2, 5), replace=False)
+        half = max(len(nodes) // 2, 1)
+        for nodei in nodes[:half]:
+            iod.addSrcNode(0, reai, int(nodei), 1)
+        for nodei in nodes[half:]:
+            iod.addDestNode(0, reai, int(nodei), 1)
+    iod.endGroup()
+    return side
+
+
+def bench(num_nodes: int, iterations: int = 100):
+    side = make_network(num_nodes)
+    snapshot = take_snapshot(0)
+
+    start = time.perf_counter()
+    graph = LayoutGraph.from_snapshot(snapshot, (side, side))
+    layout = ForceLayout(graph, iterations=iterations)
+    setup_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    positions = graph.node_positions(layout.run())
+    handles = default_handles(snapshot, positions + snapshot.node_sizes / 2)
+    layout_secs = time.perf_counter() - start
+
+    # What rkplugin.api.apply_layout() passes to iodine, through the controller
+    start = time.perf_counter()
+    iod.startGroup()
+    node_indices = snapshot.node_indices.tolist()
+    reaction_indices = snapshot.reaction_indices.tolist()
+    iod.setNodesAttributes(0, {nodei: {'x': x, 'y': y}
+                               for nodei, (x, y) in zip(node_indices, positions.tolist())})
+    handle_updates = {reai: {'center': tuple(pos), 'src': dict(), 'dest': dict()}
+                      for reai, pos in zip(reaction_indices, handles.centers.tolist())}
+    for key, edges, edge_handles in (('src', snapshot.reactant_edges, handles.reactants),
+                                     ('dest', snapshot.product_edges, handles.products)):
+        for (row, node_row), pos in zip(edges.tolist(), edge_handles.tolist()):
+            handle_updates[reaction_indices[row]][key][node_indices[node_row]] = tuple(pos)
+    iod.setReactionsHandlePositions(0, handle_updates)
+    iod.endGroup()
+    apply_secs = time.perf_counter() - start
+
+    print('{:>8} nodes: setup {:8.1f} ms, {:8.2f} ms/iteration, layout {:8.1f} ms, '
+          'apply {:8.1f} ms'.format(num_nodes, setup_secs * 1000,
+                                    layout_secs * 1000 / iterations, layout_secs * 1000,
+                                    apply_secs * 1000))
+
+
+if __name__ == '__main__':
+    max_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for size in (1000, 2000, 5000, 10000, 20000):
+        if size <= max_nodes:
+            bench(size)
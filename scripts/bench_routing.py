@@ -0,0 +1,62 @@
+"""Benchmark the routing of reaction handles on random networks.
+
+Usage: python scripts/bench_routing.py [max_reactions]
+
+Each network has twice as many species as reactions, scattered uniformly over a square canvas with
+about one species per 200x200 area. Each reaction has one reactant and one or two products, chosen
+at random. For each size, this prints the time taken by route_handles(), and the overlaps of the
+curves (see routing_costs()) with the default handles and with the routed ones.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.layout.graph import default_handles  # noqa: E402
+from rkviewer.layout.routing import route_handles, routing_costs  # noqa: E402
+from rkviewer.snapshot import take_snapshot  # noqa: E402
+
+
+def make_network(num_reactions: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    num_species = 2 * num_reactions
+    side = 200 * np.sqrt(num_species)
+    iod.reset()
+    iod.newNetwork('bench')
+    iod.startGroup()
+    for nodei, (x, y) in enumerate(rng.uniform(0, side, (num_species, 2)).tolist()):
+        iod.addNode(0, 's{}'.format(nodei), x, y, 50, 30)
+    for reai in range(num_reactions):
+        iod.createReaction(0, 'r{}'.format(reai))
+        species = rng.choice(num_species, 3, replace=False).tolist()
+        iod.addSrcNode(0, reai, species[0], 1)
+        for nodei in species[1:rng.integers(2, 4)]:
+            iod.addDestNode(0, reai, nodei, 1)
+    iod.endGroup()
+
+
+def bench(num_reactions: int):
+    make_network(num_reactions)
+    snapshot = take_snapshot(0)
+    centers = snapshot.node_centers()
+    before = routing_costs(snapshot, centers, default_handles(snapshot, centers))
+
+    start = time.perf_counter()
+    handles = route_handles(snapshot)
+    secs = time.perf_counter() - start
+
+    after = routing_costs(snapshot, centers, handles)
+    print('{:>6} reactions: routing {:7.1f} ms, points in other nodes {:>6} -> {:>6}, '
+          'crowded pairs {:>7} -> {:>7}'.format(num_reactions, secs * 1000, before[0], after[0],
+                                                before[1], after[1]))
+
+
+if __name__ == '__main__':
+    max_reactions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for size in (500, 1000, 2000, 5000, 10000):
+        if size <= max_reactions:
+            bench(size)
@@ -0,0 +1,97 @@
+"""Benchmark reading and writing SBML on generated models.
+
+Usage: python scripts/bench_sbml.py [max_species]
+
+Each model has as many reactions as species, each with one or two reactants and products and a
+mass-action rate law, and a layout with a glyph and a style for every species and reaction. For
+each size, this prints the size of the file, the time taken by write_sbml() and read_sbml() and
+their throughput, the time taken by iodine.addNetwork(), and the peak memory allocated while
+reading, compared with that of parsing the whole file into an ElementTree.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Tuple
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.sbml import read_sbml, write_sbml  # noqa: E402
+
+
+def make_model(num_species: int, seed: int = 0) -> iod.TNetwork:
+    """Build the network directly, as read_sbml() does, since adding items one by one is slow."""
+    rng = np.random.default_rng(seed)
+    net = iod.TNetwork('bench')
+    comp = iod.TCompartment('cell', 0, 0, 0, 0)
+    compi = net.addCompartment(comp)
+    columns = int(np.ceil(np.sqrt(num_species)))
+    for nodei in range(num_species):
+        net.addNode(iod.TNode('S{}'.format(nodei), (nodei % columns) * 100,
+                              (nodei // columns) * 60, 50, 30, compi))
+        comp.node_indices.add(nodei)
+    net.baseNodes.clear()
+    comp.w, comp.h = columns * 100, (num_species // columns + 1) * 60
+    for reai in range(num_species):
+        reaction = iod.TReaction('J{}'.format(reai))
+        species = rng.choice(num_species, 4, replace=False).tolist()
+        reactants = species[:rng.integers(1, 3)]
+        for nodei in reactants:
+            reaction.srcDict[nodei] = iod.TSpeciesNode(1)
+        for nodei in species[2:2 + rng.integers(1, 3)]:
+            reaction.destDict[nodei] = iod.TSpeciesNode(1)
+        reaction.rateLaw = 'k{} * {}'.format(reai, ' * '.join('S{}'.format(i) for i in reactants))
+        net.addReaction(reaction)
+    return net
+
+
+def peak_memory(function, *args) -> Tuple[float, float]:
+    """Return the peak memory allocated by a call, and the memory still used by its result, in MB.
+    """
+    tracemalloc.start()
+    result = function(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak / 1e6, current / 1e6
+
+
+def bench(num_species: int, directory: str):
+    iod.reset()
+    neti = iod.addNetwork(make_model(num_species))
+    path = os.path.join(directory, 'model{}.xml'.format(num_species))
+
+    start = time.perf_counter()
+    write_sbml(neti, path)
+    write_secs = time.perf_counter() - start
+    megabytes = os.path.getsize(path) / 1e6
+
+    start = time.perf_counter()
+    net = read_sbml(path)
+    read_secs = time.perf_counter() - start
+    net.id = 'copy'
+    start = time.perf_counter()
+    iod.addNetwork(net)
+    add_secs = time.perf_counter() - start
+
+    read_peak, network = peak_memory(read_sbml, path)
+    tree_peak, _ = peak_memory(ET.parse, path)
+    print('{:>6} species: {:6.1f} MB, write {:6.2f} s ({:5.1f} MB/s), read {:6.2f} s '
+          '({:5.1f} MB/s, {:>6.0f} species/s), addNetwork {:5.3f} s, read peak {:6.1f} MB '
+          '(network {:6.1f} MB), ElementTree.parse peak {:6.1f} MB'.format(
+              num_species, megabytes, write_secs, megabytes / write_secs, read_secs,
+              megabytes / read_secs, num_species / read_secs, add_secs, read_peak, network,
+              tree_peak))
+
+
+if __name__ == '__main__':
+    max_species = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (1000, 5000, 20000, 50000, 100000):
+            if size <= max_species:
+                bench(size, directory)
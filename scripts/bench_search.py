@@ -0,0 +1,53 @@
+"""Benchmark searching the IDs of a network with SearchIndex.
+
+Usage: python scripts/bench_search.py [num_reactions]
+
+The model has num_reactions reactions among twice as many species, with mass-action rate laws
+whose rate constants are also indexed. This prints the time SearchIndex takes to index the
+network, the time of typical prefix, substring and fuzzy queries, and the time of the first query
+after a node is renamed, compared to looping over the IDs of all the nodes as a plugin would.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.antimony import read_antimony  # noqa: E402
+from rkviewer.search import FUZZY, PREFIX, SUBSTRING, SearchIndex  # noqa: E402
+
+from bench_antimony import make_text  # noqa: E402
+
+
+def timed(function, *args, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def loop_search(query: str):
+    return [nodei for nodei in iod.getListOfNodeIndices(0)
+            if query in iod.getNodeID(0, nodei).lower()]
+
+
+def bench(num_reactions: int):
+    iod.reset()
+    iod.addNetwork(read_antimony(make_text(num_reactions)))
+    index = SearchIndex()
+    print('{} reactions, {} species: index {:.0f} ms, loop over the node IDs {:.1f} ms'.format(
+        num_reactions, iod.getNumberOfNodes(0), timed(index.search, 0, 's1'),
+        timed(loop_search, '123')))
+    for mode in (PREFIX, SUBSTRING, FUZZY):
+        print('  {}: {}'.format(mode, ', '.join(
+            "'{}' {:.3f} ms".format(query, timed(index.search, 0, query, mode, repeat=20))
+            for query in ('s1', '123', 'j99', 'k5x', 'zzz'))))
+
+    iod.setNodeID(0, 0, 'Glucose')
+    print('  first substring query after a rename {:.1f} ms'.format(
+        timed(index.search, 0, 'gluc')))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,65 @@
+"""Benchmark compiling and simulating the ODEs of a network.
+
+Usage: python scripts/bench_simulation.py [num_reactions]
+
+The model has num_reactions reactions among twice as many species, with one or two reactants and
+products each and mass-action rate laws, whose rate constants span five orders of magnitude so
+that the system is stiff. This prints the time taken by build_model(), by one evaluation of the
+right-hand side for one state and for 20 states at once, and by simulate() to integrate the model
+to t = 100, with and without the sparsity pattern of the Jacobian. It also prints the time until
+the first chunk of the time course is streamed.
+"""
+import dataclasses
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.antimony import read_antimony  # noqa: E402
+from rkviewer.simulation import build_model, simulate  # noqa: E402
+
+from bench_antimony import make_text  # noqa: E402
+
+
+def timed(function, *args, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench(num_reactions: int):
+    iod.reset()
+    iod.addNetwork(read_antimony(make_text(num_reactions)))
+    rng = np.random.default_rng(1)
+    parameters = {'k{}'.format(i): 10 ** rng.uniform(-2, 3) for i in range(num_reactions)}
+
+    start = time.perf_counter()
+    model = build_model(0)
+    build_ms = (time.perf_counter() - start) * 1000
+    print('{} reactions, {} species: build_model {:.1f} ms'.format(
+        num_reactions, len(model.node_indices), build_ms))
+
+    f = model.rhs(model.parameter_values(parameters))
+    y = model.initial_state()
+    print('  rhs: one state {:.3f} ms, 20 states {:.3f} ms'.format(
+        timed(f, 0.0, y, repeat=100), timed(f, 0.0, np.tile(y[:, None], 20), repeat=100)))
+
+    for name, tested in (('sparse Jacobian', model),
+                         ('dense Jacobian', dataclasses.replace(model, jac_sparsity=None))):
+        first = list()
+        start = time.perf_counter()
+        course = simulate(tested, 100.0, 200, parameters=parameters,
+                          on_chunk=lambda chunk: first.append(time.perf_counter()) if not first
+                          else None)
+        total_ms = (time.perf_counter() - start) * 1000
+        print('  simulate ({}): {:.0f} ms, first chunk after {:.0f} ms, final total amount {:.2f}'
+              .format(name, total_ms, (first[0] - start) * 1000, course.amounts[-1].sum()))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,64 @@
+"""Benchmark the stoichiometry matrix of a network, and the structural analyses on it.
+
+Usage: python scripts/bench_stoichiometry.py [num_reactions]
+
+The model has num_reactions reactions among twice as many species, with one or two reactants and
+products each. This prints the time StoichiometryCache takes to read the network the first time,
+and to update the matrix after a change to one reaction, compared to reading the reactants and
+products of every reaction through the plugin API functions that iodine provides. It then prints
+the time taken by each analysis.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.antimony import read_antimony  # noqa: E402
+from rkviewer.stoichiometry import StoichiometryCache  # noqa: E402
+
+from bench_antimony import make_text  # noqa: E402
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def read_with_api(neti: int):
+    for reai in iod.getListOfReactionIndices(neti):
+        for nodei in iod.getListOfReactionSrcNodes(neti, reai):
+            iod.getReactionSrcNodeStoich(neti, reai, nodei)
+        for nodei in iod.getListOfReactionDestNodes(neti, reai):
+            iod.getReactionDestNodeStoich(neti, reai, nodei)
+
+
+def bench(num_reactions: int):
+    iod.reset()
+    iod.addNetwork(read_antimony(make_text(num_reactions)))
+    cache = StoichiometryCache()
+    print('{} reactions, {} species: first read {:.1f} ms, API reads {:.0f} ms'.format(
+        num_reactions, iod.getNumberOfNodes(0), timed(cache.get, 0), timed(read_with_api, 0)))
+
+    reai = num_reactions // 2
+    nodei = iod.getListOfReactionSrcNodes(0, reai)[0]
+    iod.setReactionSrcNodeStoich(0, reai, nodei, 2.0)
+    print('  update after one change {:.2f} ms, unchanged {:.3f} ms'.format(
+        timed(cache.get, 0), timed(cache.get, 0)))
+
+    stoichiometry = cache.get(0)
+    laws = list()
+    print('  conservation laws {:.0f} ms, dead ends {:.1f} ms, components {:.1f} ms, '
+          'reachable {:.1f} ms'.format(
+              timed(lambda: laws.append(stoichiometry.conservation_laws())),
+              timed(stoichiometry.dead_end_species),
+              timed(stoichiometry.connected_components),
+              timed(stoichiometry.reachable, [nodei])))
+    print('  {} conservation laws, {} components'.format(
+        laws[0].shape[0], len(stoichiometry.connected_components())))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
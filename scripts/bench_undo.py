@@ -0,0 +1,55 @@
+"""Benchmark editing and undoing changes to a small network while large networks are open.
+
+Usage: python scripts/bench_undo.py [num_reactions] [num_networks]
+
+Each of the num_networks large networks has num_reactions reactions among twice as many species.
+This prints the time iodine takes to move a node of a small network, to undo that, and to move a
+node of one of the large networks. Since each network has its own undo history, the time to edit
+the small network does not depend on the large ones.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import iodine as iod  # noqa: E402
+from rkviewer.antimony import read_antimony  # noqa: E402
+
+from bench_antimony import make_text  # noqa: E402
+
+
+def timed(function, *args, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def edit_and_undo(neti: int):
+    iod.setNodeCoordinate(neti, 0, 10, 10)
+    iod.undo(neti)
+
+
+def bench(num_reactions: int, num_networks: int):
+    iod.reset()
+    text = make_text(num_reactions)
+    for i in range(num_networks):
+        network = read_antimony(text)
+        network.id = 'large{}'.format(i)
+        iod.addNetwork(network)
+    iod.newNetwork('small')
+    small = iod.getNetworkIndex('small')
+    iod.addNode(small, 'S', 0, 0, 50, 30)
+
+    print('{} networks of {} reactions open: edit of a small network {:.3f} ms, edit and undo '
+          '{:.3f} ms'.format(num_networks, num_reactions,
+                             timed(iod.setNodeCoordinate, small, 0, 5, 5, repeat=100),
+                             timed(edit_and_undo, small, repeat=100)))
+    print('  edit of a large network {:.0f} ms, edit and undo {:.0f} ms'.format(
+        timed(iod.setNodeCoordinate, 0, 0, 5, 5), timed(edit_and_undo, 0)))
+
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+          int(sys.argv[2]) if len(sys.argv) > 2 else 4)
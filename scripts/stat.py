@@ -1,6 +1,33 @@
+"""Print a summary of profiling output.
+
+Usage: python scripts/stat.py [path]
+
+If path ends with '.json', it is read as a frame-time profile dumped from View > Dump Profile Data,
+and a table of its phases is printed. Otherwise it is read as cProfile output (defaults to
+'rkviewer.stat').
+"""
+import json
 import pstats
 from pstats import SortKey
+import sys
+
+
+def print_phase_table(path: str):
+    with open(path) as fp:
+        data = json.load(fp)
+
+    phases = data['phases']
+    print('{} samples per phase (window)'.format(data['window']))
+    print('{:<32} {:>7} {:>10} {:>10} {:>10}'.format('phase', 'count', 'mean(ms)', 'p95(ms)',
+                                                    'max(ms)'))
+    for name, st in sorted(phases.items(), key=lambda pair: pair[1]['mean_ms'], reverse=True):
+        print('{:<32} {:>7} {:>10.3f} {:>10.3f} {:>10.3f}'.format(name, st['count'], st['mean_ms'],
+                                                                  st['p95_ms'], st['max_ms']))
 
-p = pstats.Stats('rkviewer.stat')
 
-p.sort_stats(SortKey.TIME).print_stats(20)
+path = sys.argv[1] if len(sys.argv) > 1 else 'rkviewer.stat'
+if path.endswith('.json'):
+    print_phase_table(path)
+else:
+    p = pstats.Stats(path)
+    p.sort_stats(SortKey.TIME).print_stats(20)
@@ -1,10 +1,12 @@
 # pylint: disable=maybe-no-member
-from rkplugin.api import Node, Vec2
+from rkplugin.api import Node, Reaction, Vec2
 from rkplugin import api
 from test.utils import run_app
 import wx
 import unittest
 import time
+from rkviewer.layout.force import force_layout
+from rkviewer.layout.graph import LayoutGraph, default_handles
 
 
 # TODO add more tests
@@ -40,3 +42,48 @@ class TestRectUtils(unittest.TestCase):
             nodes = api.all_nodes() 
             self.assertEqual(len(nodes), 1)
             self.assertTrue(nodes[0].id_, 'James')
+
+    def test_batch(self):
+        with run_app():
+            for i in range(3):
+                api.add_node(self.neti, Node('Node{}'.format(i), pos=Vec2(50 * i, 50),
+                                             size=Vec2(40, 12), fill_color=wx.RED,
+                                             border_color=wx.GREEN, border_width=4))
+            with api.batch() as b:
+                for node in api.all_nodes():
+                    b.update_node(self.neti, node.index, fill_color=wx.BLUE,
+                                  position=node.position + Vec2(10, 10))
+                # Nothing changes until the batch exits
+                self.assertEqual(api.get_node_by_index(self.neti, 0).fill_color, wx.RED)
+            nodes = api.all_nodes()
+            self.assertTrue(all(n.fill_color == wx.BLUE for n in nodes))
+            self.assertEqual(nodes[2].position, Vec2(110, 60))
+
+            # Nothing is applied if the block raises
+            with self.assertRaises(ValueError):
+                with api.batch() as b:
+                    b.update_node(self.neti, 0, fill_color=wx.GREEN)
+                    b.update_node(self.neti, 1, border_width=-1)
+            self.assertEqual(api.get_node_by_index(self.neti, 0).fill_color, wx.BLUE)
+
+    def test_apply_layout(self):
+        with run_app():
+            for i in range(3):
+                api.add_node(self.neti, Node('Node{}'.format(i), pos=Vec2(100, 100),
+                                             size=Vec2(40, 20), fill_color=wx.RED,
+                                             border_color=wx.GREEN, border_width=4))
+            api.add_reaction(self.neti, Reaction('R', sources=[0], targets=[1, 2],
+                                                 handle_positions=[Vec2()] * 4,
+                                                 fill_color=wx.RED, line_thickness=1,
+                                                 rate_law=''))
+            snapshot = api.snapshot()
+            graph = LayoutGraph.from_snapshot(snapshot, api.canvas_size().as_tuple())
+            positions = force_layout(graph)
+            handles = default_handles(snapshot, positions + snapshot.node_sizes / 2)
+            api.apply_layout(snapshot, positions, handles)
+            for node, (x, y) in zip(api.all_nodes(), positions):
+                self.assertAlmostEqual(node.position.x, x, places=1)
+                self.assertAlmostEqual(node.position.y, y, places=1)
+            center = api.all_reactions()[0].src_c_handle.tip
+            self.assertAlmostEqual(center.x, handles.centers[0, 0], places=1)
+            self.assertAlmostEqual(center.y, handles.centers[0, 1], places=1)
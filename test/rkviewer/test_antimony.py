@@ -0,0 +1,134 @@
+import unittest
+
+import iodine as iod
+from rkviewer.antimony import (AntimonyDocument, AntimonyError, ReactionStatement,
+                               SpeciesStatement, parse_line, read_antimony)
+
+
+MODEL = '''model example()
+  J0: 2 A + B -> C; k1 * A^2 * B  // a comment
+  C => D + $E;
+  species F, G in cell;
+  k1 = 0.1
+end'''
+
+
+def _reactions(neti: int):
+    """Return the reactions of a network as {ID: (reactants, products, rate law)}, by node ID."""
+    net = iod.networkDict[neti]
+    return {rea.id: ({net.nodes[i].id: s.stoich for i, s in rea.srcDict.items()},
+                     {net.nodes[i].id: s.stoich for i, s in rea.destDict.items()}, rea.rateLaw)
+            for rea in net.reactions.values()}
+
+
+class TestParse(unittest.TestCase):
+    def test_parse_line(self):
+        self.assertEqual(parse_line('J1: 2A + 1.5*B + A => $C; Vm*A/(Km + A);'),
+                         ReactionStatement('J1', (('A', 3), ('B', 1.5)), (('C', 1),),
+                                           'Vm*A/(Km + A)'))
+        self.assertEqual(parse_line('A -> B'), ReactionStatement('', (('A', 1),), (('B', 1),), ''))
+        self.assertEqual(parse_line('species $X, Y'), SpeciesStatement(('X', 'Y')))
+        for line in ('', '  // A -> B', 'k1 = 0.1;', 'model m()', 'end'):
+            self.assertIsNone(parse_line(line))
+        for line in ('A + -> B', '-> B; k', 'A -> 0 B', 'A -> B C', 'species A B'):
+            with self.assertRaises(ValueError):
+                parse_line(line)
+
+    def test_read(self):
+        net = read_antimony(MODEL, 'example')
+        self.assertEqual(net.id, 'example')
+        self.assertEqual([n.id for n in net.nodes.values()], ['A', 'B', 'C', 'D', 'E', 'F', 'G'])
+        self.assertEqual(net.baseNodes, set(range(7)))
+        j0, j1 = net.reactions.values()
+        self.assertEqual((j0.id, j0.rateLaw, j0.srcDict[0].stoich), ('J0', 'k1 * A^2 * B', 2))
+        self.assertEqual((j1.id, list(j1.srcDict), list(j1.destDict)), ('_J0', [2], [3, 4]))
+        # Nodes do not overlap, and the handles are around them
+        self.assertEqual(len({(n.x, n.y) for n in net.nodes.values()}), 7)
+        self.assertNotEqual((j0.centerHandleX, j0.centerHandleY), (0, 0))
+
+        with self.assertRaises(AntimonyError) as cm:
+            read_antimony('A -> B\nJ0: B -> C\nJ0: C -> D')
+        self.assertEqual(cm.exception.line, 3)
+        with self.assertRaises(AntimonyError) as cm:
+            read_antimony('A -> B\nB -> ; k')
+        self.assertEqual(cm.exception.line, 2)
+
+
+class TestAntimonyDocument(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        self.neti = iod.addNetwork(read_antimony(MODEL))
+        self.document = AntimonyDocument(self.neti)
+
+    def tearDown(self):
+        iod.reset()
+
+    def test_text(self):
+        self.assertEqual(self.document.text, 'J0: 2 A + B -> C; k1 * A^2 * B\n_J0: C -> D + E;\n'
+                                             'species F;\nspecies G;')
+        version = iod.getModelVersion()
+        self.assertEqual(self.document.update(self.document.text), [])
+        self.assertEqual(iod.getModelVersion(), version)
+
+    def test_update(self):
+        net = iod.networkDict[self.neti]
+        iod.setNodeCoordinate(self.neti, 0, 500, 600)
+        self.document.update(self.document.text)
+        lines = self.document.text.split('\n')
+        lines[0] = 'J0: A + 3 B -> C + F; k2 * A'
+        lines.insert(2, 'G -> H')
+        lines[4] = 'species G, X;'
+        self.document.update('\n'.join(lines))
+        self.assertEqual(_reactions(self.neti), {
+            'J0': ({'A': 1, 'B': 3}, {'C': 1, 'F': 1}, 'k2 * A'),
+            '_J0': ({'C': 1}, {'D': 1, 'E': 1}, ''),
+            '_J1': ({'G': 1}, {'H': 1}, ''),
+        })
+        # Only the new species are added; the others keep their positions
+        self.assertEqual(iod.getListOfNodeIDs(self.neti), ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H',
+                                                           'X'])
+        self.assertEqual((net.nodes[0].x, net.nodes[0].y), (500, 600))
+        self.assertEqual(len({(n.x, n.y) for n in net.nodes.values()}), 9)
+        # As a single undo step
+        iod.undo()
+        self.assertEqual(iod.getNumberOfNodes(self.neti), 7)
+
+    def test_delete(self):
+        self.document.update('J0: 2 A + B -> C; k1 * A^2 * B\nspecies F;')
+        self.assertEqual(list(_reactions(self.neti)), ['J0'])
+        # The species that no line mentions any more are deleted
+        self.assertEqual(iod.getListOfNodeIDs(self.neti), ['A', 'B', 'C', 'F'])
+
+    def test_unnamed(self):
+        text = self.document.text.replace('_J0: C -> D + E;', 'C -> D + E;')
+        self.document.update(text)
+        self.document.update(text.replace('D + E;', 'D + E; k3 * C'))
+        # The edited unnamed reaction is the same reaction
+        self.assertEqual(_reactions(self.neti)['_J0'], ({'C': 1}, {'D': 1, 'E': 1}, 'k3 * C'))
+        self.assertEqual(iod.getNumberOfReactions(self.neti), 2)
+
+    def test_errors(self):
+        text = self.document.text
+        # A line being typed keeps its reaction until it can be read again
+        errors = self.document.update(text.replace('_J0: C -> D + E;', '_J0: C -> D +'))
+        self.assertEqual([e.line for e in errors], [2])
+        self.assertIn('_J0', _reactions(self.neti))
+        errors = self.document.update(text.replace('_J0: C -> D + E;', '_J0: C -> D + Y;'))
+        self.assertEqual(errors, [])
+        self.assertEqual(_reactions(self.neti)['_J0'][1], {'D': 1, 'Y': 1})
+
+        errors = self.document.update(self.document.text + '\nJ0: A -> D')
+        self.assertEqual([e.line for e in errors], [5])
+        self.assertEqual(iod.getNumberOfReactions(self.neti), 2)
+        # Once the ID is free, the line is read
+        errors = self.document.update(self.document.text.replace('J0: 2 A', 'J2: 2 A', 1))
+        self.assertEqual(errors, [])
+        self.assertEqual(set(_reactions(self.neti)), {'J0', 'J2', '_J0'})
+
+    def test_stale(self):
+        iod.setRateLaw(self.neti, 0, 'k')
+        self.assertTrue(self.document.stale)
+        self.document.update('J0: 2 A + B -> C; k\n_J0: C -> D + E; v\nspecies F;\nspecies G;')
+        self.assertFalse(self.document.stale)
+        self.assertEqual(_reactions(self.neti)['_J0'][2], 'v')
+        self.assertEqual(iod.getNumberOfNodes(self.neti), 7)
@@ -0,0 +1,61 @@
+import unittest
+
+import iodine as iod
+from rkviewer.controller import Controller
+from rkviewer.plugin_isolation import _NullView
+
+
+class RecordingView(_NullView):
+    def __init__(self):
+        self.shown = list()
+
+    def update_all(self, neti, nodes, reactions, compartments):
+        self.shown.append(neti)
+
+
+class TestNetworks(unittest.TestCase):
+    def setUp(self):
+        self.view = RecordingView()
+        self.controller = Controller(self.view)
+
+    def test_activate(self):
+        self.assertEqual(self.controller.new_network('second'), 1)
+        self.assertEqual(self.view.shown, [1])
+        self.assertTrue(self.controller.activate_network(0))
+        self.assertEqual(self.controller.get_active_network(), 0)
+        self.assertEqual(self.view.shown, [1, 0])
+        # Not an undo step
+        self.assertFalse(self.controller.activate_network(0))
+        self.assertEqual(self.view.shown, [1, 0])
+        with self.assertRaises(iod.NetIndexNotFoundError):
+            self.controller.activate_network(5)
+
+    def test_close_active(self):
+        self.controller.new_network('second')
+        self.controller.new_network('third')
+        self.controller.activate_network(1)
+        # The next network is shown in place of the closed one, or the previous one if last
+        self.assertTrue(self.controller.close_network(1))
+        self.assertEqual(self.controller.get_list_of_networks(), [0, 2])
+        self.assertEqual(self.controller.get_active_network(), 2)
+        self.assertTrue(self.controller.close_network(2))
+        self.assertEqual(self.controller.get_active_network(), 0)
+        self.assertEqual(self.view.shown[-1], 0)
+        # The last network is never closed
+        self.assertFalse(self.controller.close_network(0))
+        # Closing is undone from the network shown
+        self.assertTrue(self.controller.undo())
+        self.assertEqual(self.controller.get_list_of_networks(), [0, 2])
+        self.assertEqual(self.controller.get_active_network(), 0)
+
+    def test_undo_creation(self):
+        self.controller.new_network('second')
+        self.assertEqual(self.controller.get_active_network(), 1)
+        self.assertTrue(self.controller.undo())
+        # The network shown was removed, so the view falls back to the first network
+        self.assertEqual(self.controller.get_list_of_networks(), [0])
+        self.assertEqual(self.controller.get_active_network(), 0)
+        self.assertEqual(self.view.shown[-1], 0)
+        # The first network is never removed
+        self.assertFalse(self.controller.undo())
+        self.assertEqual(self.controller.get_list_of_networks(), [0])
@@ -0,0 +1,54 @@
+import unittest
+
+from rkviewer.canvas.geometry import Vec2
+from rkviewer.events import DidMoveNodesEvent, bind_handler, post_event, unbind_handler
+
+
+class FakeNode:
+    def __init__(self, index: int):
+        self.index = index
+
+
+def move_event(*indices: int) -> DidMoveNodesEvent:
+    return DidMoveNodesEvent([FakeNode(i) for i in indices], Vec2(1, 1), dragged=True)
+
+
+class TestKeyedHandlers(unittest.TestCase):
+    def setUp(self):
+        self.calls = list()
+        self.ids = list()
+
+    def tearDown(self):
+        for id_ in self.ids:
+            unbind_handler(id_)
+
+    def bind(self, name, keys=None):
+        self.ids.append(bind_handler(DidMoveNodesEvent, lambda _: self.calls.append(name),
+                                     keys=keys))
+
+    def test_routing(self):
+        self.bind('a', keys=[0, 1])
+        self.bind('b', keys=[2])
+        post_event(move_event(1))
+        self.assertEqual(self.calls, ['a'])
+        post_event(move_event(3))
+        self.assertEqual(self.calls, ['a'])
+
+    def test_once_per_event_in_bind_order(self):
+        self.bind('a', keys=[1, 2])
+        self.bind('b', keys=[2, 3])
+        self.bind('all')
+        post_event(move_event(3, 2, 1))
+        # unkeyed handlers first, then keyed ones in bind order, each only once
+        self.assertEqual(self.calls, ['all', 'a', 'b'])
+
+    def test_unbind(self):
+        self.bind('a', keys=[0])
+        self.bind('b', keys=[0])
+        unbind_handler(self.ids.pop(0))
+        post_event(move_event(0))
+        self.assertEqual(self.calls, ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import math
+import unittest
+
+import numpy as np
+
+import iodine as iod
+from rkviewer.layout.force import ForceLayout, force_layout, repulsion
+from rkviewer.layout.graph import LayoutGraph, default_handles
+from rkviewer.layout.layered import count_inversions, layered_handles, layered_layout
+from rkviewer.layout.routing import route_handles, routing_costs
+from rkviewer.snapshot import take_snapshot
+
+
+class TestLayout(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        iod.newNetwork('net')
+        # A chain of reactions, all nodes starting at the same position
+        for i in range(10):
+            iod.addNode(0, 'n{}'.format(i), 300, 200, 50, 30)
+        for i in range(9):
+            iod.createReaction(0, 'r{}'.format(i))
+            iod.addSrcNode(0, i, i, 1)
+            iod.addDestNode(0, i, i + 1, 1)
+        iod.addCompartment(0, 'comp', 1000, 1000, 200, 100)
+        iod.setCompartmentOfNode(0, 9, 0)
+
+    def tearDown(self):
+        iod.reset()
+
+    def test_graph(self):
+        graph = LayoutGraph.from_snapshot(take_snapshot(0), (2000, 1500))
+        self.assertEqual(graph.num_vertices, 19)
+        self.assertEqual(len(graph.edges), 18)
+        self.assertEqual(list(graph.edges[0]), [0, 10])
+        self.assertEqual(list(graph.free), [True] * 9 + [False] + [True] * 9)
+        np.testing.assert_array_equal(graph.lower[9], (1025, 1015))
+        np.testing.assert_array_equal(graph.upper[9], (1175, 1085))
+        # Reactions start at the centroid of their nodes
+        np.testing.assert_array_equal(graph.initial_centers()[10], (325, 215))
+
+    def test_layout(self):
+        snapshot = take_snapshot(0)
+        graph = LayoutGraph.from_snapshot(snapshot, (2000, 1500))
+        positions = force_layout(graph)
+        self.assertTrue(np.all(positions >= 0))
+        self.assertTrue(np.all(positions + snapshot.node_sizes <= (2000, 1500)))
+        # The free nodes are kept where they were
+        np.testing.assert_allclose(positions[:9].min(axis=0), (300, 200))
+        # The node in the compartment stays in it
+        self.assertTrue(np.all(positions[9] >= (1000, 1000)))
+        self.assertTrue(np.all(positions[9] + (50, 30) <= (1200, 1100)))
+        # The nodes are spread out
+        centers = positions[:9] + (25, 15)
+        dists = np.hypot(*(centers[:, None] - centers[None]).transpose(2, 0, 1))
+        np.fill_diagonal(dists, np.inf)
+        self.assertGreater(dists.min(), 30)
+
+    def test_pinned(self):
+        graph = LayoutGraph.from_snapshot(take_snapshot(0), (2000, 1500))
+        layout = ForceLayout(graph, iterations=10, pinned=[0])
+        centers = layout.run()
+        np.testing.assert_array_equal(centers[0], (325, 215))
+        self.assertFalse(layout.step())
+
+    def test_pin(self):
+        graph = LayoutGraph.from_snapshot(take_snapshot(0), (2000, 1500))
+        layout = ForceLayout(graph, iterations=20)
+        self.assertTrue(layout.run_for(0))
+        self.assertEqual(layout.iteration, 1)
+        # A node dropped outside of its compartment's bounds stays where it is pinned
+        layout.pin([0, 9], np.array([[100, 100], [900, 900]]))
+        self.assertFalse(layout.run_for(60))
+        self.assertEqual(layout.iteration, 20)
+        np.testing.assert_array_equal(layout.centers[[0, 9]], [[100, 100], [900, 900]])
+        # The translation applies to the free nodes only
+        positions = graph.node_positions(layout.centers, offset=np.array([10, 20]))
+        np.testing.assert_array_equal(positions[[0, 9]], [[85, 105], [875, 885]])
+
+    def test_repulsion(self):
+        rng = np.random.default_rng(0)
+        centers = rng.uniform(0, 3000, (500, 2))
+        delta = centers[:, None] - centers[None]
+        dist2 = np.einsum('ijk,ijk->ij', delta, delta)
+        np.fill_diagonal(dist2, np.inf)
+        exact = np.einsum('ijk,ij->ik', delta, 80 ** 2 / dist2)
+        errors = np.hypot(*(repulsion(centers, 80) - exact).T) / np.hypot(*exact.T)
+        self.assertLess(np.median(errors), 0.01)
+
+    def test_default_handles(self):
+        iod.addNode(0, 'a', 0, 0, 20, 20)
+        iod.addNode(0, 'b', 100, 0, 20, 20)
+        iod.createReaction(0, 'loop')
+        iod.addSrcNode(0, 9, 10, 1)
+        iod.addDestNode(0, 9, 10, 1)
+        iod.addDestNode(0, 9, 11, 1)
+        snapshot = take_snapshot(0)
+        handles = default_handles(snapshot, snapshot.node_centers())
+        # The centroid is the mean of (10, 10), (10, 10) and (110, 10)
+        np.testing.assert_allclose(handles.centers[9], (10 / 3 + 2 / 3 * 130 / 3, 10))
+        np.testing.assert_allclose(handles.reactants[9], ((10 + 130 / 3) / 2, 10))
+        np.testing.assert_allclose(handles.products[10], ((110 + 130 / 3) / 2, 10))
+        # The product that is also a reactant is rotated
+        length = (130 / 3 - 10) * 3 / 4
+        np.testing.assert_allclose(handles.products[9], (10 + length * math.cos(-math.pi / 3),
+                                                         10 + length * math.sin(-math.pi / 3)))
+
+    def test_count_inversions(self):
+        rng = np.random.default_rng(0)
+        for size in (0, 1, 2, 7, 100):
+            values = rng.integers(0, 10, size)
+            expected = sum(values[i] > values[j] for i in range(size) for j in range(i + 1, size))
+            self.assertEqual(count_inversions(values), expected)
+
+    def test_layered(self):
+        # Close the chain into a cycle
+        iod.createReaction(0, 'back')
+        iod.addSrcNode(0, 9, 8, 1)
+        iod.addDestNode(0, 9, 0, 1)
+        snapshot = take_snapshot(0)
+        graph = LayoutGraph.from_snapshot(snapshot, (2000, 1500))
+        positions = layered_layout(graph, layer_gap=20)
+        # The cycle is broken at the new reaction, and the chain goes from top to bottom
+        np.testing.assert_allclose(np.diff(positions[:9, 1]), 50)
+        np.testing.assert_allclose(positions[:9].min(axis=0), (300, 200))
+        self.assertTrue(np.all(positions[9] >= (1000, 1000)))
+        self.assertTrue(np.all(positions[9] + (50, 30) <= (1200, 1100)))
+
+        centers = positions + snapshot.node_sizes / 2
+        handles = layered_handles(snapshot, centers)
+        # The curves leave and enter the nodes vertically
+        np.testing.assert_allclose(handles.reactants[0], (centers[0, 0], centers[0, 1] + 12.5))
+        np.testing.assert_allclose(handles.products[0], (centers[1, 0], centers[1, 1] - 12.5))
+        np.testing.assert_allclose(handles.centers[0], (centers[:2, 0].mean(),
+                                                        centers[0, 1] + 12.5))
+
+    def test_routing(self):
+        # A reaction whose curves cross the node between its reactant and product, and one clear
+        # of the other nodes
+        iod.newNetwork('routing')
+        for i, x in enumerate((0, 200, 300)):
+            iod.addNode(1, 'n{}'.format(i), x, 0, 20, 20)
+        iod.addNode(1, 'n3', 0, 300, 20, 20)
+        iod.createReaction(1, 'across')
+        iod.addSrcNode(1, 0, 0, 1)
+        iod.addDestNode(1, 0, 2, 1)
+        iod.createReaction(1, 'clear')
+        iod.addSrcNode(1, 1, 0, 1)
+        iod.addDestNode(1, 1, 3, 1)
+        snapshot = take_snapshot(1)
+        centers = snapshot.node_centers()
+        defaults = default_handles(snapshot, centers)
+        handles = route_handles(snapshot)
+        self.assertGreater(routing_costs(snapshot, centers, defaults)[0], 0)
+        self.assertEqual(routing_costs(snapshot, centers, handles)[0], 0)
+        np.testing.assert_allclose(handles.centers[1], defaults.centers[1])
+        np.testing.assert_allclose(handles.products[1], defaults.products[1])
@@ -0,0 +1,60 @@
+import unittest
+
+from rkviewer.controller import iod_setter
+from rkviewer.plugin_isolation import RecordingController, replay
+
+
+class FakeController:
+    def __init__(self):
+        self.group_depth = 0
+        self.calls = list()
+
+    def start_group(self):
+        self.group_depth += 1
+        self.calls.append('start_group')
+
+    def end_group(self):
+        self.group_depth -= 1
+        self.calls.append('end_group')
+
+    def cancel_group(self):
+        self.group_depth -= 1
+        self.calls.append('cancel_group')
+
+    def _update_view(self):
+        pass
+
+    @iod_setter
+    def move_node(self, neti, nodei, pos):
+        self.calls.append(('move_node', neti, nodei, pos))
+
+    def get_node_id(self, neti, nodei):
+        return 'node{}'.format(nodei)
+
+
+class TestRecordingController(unittest.TestCase):
+    def test_record(self):
+        controller = FakeController()
+        recorder = RecordingController(controller)
+        recorder.start_group()
+        self.assertEqual(recorder.get_node_id(0, 2), 'node2')
+        recorder.move_node(0, 2, (1, 2))
+        recorder.end_group()
+        # Calls are forwarded, but only the setters are recorded
+        self.assertEqual(controller.calls, ['start_group', ('move_node', 0, 2, (1, 2)),
+                                            'end_group'])
+        self.assertEqual(recorder.mutations, [('move_node', (0, 2, (1, 2)))])
+
+    def test_replay(self):
+        controller = FakeController()
+        replay(controller, [('move_node', (0, 1, (1, 1))), ('move_node', (0, 2, (2, 2)))])
+        self.assertEqual(controller.calls, ['start_group', ('move_node', 0, 1, (1, 1)),
+                                            ('move_node', 0, 2, (2, 2)), 'end_group'])
+
+    def test_replay_error(self):
+        controller = FakeController()
+        with self.assertRaises(AttributeError):
+            replay(controller, [('move_node', (0, 1, (1, 1))), ('move_nodes', (0, [2]))])
+        # The group is cancelled rather than ended, so that no mutation is applied
+        self.assertEqual(controller.calls, ['start_group', ('move_node', 0, 1, (1, 1)),
+                                            'cancel_group'])
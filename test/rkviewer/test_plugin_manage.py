@@ -0,0 +1,92 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from rkplugin.plugins import Plugin, PluginMetadata, PluginType
+from rkviewer import plugin_manage
+from rkviewer.canvas.geometry import Vec2
+from rkviewer.config import settings
+from rkviewer.events import DidMoveNodesEvent, SelectionDidUpdateEvent
+from rkviewer.plugin_manage import HandlerStats, PluginManager
+
+
+class RecordingPlugin(Plugin):
+    def __init__(self):
+        super().__init__(PluginMetadata('Recorder', 'test', '0.1', '', ''), PluginType.WINDOWED)
+        self.moves = list()
+        self.selections = list()
+
+    def on_did_move_nodes(self, nodes, offset, dragged):
+        self.moves.append(([n.index for n in nodes], offset))
+
+    def on_selection_did_change(self, node_indices, reaction_indices, compartment_indices):
+        self.selections.append(node_indices)
+
+
+class TestHandlerStats(unittest.TestCase):
+    def test_record(self):
+        stats = HandlerStats()
+        # Throttled after 'strike_limit' consecutive calls over budget
+        self.assertFalse(stats.record(20, 10, 3))
+        self.assertFalse(stats.record(5, 10, 3))
+        self.assertFalse(stats.record(20, 10, 3))
+        self.assertFalse(stats.record(20, 10, 3))
+        self.assertTrue(stats.record(20, 10, 3))
+        self.assertTrue(stats.throttled)
+        # And no longer throttled after as many consecutive calls within budget
+        self.assertFalse(stats.record(5, 10, 3))
+        self.assertFalse(stats.record(5, 10, 3))
+        self.assertTrue(stats.record(5, 10, 3))
+        self.assertFalse(stats.throttled)
+        self.assertEqual((stats.calls, stats.over_budget, stats.max, stats.total),
+                         (8, 4, 20, 100))
+        self.assertEqual(stats.mean, 12.5)
+
+
+class TestThrottling(unittest.TestCase):
+    def setUp(self):
+        # Not bound to the global event handlers, so that other tests do not reach the plugin
+        with mock.patch.object(plugin_manage, 'bind_handler'):
+            self.manager = PluginManager(None)
+        self.plugin = RecordingPlugin()
+        self.manager.plugins.append(self.plugin)
+        self.manager.stats[self.plugin] = dict()
+
+    def deliver(self, handler_name, events):
+        """Deliver events to the throttled handler, and return the number of deferred calls."""
+        stats = self.manager.stats[self.plugin].setdefault(handler_name, HandlerStats())
+        stats.throttled = True
+        notify = self.manager.make_notify(handler_name)
+        with mock.patch.object(plugin_manage.wx, 'CallLater') as call_later:
+            for evt in events:
+                notify(evt)
+        for args in call_later.call_args_list:
+            interval, flush, *flush_args = args[0]
+            self.assertEqual(interval, settings['plugin_throttle_interval'])
+            flush(*flush_args)
+        return call_later.call_count
+
+    def test_merged_moves(self):
+        a, b, c = (SimpleNamespace(index=i) for i in range(3))
+        events = [DidMoveNodesEvent([a, b], Vec2(1, 2), True),
+                  DidMoveNodesEvent([a, b], Vec2(3, 0), True),
+                  DidMoveNodesEvent([b, c], [Vec2(1, 1), Vec2(0, 5)], True)]
+        self.assertEqual(self.deliver('on_did_move_nodes', events), 1)
+        # Delivered once, with each node moved by the sum of its offsets
+        self.assertEqual(self.plugin.moves,
+                         [([0, 1, 2], [Vec2(4, 2), Vec2(5, 3), Vec2(0, 5)])])
+        stats = self.manager.stats[self.plugin]['on_did_move_nodes']
+        self.assertEqual((stats.calls, stats.deferred, stats.skipped), (1, 3, 2))
+        self.assertEqual(stats.pending, [])
+
+    def test_coalesced(self):
+        events = [SelectionDidUpdateEvent({i}, set(), set()) for i in range(3)]
+        self.assertEqual(self.deliver('on_selection_did_change', events), 1)
+        # Only the latest selection matters
+        self.assertEqual(self.plugin.selections, [{2}])
+        stats = self.manager.stats[self.plugin]['on_selection_did_change']
+        self.assertEqual((stats.calls, stats.deferred, stats.skipped), (1, 3, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
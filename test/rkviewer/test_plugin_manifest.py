@@ -0,0 +1,136 @@
+import ast
+import os
+import tempfile
+import textwrap
+import unittest
+
+from rkviewer.plugin_manifest import EVENT_HANDLERS, ManifestCache, scan_source
+
+
+PLUGIN_SOURCE = textwrap.dedent('''
+    import wx
+    from rkplugin.plugins import CommandPlugin, PluginMetadata, WindowedPlugin
+
+    metadata = PluginMetadata(
+        name='Disco',
+        author='Gary Geng',
+        version='0.0.1',
+        short_desc='Set all nodes to a random color.',
+        long_desc='The fill and border color of all nodes are set to a random color.'
+    )
+
+
+    class Helper:
+        pass
+
+
+    class Disco(CommandPlugin):
+        isolated = True
+
+        def __init__(self):
+            super().__init__(metadata)
+
+        def run(self):
+            pass
+
+
+    class Watcher(WindowedPlugin):
+        async_events = True
+
+        def __init__(self):
+            super().__init__(PluginMetadata(name='Watcher', author='a', version='1',
+                                            short_desc='s', long_desc='l'))
+
+        def on_selection_did_change(self, node_indices, reaction_indices, compartment_indices):
+            pass
+''')
+
+
+class TestScanSource(unittest.TestCase):
+    def test_scan(self):
+        classes = scan_source(PLUGIN_SOURCE)
+        self.assertEqual([c.name for c in classes], ['Disco', 'Watcher'])
+        disco, watcher = classes
+        self.assertEqual(disco.ptype, 'command')
+        self.assertEqual(disco.metadata['name'], 'Disco')
+        self.assertEqual(disco.handlers, [])
+        self.assertTrue(disco.isolated)
+        self.assertFalse(disco.async_events)
+        self.assertFalse(disco.needs_import)
+        self.assertEqual(watcher.ptype, 'windowed')
+        self.assertEqual(watcher.metadata['name'], 'Watcher')
+        self.assertEqual(watcher.handlers, ['on_selection_did_change'])
+        self.assertTrue(watcher.async_events)
+        self.assertFalse(watcher.isolated)
+        self.assertTrue(watcher.needs_import)
+
+    def test_simulation_handler(self):
+        source = PLUGIN_SOURCE.replace('def on_selection_did_change(self, node_indices, '
+                                       'reaction_indices, compartment_indices)',
+                                       'def on_simulation_did_progress(self, *args)')
+        watcher = scan_source(source)[1]
+        self.assertEqual(watcher.handlers, ['on_simulation_did_progress'])
+        self.assertTrue(watcher.needs_import)
+
+    def test_all_handlers(self):
+        # Every event handler of the Plugin base class is listed
+        path = os.path.join(os.path.dirname(__file__), '..', '..', 'rkplugin', 'plugins.py')
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        plugin = next(stmt for stmt in tree.body
+                      if isinstance(stmt, ast.ClassDef) and stmt.name == 'Plugin')
+        self.assertEqual({stmt.name for stmt in plugin.body if isinstance(stmt, ast.FunctionDef)
+                          and stmt.name.startswith('on_')}, EVENT_HANDLERS)
+
+    def test_hidden_handlers(self):
+        # Handlers inherited from a mixin
+        source = PLUGIN_SOURCE.replace('class Disco(CommandPlugin):',
+                                       'class Disco(MoveMixin, CommandPlugin):')
+        disco = scan_source(source)[0]
+        self.assertEqual(disco.handlers, [])
+        self.assertTrue(disco.hidden_handlers)
+        self.assertTrue(disco.needs_import)
+        # Handlers assigned rather than defined
+        source = PLUGIN_SOURCE.replace('isolated = True',
+                                       'isolated = True\n    on_did_move_nodes = print')
+        disco = scan_source(source)[0]
+        self.assertTrue(disco.needs_import)
+        self.assertFalse(scan_source(PLUGIN_SOURCE)[0].hidden_handlers)
+
+    def test_not_literal(self):
+        source = PLUGIN_SOURCE.replace("name='Disco'", "name='Dis' + 'co'")
+        self.assertIsNone(scan_source(source))
+
+    def test_indirect_base(self):
+        self.assertIsNone(scan_source('class Mine(MyBasePlugin):\n    pass\n'))
+        self.assertEqual(scan_source('class Mine(object):\n    pass\n'), [])
+
+
+class TestManifestCache(unittest.TestCase):
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'disco.py')
+            with open(path, 'w') as f:
+                f.write(PLUGIN_SOURCE)
+            cache_path = os.path.join(tmp, '__pycache__', 'manifest.json')
+
+            cache = ManifestCache(cache_path)
+            self.assertEqual(len(cache.get(path).classes), 2)
+            cache.set_import_ms(path, 12.5)
+            cache.save()
+
+            cache = ManifestCache(cache_path)
+            self.assertFalse(cache.dirty)
+            manifest = cache.get(path)
+            self.assertFalse(cache.dirty)  # served from the cache
+            self.assertEqual(manifest.import_ms, 12.5)
+
+            # Changing the file invalidates its entry
+            with open(path, 'a') as f:
+                f.write('\n\nclass Other(CommandPlugin):\n    pass\n')
+            self.assertEqual(len(cache.get(path).classes), 3)
+            self.assertTrue(cache.dirty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import threading
+from types import SimpleNamespace
+import unittest
+
+from rkviewer.plugin_worker import EventQueue, PluginWorker, merge_move_args, snapshot_args
+
+
+def _node(index: int):
+    return SimpleNamespace(index=index, position=0j)
+
+
+class TestEventQueue(unittest.TestCase):
+    def test_bounded(self):
+        queue = EventQueue(2)
+        for i in range(3):
+            queue.put('on_did_add_node', (i,))
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual(queue.get(0), ('on_did_add_node', (1,)))
+        self.assertEqual(queue.get(0), ('on_did_add_node', (2,)))
+        self.assertIsNone(queue.get(0))
+
+    def test_coalesced(self):
+        queue = EventQueue(10, coalesced={'on_did_move_nodes'})
+        queue.put('on_did_move_nodes', (0,))
+        queue.put('on_did_move_nodes', (1,))
+        self.assertEqual(len(queue), 1)
+        self.assertEqual(queue.dropped, 1)
+        # the latest move replaces the pending one
+        self.assertEqual(queue.get(0), ('on_did_move_nodes', (1,)))
+
+    def test_coalesced_order(self):
+        queue = EventQueue(10, coalesced={'on_did_move_nodes'},
+                           merge={'on_did_move_nodes': merge_move_args})
+        a = _node(0)
+        queue.put('on_did_move_nodes', ([a], 1, True))
+        queue.put('on_did_commit_node_positions', ())
+        queue.put('on_did_move_nodes', ([a], 5, True))
+        queue.put('on_did_move_nodes', ([a], 2, True))
+        # Only merged with the last item, so the moves stay on their side of the commit
+        self.assertEqual(queue.dropped, 1)
+        self.assertEqual([(name, args[1] if args else None) for name, args in
+                          (queue.get(0), queue.get(0), queue.get(0))],
+                         [('on_did_move_nodes', 1), ('on_did_commit_node_positions', None),
+                          ('on_did_move_nodes', 7)])
+
+    def test_merged(self):
+        # Offsets are complex numbers here, which add up like Vec2
+        queue = EventQueue(10, coalesced={'on_did_move_nodes'},
+                           merge={'on_did_move_nodes': merge_move_args})
+        a, b, c = _node(0), _node(1), _node(2)
+        queue.put('on_did_move_nodes', ([a, b], 1 + 2j, True))
+        queue.put('on_did_move_nodes', ([a, b], 3j, True))
+        name, (nodes, offset, _) = queue.get(0)
+        self.assertEqual(([n.index for n in nodes], offset), ([0, 1], 1 + 5j))
+
+        # Different nodes, or offsets per node, give one offset per node
+        queue.put('on_did_move_nodes', ([a, b], 1, True))
+        queue.put('on_did_move_nodes', ([b, c], [2, 1j], True))
+        queue.put('on_did_move_nodes', ([c], 1, False))
+        self.assertEqual(queue.dropped, 3)
+        name, (nodes, offset, dragged) = queue.get(0)
+        self.assertEqual(([n.index for n in nodes], offset, dragged),
+                         ([0, 1, 2], [1, 3, 1 + 1j], False))
+
+    def test_close(self):
+        queue = EventQueue(2)
+        queue.put('on_did_add_node', (0,))
+        queue.close()
+        queue.put('on_did_add_node', (1,))
+        self.assertEqual(queue.get(), ('on_did_add_node', (0,)))
+        self.assertIsNone(queue.get())
+
+        queue = EventQueue(2)
+        queue.put('on_did_add_node', (0,))
+        queue.close(discard=True)
+        self.assertIsNone(queue.get())
+        self.assertEqual(queue.dropped, 1)
+
+    def test_snapshot(self):
+        node = _node(0)
+        args = snapshot_args(([node], {1, 2}, 3))
+        node.position = 1j
+        self.assertEqual(args[0][0].position, 0j)
+        self.assertEqual(args[1:], ({1, 2}, 3))
+
+
+class TestPluginWorker(unittest.TestCase):
+    def test_delivery(self):
+        calls = list()
+        dispatched = list()
+        main_thread = threading.current_thread()
+
+        class Target:
+            def on_did_add_node(self, node):
+                calls.append((node, threading.current_thread() is main_thread))
+                return lambda: node
+
+            def on_did_commit_node_positions(self):
+                raise RuntimeError('errors are logged and do not stop the worker')
+
+        worker = PluginWorker(Target(), 'test-worker', dispatched.append, 10)
+        durations = list()
+        worker.on_done = lambda name, duration: durations.append(name)
+        worker.post('on_did_add_node', (1,))
+        worker.post('on_did_commit_node_positions', ())
+        worker.post('on_did_add_node', (2,))
+        worker.stop(5)
+
+        self.assertEqual(calls, [(1, False), (2, False)])
+        self.assertEqual([f() for f in dispatched], [1, 2])
+        self.assertEqual(durations, ['on_did_add_node', 'on_did_add_node'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import json
+import unittest
+
+from rkviewer.profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = Profiler(window=4)
+        self.profiler.enabled = True
+
+    def test_disabled(self):
+        self.profiler.enabled = False
+        self.profiler.add('paint', 3)
+        with self.profiler.phase('motion'):
+            pass
+        self.assertEqual(self.profiler.phases(), [])
+        self.assertIsNone(self.profiler.stats('paint'))
+
+    def test_rolling_window(self):
+        for i in range(6):
+            self.profiler.add('paint', i)
+        self.assertEqual(self.profiler.samples('paint'), [2, 3, 4, 5])
+        stats = self.profiler.stats('paint')
+        self.assertEqual(stats.count, 4)
+        self.assertAlmostEqual(stats.mean, 3.5)
+        self.assertEqual(stats.p95, 5)
+        self.assertEqual(stats.max, 5)
+
+    def test_frame_accumulates(self):
+        self.profiler.begin_frame()
+        self.profiler.add('paint.NodeElement', 1)
+        self.profiler.add('paint.NodeElement', 2)
+        self.profiler.add('paint.minimap', 0.5)
+        self.assertEqual(self.profiler.samples('paint.NodeElement'), [])
+        self.profiler.end_frame()
+        self.assertEqual(self.profiler.samples('paint.NodeElement'), [3])
+        self.assertEqual(self.profiler.samples('paint.minimap'), [0.5])
+
+    def test_phase(self):
+        with self.profiler.phase('motion'):
+            pass
+        samples = self.profiler.samples('motion')
+        self.assertEqual(len(samples), 1)
+        self.assertGreaterEqual(samples[0], 0)
+
+    def test_histogram(self):
+        for sample in [0.5, 1.5, 2.5, 100]:
+            self.profiler.add('paint', sample)
+        self.assertEqual(self.profiler.histogram('paint', 2, 3), [2, 1, 1])
+
+    def test_dump_json(self):
+        self.profiler.add('paint', 2)
+        self.profiler.add('paint', 4)
+        fp = io.StringIO()
+        self.profiler.dump_json(fp)
+        data = json.loads(fp.getvalue())
+        self.assertEqual(data['window'], 4)
+        self.assertEqual(data['phases']['paint']['samples_ms'], [2, 4])
+        self.assertAlmostEqual(data['phases']['paint']['mean_ms'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
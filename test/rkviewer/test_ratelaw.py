@@ -0,0 +1,94 @@
+import math
+import unittest
+
+import numpy as np
+
+import iodine as iod
+from rkviewer.ratelaw import RateLawCache, RateLawError, compile_rate_law
+
+
+class TestCompile(unittest.TestCase):
+    def test_evaluate(self):
+        law = compile_rate_law('Vm * S^h / (Km^h + S**h) - k2*exp(-time) + abs(-pi)')
+        self.assertEqual(law.symbols, ('Vm', 'S', 'h', 'Km', 'k2'))
+        self.assertTrue(law.uses_time)
+        values = {'Vm': 2.0, 'S': 3.0, 'h': 2, 'Km': 1.0, 'k2': 0.5}
+        expected = 2 * 9 / (1 + 9) - 0.5 * math.exp(-1.5) + math.pi
+        self.assertAlmostEqual(law.evaluate(values, 1.5), expected)
+
+        # Vectorized over any number of states
+        values['S'] = np.array([[0.0, 1.0], [2.0, 3.0]])
+        result = law.evaluate(values, 1.5)
+        self.assertEqual(result.shape, (2, 2))
+        self.assertAlmostEqual(result[1, 1], expected)
+        np.testing.assert_allclose(result[0], [0 - 0.5 * math.exp(-1.5) + math.pi,
+                                               1 - 0.5 * math.exp(-1.5) + math.pi])
+
+        # Negative integer powers of integers would raise in NumPy
+        self.assertEqual(compile_rate_law('x^-1').evaluate({'x': np.array([2, 4])}).tolist(),
+                         [0.5, 0.25])
+        self.assertEqual(compile_rate_law('max(a, 1) + 2').evaluate({'a': 0}), 3)
+
+    def test_cache(self):
+        self.assertIs(compile_rate_law('k1 * A'), compile_rate_law('k1 * A'))
+        self.assertIsNot(compile_rate_law('k1 * A'), compile_rate_law('k1*A'))
+
+    def test_errors(self):
+        for rate_law in ('', '  ', 'k1 *', 'k1 * A)', 'foo(A)', 'exp(A, B)', 'A if B else C',
+                         'A < B', '"A"', 'A[0]', 'exp(x=A)', 'A.real', 'lambda: A', '(' * 500):
+            with self.assertRaises(RateLawError, msg=rate_law):
+                compile_rate_law(rate_law)
+        # Long sums are deep trees, which are compiled without going through their source
+        self.assertEqual(compile_rate_law('a+' * 400 + 'a').evaluate({'a': 1}), 401)
+
+
+class TestRateLawCache(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        iod.newNetwork('net')
+        iod.startGroup()
+        for nodei, node_id in enumerate(('A', 'B', 'C')):
+            iod.addNode(0, node_id, nodei * 100, 0, 50, 30)
+        iod.createUniUni(0, 'J0', 'k1 * A * B / (1 + C)', 0, 2, 1, 1)
+        iod.endGroup()
+        self.cache = RateLawCache()
+
+    def tearDown(self):
+        self.cache.close()
+        iod.reset()
+
+    def test_bind(self):
+        law = self.cache.get(0, 0)
+        self.assertEqual(law.species, ('A', 'B', 'C'))
+        self.assertEqual(law.parameters, ('k1',))
+        self.assertEqual(law.nodes, (-1, 0, 1, 2))
+        self.assertEqual(law.evaluate({0: 2.0, 1: 3.0, 2: 1.0}, {'k1': 0.5}), 1.5)
+        self.assertIs(self.cache.get(0, 0), law)
+
+    def test_invalidate(self):
+        law = self.cache.get(0, 0)
+        # Moving or resizing a node keeps the bindings
+        iod.setNodeCoordinate(0, 1, 50, 50)
+        iod.setNodeSize(0, 2, 80, 40)
+        self.assertIs(self.cache.get(0, 0), law)
+        # A node renamed to a symbol that was a parameter makes it a species
+        iod.setNodeID(0, 1, 'k1')
+        law = self.cache.get(0, 0)
+        self.assertEqual(law.species, ('k1', 'A', 'C'))
+        self.assertEqual(law.parameters, ('B',))
+
+        # Added nodes are not reported by iodine, but are seen
+        iod.addNode(0, 'B', 300, 0, 50, 30)
+        self.assertEqual(self.cache.get(0, 0).nodes, (1, 0, 3, 2))
+
+        iod.setRateLaw(0, 0, 'k2 * C')
+        law = self.cache.get(0, 0)
+        self.assertEqual((law.species, law.parameters), (('C',), ('k2',)))
+        iod.undo()
+        self.assertEqual(self.cache.get(0, 0).compiled.text, 'k1 * A * B / (1 + C)')
+
+        iod.setRateLaw(0, 0, 'k2 * ')
+        with self.assertRaises(RateLawError):
+            self.cache.get(0, 0)
+        with self.assertRaises(iod.ReactionIndexNotFoundError):
+            self.cache.get(0, 1)
@@ -0,0 +1,233 @@
+import io
+import unittest
+
+import iodine as iod
+from rkviewer.sbml import SBMLError, read_sbml, write_sbml
+
+
+# As written by other tools: layout and render attributes unprefixed, color definitions, styles by
+# type, negative coordinates, a species without a glyph, and a multi-segment curve
+EXTERNAL = b'''<?xml version="1.0" encoding="UTF-8"?>
+<sbml xmlns="http://www.sbml.org/sbml/level3/version1/core" level="3" version="1"
+      xmlns:layout="http://www.sbml.org/sbml/level3/version1/layout/version1"
+      xmlns:render="http://www.sbml.org/sbml/level3/version1/render/version1"
+      xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <model id="external">
+    <listOfCompartments>
+      <compartment id="cyto" size="2.5" constant="true"/>
+      <compartment id="hidden" constant="true"/>
+    </listOfCompartments>
+    <listOfSpecies>
+      <species id="S1" compartment="cyto"/>
+      <species id="S2" compartment="hidden"/>
+      <species id="S3" compartment="cyto"/>
+    </listOfSpecies>
+    <listOfParameters>
+      <parameter id="k1" value="0.1"/>
+    </listOfParameters>
+    <listOfReactions>
+      <reaction id="J0" reversible="false">
+        <listOfReactants>
+          <speciesReference species="S1" stoichiometry="2"/>
+        </listOfReactants>
+        <listOfProducts>
+          <speciesReference species="S2"/>
+        </listOfProducts>
+        <kineticLaw>
+          <math xmlns="http://www.w3.org/1998/Math/MathML">
+            <apply><divide/>
+              <apply><times/><ci> k1 </ci><apply><power/><ci> S1 </ci><cn> 2 </cn></apply></apply>
+              <apply><plus/><cn type="e-notation"> 1 <sep/> -3 </cn><ci> S1 </ci></apply>
+            </apply>
+          </math>
+        </kineticLaw>
+      </reaction>
+      <reaction id="J1" reversible="false">
+        <listOfReactants>
+          <speciesReference species="S2"/>
+        </listOfReactants>
+        <listOfProducts>
+          <speciesReference species="S3"/>
+        </listOfProducts>
+      </reaction>
+    </listOfReactions>
+    <layout:listOfLayouts>
+      <layout:layout layout:id="L">
+        <layout:listOfCompartmentGlyphs>
+          <layout:compartmentGlyph id="cg" compartment="cyto">
+            <layout:boundingBox><layout:position x="-100" y="0"/>
+              <layout:dimensions width="500" height="300"/></layout:boundingBox>
+          </layout:compartmentGlyph>
+        </layout:listOfCompartmentGlyphs>
+        <layout:listOfSpeciesGlyphs>
+          <layout:speciesGlyph id="sg1" species="S1">
+            <layout:boundingBox><layout:position x="-50" y="10"/>
+              <layout:dimensions width="40" height="20"/></layout:boundingBox>
+          </layout:speciesGlyph>
+          <layout:speciesGlyph id="sg2" species="S2">
+            <layout:boundingBox><layout:position x="150" y="10"/>
+              <layout:dimensions width="40" height="20"/></layout:boundingBox>
+          </layout:speciesGlyph>
+        </layout:listOfSpeciesGlyphs>
+        <layout:listOfReactionGlyphs>
+          <layout:reactionGlyph id="rg0" reaction="J0">
+            <layout:listOfSpeciesReferenceGlyphs>
+              <layout:speciesReferenceGlyph id="r0" speciesGlyph="sg1" role="substrate">
+                <layout:curve><layout:listOfCurveSegments>
+                  <layout:curveSegment xsi:type="CubicBezier">
+                    <layout:start x="-30" y="20"/><layout:end x="0" y="50"/>
+                    <layout:basePoint1 x="-20" y="40"/><layout:basePoint2 x="-10" y="45"/>
+                  </layout:curveSegment>
+                  <layout:curveSegment xsi:type="CubicBezier">
+                    <layout:start x="0" y="50"/><layout:end x="50" y="60"/>
+                    <layout:basePoint1 x="10" y="55"/><layout:basePoint2 x="30" y="70"/>
+                  </layout:curveSegment>
+                </layout:listOfCurveSegments></layout:curve>
+              </layout:speciesReferenceGlyph>
+              <layout:speciesReferenceGlyph id="p0" speciesGlyph="sg2" role="product">
+                <layout:curve><layout:listOfCurveSegments>
+                  <layout:curveSegment xsi:type="CubicBezier">
+                    <layout:start x="50" y="60"/><layout:end x="170" y="20"/>
+                    <layout:basePoint1 x="70" y="50"/><layout:basePoint2 x="120" y="30"/>
+                  </layout:curveSegment>
+                </layout:listOfCurveSegments></layout:curve>
+              </layout:speciesReferenceGlyph>
+            </layout:listOfSpeciesReferenceGlyphs>
+          </layout:reactionGlyph>
+        </layout:listOfReactionGlyphs>
+        <render:listOfRenderInformation>
+          <render:renderInformation id="info">
+            <render:listOfColorDefinitions>
+              <render:colorDefinition id="blue" value="#0000ff"/>
+            </render:listOfColorDefinitions>
+            <render:listOfStyles>
+              <render:style typeList="SPECIESGLYPH">
+                <render:g stroke="blue" stroke-width="4" fill="#ffffff80"/>
+              </render:style>
+              <render:style idList="sg2">
+                <render:g fill="#102030"/>
+              </render:style>
+              <render:style typeList="REACTIONGLYPH">
+                <render:g stroke="blue" stroke-width="5"/>
+              </render:style>
+            </render:listOfStyles>
+          </render:renderInformation>
+        </render:listOfRenderInformation>
+      </layout:layout>
+    </layout:listOfLayouts>
+  </model>
+</sbml>
+'''
+
+
+def _rgba(color: iod.TColor):
+    return color.r, color.g, color.b, color.a
+
+
+class TestSBML(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        iod.newNetwork('net')
+
+    def tearDown(self):
+        iod.reset()
+
+    def test_read(self):
+        net = read_sbml(io.BytesIO(EXTERNAL))
+        self.assertEqual(net.id, 'external')
+        self.assertEqual([n.id for n in net.nodes.values()], ['S1', 'S2', 'S3'])
+        # Everything is shifted right, so that the compartment is at x = 0
+        s1, s2, s3 = net.nodes.values()
+        self.assertEqual((s1.x, s1.y, s1.w, s1.h), (50, 10, 40, 20))
+        self.assertEqual((s2.x, s2.y), (250, 10))
+        # The species without a glyph is placed below the others
+        self.assertEqual((s3.x, s3.y, s3.w, s3.h), (0, 360, 50, 30))
+        # Only the compartment with a glyph is drawn
+        self.assertEqual(len(net.compartments), 1)
+        comp = net.compartments[0]
+        self.assertEqual((comp.id, comp.x, comp.w, comp.volume), ('cyto', 0, 500, 2.5))
+        self.assertEqual(comp.node_indices, {0, 2})
+        self.assertEqual(net.baseNodes, {1})
+        self.assertEqual([s1.compi, s2.compi, s3.compi], [0, -1, 0])
+
+        j0, j1 = net.reactions.values()
+        self.assertEqual(j0.srcDict[0].stoich, 2)
+        self.assertEqual(j0.rateLaw, 'k1 * S1^2 / (1e-3 + S1)')
+        # The handles are next to each end of the curves, shifted as the nodes are
+        self.assertEqual((j0.srcDict[0].handleX, j0.srcDict[0].handleY), (80, 40))
+        self.assertEqual((j0.centerHandleX, j0.centerHandleY), (130, 70))
+        self.assertEqual((j0.destDict[1].handleX, j0.destDict[1].handleY), (220, 30))
+        # The reaction without curves gets the default handles
+        self.assertEqual((j1.srcDict[1].handleX, j1.srcDict[1].handleY),
+                         ((270 + 147.5) / 2, (20 + 197.5) / 2))
+
+        # Styles by ID take precedence over styles by type
+        self.assertEqual(_rgba(s1.fillColor), (255, 255, 255, 128))
+        self.assertEqual(_rgba(s1.outlineColor), (0, 0, 255, 255))
+        self.assertEqual(s1.outlineThickness, 4)
+        self.assertEqual(_rgba(s2.fillColor), (16, 32, 48, 255))
+        self.assertEqual(_rgba(j0.fillColor), (0, 0, 255, 255))
+        # The reaction without a glyph keeps its default style
+        self.assertEqual((j0.thickness, j1.thickness), (5, 3))
+        self.assertIsNot(s1.outlineColor, s2.outlineColor)
+
+    def test_read_layout_first(self):
+        # Level 2 models have their layout in an annotation, which may come before the species
+        start = EXTERNAL.index(b'    <layout:listOfLayouts>')
+        end = EXTERNAL.index(b'</layout:listOfLayouts>') + len(b'</layout:listOfLayouts>\n')
+        model = EXTERNAL.index(b'<model id="external">\n') + len(b'<model id="external">\n')
+        text = EXTERNAL[:model] + b'<annotation>\n' + EXTERNAL[start:end] + b'</annotation>\n' \
+            + EXTERNAL[model:start] + EXTERNAL[end:]
+        net = read_sbml(io.BytesIO(text))
+        s1, s2, _ = net.nodes.values()
+        self.assertEqual((s1.x, s1.y, s2.x), (50, 10, 250))
+        self.assertEqual(net.reactions[0].centerHandleX, 130)
+        self.assertEqual(_rgba(s2.fillColor), (16, 32, 48, 255))
+
+    def test_round_trip(self):
+        neti = iod.addNetwork(read_sbml(io.BytesIO(EXTERNAL)))
+        iod.setRateLaw(neti, 1, 'Vm * S2 / (Km + S2) - exp(-time)^0.5')
+        text = io.StringIO()
+        write_sbml(neti, text)
+        net = read_sbml(io.BytesIO(text.getvalue().encode()))
+        original = iod.networkDict[neti]
+        for a, b in ((original.nodes, net.nodes), (original.reactions, net.reactions)):
+            self.assertEqual(list(a), list(b))
+            for item_a, item_b in zip(a.values(), b.values()):
+                attrs_a = {k: v for k, v in vars(item_a).items()
+                           if not k.endswith('Dict') and k != 'rateLaw'}
+                attrs_b = {k: v for k, v in vars(item_b).items() if not k.endswith('Dict')}
+                for key, value in attrs_a.items():
+                    if isinstance(value, iod.TColor):
+                        self.assertEqual(_rgba(value), _rgba(attrs_b[key]))
+                    else:
+                        self.assertEqual(value, attrs_b[key], key)
+        for reai, rea in original.reactions.items():
+            read = net.reactions[reai]
+            for name in ('srcDict', 'destDict'):
+                self.assertEqual({k: vars(v) for k, v in getattr(rea, name).items()},
+                                 {k: vars(v) for k, v in getattr(read, name).items()})
+        # Numbers are written in their shortest form
+        self.assertEqual(net.reactions[0].rateLaw, 'k1 * S1^2 / (0.001 + S1)')
+        self.assertEqual(net.reactions[1].rateLaw, 'Vm * S2 / (Km + S2) - exp(-time)^0.5')
+        self.assertEqual(net.compartments[0].node_indices, {0, 2})
+
+    def test_errors(self):
+        with self.assertRaises(SBMLError):
+            read_sbml(io.BytesIO(b'<sbml><model><listOfSpecies>'))
+        with self.assertRaises(SBMLError):
+            read_sbml(io.BytesIO(b'<notsbml/>'))
+        unknown = EXTERNAL.replace(b'<speciesReference species="S2"/>',
+                                   b'<speciesReference species="S4"/>', 1)
+        with self.assertRaises(SBMLError):
+            read_sbml(io.BytesIO(unknown))
+
+    def test_set_network(self):
+        net = read_sbml(io.BytesIO(EXTERNAL))
+        iod.setNetwork(0, net)
+        self.assertEqual(iod.getListOfNodeIDs(0), ['S1', 'S2', 'S3'])
+        with self.assertRaises(iod.IDRepeatError):
+            iod.addNetwork(net)
+        iod.undo()
+        self.assertEqual(iod.getNetworkID(0), 'net')
+        self.assertEqual(iod.getNumberOfNodes(0), 0)
@@ -0,0 +1,74 @@
+import unittest
+
+import iodine as iod
+from rkviewer.search import FUZZY, PREFIX, SUBSTRING, SearchIndex
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        iod.newNetwork('net')
+        iod.startGroup()
+        for nodei, node_id in enumerate(('Glucose', 'G6P', 'F6P', 'ATP', 'ADP')):
+            iod.addNode(0, node_id, nodei * 100, 0, 50, 30)
+        iod.createUniUni(0, 'hexokinase', 'Vmax * Glucose * ATP / (Km_glc + Glucose)', 0, 1, 1,
+                         1)
+        iod.addSrcNode(0, 0, 3, 1)
+        iod.addDestNode(0, 0, 4, 1)
+        iod.createUniUni(0, 'pgi', 'k_pgi * G6P', 1, 2, 1, 1)
+        iod.addCompartment(0, 'cytosol', 0, 0, 600, 200)
+        iod.endGroup()
+        self.index = SearchIndex()
+
+    def tearDown(self):
+        self.index.close()
+        iod.reset()
+
+    def found(self, query, mode=SUBSTRING, **kw):
+        return [(m.kind, m.index, m.text) for m in self.index.search(0, query, mode, **kw)]
+
+    def test_modes(self):
+        # Reactions match the symbols of their rate laws too
+        self.assertEqual(self.found('g', PREFIX), [
+            (iod.NODE, 1, 'G6P'), (iod.REACTION, 1, 'G6P'), (iod.NODE, 0, 'Glucose'),
+            (iod.REACTION, 0, 'Glucose')])
+        self.assertEqual(self.found('g6p', PREFIX, kinds=[iod.NODE]), [(iod.NODE, 1, 'G6P')])
+        # Prefix matches come first
+        self.assertEqual(self.found('p'), [
+            (iod.REACTION, 1, 'pgi'), (iod.NODE, 4, 'ADP'), (iod.NODE, 3, 'ATP'),
+            (iod.REACTION, 0, 'ATP'), (iod.NODE, 2, 'F6P'), (iod.NODE, 1, 'G6P')])
+        # The characters in order, tightest first
+        self.assertEqual(self.found('gcs', FUZZY), [(iod.NODE, 0, 'Glucose'),
+                                                    (iod.REACTION, 0, 'Glucose')])
+        self.assertEqual(self.found('hxk', FUZZY), [(iod.REACTION, 0, 'hexokinase')])
+        self.assertEqual(self.found('xyz', FUZZY), [])
+
+        self.assertEqual(self.found('glc', kinds=[iod.REACTION]), [(iod.REACTION, 0, 'Km_glc')])
+        self.assertEqual(self.found('cyto'), [(iod.COMPARTMENT, 0, 'cytosol')])
+        self.assertEqual(len(self.found('p', limit=2)), 2)
+        self.assertEqual(self.found(''), [])
+        with self.assertRaises(ValueError):
+            self.index.search(0, 'g', 'regex')
+        with self.assertRaises(iod.NetIndexNotFoundError):
+            self.index.search(1, 'g')
+
+    def test_update(self):
+        self.assertEqual(self.found('glucose', PREFIX), [(iod.NODE, 0, 'Glucose'),
+                                                         (iod.REACTION, 0, 'Glucose')])
+        iod.setNodeID(0, 0, 'Glc')
+        iod.setRateLaw(0, 0, 'Vmax * Glc')
+        self.assertEqual(self.found('glucose'), [])
+        self.assertEqual(self.found('glc'), [(iod.NODE, 0, 'Glc'), (iod.REACTION, 0, 'Glc')])
+
+        # Created items are not reported by iodine, but are found
+        iod.addNode(0, 'Fructose', 0, 100, 50, 30)
+        iod.createUniUni(0, 'fructokinase', 'k * Fructose', 5, 2, 1, 1)
+        self.assertEqual(self.found('fruct'), [(iod.REACTION, 2, 'fructokinase'),
+                                               (iod.NODE, 5, 'Fructose')])
+
+        iod.deleteReaction(0, 2)
+        iod.deleteNode(0, 5)
+        self.assertEqual(self.found('fruct'), [])
+        iod.undo()
+        iod.undo()
+        self.assertEqual(self.found('fruct', kinds=[iod.NODE]), [(iod.NODE, 5, 'Fructose')])
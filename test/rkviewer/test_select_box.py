@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+
+from rkviewer.canvas import elements
+from rkviewer.canvas.data import Node
+from rkviewer.canvas.elements import SelectBox
+from rkviewer.canvas.geometry import Rect, Vec2
+from rkviewer.events import DidDragResizeNodesEvent, DidMoveNodesEvent
+
+
+class FakeCanvas:
+    MILLIS_PER_REFRESH = 16
+
+    def __init__(self):
+        self.node_idx_map = dict()
+
+    def InWhichCompartment(self, rects):
+        return -1
+
+
+class RecordingController:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append(name)
+
+
+def make_node(index: int) -> Node:
+    return Node('x{}'.format(index), pos=Vec2(index * 50, 0), size=Vec2(20, 20), fill_color=None,
+                border_color=None, border_width=1, index=index)
+
+
+class TestSelectBoxEvents(unittest.TestCase):
+    def setUp(self):
+        self.calls = list()
+        self.nodes = [make_node(0), make_node(1)]
+        self.box = SelectBox(FakeCanvas(), self.nodes, [], Rect(Vec2(), Vec2(1000, 1000)),
+                             RecordingController(self.calls), 0, 0)
+        patchers = [mock.patch.object(elements.wx, 'CallLater'),
+                    mock.patch.object(elements, 'post_event', side_effect=self.calls.append)]
+        self.call_later, _ = (p.start() for p in patchers)
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def run_timer(self):
+        """Run the scheduled flush, checking that only one was scheduled."""
+        self.assertEqual(self.call_later.call_count, 1)
+        interval, flush = self.call_later.call_args[0]
+        self.assertEqual(interval, FakeCanvas.MILLIS_PER_REFRESH)
+        self.call_later.reset_mock()
+        flush()
+
+    def test_uniform(self):
+        self.box._queue_move(self.nodes, Vec2(1, 2))
+        self.box._queue_move(self.nodes, Vec2(3, 4))
+        # Nothing is posted until the timer runs
+        self.assertEqual(self.calls, [])
+        self.run_timer()
+        self.assertEqual(len(self.calls), 1)
+        evt = self.calls[0]
+        self.assertIsInstance(evt, DidMoveNodesEvent)
+        self.assertEqual(evt.nodes, self.nodes)
+        self.assertEqual(evt.offset, Vec2(4, 6))
+        self.assertTrue(evt.dragged)
+        # The next move schedules a new flush
+        self.box._queue_move(self.nodes, Vec2(1, 1))
+        self.run_timer()
+        self.assertEqual(self.calls[1].offset, Vec2(1, 1))
+
+    def test_per_node(self):
+        self.box._queue_resize(Vec2(2, 2))
+        self.box._queue_move(self.nodes, [Vec2(1, 0), Vec2(0, 1)])
+        self.box._queue_resize(Vec2(1.5, 1))
+        self.box._queue_move(self.nodes, Vec2(1, 1))
+        self.run_timer()
+        resize, move = self.calls
+        self.assertIsInstance(resize, DidDragResizeNodesEvent)
+        self.assertEqual(resize.ratio, Vec2(3, 2))
+        self.assertEqual(move.offset, [Vec2(2, 1), Vec2(1, 2)])
+
+    def test_other_nodes(self):
+        self.box._queue_move(self.nodes, Vec2(1, 1))
+        self.box._queue_move(self.nodes[:1], Vec2(2, 2))
+        # The first move is posted as soon as a different set of nodes is moved
+        self.assertEqual([evt.offset for evt in self.calls], [Vec2(1, 1)])
+        self.run_timer()
+        self.assertEqual(self.calls[1].nodes, self.nodes[:1])
+        self.assertEqual(self.calls[1].offset, Vec2(2, 2))
+
+    def test_flush_before_commit(self):
+        self.box._mode = SelectBox.Mode.MOVING
+        self.box._did_move = True
+        self.box._queue_move(self.nodes, Vec2(5, 0))
+        self.box.do_left_up(Vec2())
+        self.assertIsInstance(self.calls[0], DidMoveNodesEvent)
+        self.assertEqual(self.calls[1], 'start_group')
+        self.assertEqual(self.calls[-1], 'end_group')
+        # The scheduled flush has nothing left to post
+        self.run_timer()
+        self.assertEqual(sum(isinstance(c, DidMoveNodesEvent) for c in self.calls), 1)
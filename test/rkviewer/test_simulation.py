@@ -0,0 +1,121 @@
+import threading
+import unittest
+
+import numpy as np
+
+import iodine as iod
+from rkviewer.simulation import (SimulationCancelled, SimulationError, SimulationWorker,
+                                 TimeCourseBuffer, build_model, simulate, stoichiometry_matrix)
+
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        iod.newNetwork('net')
+        iod.startGroup()
+        for nodei, node_id in enumerate(('A', 'B', 'C')):
+            iod.addNode(0, node_id, nodei * 100, 0, 50, 30)
+        # A -> B, and A + B -> 2 B + C
+        iod.createUniUni(0, 'J0', 'k1 * A', 0, 1, 1, 1)
+        iod.createReaction(0, 'J1')
+        iod.addSrcNode(0, 1, 0, 1)
+        iod.addSrcNode(0, 1, 1, 1)
+        iod.addDestNode(0, 1, 1, 2)
+        iod.addDestNode(0, 1, 2, 1)
+        iod.setRateLaw(0, 1, 'k2 * A * B')
+        iod.endGroup()
+
+    def tearDown(self):
+        iod.reset()
+
+    def test_stoichiometry_matrix(self):
+        node_indices, reaction_indices, matrix = stoichiometry_matrix(iod.networkDict[0])
+        self.assertEqual((node_indices, reaction_indices), ([0, 1, 2], [0, 1]))
+        self.assertEqual(matrix.toarray().tolist(), [[-1, -1], [1, 1], [0, 1]])
+
+    def test_build_model(self):
+        model = build_model(0)
+        self.assertEqual(model.species_ids, ('A', 'B', 'C'))
+        self.assertEqual(model.parameters, ('k1', 'k2'))
+        # C depends on A and B through J1, but nothing depends on C
+        self.assertEqual(model.jac_sparsity.toarray().tolist(), [[1, 1, 0], [1, 1, 0], [1, 1, 0]])
+
+        f = model.rhs(model.parameter_values({'k1': 2, 'k2': 3}))
+        y = model.initial_state({'A': 1, 'B': 2})
+        np.testing.assert_allclose(f(0.0, y), [-2 - 6, 2 + 6, 6])
+        # Vectorized over states
+        np.testing.assert_allclose(f(0.0, np.stack([y, 2 * y], axis=1))[:, 1], [-28, 28, 24])
+
+        iod.setRateLaw(0, 1, '')
+        with self.assertRaisesRegex(SimulationError, 'J1'):
+            build_model(0)
+        iod.setRateLaw(0, 1, 'foo(A)')
+        with self.assertRaisesRegex(SimulationError, 'J1'):
+            build_model(0)
+        iod.newNetwork('empty')
+        with self.assertRaises(SimulationError):
+            build_model(1)
+
+    def test_simulate(self):
+        iod.setRateLaw(0, 1, '0')
+        chunks = list()
+        course = simulate(build_model(0), 4.0, 9, {'A': 2, 'B': 0}, {'k1': 0.5},
+                          on_chunk=chunks.append, chunk_interval=0)
+        np.testing.assert_allclose(course.times, np.linspace(0, 4, 9))
+        np.testing.assert_allclose(course.amounts[:, 0], 2 * np.exp(-0.5 * course.times),
+                                   rtol=1e-4)
+        np.testing.assert_allclose(course.amounts.sum(axis=1), 3, rtol=1e-6)
+        # The chunks add up to the time course
+        np.testing.assert_array_equal(np.concatenate([c.times for c in chunks]), course.times)
+        np.testing.assert_array_equal(np.concatenate([c.amounts for c in chunks]),
+                                      course.amounts)
+        # The rates are those of each state
+        np.testing.assert_allclose(course.rates, np.stack([0.5 * course.amounts[:, 0],
+                                                           np.zeros(9)], axis=1))
+        np.testing.assert_allclose(np.concatenate([c.rates for c in chunks]), course.rates)
+
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(SimulationCancelled):
+            simulate(build_model(0), 4.0, 9, cancel=cancel)
+
+    def test_worker(self):
+        results = list()
+        done = threading.Event()
+
+        def on_done(course, error):
+            results.append((course, error))
+            done.set()
+
+        # Run the callbacks on the worker thread
+        chunks = list()
+        worker = SimulationWorker(build_model(0), 1.0, 11, None, None, lambda f: f(),
+                                  chunks.append, on_done, chunk_interval=0)
+        self.assertTrue(done.wait(10))
+        worker.join()
+        course, error = results[0]
+        self.assertIsNone(error)
+        self.assertEqual(sum(len(c.times) for c in chunks), 11)
+        self.assertEqual(course.amounts.shape, (11, 3))
+
+        done.clear()
+        SimulationWorker(build_model(0), -1.0, 11, None, None, lambda f: f(), chunks.append,
+                         on_done)
+        self.assertTrue(done.wait(10))
+        self.assertIsNone(results[1][0])
+        self.assertIn('end time', results[1][1])
+
+    def test_buffer(self):
+        buffer = TimeCourseBuffer(2, 1)
+        for start in range(0, 40, 10):
+            times = np.arange(start, start + 10, dtype=float)
+            buffer.append(times, np.stack([times, -times], axis=1), times[:, None] - 20)
+        self.assertEqual(len(buffer), 40)
+        np.testing.assert_array_equal(buffer.times, np.arange(40))
+        self.assertEqual((buffer.max_amount, buffer.max_rate), (39, 20))
+        amounts, rates = buffer.sample(12.25)
+        np.testing.assert_allclose(amounts, [12.25, -12.25])
+        np.testing.assert_allclose(rates, [-7.75])
+        # Clamped to the times appended so far
+        self.assertEqual(buffer.sample(-1)[0].tolist(), [0, 0])
+        self.assertEqual(buffer.sample(100)[0].tolist(), [39, -39])
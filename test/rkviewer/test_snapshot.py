@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+
+import iodine as iod
+from rkviewer.snapshot import SnapshotCache, take_snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        iod.newNetwork('net')
+        iod.addNode(0, 'A', 10, 20, 30, 40)
+        iod.addNode(0, 'B', 100, 20, 30, 40)
+        iod.addNode(0, 'C', 200, 20, 30, 40)
+        iod.deleteNode(0, 1)
+        iod.addNode(0, 'D', 300, 20, 30, 40)
+        iod.setNodeFillColorRGB(0, 3, 1, 2, 3)
+        iod.createReaction(0, 'R')
+        iod.addSrcNode(0, 0, 0, 1)
+        iod.addSrcNode(0, 0, 2, 2)
+        iod.addDestNode(0, 0, 3, 3)
+        iod.addCompartment(0, 'comp', 0, 0, 500, 500)
+        iod.setCompartmentOfNode(0, 2, 0)
+
+    def tearDown(self):
+        iod.reset()
+
+    def test_snapshot(self):
+        snapshot = take_snapshot(0)
+        self.assertEqual(snapshot.node_ids, ('A', 'C', 'D'))
+        self.assertEqual(list(snapshot.node_indices), [0, 2, 3])
+        self.assertEqual(snapshot.node_row(3), 2)
+        np.testing.assert_array_equal(snapshot.node_positions[2], (300, 20))
+        np.testing.assert_array_equal(snapshot.node_centers()[0], (25, 40))
+        np.testing.assert_array_equal(snapshot.node_fill_colors[2], (1, 2, 3, 255))
+        self.assertEqual(list(snapshot.node_compartments), [-1, 0, -1])
+        self.assertEqual(snapshot.reaction_ids, ('R',))
+        self.assertEqual(snapshot.compartment_ids, ('comp',))
+        with self.assertRaises(ValueError):
+            snapshot.node_positions[0, 0] = 1
+
+    def test_matrices(self):
+        snapshot = take_snapshot(0)
+        np.testing.assert_array_equal(snapshot.stoichiometry_matrix().toarray(), [[-1], [-2], [3]])
+        expected = np.zeros((3, 3), dtype=bool)
+        expected[0, 2] = expected[1, 2] = True
+        np.testing.assert_array_equal(snapshot.adjacency_matrix().toarray(), expected)
+
+    def test_cache(self):
+        cache = SnapshotCache()
+        first = cache.get(0)
+        self.assertIs(cache.get(0), first)
+        iod.setNodeCoordinate(0, 0, 50, 50)
+        second = cache.get(0)
+        self.assertIsNot(second, first)
+        np.testing.assert_array_equal(second.node_positions[0], (50, 50))
+        iod.undo()
+        np.testing.assert_array_equal(cache.get(0).node_positions[0], (10, 20))
+
+    def test_empty(self):
+        iod.newNetwork('empty')
+        snapshot = take_snapshot(1)
+        self.assertEqual(snapshot.node_positions.shape, (0, 2))
+        self.assertEqual(snapshot.stoichiometry_matrix().shape, (0, 0))
+        with self.assertRaises(iod.NetIndexNotFoundError):
+            take_snapshot(5)
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from rkviewer.spatial import RectSweep, SpatialGrid
+
+
+class TestSpatialGrid(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.positions = rng.uniform(-500, 1500, (300, 2))
+        self.sizes = rng.uniform(5, 80, (300, 2))
+        # One rectangle much larger than the cells
+        self.sizes[0] = (900, 700)
+        self.grid = SpatialGrid(self.positions, self.sizes)
+        self.lower = self.positions
+        self.upper = self.positions + self.sizes
+
+    def test_point_hits(self):
+        rng = np.random.default_rng(1)
+        points = rng.uniform(-600, 1600, (2000, 2))
+        # Points on the borders are inside
+        points[:2] = self.lower[5], self.upper[5]
+        point_rows, rects = self.grid.point_hits(points)
+        inside = np.all((points[:, None] >= self.lower[None])
+                        & (points[:, None] <= self.upper[None]), axis=2)
+        self.assertEqual(set(zip(point_rows.tolist(), rects.tolist())),
+                         set(zip(*(a.tolist() for a in np.nonzero(inside)))))
+        self.assertIn((0, 5), set(zip(point_rows.tolist(), rects.tolist())))
+        self.assertIn((1, 5), set(zip(point_rows.tolist(), rects.tolist())))
+
+    def test_query_rect(self):
+        for lower, upper in (((0, 0), (100, 50)), ((-1e4, -1e4), (1e4, 1e4)),
+                             ((300, 300), (300, 300)), ((5000, 5000), (5100, 5100))):
+            expected = np.flatnonzero(np.all((self.lower <= upper) & (self.upper >= lower), axis=1))
+            np.testing.assert_array_equal(self.grid.query_rect(lower, upper), expected)
+        # An empty rectangle overlaps nothing
+        self.assertEqual(len(self.grid.query_rect((10, 10), (0, 0))), 0)
+
+    def test_empty(self):
+        grid = SpatialGrid(np.empty((0, 2)), np.empty((0, 2)))
+        self.assertEqual(len(grid), 0)
+        self.assertEqual(len(grid.point_hits([(0, 0)])[0]), 0)
+        self.assertEqual(len(grid.query_rect((0, 0), (10, 10))), 0)
+
+
+class TestRectSweep(unittest.TestCase):
+    def test_moves(self):
+        rng = np.random.default_rng(2)
+        positions = rng.uniform(0, 1000, (400, 2))
+        sizes = rng.uniform(5, 60, (400, 2))
+        lower, upper = positions, positions + sizes
+        sweep = RectSweep(SpatialGrid(positions, sizes))
+        rows = set()
+        # A drag that grows, shrinks and crosses over its start, with a few jumps
+        start = np.array([500.0, 500.0])
+        corner = start.copy()
+        for step in range(300):
+            corner = (rng.uniform(-100, 1100, 2) if step % 50 == 0
+                      else corner + rng.uniform(-40, 40, 2))
+            query_lower, query_upper = np.minimum(start, corner), np.maximum(start, corner)
+            added, removed = sweep.move(query_lower, query_upper)
+            expected = set(np.flatnonzero(np.all((lower <= query_upper)
+                                                 & (upper >= query_lower), axis=1)).tolist())
+            self.assertEqual(added, expected - rows)
+            self.assertEqual(removed, rows - expected)
+            self.assertEqual(sweep.rows, expected)
+            rows = expected
+        # Rectangles touching only the border are overlapped
+        sweep.move(lower[3] - 20, lower[3])
+        self.assertIn(3, sweep.rows)
+        # An empty rectangle overlaps nothing
+        self.assertEqual(sweep.move((10, 10), (0, 0))[0], set())
+        self.assertEqual(sweep.rows, set())
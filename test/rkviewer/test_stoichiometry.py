@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+from scipy import sparse
+
+import iodine as iod
+from rkviewer.stoichiometry import StoichiometryCache, _left_null_space
+
+
+class TestStoichiometry(unittest.TestCase):
+    def setUp(self):
+        iod.reset()
+        iod.newNetwork('net')
+        iod.startGroup()
+        for nodei, node_id in enumerate(('E', 'S', 'ES', 'P', 'X')):
+            iod.addNode(0, node_id, nodei * 100, 0, 50, 30)
+        # E + S -> ES, and ES -> E + P
+        iod.createReaction(0, 'J0')
+        iod.addSrcNode(0, 0, 0, 1)
+        iod.addSrcNode(0, 0, 1, 1)
+        iod.addDestNode(0, 0, 2, 1)
+        iod.createReaction(0, 'J1')
+        iod.addSrcNode(0, 1, 2, 1)
+        iod.addDestNode(0, 1, 0, 1)
+        iod.addDestNode(0, 1, 3, 1)
+        iod.endGroup()
+        self.cache = StoichiometryCache()
+
+    def tearDown(self):
+        self.cache.close()
+        iod.reset()
+
+    def test_matrix(self):
+        stoich = self.cache.get(0)
+        self.assertEqual(stoich.node_indices.tolist(), [0, 1, 2, 3, 4])
+        self.assertEqual(stoich.reaction_indices.tolist(), [0, 1])
+        self.assertEqual(stoich.matrix.toarray().tolist(),
+                         [[-1, 1], [-1, 0], [1, -1], [0, 1], [0, 0]])
+        self.assertIs(self.cache.get(0), stoich)
+        with self.assertRaises(iod.NetIndexNotFoundError):
+            self.cache.get(1)
+
+    def test_update(self):
+        stoich = self.cache.get(0)
+        # Only the changed column is replaced
+        iod.setReactionSrcNodeStoich(0, 0, 1, 2.0)
+        updated = self.cache.get(0)
+        self.assertIsNot(updated, stoich)
+        self.assertIs(updated.node_indices, stoich.node_indices)
+        self.assertEqual(updated.matrix[:, 0].toarray().ravel().tolist(), [-1, -2, 1, 0, 0])
+        self.assertEqual(updated.matrix[:, 1].toarray().ravel().tolist(), [1, 0, -1, 1, 0])
+
+        # Created reactions and nodes are not reported by iodine, but are seen
+        iod.addNode(0, 'Y', 500, 0, 50, 30)
+        iod.createUniUni(0, 'J2', 'k * X', 4, 5, 1, 3)
+        stoich = self.cache.get(0)
+        self.assertEqual(stoich.node_indices.tolist(), [0, 1, 2, 3, 4, 5])
+        self.assertEqual(stoich.matrix[:, 2].toarray().ravel().tolist(), [0, 0, 0, 0, -1, 3])
+
+        iod.deleteReaction(0, 0)
+        iod.deleteNode(0, 1)
+        stoich = self.cache.get(0)
+        self.assertEqual(stoich.node_indices.tolist(), [0, 2, 3, 4, 5])
+        self.assertEqual(stoich.reaction_indices.tolist(), [1, 2])
+        self.assertEqual(stoich.matrix.toarray().tolist(),
+                         [[1, 0], [-1, 0], [1, 0], [0, -1], [0, 3]])
+
+        for _ in range(5):
+            iod.undo()
+        self.assertEqual(self.cache.get(0).matrix.toarray().tolist(),
+                         [[-1, 1], [-1, 0], [1, -1], [0, 1], [0, 0]])
+
+    def test_analyses(self):
+        stoich = self.cache.get(0)
+        laws = stoich.conservation_laws().toarray()
+        self.assertEqual(laws.shape, (3, 5))
+        np.testing.assert_allclose(laws @ stoich.matrix.toarray(), 0, atol=1e-12)
+        self.assertEqual(np.linalg.matrix_rank(laws), 3)
+        # The free node X is conserved by itself
+        self.assertIn([0, 0, 0, 0, 1], laws.tolist())
+
+        self.assertEqual(stoich.dead_end_species(), (1, 3))
+        components = stoich.connected_components()
+        self.assertEqual([(c.node_indices, c.reaction_indices) for c in components],
+                         [((0, 1, 2, 3), (0, 1)), ((4,), ())])
+        self.assertEqual(stoich.reachable([1]), ((0, 1, 2, 3), (0, 1)))
+        self.assertEqual(stoich.reachable(reaction_indices=[1]), ((0, 2, 3), (0, 1)))
+        self.assertEqual(stoich.reachable([1], upstream=True), ((1,), ()))
+        self.assertEqual(stoich.reachable([3], upstream=True), ((0, 1, 2, 3), (0, 1)))
+        self.assertEqual(stoich.reachable([4]), ((4,), ()))
+        with self.assertRaises(KeyError):
+            stoich.reachable([7])
+
+    def test_left_null_space(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            n, m = rng.integers(1, 12, 2)
+            matrix = rng.integers(-2, 3, (n, m)) * (rng.random((n, m)) < 0.4)
+            laws = _left_null_space(sparse.csr_matrix(matrix.astype(float))).toarray()
+            dimension = n - np.linalg.matrix_rank(matrix)
+            self.assertEqual(laws.shape, (dimension, n))
+            np.testing.assert_allclose(laws @ matrix, 0, atol=1e-9)
+            if dimension > 0:
+                self.assertEqual(np.linalg.matrix_rank(laws), dimension)